@@ -0,0 +1,143 @@
+"""Process-wide OpenRouter clients over one pooled HTTP connection pool each.
+
+Every LLM and DenseRAG used to construct its own OpenAI client, so the nine
+pipelines (plus the evaluation judge, built per call) each opened, and
+kept, their own connections to the same host. The clients here are shared
+per API key: get_client() for the synchronous paths and get_async_client()
+for code running on an event loop (the analysis consumer), both on an httpx
+pool sized and kept alive by the OPENROUTER_* settings.
+
+An httpx.AsyncClient's connections belong to the event loop that opened
+them, so async clients are kept per loop; a process served by daphne has one.
+Code that uses them runs inside async_client_session() (the analysis consumer
+opens one per batch): when the last session on a loop ends, the loop's
+clients are closed. Clients of loops that closed without that are dropped
+the next time a client is handed out.
+"""
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_HEADERS = {
+    "HTTP-Referer": "https://rag.nevatal.tech",
+    "X-Title": "RagReader",
+}
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = 120.0
+
+_clients: Dict[str, OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+# Open async_client_session() blocks per loop.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, int]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _client_settings(api_key: str) -> dict:
+    """OpenAI / AsyncOpenAI arguments, less the http_client."""
+    from django.conf import settings
+
+    return {
+        "base_url": BASE_URL,
+        "api_key": api_key,
+        "default_headers": DEFAULT_HEADERS,
+        "timeout": httpx.Timeout(getattr(settings, "OPENROUTER_TIMEOUT", DEFAULT_TIMEOUT), connect=10.0),
+    }
+
+
+def _limits() -> httpx.Limits:
+    from django.conf import settings
+
+    return httpx.Limits(
+        max_connections=getattr(settings, "OPENROUTER_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+        max_keepalive_connections=getattr(settings, "OPENROUTER_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE),
+        keepalive_expiry=getattr(settings, "OPENROUTER_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+    )
+
+
+def _api_key(api_key: Optional[str]) -> str:
+    from django.conf import settings
+
+    return api_key or settings.OPENROUTER_API_KEY
+
+
+def get_client(api_key: Optional[str] = None) -> OpenAI:
+    """The process-wide synchronous client for `api_key` (default: settings)."""
+    api_key = _api_key(api_key)
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = OpenAI(
+                **_client_settings(api_key), http_client=DefaultHttpxClient(limits=_limits())
+            )
+        return client
+
+
+async def _close(clients: Dict[str, AsyncOpenAI]) -> None:
+    await asyncio.gather(*(client.close() for client in clients.values()), return_exceptions=True)
+
+
+async def aclose_async_clients() -> None:
+    """Close the running loop's async clients now; later calls build new ones."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    await _close(clients)
+
+
+@asynccontextmanager
+async def async_client_session() -> AsyncIterator[None]:
+    """Keep the running loop's async clients open for the block.
+
+    Sessions on one loop overlap freely; the clients are closed when the
+    last of them ends, so a loop that stops using them (or stops running)
+    does not keep their connection pools.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        _sessions[loop] = _sessions.get(loop, 0) + 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _sessions[loop] -= 1
+            clients = {}
+            if not _sessions[loop]:
+                del _sessions[loop]
+                clients = _async_clients.pop(loop, {})
+        await _close(clients)
+
+
+def _prune_closed_loops() -> None:
+    """Drop the clients of loops that were closed without closing them.
+    Call with _lock held."""
+    for loop in [loop for loop in _async_clients if loop.is_closed()]:
+        del _async_clients[loop]
+
+
+def get_async_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """The async client for `api_key` on the running event loop.
+
+    Must be called from a coroutine (or a callback on the loop), within
+    async_client_session() so the client is closed once no longer used.
+    """
+    api_key = _api_key(api_key)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        _prune_closed_loops()
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = AsyncOpenAI(
+                **_client_settings(api_key), http_client=DefaultAsyncHttpxClient(limits=_limits())
+            )
+        return client
@@ -1,8 +1,9 @@
 from common.prompt_builder import vote_prompt, rag_prompt, prompt_generator
 from abc import ABC, abstractmethod
-from typing import Optional
+import asyncio
+from typing import AsyncIterator, Iterator, Optional, Union
 from django.conf import settings
-from openai import OpenAI
+from ai_handler.clients import get_async_client, get_client
 
 # All LLMs are routed through OpenRouter using a single API key.
 # Provider-specific classes just set the appropriate model prefix.
@@ -19,20 +20,49 @@ class BaseLLM(ABC):
         """Abstract method that child classes must implement."""
         pass
 
-    def generate(self, prompt: str) -> str:
-        """Standard text generation."""
-        return self._call_api(prompt)
+    def _stream_api(self, prompt: str) -> Iterator[str]:
+        """The completion as text deltas, as the provider produces them.
 
-    def rag_generate(self, query: str, context: str) -> str:
-        """Generates an answer based on RAG context."""
+        Models that cannot stream yield the whole completion at once.
+        """
+        yield self._call_api(prompt)
+
+    def generate(self, prompt: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """Standard text generation; with `stream`, an iterator of deltas."""
+        return self._stream_api(prompt) if stream else self._call_api(prompt)
+
+    def rag_generate(self, query: str, context: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """Generates an answer based on RAG context; with `stream`, an iterator of deltas."""
         formatted_prompt = rag_prompt(query, context)
-        return self._call_api(formatted_prompt)
+        return self.generate(formatted_prompt, stream=stream)
+
+    async def _acall_api(self, prompt: str) -> str:
+        """_call_api() for code on an event loop; runs it on a worker thread
+        unless the model has a native async client."""
+        return await asyncio.to_thread(self._call_api, prompt)
+
+    async def _astream_api(self, prompt: str) -> AsyncIterator[str]:
+        yield await self._acall_api(prompt)
+
+    async def agenerate(self, prompt: str, stream: bool = False) -> Union[str, AsyncIterator[str]]:
+        """generate() for async callers; with `stream`, an async iterator of deltas."""
+        return self._astream_api(prompt) if stream else await self._acall_api(prompt)
+
+    async def arag_generate(self, query: str, context: str, stream: bool = False) -> Union[str, AsyncIterator[str]]:
+        """rag_generate() for async callers; with `stream`, an async iterator of deltas."""
+        formatted_prompt = rag_prompt(query, context)
+        return await self.agenerate(formatted_prompt, stream=stream)
 
     def prompt_generate(self, query: str) -> str:
         """Generates/Optimizes a search query."""
         formatted_prompt = prompt_generator(query)
         return self._call_api(formatted_prompt)
 
+    async def aprompt_generate(self, query: str) -> str:
+        """prompt_generate() for async callers."""
+        formatted_prompt = prompt_generator(query)
+        return await self._acall_api(formatted_prompt)
+
     def vote_generate(self, query: str, chunk: str, response: str) -> str:
         """Generates a vote (Yes/No) for validity."""
         formatted_prompt = vote_prompt(query, chunk, response)
@@ -40,18 +70,20 @@ class BaseLLM(ABC):
 
 
 class OpenRouterBase(BaseLLM):
-    """Base class for OpenRouter-routed models using the OpenAI-compatible API."""
+    """Base class for OpenRouter-routed models using the OpenAI-compatible API.
+
+    Every instance shares the process-wide clients of ai_handler.clients and
+    so their connection pool.
+    """
 
     def __init__(self, model: str, temperature: float = 0.0, api_key: str = ""):
         super().__init__(model, temperature, api_key)
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.api_key,
-            default_headers={
-                "HTTP-Referer": "https://rag.nevatal.tech",
-                "X-Title": "RagReader",
-            },
-        )
+        self.client = get_client(self.api_key)
+
+    @property
+    def async_client(self):
+        """The shared async client of the running event loop."""
+        return get_async_client(self.api_key)
 
     def _call_api(self, prompt: str) -> str:
         try:
@@ -64,6 +96,46 @@ class OpenRouterBase(BaseLLM):
         except Exception as e:
             raise RuntimeError(f"OpenRouter call failed ({self.model}): {e}") from e
 
+    def _stream_api(self, prompt: str) -> Iterator[str]:
+        try:
+            chunks = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                stream=True,
+            )
+            for chunk in chunks:
+                # OpenRouter interleaves keep-alive and usage chunks without choices.
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise RuntimeError(f"OpenRouter call failed ({self.model}): {e}") from e
+
+    async def _acall_api(self, prompt: str) -> str:
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+            )
+            return (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            raise RuntimeError(f"OpenRouter call failed ({self.model}): {e}") from e
+
+    async def _astream_api(self, prompt: str) -> AsyncIterator[str]:
+        try:
+            chunks = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                stream=True,
+            )
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise RuntimeError(f"OpenRouter call failed ({self.model}): {e}") from e
+
 
 class OpenAILLM(OpenRouterBase):
     """OpenAI models via OpenRouter (e.g. openai/gpt-4o, openai/gpt-4o-mini)."""
@@ -0,0 +1,10 @@
+"""Performance benchmarks for the retrieval engines.
+
+Not part of the test suite: each module is a standalone script that prints a
+small results table. Run them from the backend directory, e.g.
+
+    python -m benchmarks.dense_ann
+
+They use synthetic data and never call a paid API, so the numbers compare
+code paths rather than providers.
+"""
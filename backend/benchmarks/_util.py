@@ -0,0 +1,51 @@
+"""Shared helpers for the benchmark scripts."""
+import time
+from typing import Callable, List
+
+import numpy as np
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors — closer to real embeddings than uniform noise.
+
+    Real chunk embeddings bunch up by topic; uniformly random vectors are all
+    nearly orthogonal, which makes every ANN index look worse than it is.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def perturbed_queries(vectors: np.ndarray, count: int, noise: float = 0.3, seed: int = 1) -> np.ndarray:
+    """Queries near (but not on) stored vectors, like a paraphrased question."""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), size=count)]
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def time_calls(fn: Callable[[int], object], count: int) -> List[float]:
+    """Wall-clock milliseconds for fn(0) … fn(count - 1)."""
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(values), pct)) if values else 0.0
+
+
+def print_table(headers: List[str], rows: List[List[object]]) -> None:
+    cells = [[str(h) for h in headers]] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print("  ".join(cell.rjust(widths[i]) for i, cell in enumerate(row)))
+        if n == 0:
+            print("  ".join("-" * w for w in widths))
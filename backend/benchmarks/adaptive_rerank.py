@@ -0,0 +1,220 @@
+"""Adaptive reranking: how often Hybrid skips the cross-encoder, and at what cost.
+
+For each query HybridRAG.retrieve runs twice, reranking every candidate
+(adaptive_rerank off) and only the ones BM25 and dense search disagree on
+(on), and the report compares the two: the share of queries reranked fully,
+partly or not at all, cross-encoder pairs scored, p50/p95 latency, and the
+top-k overlap of the adaptive results with the full rerank.
+
+By default the engine is the synthetic one of benchmarks/hybrid_latency.py,
+with a stand-in cross-encoder that scores the density of the query's words
+and sleeps --pair-ms per pair; its dense vectors are the chunks' tf-idf vectors
+through a random projection, and each query's carries --noise, so the two
+halves agree often but not always, as they do on real documents. With --eval-sets it is measured on every
+conversation that has ground truth instead: the saved hybrid index for its
+document is opened, the real cross-encoder reranks (needs OPENROUTER_API_KEY
+for the query embedding and a configured database), and recall@k against the
+ground-truth chunks is reported for both settings.
+
+    python -m benchmarks.adaptive_rerank [--words 2000000] [--pair-ms 1.5] [--queries 200]
+    python -m benchmarks.adaptive_rerank --eval-sets [--k 5]
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from benchmarks._util import percentile, print_table, synthetic_embeddings, time_calls
+
+
+class OverlapScorer:
+    """Scores a pair by how often the query's words occur in its text, at --pair-ms a pair."""
+
+    name = "stand-in"
+
+    def __init__(self, pair_ms: float):
+        self.pair_ms = pair_ms
+
+    def predict(self, pairs, batch_size=None):
+        time.sleep(self.pair_ms / 1000 * len(pairs))
+        scores = []
+        for query, text in pairs:
+            words = text.lower().split()
+            scores.append(sum(words.count(word) for word in set(query.lower().split())) / len(words))
+        return np.array(scores, dtype=np.float64)
+
+
+class ProjectedEmbedding:
+    """tf-idf vectors through a random projection: dense scores that follow the words."""
+
+    def __init__(self, texts, dim: int, noise: float, seed: int = 0):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.vectorizer = TfidfVectorizer(token_pattern=r"\S+", lowercase=True)
+        counts = self.vectorizer.fit_transform(texts)
+        self.projection = np.random.default_rng(seed).normal(size=(counts.shape[1], dim)).astype(np.float32)
+        self.vectors = np.asarray(counts @ self.projection, dtype=np.float32)
+        self.noise = noise
+
+    def __call__(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.vectorizer.transform([query]) @ self.projection, dtype=np.float32)[0]
+        rng = np.random.default_rng(abs(hash(query)) % 2**32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        vector = vector + rng.normal(0, self.noise / np.sqrt(len(vector)), len(vector)).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+def measure(engine, queries, relevant=None):
+    """Per setting (full, adaptive): telemetry, latencies, overlap with full and recall."""
+    from hybrid_rag.adaptive import RerankTelemetry
+
+    full = [engine.retrieve(query) for query in queries]
+    measured = {}
+    for adaptive in (False, True):
+        engine.adaptive_rerank = adaptive
+        engine.rerank_telemetry = RerankTelemetry()
+        results = [engine.retrieve(query) for query in queries]
+        stats = engine.rerank_telemetry.stats()
+        ms = time_calls(lambda i: engine.retrieve(queries[i]), len(queries))
+        measured[adaptive] = {
+            "stats": stats,
+            "ms": ms,
+            "overlap": [
+                len({r["chunk_id"] for r in got} & {r["chunk_id"] for r in want}) / max(1, len(want))
+                for got, want in zip(results, full)
+            ],
+            "recall": [
+                len({r["chunk_id"] for r in got} & truth) / max(1, len(truth))
+                for got, truth in zip(results, relevant or [])
+            ],
+        }
+    engine.adaptive_rerank = False
+    return measured
+
+
+def report_rows(measured, with_recall: bool):
+    rows = []
+    for adaptive, m in measured.items():
+        stats = m["stats"]
+        queries = max(1, stats["queries"])
+        row = [
+            "adaptive" if adaptive else "full",
+            f"{stats['skipped'] / queries:.1%}" if adaptive else "-",
+            f"{stats['partial'] / queries:.1%}" if adaptive else "-",
+            f"{stats['pairs_saved_rate']:.1%}" if adaptive else "-",
+            f"{percentile(m['ms'], 50):.1f}",
+            f"{percentile(m['ms'], 95):.1f}",
+            f"{np.mean(m['overlap']):.3f}",
+        ]
+        if with_recall:
+            row.append(f"{np.mean(m['recall']):.4f}")
+        rows.append(row)
+    return rows
+
+
+HEADERS = ["rerank", "skipped", "partial", "pairs saved", "p50 ms", "p95 ms", "overlap with full"]
+
+
+def synthetic_report(args) -> None:
+    from benchmarks.hybrid_latency import hybrid_engine
+    from benchmarks.sparse_tokenizer import synthetic_chunks
+
+    chunks = synthetic_chunks(args)
+    embedding = ProjectedEmbedding(chunks, args.dim, args.noise)
+    engine = hybrid_engine(chunks, embedding.vectors, args)
+    engine.dense_engine._embed_query = embedding
+    engine._cross_encoder = OverlapScorer(args.pair_ms)
+    rng = np.random.default_rng(1)
+    queries = [" ".join(rng.choice(chunks[i].split(), size=4)) for i in rng.integers(0, len(chunks), args.queries)]
+
+    # The engines print every hit; keep the table readable.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        measured = measure(engine, queries)
+
+    print(f"\n{len(chunks)} chunks, top {args.top_k} of {args.child_top_k} per half, "
+          f"stand-in cross-encoder {args.pair_ms} ms per pair")
+    print_table(HEADERS, report_rows(measured, with_recall=False))
+
+
+def eval_set_report(args) -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ragreader.settings")
+    django.setup()
+
+    from django.conf import settings
+    from common.index_store import is_index_dir
+    from evaluation.models import GroundTruthChunk
+    from pipeline.hybrid_rag_pipeline import HybridRAGPipeline
+    from router.models import Conversation, DocumentVector
+
+    conversations = (
+        Conversation.objects
+        .filter(ground_truth_chunks__isnull=False, document__isnull=False)
+        .distinct()
+    )
+    pipeline = HybridRAGPipeline({"llm_model": args.llm_model, "top_k": args.k, "child_top_k": args.child_top_k})
+    merged = {False: None, True: None}
+    measured_sets = 0
+    for conversation in conversations:
+        record = DocumentVector.objects.filter(
+            document=conversation.document, method="hybrid", status="ready"
+        ).last()
+        if record is None or not is_index_dir(record.vectorstore_location):
+            continue
+        if not pipeline._load_state(record.vectorstore_location):
+            continue
+        relevant = set(
+            GroundTruthChunk.objects.filter(conversation=conversation).values_list("chunk_id", flat=True)
+        )
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            measured = measure(pipeline.rag, [conversation.query], [relevant])
+        for adaptive, m in measured.items():
+            if merged[adaptive] is None:
+                merged[adaptive] = m
+                continue
+            total = merged[adaptive]
+            for key in ("ms", "overlap", "recall"):
+                total[key] += m[key]
+            for key in ("queries", "skipped", "partial", "full", "pairs_scored", "pairs_saved"):
+                total["stats"][key] += m["stats"][key]
+        measured_sets += 1
+
+    if not measured_sets:
+        print(f"No conversations with ground truth and a saved hybrid index in {settings.DATABASES['default']['NAME']}.")
+        return
+
+    stats = merged[True]["stats"]
+    pairs = stats["pairs_scored"] + stats["pairs_saved"]
+    stats["pairs_saved_rate"] = stats["pairs_saved"] / pairs if pairs else 0.0
+    print(f"\n{measured_sets} evaluation sets, k={args.k}")
+    print_table(HEADERS + [f"recall@{args.k} vs ground truth"], report_rows(merged, with_recall=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=2_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--pair-ms", type=float, default=1.5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--child-top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.3, help="norm of the noise added to a query vector")
+    parser.add_argument("--embed-ms", type=float, default=0.0)
+    parser.add_argument("--eval-sets", action="store_true", help="Measure on stored ground truth instead.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--llm-model", default="openai/gpt-4o-mini")
+    args = parser.parse_args()
+
+    if args.eval_sets:
+        eval_set_report(args)
+    else:
+        synthetic_report(args)
+
+
+if __name__ == "__main__":
+    main()
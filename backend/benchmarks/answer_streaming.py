@@ -0,0 +1,113 @@
+"""Answer streaming: time to the first answer text, blocking vs streamed generation.
+
+Runs OpenAILLM.generate against a local stand-in for the chat completions
+API that takes --first-ms before the first token and --token-ms for each of
+--tokens more, as a hosted model does. The blocking call can only hand over
+text when the completion is done; the streamed one (stream=True, as QueryView
+with STREAM and the analysis socket use it) hands over each delta as it
+arrives. Reports p50/p95 of the time to the first text and to the full answer.
+
+    python -m benchmarks.answer_streaming [--tokens 300] [--first-ms 400] [--token-ms 15]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks._util import percentile, print_table
+
+
+def make_handler(args):
+    class ChatHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_):
+            pass
+
+        def _chunk(self, payload: dict) -> dict:
+            return {"id": "stand-in", "object": "chat.completion.chunk", "created": 0, "model": "stand-in", **payload}
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            tokens = [f"word{i} " for i in range(args.tokens)]
+            time.sleep(args.first_ms / 1000)
+
+            if not request.get("stream"):
+                time.sleep(args.token_ms * (len(tokens) - 1) / 1000)
+                body = json.dumps({
+                    "id": "stand-in", "object": "chat.completion", "created": 0, "model": "stand-in",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(tokens)}}],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(args.token_ms / 1000)
+                delta = {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(self._chunk(delta))}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return ChatHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--first-ms", type=float, default=400.0)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ragreader.settings")
+    django.setup()
+
+    from openai import OpenAI
+    from ai_handler.llm import OpenAILLM
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm = OpenAILLM(api_key="stand-in")
+    llm.client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stand-in", max_retries=0)
+
+    rows = []
+    for stream in (False, True):
+        first, total = [], []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            first_ms = None
+            answer = llm.generate("question", stream=stream)
+            for delta in ([answer] if not stream else answer):
+                if first_ms is None and delta:
+                    first_ms = (time.perf_counter() - start) * 1000
+            first.append(first_ms)
+            total.append((time.perf_counter() - start) * 1000)
+        rows.append([
+            "stream" if stream else "blocking",
+            f"{percentile(first, 50):.0f}", f"{percentile(first, 95):.0f}",
+            f"{percentile(total, 50):.0f}", f"{percentile(total, 95):.0f}",
+        ])
+
+    server.shutdown()
+    print(f"\n{args.tokens} tokens, server {args.first_ms:.0f} ms to the first + {args.token_ms:.0f} ms per token")
+    print_table(["generation", "first text p50 ms", "p95", "full answer p50 ms", "p95"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Recall vs latency: DenseRAG's exact scan against its FAISS ANN indexes.
+
+The exact row reproduces DenseRAG.retrieve's exact path (cosine_similarity
+over the whole matrix, then argsort); recall@k for the ANN rows is measured
+against it.
+
+    python -m benchmarks.dense_ann [--n 20000] [--dim 1536] [--queries 200] [--k 10]
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks._util import (
+    percentile,
+    perturbed_queries,
+    print_table,
+    synthetic_embeddings,
+    time_calls,
+)
+from dense_rag.ann_index import AnnIndex
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    similarities = cosine_similarity(query.reshape(1, -1), vectors).flatten()
+    return similarities.argsort()[-k:][::-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.n, args.dim)
+    # DenseRAG has historically held float64 vectors; keep the exact row honest.
+    vectors64 = vectors.astype(np.float64)
+    queries = perturbed_queries(vectors, args.queries)
+
+    truth = [set(exact_top_k(vectors64, q, args.k)) for q in queries]
+    exact_ms = time_calls(lambda i: exact_top_k(vectors64, queries[i], args.k), len(queries))
+    rows = [["exact", "-", "1.000", f"{percentile(exact_ms, 50):.2f}", f"{percentile(exact_ms, 95):.2f}"]]
+
+    configs = [
+        ("hnsw", {"ef_search": 32}),
+        ("hnsw", {"ef_search": 64}),
+        ("hnsw", {"ef_search": 128}),
+        ("ivf", {"nprobe": 4}),
+        ("ivf", {"nprobe": 16}),
+        ("ivf", {"nprobe": 32}),
+    ]
+    built = {}
+    for kind, params in configs:
+        if kind not in built:
+            start = time.perf_counter()
+            built[kind] = AnnIndex.build(vectors, kind)
+            print(f"built {kind} in {time.perf_counter() - start:.1f}s")
+        index = built[kind]
+        index.params.update(params)
+        index._apply_search_params()
+
+        found = [set(index.search(q, args.k)[1]) for q in queries]
+        recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+        ms = time_calls(lambda i: index.search(queries[i], args.k), len(queries))
+        rows.append([
+            kind,
+            ", ".join(f"{k}={v}" for k, v in params.items()),
+            f"{recall:.3f}",
+            f"{percentile(ms, 50):.2f}",
+            f"{percentile(ms, 95):.2f}",
+        ])
+
+    print(f"\nN={args.n} dim={args.dim} queries={args.queries} k={args.k}")
+    print_table(["index", "params", f"recall@{args.k}", "p50 ms", "p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
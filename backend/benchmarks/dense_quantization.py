@@ -0,0 +1,166 @@
+"""Recall loss, memory and latency of DenseRAG's quantized vector storage.
+
+Each row configures a DenseRAG engine the way the registry would
+(vector_dtype, rescore_factor) and measures its exact-path retrieval against
+float32 exact search: recall@k of the float32 top-k, the bytes the scan
+touches, and per-query latency.
+
+By default the corpus is synthetic. With --eval-sets the same rows are
+measured on every conversation that has ground truth: the saved dense index
+for its document is opened, the stored query is embedded (needs
+OPENROUTER_API_KEY and a configured database), and recall is reported both
+against the float32 ranking and against the ground-truth chunks.
+
+    python -m benchmarks.dense_quantization [--n 20000] [--dim 1536] [--queries 200] [--k 10]
+    python -m benchmarks.dense_quantization --eval-sets [--k 5]
+"""
+import argparse
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from benchmarks._util import (
+    percentile,
+    perturbed_queries,
+    print_table,
+    synthetic_embeddings,
+    time_calls,
+)
+
+CONFIGS: List[Tuple[str, int]] = [
+    ("float32", 0),
+    ("float16", 0),
+    ("float16", 4),
+    ("int8", 0),
+    ("int8", 2),
+    ("int8", 4),
+]
+
+
+def bare_engine(vector_dtype: str, rescore_factor: int, vectors: np.ndarray):
+    """A DenseRAG holding `vectors`, without an API client or an ANN index."""
+    from dense_rag.dense_rag import DenseRAG
+
+    engine = DenseRAG.__new__(DenseRAG)
+    engine.vector_dtype = vector_dtype
+    engine.rescore_factor = rescore_factor
+    engine.document_vectors = vectors
+    engine.quantize_vectors()
+    return engine
+
+
+def stored_bytes(engine) -> int:
+    if engine.quantized is not None:
+        return engine.quantized.nbytes
+    return int(engine.document_vectors.nbytes)
+
+
+def synthetic_report(args) -> None:
+    from dense_rag.vectors import normalize_rows
+
+    vectors = normalize_rows(synthetic_embeddings(args.n, args.dim))
+    queries = perturbed_queries(vectors, args.queries)
+    baseline = bare_engine("float32", 0, vectors)
+    truth = [set(baseline._search(q, args.k)[1]) for q in queries]
+
+    rows = []
+    for dtype, factor in CONFIGS:
+        engine = bare_engine(dtype, factor, vectors)
+        found = [set(engine._search(q, args.k)[1]) for q in queries]
+        recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+        ms = time_calls(lambda i: engine._search(queries[i], args.k), len(queries))
+        rows.append([
+            dtype,
+            factor or "-",
+            f"{stored_bytes(engine) / 2**20:.1f}",
+            f"{recall:.4f}",
+            f"{percentile(ms, 50):.2f}",
+            f"{percentile(ms, 95):.2f}",
+        ])
+
+    print(f"\nN={args.n} dim={args.dim} queries={args.queries} k={args.k}")
+    print_table(["dtype", "rescore", "scan MiB", f"recall@{args.k} vs fp32", "p50 ms", "p95 ms"], rows)
+
+
+def eval_set_report(args) -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ragreader.settings")
+    django.setup()
+
+    from django.conf import settings
+    from common.index_store import is_index_dir
+    from dense_rag.dense_rag import DenseRAG
+    from evaluation.models import GroundTruthChunk
+    from router.models import Conversation, DocumentVector
+
+    conversations = (
+        Conversation.objects
+        .filter(ground_truth_chunks__isnull=False, document__isnull=False)
+        .distinct()
+    )
+    engine = DenseRAG({"top_k": args.k, "model": args.model})
+    stats = {config: {"vs_fp32": [], "vs_truth": []} for config in CONFIGS}
+    measured = 0
+
+    for conversation in conversations:
+        record = DocumentVector.objects.filter(
+            document=conversation.document, method="dense", status="ready"
+        ).last()
+        if record is None or not is_index_dir(record.vectorstore_location):
+            continue
+        relevant = set(
+            GroundTruthChunk.objects.filter(conversation=conversation).values_list("chunk_id", flat=True)
+        )
+        engine.vector_dtype = "float32"
+        engine.load_index(record.vectorstore_location)
+        engine.ann_index = None
+        query_vector = engine._embed_query(conversation.query)
+        if query_vector is None:
+            continue
+
+        baseline = bare_engine("float32", 0, engine.document_vectors)
+        fp32_top = set(baseline._search(query_vector, args.k)[1])
+        for config in CONFIGS:
+            candidate = bare_engine(*config, engine.document_vectors)
+            top = candidate._search(query_vector, args.k)[1]
+            chunk_ids = {engine.document_metadata[i].get("chunk_id") for i in top}
+            stats[config]["vs_fp32"].append(len(set(top) & fp32_top) / max(1, len(fp32_top)))
+            stats[config]["vs_truth"].append(len(chunk_ids & relevant) / max(1, len(relevant)))
+        measured += 1
+
+    if not measured:
+        print(f"No conversations with ground truth and a saved dense index in {settings.DATABASES['default']['NAME']}.")
+        return
+
+    rows = []
+    for (dtype, factor), values in stats.items():
+        rows.append([
+            dtype,
+            factor or "-",
+            f"{np.mean(values['vs_fp32']):.4f}",
+            f"{np.mean(values['vs_truth']):.4f}",
+        ])
+    print(f"\n{measured} evaluation sets, k={args.k}")
+    print_table(["dtype", "rescore", f"recall@{args.k} vs fp32", f"recall@{args.k} vs ground truth"], rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--eval-sets", action="store_true", help="Measure on stored ground truth instead.")
+    parser.add_argument("--model", default="openai/text-embedding-3-small")
+    args = parser.parse_args()
+
+    if args.eval_sets:
+        eval_set_report(args)
+    else:
+        synthetic_report(args)
+
+
+if __name__ == "__main__":
+    main()
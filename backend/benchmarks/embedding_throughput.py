@@ -0,0 +1,129 @@
+"""Embedding throughput: one request per document vs batched, concurrent requests.
+
+Runs DenseRAG._get_embeddings against a local stand-in for the embeddings
+API, so the numbers measure the client's batching and concurrency, not the
+network. The stand-in behaves like the real endpoint where it matters:
+
+* rejects requests over 2048 inputs or 300k tokens (HTTP 400),
+* takes --base-ms plus --ms-per-1k-tokens per request,
+* serves at most --server-slots requests at once (the rest queue),
+* fails --fail-rate of requests with HTTP 429.
+
+    python -m benchmarks.embedding_throughput [--chunks 6000] [--chunk-chars 2000] [--fail-rate 0.05]
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from openai import OpenAI
+
+from benchmarks._util import print_table
+from dense_rag.dense_rag import DenseRAG
+
+MAX_INPUTS = 2048
+MAX_TOKENS = 300_000
+
+
+def make_handler(args, slots: threading.BoundedSemaphore):
+    class EmbeddingsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *_):
+            pass
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = request["input"]
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            if len(inputs) > MAX_INPUTS or tokens > MAX_TOKENS:
+                return self._reply(400, {"error": {"message": f"{len(inputs)} inputs / {tokens} tokens is over the limit"}})
+            if random.random() < args.fail_rate:
+                return self._reply(429, {"error": {"message": "rate limited"}})
+
+            with slots:
+                time.sleep((args.base_ms + args.ms_per_1k_tokens * tokens / 1000) / 1000)
+
+            rng = np.random.default_rng(len(inputs))
+            vectors = rng.standard_normal((len(inputs), args.dim)).astype(np.float32)
+            if request.get("encoding_format") == "base64":
+                encoded = [base64.b64encode(v.tobytes()).decode() for v in vectors]
+            else:
+                encoded = vectors.tolist()
+            self._reply(200, {
+                "object": "list",
+                "model": request["model"],
+                "data": [{"object": "embedding", "index": i, "embedding": e} for i, e in enumerate(encoded)],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+    return EmbeddingsHandler
+
+
+def engine_for(base_url: str, **settings) -> DenseRAG:
+    engine = DenseRAG.__new__(DenseRAG)
+    engine.model = "openai/text-embedding-3-small"
+    # Retries are the batching layer's job here; the client's own would hide them.
+    engine.client = OpenAI(base_url=base_url, api_key="stand-in", max_retries=0)
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=6000)
+    parser.add_argument("--chunk-chars", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--base-ms", type=float, default=150.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=8.0)
+    parser.add_argument("--server-slots", type=int, default=16)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args, threading.BoundedSemaphore(args.server_slots)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    texts = [f"{i} " + "lorem ipsum dolor sit amet " * (args.chunk_chars // 27) for i in range(args.chunks)]
+    configs = [
+        ("one request", dict(embed_batch_size=len(texts), embed_batch_tokens=10 ** 12, embed_concurrency=1)),
+        ("batched x1", dict(embed_concurrency=1)),
+        ("batched x4", dict(embed_concurrency=4)),
+        ("batched x8", dict(embed_concurrency=8)),
+    ]
+
+    rows = []
+    for label, settings in configs:
+        engine = engine_for(base_url, **settings)
+        start = time.perf_counter()
+        try:
+            vectors = engine._get_embeddings(texts)
+            outcome = f"{len(vectors)} vectors"
+        except RuntimeError as e:
+            outcome = f"failed: {type(e.__cause__ or e).__name__}"
+            vectors = []
+        seconds = time.perf_counter() - start
+        rate = f"{len(vectors) / seconds:.0f}" if vectors else "-"
+        rows.append([label, f"{seconds:.2f}", rate, outcome])
+
+    server.shutdown()
+    print(
+        f"\n{args.chunks} chunks x {args.chunk_chars} chars, server {args.base_ms:.0f} ms + "
+        f"{args.ms_per_1k_tokens:.0f} ms/1k tokens, {args.server_slots} slots, fail rate {args.fail_rate:.0%}"
+    )
+    print_table(["mode", "seconds", "texts/s", "outcome"], rows)
+
+
+if __name__ == "__main__":
+    main()
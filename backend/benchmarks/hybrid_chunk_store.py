@@ -0,0 +1,62 @@
+"""Hybrid chunk texts: one copy per half vs one ChunkStore shared by both.
+
+Builds the HybridRAG of benchmarks/hybrid_latency.py (a real SparseRAG over
+a synthetic document, a DenseRAG over clustered vectors), then measures the
+memory the two halves' chunk texts take as Python string lists, as the
+ChunkStore each half saved before, and as the single store HybridRAG now
+shares, together with the chunk bytes each layout writes to disk.
+
+    python -m benchmarks.hybrid_chunk_store [--words 4000000] [--chunk-words 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks._util import print_table, synthetic_embeddings
+from benchmarks.hybrid_latency import hybrid_engine
+from benchmarks.sparse_tokenizer import synthetic_chunks
+from common.chunk_store import CHUNK_IDS_FILE, CHUNKS_FILE, OFFSETS_FILE, ChunkStore
+
+
+def list_nbytes(texts) -> int:
+    return sys.getsizeof(texts) + sum(sys.getsizeof(text) for text in texts)
+
+
+def store_disk_bytes(store: ChunkStore) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        store.save(directory)
+        return sum(os.path.getsize(os.path.join(directory, name)) for name in (CHUNKS_FILE, OFFSETS_FILE, CHUNK_IDS_FILE))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=4_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--child-top-k", type=int, default=20)
+    parser.add_argument("--embed-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    engine = hybrid_engine(chunks, synthetic_embeddings(len(chunks), args.dim), args)
+    texts = list(engine.sparse_engine.documents)
+    store = ChunkStore.from_texts(texts, engine.sparse_engine.indexed_chunk_ids())
+    disk = store_disk_bytes(store)
+
+    engine.share_chunks()
+    shared = engine.sparse_engine.documents is engine.dense_engine.documents
+
+    rows = [
+        ["string list per half", f"{2 * list_nbytes(texts) / 2**20:.1f}", "-"],
+        ["ChunkStore per half", f"{2 * store.nbytes / 2**20:.1f}", f"{2 * disk / 2**20:.1f}"],
+        ["one shared ChunkStore", f"{engine.sparse_engine.documents.nbytes / 2**20:.1f}", f"{disk / 2**20:.1f}"],
+    ]
+    print(f"\n{len(chunks)} chunks of {args.chunk_words} words, halves share one store: {'yes' if shared else 'no'}")
+    print_table(["chunk texts", "memory MiB", "disk MiB"], rows)
+
+
+if __name__ == "__main__":
+    main()
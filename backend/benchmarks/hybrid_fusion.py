@@ -0,0 +1,89 @@
+"""Hybrid fusion modes: cross-encoder reranking vs score-level fusion.
+
+Builds the HybridRAG of benchmarks/hybrid_latency.py with an instant query
+embedding, so the rows differ only in how the halves are combined. The
+cross-encoder is a stand-in that sleeps --pair-ms per (query, chunk) pair,
+roughly MiniLM-L6 on one CPU core; the score-level modes ("rrf", "minmax",
+"zscore") never call it. Reports p50/p95 of HybridRAG.retrieve per mode, and
+the top-k overlap of each score-level mode with the RRF of
+get_retrieved_scores() in "rerank" mode (dict loops over the halves' top
+child_top_k texts, whose ties break differently), and the time of that RRF.
+
+    python -m benchmarks.hybrid_fusion [--words 4000000] [--pair-ms 1.5] [--queries 200]
+"""
+import argparse
+import contextlib
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks._util import percentile, print_table, synthetic_embeddings, time_calls
+from benchmarks.hybrid_latency import hybrid_engine
+from benchmarks.sparse_tokenizer import synthetic_chunks
+from hybrid_rag.fusion import FUSION_MODES
+
+
+class SleepingScorer:
+    def __init__(self, pair_ms: float):
+        self.pair_ms = pair_ms
+        self.name = "stand-in"
+
+    def predict(self, pairs, batch_size=None):
+        time.sleep(self.pair_ms / 1000 * len(pairs))
+        return np.zeros(len(pairs))
+
+
+def dict_rrf_top_k(engine, query: str):
+    """The RRF of get_retrieved_scores() before fusion modes, keyed by text."""
+    doc_scores = defaultdict(float)
+    for results in (engine.sparse_engine.retrieve(query), engine.dense_engine.retrieve(query)):
+        for rank, doc in enumerate(results):
+            doc_scores[doc["text"]] += 1 / (engine.rrf_k + rank + 1)
+    return sorted(doc_scores, key=doc_scores.get, reverse=True)[: engine.final_top_k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=4_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--pair-ms", type=float, default=1.5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--child-top-k", type=int, default=20)
+    parser.add_argument("--embed-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    engine = hybrid_engine(chunks, synthetic_embeddings(len(chunks), args.dim), args)
+    engine.share_chunks()
+    engine._cross_encoder = SleepingScorer(args.pair_ms)
+    rng = np.random.default_rng(1)
+    queries = [" ".join(rng.choice(chunks[i].split(), size=4)) for i in rng.integers(0, len(chunks), args.queries)]
+
+    # The engines print every hit; keep the table readable.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        reference = [dict_rrf_top_k(engine, query) for query in queries]
+        dict_ms = time_calls(lambda i: dict_rrf_top_k(engine, queries[i]), len(queries))
+        rows = []
+        for mode in FUSION_MODES:
+            engine.fusion = mode
+            engine.retrieve(queries[0])
+            # The stand-in's scores carry no ranking to compare.
+            overlap = "-" if mode == "rerank" else "{:.3f}".format(np.mean([
+                len({r["text"] for r in engine.retrieve(query)} & set(expected)) / len(expected)
+                for query, expected in zip(queries, reference) if expected
+            ]))
+            ms = time_calls(lambda i: engine.retrieve(queries[i]), len(queries))
+            rows.append([mode, f"{percentile(ms, 50):.1f}", f"{percentile(ms, 95):.1f}", overlap])
+
+    print(f"\n{len(chunks)} chunks, cross-encoder stand-in {args.pair_ms} ms per pair, "
+          f"dict RRF over the top {args.child_top_k} lists p50 {percentile(dict_ms, 50):.1f} ms")
+    print_table(["fusion", "p50 ms", "p95 ms", f"top-{args.top_k} overlap with dict RRF"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Hybrid retrieval latency: sparse then dense vs both halves at once.
+
+Builds a HybridRAG whose sparse half is a real SparseRAG over a synthetic
+document (the corpus of benchmarks/sparse_tokenizer.py) and whose dense half
+is a DenseRAG over clustered vectors, with the query embedding replaced by a
+stand-in that sleeps for a lognormal network delay (median --embed-ms). The
+cross-encoder is replaced by a constant scorer so the rows differ only in
+how the two halves are run. Reports p50/p95 of HybridRAG.retrieve with
+parallel_retrieval off and on, and whether both return the same results.
+
+    python -m benchmarks.hybrid_latency [--words 4000000] [--embed-ms 80] [--queries 200]
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from benchmarks._util import percentile, print_table, synthetic_embeddings, time_calls
+from benchmarks.sparse_tokenizer import synthetic_chunks
+from dense_rag.dense_rag import DenseRAG
+from hybrid_rag.hybrid_rag import HybridRAG
+from sparse_rag.sparse_rag import SparseRAG
+
+
+class ConstantScorer:
+    def predict(self, pairs):
+        return np.zeros(len(pairs))
+
+
+def slow_query_embedding(vectors: np.ndarray, median_ms: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+
+    def embed(query: str) -> np.ndarray:
+        time.sleep(median_ms / 1000 * rng.lognormal(0.0, 0.3))
+        return vectors[hash(query) % len(vectors)]
+
+    return embed
+
+
+def hybrid_engine(chunks, vectors, args) -> HybridRAG:
+    documents = [{"text": text, "chunk_id": i} for i, text in enumerate(chunks)]
+    sparse = SparseRAG({"remove_stop_words": False, "tokenizer": "fast", "top_k": args.child_top_k})
+    sparse.index_documents(documents)
+
+    dense = DenseRAG.__new__(DenseRAG)
+    dense.top_k = args.child_top_k
+    dense.documents = chunks
+    dense.document_metadata = [{"chunk_id": i} for i in range(len(chunks))]
+    dense.set_vectors(vectors)
+    dense._embed_query = slow_query_embedding(vectors, args.embed_ms)
+
+    engine = HybridRAG.__new__(HybridRAG)
+    engine.final_top_k = args.top_k
+    engine.child_top_k = args.child_top_k
+    engine.rrf_k = 60
+    engine.sparse_engine = sparse
+    engine.dense_engine = dense
+    engine._cross_encoder = ConstantScorer()
+    engine.document_metadata = list(sparse.document_metadata)
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=4_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embed-ms", type=float, default=80.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--child-top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    engine = hybrid_engine(chunks, synthetic_embeddings(len(chunks), args.dim), args)
+    rng = np.random.default_rng(1)
+    queries = [" ".join(rng.choice(chunks[i].split(), size=4)) for i in rng.integers(0, len(chunks), args.queries)]
+
+    # The engines print every hit; keep the table readable.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows, results, sparse_ms = measure(engine, queries)
+
+    print(f"\n{len(chunks)} chunks, sparse alone p50 {percentile(sparse_ms, 50):.1f} ms, "
+          f"query embedding median {args.embed_ms:.0f} ms, same results: "
+          f"{'yes' if results[False] == results[True] else 'no'}")
+    print_table(["halves", "p50 ms", "p95 ms"], rows)
+
+
+def measure(engine: HybridRAG, queries):
+    rows, results = [], {}
+    for parallel in (False, True):
+        engine.parallel_retrieval = parallel
+        engine.retrieve(queries[0])
+        results[parallel] = [engine.retrieve(query) for query in queries[:20]]
+        ms = time_calls(lambda i: engine.retrieve(queries[i]), len(queries))
+        rows.append([
+            "concurrent" if parallel else "sequential",
+            f"{percentile(ms, 50):.1f}",
+            f"{percentile(ms, 95):.1f}",
+        ])
+    sparse_ms = time_calls(lambda i: engine.sparse_engine.retrieve(queries[i]), len(queries))
+    return rows, results, sparse_ms
+
+
+if __name__ == "__main__":
+    main()
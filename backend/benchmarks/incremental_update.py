@@ -0,0 +1,81 @@
+"""Sparse index after an edit: full rebuild vs removing and adding the changed chunks.
+
+Indexes a synthetic document (the corpus of benchmarks/sparse_tokenizer.py)
+with SparseRAG, replaces --changed of its chunks with new text, and brings
+the index up to date twice: index_documents over every chunk (what a
+changed document cost before) and remove_documents + add_documents (what
+BasePipeline._catch_up does). Reports the time of each and whether both
+indexes return the same top-k for a sample of queries.
+
+    python -m benchmarks.incremental_update [--words 2000000] [--chunk-words 100] [--changed 0.01 0.1]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks._util import print_table
+from benchmarks.sparse_tokenizer import synthetic_chunks
+from sparse_rag.sparse_rag import SparseRAG
+
+
+def engine() -> SparseRAG:
+    return SparseRAG({"remove_stop_words": False, "tokenizer": "fast", "top_k": 10})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=2_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--changed", type=float, nargs="+", default=[0.001, 0.01, 0.1])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    documents = [{"text": text, "chunk_id": i} for i, text in enumerate(chunks)]
+    rng = np.random.default_rng(0)
+    queries = [" ".join(rng.choice(chunks[i].split(), size=3)) for i in rng.integers(0, len(chunks), args.queries)]
+
+    rows = []
+    for fraction in args.changed:
+        changed = rng.choice(len(chunks), size=max(1, int(len(chunks) * fraction)), replace=False)
+        # Rotating a chunk's words gives it new text with the same vocabulary.
+        edited = [
+            {"text": " ".join(chunks[i].split()[1:] + chunks[i].split()[:1]), "chunk_id": len(chunks) + n}
+            for n, i in enumerate(changed)
+        ]
+        stale = {documents[i]["chunk_id"] for i in changed}
+        current = [doc for doc in documents if doc["chunk_id"] not in stale] + edited
+
+        rebuilt = engine()
+        start = time.perf_counter()
+        rebuilt.index_documents(current)
+        rebuild_seconds = time.perf_counter() - start
+
+        updated = engine()
+        updated.index_documents(documents)
+        start = time.perf_counter()
+        updated.remove_documents(stale)
+        updated.add_documents(edited)
+        update_seconds = time.perf_counter() - start
+
+        same = all(
+            [r["chunk_id"] for r in rebuilt.retrieve(query)] == [r["chunk_id"] for r in updated.retrieve(query)]
+            for query in queries
+        )
+        rows.append([
+            f"{fraction:.1%}",
+            len(changed),
+            f"{rebuild_seconds:.2f}",
+            f"{update_seconds:.2f}",
+            f"{rebuild_seconds / update_seconds:.1f}x",
+            "yes" if same else "no",
+        ])
+
+    print(f"\n{len(chunks)} chunks of {args.chunk_words} words")
+    print_table(["changed", "chunks", "rebuild s", "update s", "speedup", "same top-k"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""LLM calls: a client per call vs the shared pooled clients, threaded and async.
+
+Sends --requests chat completions, --concurrency at a time, to a local
+stand-in for the OpenRouter API that answers after --server-ms and counts the
+TCP connections it accepts. The stand-in speaks plain HTTP, so the TLS
+handshake a new connection costs against the real endpoint (one or two round
+trips more) is not in these numbers; the connection counts show how often
+it would be paid.
+
+    client per call   a new OpenAI client per request, as the evaluation judge
+                      (and every LLM and DenseRAG engine, once) built its own
+    shared, threads   ai_handler.clients.get_client() from a thread pool
+    shared, async     OpenAILLM.agenerate() on one event loop, the analysis
+                      consumer's path
+
+    python -m benchmarks.llm_connection_pool [--requests 400] [--concurrency 16] [--server-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks._util import percentile, print_table
+
+
+def make_handler(args, connections: list):
+    class ChatHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(1)
+
+        def log_message(self, *_):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(args.server_ms / 1000)
+            body = json.dumps({
+                "id": "stand-in", "object": "chat.completion", "created": 0, "model": "stand-in",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "answer"}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ChatHandler
+
+
+def timed(call) -> float:
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--server-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ragreader.settings")
+    django.setup()
+    import logging
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from openai import OpenAI
+    from ai_handler import clients
+    from ai_handler.llm import OpenAILLM
+
+    connections = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args, connections))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    # The shared clients are built on first use; point them at the stand-in.
+    clients.BASE_URL = base_url
+    messages = [{"role": "user", "content": "question"}]
+
+    def per_call():
+        OpenAI(base_url=base_url, api_key="stand-in").chat.completions.create(model="stand-in", messages=messages)
+
+    def shared():
+        clients.get_client("stand-in").chat.completions.create(model="stand-in", messages=messages)
+
+    def threaded(call):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            return list(pool.map(lambda _: timed(call), range(args.requests)))
+
+    async def awaited():
+        llm = OpenAILLM(api_key="stand-in")
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with slots:
+                start = time.perf_counter()
+                await llm.agenerate("question")
+                return (time.perf_counter() - start) * 1000
+
+        async with clients.async_client_session():
+            return await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    rows = []
+    for label, run in (
+        ("client per call", lambda: threaded(per_call)),
+        ("shared, threads", lambda: threaded(shared)),
+        ("shared, async", lambda: asyncio.run(awaited())),
+    ):
+        connections.clear()
+        start = time.perf_counter()
+        ms = run()
+        seconds = time.perf_counter() - start
+        rows.append([
+            label, f"{args.requests / seconds:.0f}", f"{percentile(ms, 50):.1f}",
+            f"{percentile(ms, 95):.1f}", len(connections),
+        ])
+
+    server.shutdown()
+    print(f"\n{args.requests} requests, {args.concurrency} at a time, server {args.server_ms:.0f} ms per request")
+    print_table(["clients", "requests/s", "p50 ms", "p95 ms", "connections opened"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Cross-encoder runtimes on CPU: PyTorch vs ONNX Runtime (fp32 and int8).
+
+Loads the Hybrid reranker once per --backends entry through RerankerPool,
+as HybridRAG does, and reranks --queries (query, --candidates passages)
+sets, one HybridRAG-sized predict() call each. The passages are the
+paragraphs of the project README, the queries sentences taken from them, so
+the rankings mean something. Reports the load time (the first ONNX load
+includes the export and quantization into --onnx-dir), p50/p95 per rerank,
+and agreement with the PyTorch ranking: top-1 match, overlap of the top
+--k, and Spearman correlation of the scores.
+
+The ONNX backends need `pip install "sentence-transformers[onnx]"`; a
+backend that cannot load is reported and skipped. The model is downloaded
+on first use.
+
+    python -m benchmarks.reranker_backends [--backends torch onnx onnx-int8] [--threads 4] [--queries 100]
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ragreader.settings")
+django.setup()
+
+from benchmarks._util import percentile, print_table, time_calls  # noqa: E402
+from hybrid_rag.reranker import RERANKER_BACKENDS, RerankerPool  # noqa: E402
+
+README = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "README.md")
+
+
+def rerank_sets(queries: int, candidates: int, seed: int = 0):
+    with open(README, encoding="utf-8") as f:
+        paragraphs = [" ".join(p.split()) for p in f.read().split("\n\n")]
+    passages = [p for p in paragraphs if len(p.split()) >= 12]
+    rng = np.random.default_rng(seed)
+    sets = []
+    for _ in range(queries):
+        picked = [passages[i] for i in rng.choice(len(passages), size=min(candidates, len(passages)), replace=False)]
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", picked[0]) if len(s.split()) >= 4] or [picked[0]]
+        sets.append([(sentences[rng.integers(len(sentences))], passage) for passage in picked])
+    return sets
+
+
+def spearman(left: np.ndarray, right: np.ndarray) -> float:
+    ranks_left, ranks_right = np.argsort(np.argsort(left)), np.argsort(np.argsort(right))
+    return float(np.corrcoef(ranks_left, ranks_right)[0, 1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(RERANKER_BACKENDS), choices=RERANKER_BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--onnx-dir", default=None, help="where to export (default: a temporary directory)")
+    args = parser.parse_args()
+
+    from django.conf import settings
+
+    settings.RERANKER_ONNX_DIR = args.onnx_dir or tempfile.mkdtemp(prefix="rerankers-")
+    sets = rerank_sets(args.queries, args.candidates)
+    pool = RerankerPool()
+
+    scores, rows = {}, []
+    for backend in args.backends:
+        reranker = pool.get(args.model, backend=backend, threads=args.threads)
+        start = time.perf_counter()
+        try:
+            reranker.load()
+        except Exception as e:
+            print(f"{backend}: could not load ({e}); skipped.")
+            continue
+        load_seconds = time.perf_counter() - start
+        if reranker.backend != backend:
+            print(f"{backend}: unavailable, fell back to {reranker.backend}; skipped.")
+            continue
+
+        scores[backend] = [np.asarray(reranker.predict(pairs), dtype=np.float64) for pairs in sets]
+        ms = time_calls(lambda i: reranker.predict(sets[i]), len(sets))
+        rows.append([backend, f"{load_seconds:.1f}", f"{reranker.nbytes / 2**20:.1f}",
+                     f"{percentile(ms, 50):.1f}", f"{percentile(ms, 95):.1f}"])
+
+    reference = scores.get("torch")
+    for row in rows:
+        got = scores[row[0]]
+        if reference is None:
+            row += ["-", "-", "-"]
+            continue
+        top1 = np.mean([np.argmax(g) == np.argmax(r) for g, r in zip(got, reference)])
+        overlap = np.mean([
+            len(set(np.argsort(-g)[:args.k]) & set(np.argsort(-r)[:args.k])) / args.k
+            for g, r in zip(got, reference)
+        ])
+        rho = np.mean([spearman(g, r) for g, r in zip(got, reference)])
+        row += [f"{top1:.3f}", f"{overlap:.3f}", f"{rho:.3f}"]
+
+    print(f"\n{args.model}, {len(sets)} reranks of {args.candidates} passages, {os.cpu_count()} CPUs, "
+          f"ONNX threads {args.threads or 'all'}")
+    print_table(
+        ["backend", "load s", "model MiB", "p50 ms", "p95 ms", "top-1 = torch", f"top-{args.k} overlap", "spearman"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
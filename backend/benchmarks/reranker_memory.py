@@ -0,0 +1,100 @@
+"""Reranker memory: one CrossEncoder per Hybrid engine vs one shared per model.
+
+Each scenario runs in a fresh interpreter, imports torch and
+sentence_transformers first (their cost is the same either way), then loads
+the reranker for --engines Hybrid engines and reports the growth in resident
+memory alongside the size of the weights held:
+
+* per engine    every engine builds its own LazyCrossEncoder (the old layout)
+* pooled        every engine asks one RerankerPool for the model
+
+Without network access the model cannot be downloaded; --stand-in (the
+default when the download fails) loads a randomly initialised model with
+ms-marco-MiniLM-L6-v2's shape instead, which holds the same memory.
+
+    python -m benchmarks.reranker_memory [--engines 3] [--model cross-encoder/ms-marco-MiniLM-L6-v2] [--stand-in]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks._util import print_table
+
+CHILD = """
+import json, sys
+import torch, sentence_transformers
+import hybrid_rag.reranker as reranker
+
+def rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+if {stand_in}:
+    from transformers import BertConfig, BertForSequenceClassification
+
+    def stand_in(model_name, max_length=None):
+        config = BertConfig(hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                            intermediate_size=1536, num_labels=1)
+        return BertForSequenceClassification(config).eval()
+
+    reranker.load_cross_encoder = stand_in
+
+before = rss()
+if {pooled}:
+    pool = reranker.RerankerPool()
+    models = [pool.get({model!r}) for _ in range({engines})]
+else:
+    models = [reranker.LazyCrossEncoder({model!r}) for _ in range({engines})]
+for m in models:
+    m.load()
+held = sum(m.nbytes for m in {{id(m): m for m in models}}.values())
+print(json.dumps({{"rss": rss() - before, "weights": held, "copies": len({{id(m.model) for m in models}})}}))
+"""
+
+
+def run(args, pooled: bool, stand_in: bool) -> dict:
+    code = CHILD.format(stand_in=stand_in, pooled=pooled, model=args.model, engines=args.engines)
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, timeout=900)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output")
+    return json.loads(lines[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", type=int, default=3)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L6-v2")
+    parser.add_argument("--stand-in", action="store_true", help="skip the download; use a random model of the same shape")
+    args = parser.parse_args()
+
+    stand_in = args.stand_in
+    rows = []
+    for label, pooled in (("per engine", False), ("pooled", True)):
+        try:
+            result = run(args, pooled, stand_in)
+        except RuntimeError as e:
+            if stand_in:
+                raise
+            print(f"Could not load {args.model} ({e}); using a stand-in of the same shape.")
+            stand_in = True
+            result = run(args, pooled, stand_in)
+        rows.append([
+            label,
+            result["copies"],
+            f"{result['weights'] / 2**20:.1f}",
+            f"{result['rss'] / 2**20:.1f}",
+        ])
+
+    print(f"\n{args.engines} Hybrid engines, {args.model}{' (stand-in)' if stand_in else ''}")
+    print_table(["layout", "model copies", "weights MiB", "RSS growth MiB"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Sparse retrieval: rank_bm25's BM25Okapi vs the inverted-index BM25Index.
+
+Both score the same synthetic corpora: documents of --doc-len tokens drawn
+from a Zipf distribution over --vocab terms, so a few terms are everywhere
+and most are rare, like real text. Queries mix --query-terms terms picked
+from the same distribution. Reported per engine and corpus size: build time,
+query latency (p50 / p95 for top --top-k) and whether the top-k matches.
+The "batch" row scores --batch queries per sparse matrix product
+(BM25Index.top_k_batch) and reports the latency per query.
+
+    python -m benchmarks.sparse_bm25 [--docs 10000 100000] [--queries 200] [--batch 32]
+"""
+import argparse
+import time
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from benchmarks._util import percentile, print_table, time_calls
+from common.ranking import top_k_indices
+from sparse_rag.bm25 import BM25Index
+
+
+def zipf_tokens(rng, count: int, vocab: int, exponent: float) -> np.ndarray:
+    return np.minimum(rng.zipf(exponent, size=count), vocab) - 1
+
+
+def synthetic_corpus(args, n_docs: int):
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(args.doc_len // 2, args.doc_len * 3 // 2, size=n_docs)
+    ids = zipf_tokens(rng, int(lengths.sum()), args.vocab, args.exponent)
+    terms = np.array([f"t{i}" for i in range(args.vocab)], dtype=object)
+    corpus = np.split(terms[ids], np.cumsum(lengths)[:-1])
+    queries = [list(terms[zipf_tokens(rng, args.query_terms, args.vocab, args.exponent)]) for _ in range(args.queries)]
+    return [list(doc) for doc in corpus], queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--doc-len", type=int, default=120)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--exponent", type=float, default=1.2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-terms", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    rows = []
+    for n_docs in args.docs:
+        corpus, queries = synthetic_corpus(args, n_docs)
+
+        start = time.perf_counter()
+        okapi = BM25Okapi(corpus)
+        okapi_build = time.perf_counter() - start
+        start = time.perf_counter()
+        index = BM25Index.build(corpus)
+        index_build = time.perf_counter() - start
+
+        okapi_top = [top_k_indices(okapi.get_scores(q), args.top_k) for q in queries[:20]]
+        expected = [ids[okapi.get_scores(q)[ids] > 0] for q, ids in zip(queries, okapi_top)]
+        single_matches = sum(np.array_equal(index.top_k(q, args.top_k)[0], e) for q, e in zip(queries, expected))
+        batch_matches = sum(
+            np.array_equal(ids, e) for (ids, _), e in zip(index.top_k_batch(queries[:len(expected)], args.top_k), expected)
+        )
+
+        # rank_bm25 is slow enough at this size that a sample of queries will do.
+        okapi_ms = time_calls(lambda i: top_k_indices(okapi.get_scores(queries[i]), args.top_k), min(len(queries), 50))
+        index_ms = time_calls(lambda i: index.top_k(queries[i], args.top_k), len(queries))
+        batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+        batch_ms = [
+            ms / len(batches[i])
+            for i, ms in enumerate(time_calls(lambda i: index.top_k_batch(batches[i], args.top_k), len(batches)))
+        ]
+
+        for label, build, timings, matches in (
+            ("rank_bm25", okapi_build, okapi_ms, len(expected)),
+            ("inverted index", index_build, index_ms, single_matches),
+            (f"batch of {args.batch}", index_build, batch_ms, batch_matches),
+        ):
+            rows.append([
+                n_docs,
+                label,
+                f"{build:.2f}",
+                f"{percentile(timings, 50):.2f}",
+                f"{percentile(timings, 95):.2f}",
+                f"{matches}/{len(expected)}",
+            ])
+
+    print(
+        f"\ndocs of ~{args.doc_len} tokens, Zipf({args.exponent}) over {args.vocab} terms, "
+        f"{args.query_terms}-term queries, top {args.top_k}"
+    )
+    print_table(["docs", "engine", "build s", "p50 ms", "p95 ms", "same top-k"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Sparse indexing of a large document: tokenizing in one process vs a pool.
+
+Indexes one synthetic book (the corpus of benchmarks/sparse_tokenizer.py,
+--words words in --chunk-words chunks) with SparseRAG.index_documents, once
+per --workers count, and reports the engine's own breakdown
+(index_timings: tokenize, bm25), the total, and whether the index equals the
+single-process one. 1 worker is the serial path; more use the process pool
+(the size threshold is lifted so it always applies).
+
+The nltk tokenizer is included only when NLTK's Punkt model is installed:
+worker processes run the real word_tokenize.
+
+    python -m benchmarks.sparse_index_build [--words 4000000] [--chunk-words 100] [--workers 1 2 4]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks._util import print_table
+from benchmarks.sparse_tokenizer import synthetic_chunks
+from sparse_rag.sparse_rag import SparseRAG
+
+
+def punkt_installed() -> bool:
+    import nltk
+
+    try:
+        nltk.data.find("tokenizers/punkt_tab")
+        return True
+    except LookupError:
+        return False
+
+
+def same_index(left, right) -> bool:
+    return left.vocabulary == right.vocabulary and all(
+        np.array_equal(getattr(left, name), getattr(right, name))
+        for name in ("indptr", "doc_ids", "term_freqs", "doc_len")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=4_000_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=2_000)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    documents = [{"text": text, "chunk_id": i} for i, text in enumerate(chunks)]
+    megabytes = sum(len(text) for text in chunks) / 1e6
+
+    rows = []
+    for tokenizer in ("fast", "nltk") if punkt_installed() else ("fast",):
+        reference = None
+        for workers in args.workers:
+            engine = SparseRAG({
+                "remove_stop_words": False,
+                "tokenizer": tokenizer,
+                "tokenize_workers": workers,
+                "tokenize_batch_size": args.batch_size,
+                "parallel_tokenize_min_chars": 0,
+            })
+            start = time.perf_counter()
+            engine.index_documents(documents)
+            total = time.perf_counter() - start
+            reference = reference or engine.bm25
+            rows.append([
+                tokenizer,
+                workers,
+                f"{engine.index_timings['tokenize']:.2f}",
+                f"{engine.index_timings['bm25']:.2f}",
+                f"{total:.2f}",
+                "yes" if same_index(engine.bm25, reference) else "no",
+            ])
+
+    print(f"\n{len(chunks)} chunks, {megabytes:.1f} MB, {os.cpu_count()} CPUs")
+    print_table(["tokenizer", "workers", "tokenize s", "bm25 s", "total s", "same index"], rows)
+
+
+if __name__ == "__main__":
+    main()
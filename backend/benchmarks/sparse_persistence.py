@@ -0,0 +1,127 @@
+"""Sparse index on disk: the old pickles vs the memory-mappable index directory.
+
+Saves one synthetic corpus (--chunks chunks of --chunk-tokens Zipf-distributed
+words) three ways and reports disk size, the time to get from the saved
+files to an engine that can answer a query, and that first query:
+
+* pickle + tokens   the old Hybrid sparse.pkl: BM25Okapi, token lists, texts
+* pickle            the old Sparse .pkl: BM25Okapi and texts
+* index dir         SparseRAG.save_index(): flat arrays, loaded with mmap
+
+Loading a pickle includes converting its BM25Okapi (SparseRAG.restore_bm25),
+as the pipelines do. Times are the median of --repeat loads from a warm page
+cache, so they measure deserialization, not the disk.
+
+    python -m benchmarks.sparse_persistence [--chunks 50000] [--chunk-tokens 120] [--repeat 3]
+"""
+import argparse
+import os
+import pickle
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from benchmarks._util import print_table
+from sparse_rag.bm25 import BM25Index
+from sparse_rag.sparse_rag import SparseRAG
+
+
+def empty_engine() -> SparseRAG:
+    engine = SparseRAG.__new__(SparseRAG)
+    engine.top_k = 10
+    engine.stop_words = set()
+    engine._clear_index()
+    return engine
+
+
+def synthetic_chunks(args):
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i}" for i in range(args.vocab)], dtype=object)
+    ids = np.minimum(rng.zipf(1.2, size=args.chunks * args.chunk_tokens), args.vocab) - 1
+    corpus = [list(words[ids[i:i + args.chunk_tokens]]) for i in range(0, len(ids), args.chunk_tokens)]
+    return corpus, [" ".join(tokens) for tokens in corpus]
+
+
+def disk_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def load_pickle(path: str) -> SparseRAG:
+    engine = empty_engine()
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    engine.documents = data["documents"]
+    engine.document_metadata = data["metadata"]
+    engine.restore_bm25(data["bm25"])
+    return engine
+
+
+def load_dir(path: str) -> SparseRAG:
+    engine = empty_engine()
+    engine.load_index(path)
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--chunk-tokens", type=int, default=120)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus, texts = synthetic_chunks(args)
+    metadata = [{"chunk_id": i + 1} for i in range(len(texts))]
+    okapi = BM25Okapi(corpus)
+    engine = empty_engine()
+    engine.documents, engine.document_metadata, engine.bm25 = texts, metadata, BM25Index.build(corpus)
+    query = corpus[0][:4]
+
+    scratch = tempfile.mkdtemp(prefix="sparse-persistence-")
+    try:
+        paths = {
+            "pickle + tokens": os.path.join(scratch, "hybrid_sparse.pkl"),
+            "pickle": os.path.join(scratch, "sparse.pkl"),
+            "index dir": os.path.join(scratch, "sparse.idx"),
+        }
+        with open(paths["pickle + tokens"], "wb") as f:
+            pickle.dump({"documents": texts, "bm25": okapi, "tokenized_corpus": corpus, "metadata": metadata}, f)
+        with open(paths["pickle"], "wb") as f:
+            pickle.dump({"documents": texts, "bm25": okapi, "metadata": metadata}, f)
+        os.makedirs(paths["index dir"])
+        engine.save_index(paths["index dir"])
+
+        expected = engine.bm25.top_k(query, 10)[0]
+        rows = []
+        for label, path in paths.items():
+            loader = load_dir if os.path.isdir(path) else load_pickle
+            loads, queries = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                loaded = loader(path)
+                loads.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                ids, _ = loaded.bm25.top_k(query, 10)
+                queries.append((time.perf_counter() - start) * 1000)
+            rows.append([
+                label,
+                f"{disk_bytes(path) / 2**20:.1f}",
+                f"{statistics.median(loads):.3f}",
+                f"{statistics.median(queries):.2f}",
+                "yes" if np.array_equal(ids, expected) else "no",
+            ])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"\n{args.chunks} chunks x {args.chunk_tokens} tokens, {args.vocab}-word vocabulary, median of {args.repeat}")
+    print_table(["format", "disk MiB", "load s", "first query ms", "same top-k"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Sparse tokenization throughput: word_tokenize vs the "fast" tokenizer.
+
+Tokenizes one large synthetic document (--words Zipf-distributed words with
+capitals, digits and punctuation, cut into --chunk-words chunks as indexing
+does) with SparseRAG._tokenize in each mode and reports MB/s, tokens/s and
+whether the tokens equal the NLTK path's:
+
+* nltk          word_tokenize after stripping punctuation (the default)
+* fast          sparse_rag.tokenizer.FastTokenizer, first pass (cold cache)
+* fast, warm    the same tokenizer again, every word already cached
+* fast + stem   FastTokenizer with Snowball stemming, cold cache
+
+Without the Punkt model (no network) word_tokenize runs with
+preserve_line=True, which skips its sentence split, so the nltk row is, if
+anything, faster than in production.
+
+    python -m benchmarks.sparse_tokenizer [--words 1000000] [--chunk-words 400]
+"""
+import argparse
+import time
+from unittest import mock
+
+import numpy as np
+
+from benchmarks._util import print_table
+from sparse_rag.sparse_rag import SparseRAG
+
+
+def synthetic_chunks(args):
+    rng = np.random.default_rng(0)
+    letters = np.array(list("etaoinshrdlucmfwypvbgkjqxz"))
+    vocab = ["".join(rng.choice(letters, size=rng.integers(1, 11))) for _ in range(args.vocab)]
+    vocab[:6] = ["the", "cannot", "running", "it's", "U.S.", "3.14"]
+    punctuation = np.array(["", "", "", "", ",", ".", ";", "!", "?", ")"])
+    ids = np.minimum(rng.zipf(1.2, size=args.words), args.vocab) - 1
+    words = [
+        (vocab[i].capitalize() if cap else vocab[i]) + punct
+        for i, cap, punct in zip(ids, rng.random(args.words) < 0.1, rng.choice(punctuation, size=args.words))
+    ]
+    return [" ".join(words[i:i + args.chunk_words]) for i in range(0, len(words), args.chunk_words)]
+
+
+def stop_words() -> set:
+    try:
+        from nltk.corpus import stopwords
+
+        return set(stopwords.words("english"))
+    except LookupError:
+        return {"the", "a", "an", "and", "of", "to", "in", "is", "it", "not", "me", "s", "t"}
+
+
+def engine(words: set, **config) -> SparseRAG:
+    rag = SparseRAG({"remove_stop_words": False, **config})
+    rag.stop_words = words
+    if rag._fast_tokenizer is not None:
+        rag._fast_tokenizer.stop_words = frozenset(words)
+    return rag
+
+
+def word_tokenize(text):
+    from nltk.tokenize import word_tokenize as nltk_word_tokenize
+
+    try:
+        return nltk_word_tokenize(text)
+    except LookupError:
+        return nltk_word_tokenize(text, preserve_line=True)
+
+
+def run(rag: SparseRAG, chunks):
+    start = time.perf_counter()
+    tokens = [rag._tokenize(chunk) for chunk in chunks]
+    return tokens, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=1_000_000)
+    parser.add_argument("--chunk-words", type=int, default=400)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args)
+    megabytes = sum(len(chunk) for chunk in chunks) / 1e6
+    words = stop_words()
+
+    with mock.patch("sparse_rag.sparse_rag.word_tokenize", side_effect=word_tokenize):
+        expected, nltk_seconds = run(engine(words), chunks)
+    fast = engine(words, tokenizer="fast")
+    cold, cold_seconds = run(fast, chunks)
+    warm, warm_seconds = run(fast, chunks)
+    stemming = engine(words, tokenizer="fast", stem=True)
+    stemming._fast_tokenizer.warm_up()
+    _, stem_seconds = run(stemming, chunks)
+
+    n_tokens = sum(len(tokens) for tokens in expected)
+    rows = []
+    for label, seconds, tokens in (
+        ("nltk", nltk_seconds, expected),
+        ("fast", cold_seconds, cold),
+        ("fast, warm", warm_seconds, warm),
+        ("fast + stem", stem_seconds, None),
+    ):
+        rows.append([
+            label,
+            f"{seconds:.2f}",
+            f"{megabytes / seconds:.1f}",
+            f"{n_tokens / seconds / 1e6:.2f}",
+            f"{nltk_seconds / seconds:.1f}x",
+            "-" if tokens is None else ("yes" if tokens == expected else "no"),
+        ])
+
+    print(f"\n{len(chunks)} chunks, {megabytes:.1f} MB, {n_tokens} tokens after {len(words)} stop words")
+    print_table(["tokenizer", "seconds", "MB/s", "M tokens/s", "speedup", "same tokens"], rows)
+
+
+if __name__ == "__main__":
+    main()
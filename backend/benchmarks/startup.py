@@ -0,0 +1,113 @@
+"""Process startup: what importing rag.rag_service costs, and what is deferred.
+
+Every daphne, gunicorn and celery process imports rag.rag_service. Each
+scenario below runs in a fresh interpreter (so nothing is already imported
+or cached) and reports wall-clock seconds:
+
+* import           django.setup() + import rag.rag_service
+* first request    get_engine() for each method, building it lazily
+* warm_up          RAGRegistry.warm_up(): all nine pipelines plus models
+
+`--tree` points the import scenario at another checkout's backend/ (e.g. a
+worktree of the previous release) for a before/after comparison. Model
+downloads are disabled unless --online is given, so the cross-encoder load
+fails fast offline; the timings show where that cost would land.
+
+    python -m benchmarks.startup [--repeat 3] [--tree ../other/backend] [--online]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks._util import print_table
+
+SETUP = """
+import json, os, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import rag.rag_service as rag_service
+timings = {"import": time.perf_counter() - start}
+heavy = [m for m in ("sentence_transformers", "torch", "nltk") if m in sys.modules]
+"""
+
+SCENARIOS = {
+    "import": SETUP + """
+print(json.dumps({"seconds": timings["import"], "loaded": heavy}))
+""",
+    "first request": SETUP + """
+from common.constant import CONFIG_VARIANTS, METHOD_IDS
+start = time.perf_counter()
+for method in METHOD_IDS:
+    try:
+        rag_service.rag_registry.get_engine(method, CONFIG_VARIANTS[0]["model"])
+    except Exception as e:
+        print(f"{method}: {e}", file=sys.stderr)
+print(json.dumps({"seconds": time.perf_counter() - start, "loaded": heavy}))
+""",
+    "warm_up": SETUP + """
+start = time.perf_counter()
+rag_service.rag_registry.warm_up()
+print(json.dumps({"seconds": time.perf_counter() - start, "loaded": heavy}))
+""",
+}
+
+
+def run(code: str, cwd: str, env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, timeout=900
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output")
+    return json.loads(lines[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tree", help="another checkout's backend/ to time the import of, for comparison")
+    parser.add_argument("--online", action="store_true", help="allow model downloads")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "ragreader.settings",
+        "DEVELOPMENT_MODE": os.environ.get("DEVELOPMENT_MODE", "True"),
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY") or "startup-benchmark",
+        "RAG_DISABLE_ENGINE_INIT": "",
+        "RAG_EAGER_ENGINE_INIT": "",
+    }
+    if not args.online:
+        env.update(HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+
+    runs = [(name, here, code) for name, code in SCENARIOS.items()]
+    if args.tree:
+        runs.insert(0, (f"import ({os.path.basename(os.path.normpath(os.path.join(args.tree, '..')))})",
+                        os.path.abspath(args.tree), SCENARIOS["import"]))
+
+    rows = []
+    for label, cwd, code in runs:
+        try:
+            results = [run(code, cwd, env) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            rows.append([label, "-", "-", f"failed: {e}"])
+            continue
+        seconds = [r["seconds"] for r in results]
+        rows.append([
+            label,
+            f"{statistics.median(seconds):.2f}",
+            f"{min(seconds):.2f}",
+            ", ".join(results[-1]["loaded"]) or "-",
+        ])
+
+    print(f"\nmedian of {args.repeat} fresh interpreters{'' if args.online else ', model downloads disabled'}")
+    print_table(["scenario", "median s", "min s", "heavy modules imported"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Compact, memory-mappable storage for an index's chunk texts and ids.
+
+A list of Python strings costs ~50 bytes of object overhead per chunk and has
+to be rebuilt string by string whenever an index is unpickled. ChunkStore
+keeps every chunk as one UTF-8 buffer plus an offsets array, so a saved store
+opens with np.load(mmap_mode="r") in constant time and each text is decoded
+only when it is actually read. Worker processes that open the same index share
+its pages through the OS page cache instead of each holding a private copy.
+
+On disk a store is three files inside an index directory:
+
+    chunks.bin          UTF-8 texts, back to back
+    chunk_offsets.npy   int64, len = n + 1; text i is bin[off[i]:off[i + 1]]
+    chunk_ids.npy       int64 Chunk primary keys, -1 where there was none
+"""
+import operator
+import os
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+CHUNK_IDS_FILE = "chunk_ids.npy"
+
+# Chunk ids are database primary keys, so -1 can never be a real one.
+_NO_CHUNK_ID = -1
+
+
+def _sequence_equal(left: Sequence, right: Any) -> bool:
+    if not isinstance(right, Sequence) or isinstance(right, (str, bytes)):
+        return NotImplemented
+    return len(left) == len(right) and all(a == b for a, b in zip(left, right))
+
+
+def _normalize_index(i, length: int) -> int:
+    i = operator.index(i)
+    if i < 0:
+        i += length
+    if not 0 <= i < length:
+        raise IndexError("chunk index out of range")
+    return i
+
+
+class ChunkMetadata(Sequence):
+    """Read-only `[{"chunk_id": ...}, ...]` view over a chunk-id array.
+
+    Matches the shape engines have always exposed as `document_metadata`
+    without materializing one dict per chunk up front.
+    """
+
+    def __init__(self, chunk_ids: np.ndarray):
+        self._chunk_ids = chunk_ids
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        value = int(self._chunk_ids[_normalize_index(i, len(self))])
+        return {"chunk_id": None if value == _NO_CHUNK_ID else value}
+
+    def chunk_ids(self) -> List[Optional[int]]:
+        return [None if value == _NO_CHUNK_ID else value for value in self._chunk_ids.tolist()]
+
+    def __eq__(self, other):
+        return _sequence_equal(self, other)
+
+    __hash__ = None
+
+
+class ChunkStore(Sequence):
+    """Chunk texts as a read-only sequence of str, backed by one byte buffer."""
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray, chunk_ids: np.ndarray):
+        if len(offsets) != len(chunk_ids) + 1:
+            raise ValueError("ChunkStore offsets must have exactly one more entry than chunk ids.")
+        self._buffer = buffer
+        self._offsets = offsets
+        self.chunk_ids = chunk_ids
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], chunk_ids: Optional[Iterable[Optional[int]]] = None) -> "ChunkStore":
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        ids = list(chunk_ids) if chunk_ids is not None else [None] * len(encoded)
+        id_array = np.array(
+            [_NO_CHUNK_ID if cid is None else int(cid) for cid in ids], dtype=np.int64
+        )
+        return cls(buffer, offsets, id_array)
+
+    @classmethod
+    def from_documents(cls, texts: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> "ChunkStore":
+        """Build from an engine's `documents` + `document_metadata` pair."""
+        if isinstance(texts, ChunkStore):
+            return texts
+        return cls.from_texts(texts, [m.get("chunk_id") for m in metadata])
+
+    # ── Sequence protocol ────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = _normalize_index(i, len(self))
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._buffer[start:end].tobytes().decode("utf-8")
+
+    def __eq__(self, other):
+        return _sequence_equal(self, other)
+
+    __hash__ = None
+
+    @property
+    def metadata(self) -> ChunkMetadata:
+        return ChunkMetadata(self.chunk_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._buffer.nbytes + self._offsets.nbytes + self.chunk_ids.nbytes)
+
+    def texts(self) -> List[str]:
+        """Every text as a plain list (decodes the whole store)."""
+        return list(self)
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+
+    def save(self, directory: str) -> None:
+        with open(os.path.join(directory, CHUNKS_FILE), "wb") as f:
+            f.write(self._buffer.tobytes())
+        np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+        np.save(os.path.join(directory, CHUNK_IDS_FILE), np.asarray(self.chunk_ids, dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "ChunkStore":
+        mode = "r" if mmap else None
+        offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode=mode)
+        chunk_ids = np.load(os.path.join(directory, CHUNK_IDS_FILE), mmap_mode=mode)
+
+        chunks_path = os.path.join(directory, CHUNKS_FILE)
+        # np.memmap refuses zero-length files (every chunk an empty string).
+        if mmap and os.path.getsize(chunks_path) > 0:
+            buffer = np.memmap(chunks_path, dtype=np.uint8, mode="r")
+        else:
+            buffer = np.fromfile(chunks_path, dtype=np.uint8)
+
+        if len(offsets) and int(offsets[-1]) != len(buffer):
+            raise ValueError(f"{chunks_path} is truncated: expected {int(offsets[-1])} bytes, found {len(buffer)}.")
+        return cls(buffer, offsets, chunk_ids)
@@ -1,7 +1,6 @@
 import re
 import numpy as np
 from typing import List, Literal
-from sklearn.metrics.pairwise import cosine_similarity
 
 class DocumentChunker:
     def __init__(self, 
@@ -98,12 +97,13 @@ class DocumentChunker:
             print(f"Embedding failed: {e}")
             return sentences
 
-        distances =[]
-        for i in range(len(vecs) - 1):
-            v1 = np.asarray(vecs[i]).reshape(1, -1)
-            v2 = np.asarray(vecs[i + 1]).reshape(1, -1)
-            sim = cosine_similarity(v1, v2)[0][0]
-            distances.append(sim)
+        # Cosine similarity of each sentence with the next, in one pass.
+        # (Plain numpy: importing sklearn for this cost ~1s of every startup.)
+        matrix = np.asarray(vecs, dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        distances = np.einsum("ij,ij->i", matrix[:-1], matrix[1:]).tolist()
 
        
         threshold = 0.75 
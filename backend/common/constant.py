@@ -56,6 +56,8 @@ GROUND_TRUTH_MODE_IDS = [m["id"] for m in GROUND_TRUTH_MODES]
 DEFAULT_POOL_TOP_N = 10
 POOL_TOP_N_MIN = 1
 POOL_TOP_N_MAX = 50
+# Conversations one request to the pooling endpoint may pool at once.
+POOL_BATCH_MAX = 100
 
 DEFAULT_ANALYSIS_CONFIG = {
     "methods": METHOD_IDS,
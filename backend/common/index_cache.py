@@ -0,0 +1,185 @@
+"""Loaded indexes for several documents at once, under a byte budget.
+
+RAGRegistry's pipelines are process-wide singletons, and each used to hold a
+single index in memory: whichever user's document was loaded last. A request
+from another user then either reloaded from disk or, when the guard saw a
+non-empty engine, answered from the wrong document.
+
+IndexCache keeps one engine per (document id, method, chunk-config hash).
+Engines are spawned from the pipeline's template engine (see BaseRAG.spawn),
+so they share its API clients and models, and are loaded on first use. Once
+the loaded indexes exceed `max_bytes`, the least recently used entries that no
+request is holding are dropped; an index in use is never evicted under it.
+
+Every entry has its own lock, held while the index loads and while a request
+uses it. Building one user's index never blocks a query against another's,
+and two requests for the same document never load it twice.
+
+A saved index can be replaced (and its files deleted) by another process
+catching it up, so acquire() takes an `is_current` check that sends a stale
+engine back through `load()`; discard_location() drops this process's
+entries for an index about to be deleted.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 << 30
+
+
+def index_nbytes(engine: Any) -> int:
+    """Approximate memory held by `engine`'s index (0 if it cannot say)."""
+    try:
+        return int(engine.index_nbytes())
+    except Exception as e:
+        logger.warning(f"Index cache: could not size {type(engine).__name__} ({e}); counting it as 0 bytes.")
+        return 0
+
+
+class _Entry:
+    __slots__ = ("engine", "nbytes", "lock", "users")
+
+    def __init__(self):
+        self.engine = None
+        self.nbytes = 0
+        # Re-entrant: a pipeline may call init() while already holding the
+        # entry (the empty-memory guard in _run_core).
+        self.lock = threading.RLock()
+        self.users = 0
+
+
+class IndexCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def acquire(
+        self,
+        key: Hashable,
+        load: Callable[[], Any],
+        is_current: Optional[Callable[[Any], bool]] = None,
+    ) -> Iterator[Any]:
+        """Yield the engine cached under `key`, calling `load()` on a miss.
+
+        A cached engine for which `is_current(engine)` is False counts as a
+        miss and is loaded again. The entry is locked and pinned for the
+        duration of the `with` block. If `load()` raises, nothing is cached
+        and the error propagates.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            self._entries.move_to_end(key)
+            entry.users += 1
+
+        try:
+            with entry.lock:
+                if entry.engine is not None and is_current is not None and not is_current(entry.engine):
+                    logger.info(f"Index cache: {key} was replaced on disk; reloading it.")
+                    with self._lock:
+                        entry.engine, entry.nbytes = None, 0
+                if entry.engine is None:
+                    with self._lock:
+                        self.misses += 1
+                    engine = load()
+                    nbytes = index_nbytes(engine)
+                    with self._lock:
+                        entry.engine, entry.nbytes = engine, nbytes
+                    logger.info(f"Index cache: loaded {key} ({nbytes / 2**20:.1f} MiB).")
+                else:
+                    with self._lock:
+                        self.hits += 1
+                yield entry.engine
+        finally:
+            with self._lock:
+                entry.users -= 1
+                if entry.engine is None and entry.users == 0 and self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop idle entries, least recently used first, until under budget."""
+        total = sum(entry.nbytes for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in list(self._entries.items()):
+            if total <= self.max_bytes:
+                break
+            if entry.users or entry.engine is None:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            self.evictions += 1
+            logger.info(f"Index cache over {self.max_bytes} bytes; evicted {key} ({entry.nbytes} bytes).")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The engine loaded under `key`, or None. Does not load or touch recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.engine if entry is not None else None
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_location(self, location: str) -> int:
+        """Drop every entry whose engine holds the saved index at `location`.
+        Returns how many were dropped."""
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if getattr(entry.engine, "index_location", None) == location
+            ]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(entry.engine is not None for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": sum(entry.engine is not None for entry in self._entries.values()),
+                "nbytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+_shared_cache: Optional[IndexCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_index_cache() -> IndexCache:
+    """The process-wide index cache, sized by settings.INDEX_CACHE_MAX_BYTES."""
+    global _shared_cache
+    from django.conf import settings
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = IndexCache(getattr(settings, "INDEX_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        return _shared_cache
@@ -0,0 +1,86 @@
+"""On-disk layout shared by the saved retrieval indexes.
+
+A saved index is a directory rather than a single pickle: raw `.npy` arrays
+that load with np.load(mmap_mode="r"), plus a `manifest.json` naming the index
+kind and format version. Loading checks the manifest first, so an index
+written by a newer (or different) format fails loudly instead of being
+misread — the pipelines treat that like any other unreadable index and
+rebuild it.
+
+Indexes saved before this format existed are single `.pkl` files; the
+pipelines still read those.
+"""
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+# Suffix for index directories, so a vector_stores listing tells the two
+# formats apart at a glance.
+INDEX_DIR_SUFFIX = ".idx"
+
+
+class IndexFormatError(Exception):
+    """A saved index is missing, of the wrong kind, or from another format version."""
+
+
+def is_index_dir(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+@contextmanager
+def atomic_index_dir(path: str) -> Iterator[str]:
+    """Yield a scratch directory that becomes `path` only if the block succeeds.
+
+    Readers either see a complete index or none at all — never one whose
+    manifest exists but whose arrays are still being written.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        yield scratch
+        if os.path.exists(path):
+            remove_index(path)
+        os.replace(scratch, path)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+
+
+def write_manifest(directory: str, kind: str, **fields: Any) -> Dict[str, Any]:
+    manifest = {"kind": kind, "format_version": FORMAT_VERSION, **fields}
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def read_manifest(directory: str, kind: str) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise IndexFormatError(f"Unreadable index manifest at {path}: {e}") from e
+
+    if manifest.get("kind") != kind:
+        raise IndexFormatError(f"{directory} holds a '{manifest.get('kind')}' index, expected '{kind}'.")
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise IndexFormatError(
+            f"{directory} is index format v{manifest.get('format_version')}, "
+            f"this build reads v{FORMAT_VERSION}."
+        )
+    return manifest
+
+
+def remove_index(path: str) -> None:
+    """Delete a saved index in either format (directory or legacy file)."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,22 @@
+"""Top-k selection over score arrays, shared by the retrieval engines."""
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first.
+
+    `argpartition` finds the top k in O(N); only those k are then sorted, so
+    the cost no longer includes sorting the whole corpus. Ties break on the
+    lower index, which keeps results deterministic across runs.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
@@ -0,0 +1,203 @@
+"""Approximate nearest-neighbour indexes for DenseRAG.
+
+Exact search scores the query against every stored vector, so its cost grows
+linearly with the corpus. For large documents a FAISS graph (HNSW) or
+inverted-file (IVF) index answers the same top-k question while touching only
+a small fraction of the vectors, at the price of occasionally missing a true
+neighbour.
+
+Vectors are L2-normalized before they go into the index and the index uses the
+inner-product metric, so the scores FAISS returns are cosine similarities —
+the same numbers the exact path reports.
+
+When DenseRAG stores quantized vectors (see dense_rag.quantization) the index
+stores them the same way, through FAISS's scalar quantizer (HNSW-SQ /
+IVF-SQ), so the graph does not keep a full float32 copy of the corpus.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from dense_rag.vectors import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("exact", "hnsw", "ivf")
+
+# Below this many chunks the exact scan is already sub-millisecond and always
+# correct; building a graph for it would only add recall loss.
+DEFAULT_ANN_MIN_CORPUS = 2000
+
+DEFAULT_HNSW_M = 32
+DEFAULT_HNSW_EF_CONSTRUCTION = 80
+DEFAULT_HNSW_EF_SEARCH = 128
+DEFAULT_IVF_NPROBE = 16
+
+
+def _sq_type(faiss, vector_dtype: str):
+    return {
+        "float16": faiss.ScalarQuantizer.QT_fp16,
+        "int8": faiss.ScalarQuantizer.QT_8bit,
+    }[vector_dtype]
+
+
+class AnnIndex:
+    """A FAISS index over one document's vectors, plus its search parameters."""
+
+    def __init__(self, kind: str, index: Any, params: Dict[str, Any]):
+        self.kind = kind
+        self.index = index
+        self.params = params
+        self._apply_search_params()
+
+    @property
+    def vector_dtype(self) -> str:
+        return self.params.get("vector_dtype", "float32")
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.index.ntotal)
+
+    @property
+    def writable(self) -> bool:
+        """Whether add() works. An IVF index opened memory-mapped keeps its
+        lists on disk, read-only; HNSW is read into memory either way."""
+        if self.kind != "ivf":
+            return True
+        import faiss
+
+        lists = faiss.downcast_InvertedLists(faiss.extract_index_ivf(self.index).invlists)
+        return not getattr(lists, "read_only", False)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory: the stored codes plus HNSW links or IVF ids and centroids."""
+        if self.kind == "hnsw":
+            return int(self.ntotal * self.index.storage.sa_code_size() + self.index.hnsw.neighbors.size() * 4)
+        return int(self.ntotal * (self.index.code_size + 8) + self.index.nlist * self.index.d * 4)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        kind: str,
+        params: Optional[Dict[str, Any]] = None,
+        vector_dtype: str = "float32",
+    ) -> "AnnIndex":
+        """Build a `kind` ("hnsw" or "ivf") index over `vectors`.
+
+        `vector_dtype` other than float32 stores the vectors scalar-quantized;
+        it is recorded in `params` so a reloaded index can be checked against
+        the engine's configuration.
+        """
+        import faiss
+
+        if kind not in ("hnsw", "ivf"):
+            raise ValueError(f"Unknown ANN index type: {kind}")
+
+        params = dict(params or {})
+        params["vector_dtype"] = vector_dtype
+        quantized = vector_dtype != "float32"
+        matrix = normalize_rows(vectors)
+        n, dim = matrix.shape
+
+        if kind == "hnsw":
+            m = int(params.setdefault("hnsw_m", DEFAULT_HNSW_M))
+            if quantized:
+                index = faiss.IndexHNSWSQ(dim, _sq_type(faiss, vector_dtype), m, faiss.METRIC_INNER_PRODUCT)
+                index.train(matrix)
+            else:
+                index = faiss.IndexHNSWFlat(dim, m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = int(
+                params.setdefault("ef_construction", DEFAULT_HNSW_EF_CONSTRUCTION)
+            )
+            params.setdefault("ef_search", DEFAULT_HNSW_EF_SEARCH)
+            index.add(matrix)
+        else:
+            # ~sqrt(N) lists is the usual starting point; FAISS wants at least
+            # ~39 training points per list or it warns about poor centroids.
+            nlist = int(params.get("nlist") or max(1, min(int(np.sqrt(n)), n // 39 or 1)))
+            params["nlist"] = nlist
+            params.setdefault("nprobe", DEFAULT_IVF_NPROBE)
+            quantizer = faiss.IndexFlatIP(dim)
+            if quantized:
+                index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, dim, nlist, _sq_type(faiss, vector_dtype), faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.add(matrix)
+
+        logger.info(f"Built {kind.upper()} index over {n} vectors ({dim} dims, {vector_dtype}).")
+        return cls(kind, index, params)
+
+    def _apply_search_params(self) -> None:
+        if self.kind == "hnsw":
+            self.index.hnsw.efSearch = int(self.params.get("ef_search", DEFAULT_HNSW_EF_SEARCH))
+        elif self.kind == "ivf":
+            self.index.nprobe = int(self.params.get("nprobe", DEFAULT_IVF_NPROBE))
+
+    def covers(self, vectors: np.ndarray) -> bool:
+        """Whether `vectors` lie inside the ranges the scalar quantizer was
+        trained on. int8 codes clip anything outside its per-dimension
+        [min, max], so such rows need a retrained index; float16 and float32
+        store every value as it is."""
+        if self.vector_dtype != "int8":
+            return True
+        import faiss
+
+        index = faiss.downcast_index(self.index.storage) if self.kind == "hnsw" else self.index
+        trained = faiss.vector_to_array(index.sq.trained)
+        half = len(trained) // 2
+        low, width = trained[:half], trained[half:]
+        matrix = normalize_rows(vectors)
+        return bool(np.all(matrix >= low - 1e-6) and np.all(matrix <= low + width + 1e-6))
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append `vectors` as rows ntotal, ... without retraining. Check
+        `writable` and `covers()` first."""
+        self.index.add(normalize_rows(vectors))
+
+    def search(self, query_vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-`k` (scores, indices) for one query, best first.
+
+        FAISS pads with -1 when fewer than `k` neighbours are reachable; those
+        slots are dropped so callers only ever see real row indices.
+        """
+        query = normalize_rows(query_vector)
+        k = min(int(k), self.ntotal)
+        if k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores, indices = self.index.search(query, k)
+        keep = indices[0] >= 0
+        return scores[0][keep], indices[0][keep]
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "AnnIndex":
+        """Rebuild from the {kind, params, data} dict legacy pickles embedded."""
+        import faiss
+
+        raw = np.frombuffer(state["data"], dtype=np.uint8)
+        index = faiss.deserialize_index(raw)
+        return cls(state["kind"], index, dict(state.get("params") or {}))
+
+    def save(self, path: str) -> None:
+        import faiss
+
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path: str, kind: str, params: Optional[Dict[str, Any]] = None) -> "AnnIndex":
+        """Open a saved index memory-mapped where FAISS supports it (IVF
+        lists opened this way are read-only; see `writable`)."""
+        import faiss
+
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(path)
+        return cls(kind, index, dict(params or {}))
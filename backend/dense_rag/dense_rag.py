@@ -1,11 +1,51 @@
+import asyncio
+import os
+import time
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 from django.conf import settings
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
+from ai_handler.clients import get_async_client, get_client
 from rag.base_rag import BaseRAG
+from common.ranking import top_k_indices
+from dense_rag.ann_index import AnnIndex, DEFAULT_ANN_MIN_CORPUS, INDEX_TYPES
+from dense_rag.embedding_batches import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    aembed_in_batches,
+    embed_in_batches,
+)
+from dense_rag.embedding_cache import EmbeddingCache
+from dense_rag.query_cache import QueryEmbeddingCache
+from dense_rag.quantization import DEFAULT_RESCORE_FACTOR, VECTOR_DTYPES, QuantizedVectors
+from dense_rag.vectors import normalize_rows
+from common.chunk_store import ChunkStore
+from common.index_store import IndexFormatError, read_manifest, write_manifest
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_KIND = "dense"
+VECTORS_FILE = "vectors.npy"
+ANN_FILE = "ann.faiss"
 
 class DenseRAG(BaseRAG):
+    # Class-level default so engines assembled without __init__ (tests,
+    # tooling) still take the exact path.
+    ann_index: Optional[AnnIndex] = None
+    vector_dtype: str = "float32"
+    rescore_factor: int = DEFAULT_RESCORE_FACTOR
+    quantized: Optional[QuantizedVectors] = None
+    embedding_cache: Optional[EmbeddingCache] = None
+    query_cache: Optional[QueryEmbeddingCache] = None
+    embed_batch_size: int = DEFAULT_BATCH_SIZE
+    embed_batch_tokens: int = DEFAULT_BATCH_TOKENS
+    embed_concurrency: int = DEFAULT_CONCURRENCY
+    embed_max_retries: int = DEFAULT_MAX_RETRIES
+    updates_in_place = True
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initializes the DenseRAG engine using OpenRouter.
@@ -14,6 +54,27 @@ class DenseRAG(BaseRAG):
         - top_k: (int) Number of chunks to retrieve.
         - model: (str) OpenRouter model string 
                  (e.g., "openai/text-embedding-3-small", "qwen/qwen3-embedding-8b")
+        - index_type: (str) "exact" (default), "hnsw" or "ivf". The ANN types
+                      build a FAISS index at indexing time.
+        - ann_min_corpus: (int) Corpora smaller than this stay on exact search
+                          whatever `index_type` says.
+        - ann_params: (dict) Optional FAISS tuning (hnsw_m, ef_construction,
+                      ef_search, nlist, nprobe).
+        - vector_dtype: (str) "float32" (default), "float16" or "int8". The
+                        quantized types score against compact codes (and store
+                        the ANN index the same way).
+        - rescore_factor: (int) With a quantized dtype, re-score the best
+                          top_k * rescore_factor candidates against the float32
+                          vectors. 0 returns the quantized ranking as-is.
+        - embedding_cache: (EmbeddingCache) Optional shared cache consulted
+                           before every embeddings API call (see
+                           dense_rag.embedding_cache).
+        - query_cache: (QueryEmbeddingCache) Optional shared LRU of query
+                       vectors, consulted by retrieve/get_retrieved_scores.
+        - embed_batch_size / embed_batch_tokens: (int) Limits per embeddings
+                           request; larger inputs are split into batches.
+        - embed_concurrency: (int) Batches in flight at once.
+        - embed_max_retries: (int) Retries per failed batch, with backoff.
         """
         super().__init__(config)
         
@@ -21,34 +82,140 @@ class DenseRAG(BaseRAG):
         if not api_key:
             raise ValueError("OPENROUTER_API_KEY not found in settings.")
         
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+        # Shared by every engine in the process; see ai_handler.clients.
+        self.client = get_client(api_key)
         
         self.top_k = config.get("top_k", 3)
         self.model = config.get("model", "openai/text-embedding-3-small")
         
-        self.documents: List[str] =[]  
+        self.documents: Sequence[str] =[]  
+        # Unit-normalized float32, one row per chunk — see set_vectors().
         self.document_vectors: Optional[np.ndarray] = None 
-        self.document_metadata: List[Dict[str, Any]] = []
+        self.document_metadata: Sequence[Dict[str, Any]] = []
+
+        self.index_type = config.get("index_type", "exact")
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{self.index_type}'. Expected one of {INDEX_TYPES}.")
+        self.ann_min_corpus = config.get("ann_min_corpus", DEFAULT_ANN_MIN_CORPUS)
+        self.ann_params = dict(config.get("ann_params") or {})
+        self.ann_index = None
+
+        self.vector_dtype = config.get("vector_dtype", "float32")
+        if self.vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector_dtype '{self.vector_dtype}'. Expected one of {VECTOR_DTYPES}.")
+        self.rescore_factor = int(config.get("rescore_factor", DEFAULT_RESCORE_FACTOR))
+        self.quantized = None
+        self.embedding_cache = config.get("embedding_cache")
+        self.query_cache = config.get("query_cache")
 
+        self.embed_batch_size = int(config.get("embed_batch_size", DEFAULT_BATCH_SIZE))
+        self.embed_batch_tokens = int(config.get("embed_batch_tokens", DEFAULT_BATCH_TOKENS))
+        self.embed_concurrency = int(config.get("embed_concurrency", DEFAULT_CONCURRENCY))
+        self.embed_max_retries = int(config.get("embed_max_retries", DEFAULT_MAX_RETRIES))
 
-    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+
+    @property
+    def async_client(self):
+        """The shared async client of the running event loop."""
+        return get_async_client(settings.OPENROUTER_API_KEY)
+
+    def _get_embeddings(self, texts: List[str], use_cache: bool = True) -> List[Sequence[float]]:
         """
-        Helper to call OpenAI API. Handles batching automatically if list is small,
+        Helper to call OpenAI API. Large inputs are split into batches sent
+        concurrently (see dense_rag.embedding_batches); order is preserved.
+
+        Texts found in the embedding cache (if one is configured and
+        `use_cache`) are not sent, and repeated texts within one call are
+        sent once.
         """
-        cleaned_texts = [text.replace("\n", " ") for text in texts]
+        cleaned_texts, cached, missing = self._plan_embeddings(texts, use_cache)
+        if not missing:
+            return cached
 
         try:
-            response = self.client.embeddings.create(
-                input=cleaned_texts,
-                model=self.model
-            )
-            return [data.embedding for data in response.data]
+            fetched = embed_in_batches(self._embed_batch, missing, **self._batch_settings())
+        except Exception as e:
+            raise RuntimeError(f"Embeddings API call failed ({self.model}): {e}") from e
+
+        return self._merge_embeddings(cleaned_texts, cached, missing, fetched, use_cache)
+
+    async def _aget_embeddings(self, texts: List[str], use_cache: bool = True) -> List[Sequence[float]]:
+        """_get_embeddings() on the event loop, through the shared async client.
+
+        The embedding cache is a database, so it is read and written on a
+        worker thread.
+        """
+        with_cache = use_cache and self.embedding_cache is not None
+        if with_cache:
+            cleaned_texts, cached, missing = await asyncio.to_thread(self._plan_embeddings, texts, use_cache)
+        else:
+            cleaned_texts, cached, missing = self._plan_embeddings(texts, use_cache)
+        if not missing:
+            return cached
+
+        try:
+            fetched = await aembed_in_batches(self._aembed_batch, missing, **self._batch_settings())
         except Exception as e:
             raise RuntimeError(f"Embeddings API call failed ({self.model}): {e}") from e
 
+        if with_cache:
+            return await asyncio.to_thread(self._merge_embeddings, cleaned_texts, cached, missing, fetched, use_cache)
+        return self._merge_embeddings(cleaned_texts, cached, missing, fetched, use_cache)
+
+    def _batch_settings(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "batch_size": self.embed_batch_size,
+            "batch_tokens": self.embed_batch_tokens,
+            "concurrency": self.embed_concurrency,
+            "max_retries": self.embed_max_retries,
+        }
+
+    def _plan_embeddings(self, texts: List[str], use_cache: bool):
+        """(cleaned texts, their cached vectors or None, distinct texts to fetch)."""
+        cleaned_texts = [text.replace("\n", " ") for text in texts]
+        cached = self._cached_embeddings(cleaned_texts) if use_cache else [None] * len(cleaned_texts)
+        missing = list(dict.fromkeys(t for t, v in zip(cleaned_texts, cached) if v is None))
+        return cleaned_texts, cached, missing
+
+    def _merge_embeddings(self, cleaned_texts, cached, missing, fetched, use_cache: bool) -> List[Sequence[float]]:
+        """The vectors of `cleaned_texts`, cached ones and `fetched` ones for `missing`."""
+        if not fetched:
+            return []
+        if len(fetched) != len(missing):
+            raise RuntimeError(
+                f"Embeddings API returned {len(fetched)} vectors for {len(missing)} texts ({self.model})."
+            )
+
+        if self.embedding_cache is not None and use_cache:
+            try:
+                self.embedding_cache.put_many(self.model, missing, fetched)
+            except Exception as e:
+                logger.warning(f"Could not write to the embedding cache: {e}")
+
+        by_text = dict(zip(missing, fetched))
+        return [v if v is not None else by_text[t] for t, v in zip(cleaned_texts, cached)]
+
+    def _embed_batch(self, texts: List[str]) -> List[Sequence[float]]:
+        response = self.client.embeddings.create(
+            input=texts,
+            model=self.model
+        )
+        return [data.embedding for data in response.data]
+
+    async def _aembed_batch(self, texts: List[str]) -> List[Sequence[float]]:
+        response = await self.async_client.embeddings.create(input=texts, model=self.model)
+        return [data.embedding for data in response.data]
+
+    def _cached_embeddings(self, texts: List[str]) -> List[Optional[Sequence[float]]]:
+        if self.embedding_cache is None:
+            return [None] * len(texts)
+        try:
+            return self.embedding_cache.get_many(self.model, texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, embedding everything: {e}")
+            return [None] * len(texts)
+
     def index_documents(self, documents: List[Dict[str, Any]]) -> None:
         """
         1. Sends text to OpenAI to get vectors.
@@ -61,13 +228,328 @@ class DenseRAG(BaseRAG):
         
         self.documents = texts
         
+        start = time.perf_counter()
         embeddings = self._get_embeddings(texts)
+        embedded = time.perf_counter()
         
         if not embeddings:
             raise RuntimeError("Indexing failed: no embeddings returned.")
 
-        self.document_vectors = np.array(embeddings)
+        self.set_vectors(embeddings)
+        stored = time.perf_counter()
+        self.build_ann_index()
+        self.index_timings = {
+            "embed": embedded - start,
+            "vectors": stored - embedded,
+            "ann": time.perf_counter() - stored,
+        }
         print("Indexing complete. Vectors stored in memory.")
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Embed and append `documents`; the existing vectors are kept.
+
+        The quantized codes are re-encoded (their per-dimension ranges may
+        change) and the ANN index takes the new rows in place, unless it was
+        opened read-only (a memory-mapped IVF index) or the rows fall outside
+        its int8 quantizer's trained ranges; then it is rebuilt. The float32
+        matrix is extended in memory, so a memory-mapped one is read into RAM
+        until the index is saved again (the pipelines map it back then).
+        """
+        if not documents:
+            return
+        if self.document_vectors is None:
+            self.index_documents(documents)
+            return
+        texts = [doc["text"] for doc in documents]
+        embeddings = self._get_embeddings(texts)
+        if len(embeddings) != len(texts):
+            raise RuntimeError("Updating failed: embeddings missing for some chunks.")
+
+        previous = len(self.document_vectors)
+        self.documents = list(self.documents) + texts
+        self.document_metadata = list(self.document_metadata) + [{"chunk_id": doc.get("chunk_id")} for doc in documents]
+        self.document_vectors = np.concatenate((self.document_vectors, normalize_rows(embeddings)))
+        self.quantize_vectors()
+        added = self.document_vectors[previous:]
+        if self.ann_index is not None and self.ann_index.writable and self.ann_index.covers(added):
+            self.ann_index.add(added)
+        elif self.ann_index is not None or len(self.document_vectors) >= self.ann_min_corpus > previous:
+            self.build_ann_index()
+
+    def remove_documents(self, chunk_ids) -> None:
+        """Drop the rows of these chunks. The ANN index is rebuilt: FAISS
+        graphs cannot delete."""
+        chunk_ids = set(chunk_ids)
+        keep = [i for i, meta in enumerate(self.document_metadata) if meta.get("chunk_id") not in chunk_ids]
+        if self.document_vectors is None or len(keep) == len(self.document_metadata):
+            return
+        self.documents = [self.documents[i] for i in keep]
+        self.document_metadata = [self.document_metadata[i] for i in keep]
+        self.set_vectors(self.document_vectors[keep])
+        self.build_ann_index()
+
+    def _clear_index(self) -> None:
+        super()._clear_index()
+        self.documents = []
+        self.document_vectors = None
+        self.quantized = None
+        self.ann_index = None
+
+    def index_nbytes(self) -> int:
+        # With quantized codes doing the scanning, memory-mapped float32
+        # vectors are paged in only for the rows _search() re-scores.
+        vectors = self.document_vectors
+        if isinstance(vectors, np.memmap) and self.quantized is not None:
+            vectors = None
+        total = sum(
+            part.nbytes for part in (vectors, self.quantized, self.ann_index) if part is not None
+        )
+        if isinstance(self.documents, ChunkStore):
+            return total + self.documents.nbytes
+        return total + sum(len(text) for text in self.documents)
+
+    def set_vectors(self, vectors) -> None:
+        """Store `vectors` as the unit-normalized float32 document matrix.
+
+        Every path that puts vectors into the engine (indexing, loading a saved
+        index) goes through here, so retrieval can score with a single dot
+        product and never re-normalizes the corpus per query. Empty input
+        leaves the engine empty (None).
+        """
+        if vectors is None or len(vectors) == 0:
+            self.document_vectors = None
+            self.quantized = None
+            return
+        self.document_vectors = normalize_rows(vectors)
+        self.quantize_vectors()
+
+    def quantize_vectors(self) -> None:
+        """(Re)encode the float32 vectors as `vector_dtype` codes, if quantized."""
+        if self.vector_dtype == "float32" or self.document_vectors is None:
+            self.quantized = None
+            return
+        self.quantized = QuantizedVectors.quantize(self.document_vectors, self.vector_dtype)
+
+    def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Unit-length float32 query vector, or None if nothing came back.
+
+        Queries go through the query cache rather than the persistent chunk
+        cache: they are mostly one-off and would only crowd chunks out.
+        """
+        if self.query_cache is not None:
+            cached = self.query_cache.get(self.model, query)
+            if cached is not None:
+                return cached
+        return self._query_vector(query, self._get_embeddings([query], use_cache=False))
+
+    async def _aembed_query(self, query: str) -> Optional[np.ndarray]:
+        """_embed_query() on the event loop. The vector lands in the query
+        cache, where a retrieve() on a worker thread finds it."""
+        if self.query_cache is not None:
+            cached = self.query_cache.get(self.model, query)
+            if cached is not None:
+                return cached
+        return self._query_vector(query, await self._aget_embeddings([query], use_cache=False))
+
+    def _query_vector(self, query: str, query_embeddings) -> Optional[np.ndarray]:
+        if not query_embeddings:
+            return None
+        vector = normalize_rows(query_embeddings[0])[0]
+        if self.query_cache is not None:
+            self.query_cache.put(self.model, query, vector)
+        return vector
+
+    def _score_all(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the (unit) query against every stored chunk.
+
+        Approximate when the vectors are quantized — the float32 matrix is
+        only touched for the rows _search() re-scores.
+        """
+        if self.quantized is not None:
+            return self.quantized.score(query_vector)
+        return self.document_vectors @ query_vector
+
+    def _rescores(self) -> bool:
+        return (
+            self.vector_dtype != "float32"
+            and self.rescore_factor > 0
+            and self.document_vectors is not None
+        )
+
+    def _search(self, query_vector: np.ndarray, k: int):
+        """Top-`k` (scores, row indices), best first.
+
+        With quantized storage the first pass over-fetches
+        k * rescore_factor candidates, which are then re-ranked by their exact
+        float32 cosine, so the returned scores are exact either way.
+        """
+        rescore = self._rescores()
+        depth = k * self.rescore_factor if rescore else k
+
+        if self.ann_index is not None:
+            scores, indices = self.ann_index.search(query_vector, depth)
+        else:
+            similarities = self._score_all(query_vector)
+            indices = top_k_indices(similarities, depth)
+            scores = similarities[indices]
+
+        if rescore and len(indices):
+            # Sorted row order keeps reads from a memory-mapped matrix sequential.
+            rows = np.sort(indices)
+            exact = np.asarray(self.document_vectors[rows], dtype=np.float32) @ query_vector
+            best = top_k_indices(exact, k)
+            return exact[best], rows[best]
+        return scores[:k], indices[:k]
+
+    def build_ann_index(self) -> None:
+        """(Re)build the ANN index for the current vectors, if one is wanted.
+
+        Falls back to exact search — `ann_index` stays None — when the engine is
+        configured for it, or the corpus is too small for an ANN index to pay
+        for its recall loss.
+        """
+        self.ann_index = None
+        if self.index_type == "exact" or self.document_vectors is None:
+            return
+        if len(self.document_vectors) < self.ann_min_corpus:
+            logger.info(
+                f"{len(self.document_vectors)} vectors < ann_min_corpus "
+                f"({self.ann_min_corpus}); using exact search."
+            )
+            return
+        try:
+            self.ann_index = AnnIndex.build(
+                self.document_vectors, self.index_type, self.ann_params, self.vector_dtype
+            )
+        except Exception as e:
+            logger.error(f"Building {self.index_type} index failed, falling back to exact search: {e}")
+            self.ann_index = None
+
+    def restore_ann_index(self, state: Optional[Dict[str, Any]]) -> None:
+        """Restore an ANN index embedded in a legacy pickle, or rebuild it.
+
+        Pickles saved before ANN support (or under a different `index_type`)
+        carry no usable state; those are rebuilt from the vectors so a config
+        change takes effect on the next load.
+        """
+        self.ann_index = None
+        if (
+            state
+            and state.get("kind") == self.index_type
+            and (state.get("params") or {}).get("vector_dtype", "float32") == self.vector_dtype
+        ):
+            try:
+                ann_index = AnnIndex.from_state(state)
+                if ann_index.ntotal == len(self.document_vectors):
+                    self.ann_index = ann_index
+                    return
+                logger.warning("Persisted ANN index does not match the vectors; rebuilding.")
+            except Exception as e:
+                logger.warning(f"Could not restore ANN index ({e}); rebuilding.")
+        self.build_ann_index()
+
+    def save_index(self, directory: str, with_chunks: bool = True) -> None:
+        """Write the index into `directory` (see common.index_store).
+
+        Layout: vectors.npy (unit float32, N x D), the chunk store files,
+        the quantized codes when `vector_dtype` is not float32, an optional
+        ann.faiss, and manifest.json describing them. Without `with_chunks`
+        the chunk store is left to the caller, as in SparseRAG.save_index().
+        """
+        if self.document_vectors is None or len(self.documents) == 0:
+            raise RuntimeError("Cannot save an empty dense index.")
+
+        store = ChunkStore.from_documents(self.documents, self.document_metadata)
+        if with_chunks:
+            store.save(directory)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.document_vectors, dtype=np.float32))
+
+        ann = None
+        if self.ann_index is not None:
+            self.ann_index.save(os.path.join(directory, ANN_FILE))
+            ann = {"kind": self.ann_index.kind, "params": self.ann_index.params}
+
+        quantization = None
+        if self.quantized is not None:
+            self.quantized.save(directory)
+            quantization = {"dtype": self.quantized.dtype}
+
+        write_manifest(
+            directory,
+            INDEX_KIND,
+            model=self.model,
+            count=len(store),
+            dim=int(self.document_vectors.shape[1]),
+            dtype="float32",
+            normalized=True,
+            ann_index=ann,
+            quantization=quantization,
+        )
+
+    def map_vectors(self, directory: str) -> None:
+        """Swap the in-memory float32 vectors for the copy save_index() wrote
+        to `directory`, memory-mapped.
+
+        After a build the engine holds both the float32 matrix and, when
+        quantized, its codes; mapping the saved matrix leaves only the codes
+        resident, as load_index() does.
+        """
+        if self.document_vectors is None or isinstance(self.document_vectors, np.memmap):
+            return
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        if vectors.shape != self.document_vectors.shape:
+            raise IndexFormatError(
+                f"{directory}: saved vectors are {vectors.shape}, engine holds {self.document_vectors.shape}."
+            )
+        self.document_vectors = vectors
+
+    def load_index(self, directory: str, mmap: bool = True, store: Optional[ChunkStore] = None) -> None:
+        """Open an index written by save_index().
+
+        With `mmap` the vectors and chunk texts stay on disk and are paged in
+        on demand, so loading is near-instant and every process that opens
+        the same index shares one copy in the page cache. The stored vectors
+        are already unit float32, so they bypass set_vectors()' copy. An index
+        saved under a different `vector_dtype` is re-quantized on load.
+        `store` is the chunk store of an index saved without one.
+        """
+        manifest = read_manifest(directory, INDEX_KIND)
+        if manifest.get("model") and manifest["model"] != self.model:
+            raise IndexFormatError(
+                f"Index was embedded with {manifest['model']}, engine is configured for {self.model}."
+            )
+
+        if store is None:
+            store = ChunkStore.load(directory, mmap=mmap)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        if vectors.shape[0] != len(store):
+            raise IndexFormatError(f"{directory}: {vectors.shape[0]} vectors for {len(store)} chunks.")
+
+        self.documents = store
+        self.document_metadata = store.metadata
+        self.document_vectors = vectors
+
+        quantization = manifest.get("quantization") or {}
+        if self.vector_dtype != "float32" and quantization.get("dtype") == self.vector_dtype:
+            self.quantized = QuantizedVectors.load(directory, self.vector_dtype, mmap=mmap)
+            if len(self.quantized) != len(store):
+                raise IndexFormatError(f"{directory}: {len(self.quantized)} quantized rows for {len(store)} chunks.")
+        else:
+            self.quantize_vectors()
+
+        ann = manifest.get("ann_index")
+        self.ann_index = None
+        if (
+            ann
+            and ann.get("kind") == self.index_type
+            and (ann.get("params") or {}).get("vector_dtype", "float32") == self.vector_dtype
+        ):
+            try:
+                self.ann_index = AnnIndex.load(os.path.join(directory, ANN_FILE), ann["kind"], ann.get("params"))
+            except Exception as e:
+                logger.warning(f"Could not open saved ANN index ({e}); rebuilding.")
+        if self.ann_index is None or self.ann_index.ntotal != len(store):
+            self.build_ann_index()
             
 
     def retrieve(self, query: str) -> List[str]:
@@ -80,23 +562,16 @@ class DenseRAG(BaseRAG):
             print("Warning: Database is empty.")
             return []
 
-        query_embeddings = self._get_embeddings([query])
+        query_vector = self._embed_query(query)
 
-        if not query_embeddings:
+        if query_vector is None:
             return []
 
-        query_vector = np.array(query_embeddings[0]).reshape(1, -1)
-
-        similarities = cosine_similarity(query_vector, self.document_vectors).flatten()
-
-        sorted_indices = similarities.argsort()
-        
-        top_indices = sorted_indices[-self.top_k:][::-1]
+        top_scores, top_indices = self._search(query_vector, self.top_k)
 
         results = []
         print(f"--- Semantic Search Results for: '{query}' ---")
-        for idx in top_indices:
-            score = similarities[idx]
+        for idx, score in zip(top_indices, top_scores):
             doc_text = self.documents[idx]
             print(f"Score: {score:.4f} | Text: {doc_text[:50]}...") 
             results.append({
@@ -107,6 +582,20 @@ class DenseRAG(BaseRAG):
             
         return results
     
+    def score_all(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query to every indexed chunk, in index order.
+
+        An exact scan even when an ANN index is loaded (approximate with
+        quantized storage, see _score_all()). Empty when there is nothing
+        indexed or the query could not be embedded.
+        """
+        if self.document_vectors is None or len(self.documents) == 0:
+            return np.zeros(0, dtype=np.float64)
+        query_vector = self._embed_query(query)
+        if query_vector is None:
+            return np.zeros(0, dtype=np.float64)
+        return np.asarray(self._score_all(query_vector), dtype=np.float64)
+
     def get_retrieved_scores(self, query: str) -> Dict[str, Any]:
         """
         Returns the cosine similarity scores for all documents given a query.
@@ -116,16 +605,14 @@ class DenseRAG(BaseRAG):
             print("Warning: Database is empty.")
             return {"scores": []}
 
-        query_embedding_list = self._get_embeddings([query])
+        query_vector = self._embed_query(query)
         
-        if not query_embedding_list:
+        if query_vector is None:
             return {"scores": []}
-            
-        query_vector = np.array(query_embedding_list)
 
-        similarities = cosine_similarity(query_vector, self.document_vectors).flatten()
+        similarities = self._score_all(query_vector)
 
-        average_score = np.mean(similarities) if len(similarities) > 0 else 0.0
+        average_score = float(np.mean(similarities)) if len(similarities) > 0 else 0.0
         
         return {"scores": average_score}
     
\ No newline at end of file
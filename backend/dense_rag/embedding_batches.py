@@ -0,0 +1,196 @@
+"""Batched, concurrent embedding requests.
+
+One embeddings.create call per document stops working once the document is
+big enough: the API caps both the number of inputs and the total tokens per
+request, and a single huge request is the one most likely to time out.
+embed_in_batches() splits the input into contiguous batches bounded by item
+count and token budget, sends them from a small thread pool, retries a failed
+batch on its own with exponential backoff, and reassembles the vectors in
+input order. aembed_in_batches() does the same on an event loop, with an
+async `embed` and at most `concurrency` batches awaited at once.
+
+Token counts come from tiktoken, but only when they could matter: a token is
+at least one UTF-8 byte, so if the whole input is under the token budget in
+bytes, no batch can exceed it and the tokenizer is never loaded.
+"""
+import asyncio
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts up to 2048 inputs and 300k tokens per embeddings request;
+# smaller batches keep each request well clear of its timeout.
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_BATCH_TOKENS = 100_000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits and
+# server-side failures. Anything else (bad input, auth) fails the same way again.
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktoken encoding for `model`, or None if tiktoken cannot load one.
+
+    Models outside OpenAI's registry (e.g. qwen via OpenRouter) are counted
+    with cl100k_base, which is close enough for a batching budget.
+    """
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable ({e}); bounding batches by UTF-8 length instead.")
+        return None
+
+
+def token_counts(texts: Sequence[str], model: str, budget: int) -> List[int]:
+    """Per-text token counts, or a byte-length upper bound when that suffices."""
+    sizes = [len(text.encode("utf-8")) for text in texts]
+    if sum(sizes) <= budget:
+        return sizes
+    encoding = _encoding(model)
+    if encoding is None:
+        return sizes
+    return [len(tokens) for tokens in encoding.encode_batch(list(texts), disallowed_special=())]
+
+
+def plan_batches(counts: Sequence[int], max_items: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """Contiguous [start, end) ranges, each within both limits.
+
+    A single text over `max_tokens` still gets a batch of its own; the API is
+    the one to reject it.
+    """
+    batches = []
+    start, tokens = 0, 0
+    for i, count in enumerate(counts):
+        if i > start and (i - start >= max_items or tokens + count > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(counts):
+        batches.append((start, len(counts)))
+    return batches
+
+
+def is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def _retry_delay(backoff: float, attempt: int) -> float:
+    return backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def embed_in_batches(
+    embed: Callable[[List[str]], List],
+    texts: Sequence[str],
+    model: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List:
+    """`embed(batch)` over every batch of `texts`; vectors in input order.
+
+    Raises the last error of the first batch that exhausts its retries; the
+    batches not yet started are cancelled.
+    """
+    texts = list(texts)
+    batches = plan_batches(token_counts(texts, model, batch_tokens), batch_size, batch_tokens)
+
+    def run(bounds: Tuple[int, int]) -> List:
+        batch = texts[bounds[0]:bounds[1]]
+        for attempt in range(max_retries + 1):
+            try:
+                return embed(batch)
+            except Exception as e:
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                delay = _retry_delay(backoff, attempt)
+                logger.warning(
+                    f"Embedding batch {bounds} failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.2f}s."
+                )
+                sleep(delay)
+
+    if len(batches) <= 1 or concurrency <= 1:
+        results = [run(bounds) for bounds in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+            futures = [pool.submit(run, bounds) for bounds in batches]
+            try:
+                results = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    if len(batches) > 1:
+        logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches ({model}).")
+    return [vector for batch in results for vector in batch]
+
+
+async def aembed_in_batches(
+    embed: Callable[[List[str]], Awaitable[List]],
+    texts: Sequence[str],
+    model: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> List:
+    """embed_in_batches() with an async `embed`; vectors in input order.
+
+    The first batch to exhaust its retries cancels the others and its error
+    is raised.
+    """
+    texts = list(texts)
+    batches = plan_batches(token_counts(texts, model, batch_tokens), batch_size, batch_tokens)
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(bounds: Tuple[int, int]) -> List:
+        batch = texts[bounds[0]:bounds[1]]
+        async with slots:
+            for attempt in range(max_retries + 1):
+                try:
+                    return await embed(batch)
+                except Exception as e:
+                    if attempt == max_retries or not is_retryable(e):
+                        raise
+                    delay = _retry_delay(backoff, attempt)
+                    logger.warning(
+                        f"Embedding batch {bounds} failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.2f}s."
+                    )
+                    await sleep(delay)
+
+    tasks = [asyncio.ensure_future(run(bounds)) for bounds in batches]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if len(batches) > 1:
+        logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches ({model}).")
+    return [vector for batch in results for vector in batch]
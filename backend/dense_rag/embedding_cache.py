@@ -0,0 +1,313 @@
+"""Persistent, content-addressed cache of embedding vectors.
+
+An embedding depends only on the model and the exact text embedded, so the
+cache key is sha256(model, text). The same chunk embedded by the Dense and
+Hybrid pipelines, by each LLM variant in RAGRegistry, or again after a
+document is re-uploaded costs one API call in total.
+
+Two backends:
+
+* SQLiteEmbeddingCache — one file, shared by every process that can see it
+  (the web and worker containers mount the same vector_stores volume).
+* RedisEmbeddingCache — for deployments without a shared disk.
+
+Both evict least-recently-used entries once the stored vectors exceed
+`max_bytes`. Vectors are stored as float32, which is what DenseRAG keeps in
+memory anyway.
+
+SQLite keeps reads read-only: the recency of the keys a lookup hit is
+buffered and written in batches (with the next put, or every
+_TOUCH_BATCH keys / _TOUCH_INTERVAL seconds), and the stored size is a
+running total kept by triggers, so a put never scans the table.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKENDS = ("sqlite", "redis", "none")
+DEFAULT_MAX_BYTES = 1 << 30
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+_SQLITE_BATCH = 500
+# Buffered recency updates are written once this many keys or seconds pile up.
+_TOUCH_BATCH = 1024
+_TOUCH_INTERVAL = 30.0
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _encode(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class EmbeddingCache:
+    """Interface: look up and store vectors for (model, text) pairs."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """One vector (or None on a miss) per text, in order."""
+        keys = [cache_key(model, text) for text in texts]
+        found = self._get(keys)
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence) -> None:
+        entries = {cache_key(model, text): _encode(vector) for text, vector in zip(texts, vectors)}
+        if entries:
+            self._put(entries)
+
+    def _get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def _put(self, entries: Dict[str, bytes]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class SQLiteEmbeddingCache(EmbeddingCache):
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # WAL lets readers in other processes proceed while one writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        # The running size, kept by triggers so every process sees the same
+        # total. Caches created before it existed are summed once, here.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_stats ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " nbytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO embedding_stats (id, nbytes)"
+                " SELECT 0, COALESCE(SUM(nbytes), 0) FROM embeddings"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_added AFTER INSERT ON embeddings"
+                " BEGIN UPDATE embedding_stats SET nbytes = nbytes + NEW.nbytes WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_removed AFTER DELETE ON embeddings"
+                " BEGIN UPDATE embedding_stats SET nbytes = nbytes - OLD.nbytes WHERE id = 0; END"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.monotonic()
+
+    def _get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update((key, _decode(blob)) for key, blob in rows)
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if (
+                    len(self._touched) >= _TOUCH_BATCH
+                    or time.monotonic() - self._touched_since >= _TOUCH_INTERVAL
+                ):
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        self._flush_touched()
+                        self._conn.execute("COMMIT")
+                    except BaseException:
+                        self._conn.execute("ROLLBACK")
+                        raise
+        return found
+
+    def _flush_touched(self) -> None:
+        """Write the buffered recency updates. Call inside a write transaction."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched = {}
+        self._touched_since = time.monotonic()
+
+    def _put(self, entries: Dict[str, bytes]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Keys are content hashes: an existing row already holds the
+                # same vector, so it is kept (and the total stays exact).
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, blob, len(blob), now) for key, blob in entries.items()],
+                )
+                self._flush_touched()
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _total_bytes(self) -> int:
+        return int(self._conn.execute("SELECT nbytes FROM embedding_stats WHERE id = 0").fetchone()[0])
+
+    def _evict(self) -> None:
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used until enough has been freed.
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used"):
+            victims.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        logger.info(f"Embedding cache over {self.max_bytes} bytes; evicted {len(victims)} entries.")
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._total_bytes()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched = {}
+            self._conn.execute("DELETE FROM embeddings")
+
+
+class RedisEmbeddingCache(EmbeddingCache):
+    """Vectors under `<prefix>:<key>`, recency in a sorted set, size in a counter."""
+
+    def __init__(self, client, max_bytes: int = DEFAULT_MAX_BYTES, prefix: str = "embcache"):
+        super().__init__(max_bytes)
+        self.client = client
+        self.prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+        self._bytes_key = f"{prefix}:bytes"
+
+    @classmethod
+    def from_url(cls, url: str, max_bytes: int = DEFAULT_MAX_BYTES) -> "RedisEmbeddingCache":
+        import redis
+
+        return cls(redis.Redis.from_url(url), max_bytes)
+
+    def _entry(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        blobs = self.client.mget([self._entry(key) for key in keys])
+        found = {key: _decode(blob) for key, blob in zip(keys, blobs) if blob is not None}
+        if found:
+            self.client.zadd(self._lru_key, {key: time.time() for key in found})
+        return found
+
+    def _put(self, entries: Dict[str, bytes]) -> None:
+        now = time.time()
+        pipe = self.client.pipeline()
+        for key, blob in entries.items():
+            pipe.set(self._entry(key), blob, nx=True)
+        created = pipe.execute()
+
+        pipe = self.client.pipeline()
+        pipe.zadd(self._lru_key, {key: now for key in entries})
+        added = sum(len(blob) for blob, was_set in zip(entries.values(), created) if was_set)
+        if added:
+            pipe.incrby(self._bytes_key, added)
+        pipe.execute()
+        self._evict()
+
+    def _evict(self) -> None:
+        total = int(self.client.get(self._bytes_key) or 0)
+        while total > self.max_bytes:
+            oldest = self.client.zpopmin(self._lru_key, 64)
+            if not oldest:
+                break
+            entries = [self._entry(key.decode() if isinstance(key, bytes) else key) for key, _ in oldest]
+            sizes = [self.client.strlen(entry) for entry in entries]
+            self.client.delete(*entries)
+            total = int(self.client.decrby(self._bytes_key, sum(sizes)))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide cache configured in settings, or None if disabled.
+
+    Built once, so every engine in RAGRegistry shares one connection.
+    """
+    global _shared_cache
+    from django.conf import settings
+
+    backend = getattr(settings, "EMBEDDING_CACHE_BACKEND", "none")
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_CACHE_BACKEND '{backend}'. Expected one of {CACHE_BACKENDS}.")
+    if backend == "none":
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            max_bytes = getattr(settings, "EMBEDDING_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+            try:
+                if backend == "redis":
+                    _shared_cache = RedisEmbeddingCache.from_url(settings.REDIS_URL, max_bytes)
+                else:
+                    _shared_cache = SQLiteEmbeddingCache(settings.EMBEDDING_CACHE_PATH, max_bytes)
+            except Exception as e:
+                logger.error(f"Embedding cache ({backend}) unavailable, embedding without it: {e}")
+                return None
+        return _shared_cache
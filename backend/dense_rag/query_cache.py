@@ -0,0 +1,152 @@
+"""In-process LRU of query embeddings, optionally backed by Redis.
+
+Deep analysis sends the same optimized query through every Dense and Hybrid
+variant, and get_retrieved_docs() may embed both the optimized and the
+original query — each a network round-trip for a vector we already have.
+QueryEmbeddingCache keeps recent query vectors keyed by (model, normalized
+text). With a Redis client, a miss in this process falls through to Redis,
+so Celery workers and the Channels consumer share what each has embedded.
+
+Unlike the chunk cache (dense_rag.embedding_cache) this one is small and
+short-lived: queries are mostly one-off, and there is no point in persisting
+them to disk.
+"""
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_REDIS_TTL_SECONDS = 3600
+
+
+def normalize_query(text: str) -> str:
+    """NFC, trimmed, runs of whitespace collapsed to one space.
+
+    Only differences the embedding model cannot see are folded away; case
+    and punctuation are left alone because they can change the vector.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        redis_client: Any = None,
+        redis_ttl: int = DEFAULT_REDIS_TTL_SECONDS,
+        prefix: str = "qembed",
+    ):
+        self.max_entries = int(max_entries)
+        self.redis = redis_client
+        self.redis_ttl = int(redis_ttl)
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self._key(model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        if self.redis is not None:
+            try:
+                blob = self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"Query embedding cache: Redis lookup failed ({e}).")
+                blob = None
+            if blob is not None:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember(key, vector)
+                with self._lock:
+                    self.redis_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model: str, text: str, vector) -> None:
+        key = self._key(model, text)
+        vector = np.array(vector, dtype=np.float32).ravel()
+        vector.setflags(write=False)
+        self._remember(key, vector)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, vector.tobytes(), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"Query embedding cache: Redis write failed ({e}).")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.redis_hits) / lookups, 3) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.redis_hits = self.misses = 0
+
+
+_shared_cache: Optional[QueryEmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """The process-wide query cache configured in settings, or None if disabled."""
+    global _shared_cache
+    from django.conf import settings
+
+    max_entries = getattr(settings, "QUERY_EMBEDDING_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+    if max_entries <= 0:
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            redis_client = None
+            if getattr(settings, "QUERY_EMBEDDING_CACHE_REDIS", False):
+                try:
+                    import redis
+
+                    redis_client = redis.Redis.from_url(settings.REDIS_URL)
+                except Exception as e:
+                    logger.error(f"Query embedding cache: Redis unavailable, staying in-process: {e}")
+            _shared_cache = QueryEmbeddingCache(
+                max_entries,
+                redis_client=redis_client,
+                redis_ttl=getattr(settings, "QUERY_EMBEDDING_CACHE_TTL", DEFAULT_REDIS_TTL_SECONDS),
+            )
+        return _shared_cache
@@ -0,0 +1,18 @@
+"""Vector-matrix helpers shared by DenseRAG and its ANN index."""
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """C-contiguous float32 copy of `vectors` with unit-length rows.
+
+    Once every row has length 1, cosine similarity against a unit query is a
+    plain dot product, so the normalization is paid once at index/load time
+    instead of on every query. Zero rows stay zero rather than becoming NaN.
+    """
+    matrix = np.array(vectors, dtype=np.float32, order="C", copy=True)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
@@ -9,6 +9,7 @@ This is the TREC-style pooling idea: no single retriever defines relevance,
 the consensus of all of them does.
 """
 import logging
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from typing import Any
 
@@ -120,6 +121,10 @@ class CandidatePooler:
     pooler = build_default_pooler(top_n=10)
     result = pooler.pool(query="What is X?", username="alice")
     ground_truth_ids = set(result.rrf_chunk_ids)
+
+    # Several queries over the same document: one index load and one
+    # retrieve_batch call per pipeline.
+    results = pooler.pool_batch(["What is X?", "Who made Y?"], username="alice")
     """
 
     def __init__(
@@ -191,14 +196,24 @@ class CandidatePooler:
         self,
         name: str,
         pipeline: Any,
-        query: str,
+        queries: list[str],
         username: str | None = None,
-    ) -> PipelineResult:
-        """Retrieve for one pipeline, bypassing LLM generation entirely."""
+    ) -> list[PipelineResult]:
+        """Retrieve every query for one pipeline, bypassing LLM generation.
+
+        The queries share one hold on the index, and engines with a
+        `retrieve_batch` (SparseRAG scores a batch with one sparse matrix
+        product) get them all at once.
+        """
         from rag.rag_service import apply_retrieval_depth
 
         try:
-            if username:
+            holding = nullcontext()
+            if username and hasattr(pipeline, "loaded_index"):
+                # Pipelines keep one index per document in their index cache;
+                # `rag` holds this user's only inside loaded_index().
+                holding = pipeline.loaded_index(username)
+            elif username:
                 self._ensure_ready(name, pipeline, username)
 
             # Engines are process-wide singletons whose depth the analysis
@@ -206,13 +221,28 @@ class CandidatePooler:
             # decide how deep the pool goes.
             apply_retrieval_depth(pipeline, self.depth)
 
-            ranked = pipeline.rag.retrieve(query) or []
-            logger.info(f"[{name}] retrieved {len(ranked)} chunks.")
-            return PipelineResult(pipeline_name=name, ranked_chunks=ranked)
+            with holding:
+                retrieve_batch = getattr(pipeline.rag, "retrieve_batch", None)
+                if retrieve_batch is not None:
+                    batches = retrieve_batch(queries)
+                else:
+                    batches = [pipeline.rag.retrieve(query) for query in queries]
+            results = [
+                PipelineResult(pipeline_name=name, ranked_chunks=ranked or [])
+                for ranked in batches
+            ]
+            logger.info(
+                f"[{name}] retrieved {sum(len(r.ranked_chunks) for r in results)} chunks "
+                f"for {len(queries)} queries."
+            )
+            return results
 
         except Exception as e:
             logger.error(f"[{name}] retrieval failed: {e}", exc_info=True)
-            return PipelineResult(pipeline_name=name, ranked_chunks=[], error=str(e))
+            return [
+                PipelineResult(pipeline_name=name, ranked_chunks=[], error=str(e))
+                for _ in queries
+            ]
 
     def _optimize_query(self, query: str) -> str:
         """Rewrite the query once and share it across every pipeline.
@@ -253,31 +283,60 @@ class CandidatePooler:
         Returns:
             PooledResult with rrf_ranked_chunks and per-pipeline raw results.
         """
+        return self.pool_batch([query], username=username, optimize=optimize, top_n=top_n)[0]
+
+    def pool_batch(
+        self,
+        queries: list[str],
+        username: str | None = None,
+        optimize: bool = True,
+        top_n: int | None = None,
+    ) -> list[PooledResult]:
+        """
+        pool() for several queries against the same user's document.
+
+        Each pipeline loads the index once and retrieves every query in one
+        `retrieve_batch` call. Results come back in the order of `queries`.
+        """
         if not self._pipelines:
             raise RuntimeError("No pipelines registered. Call .register() first.")
 
-        optimized_query = self._optimize_query(query) if optimize else query
-
-        per_pipeline: dict[str, PipelineResult] = {}
-        ranked_lists: list[list[dict[str, Any]]] = []
-        names: list[str] = []
+        optimized_queries = [self._optimize_query(q) if optimize else q for q in queries]
 
+        per_query: list[dict[str, PipelineResult]] = [{} for _ in queries]
         for name, pipeline in self._pipelines.items():
-            result = self._retrieve_from_pipeline(
-                name, pipeline, optimized_query, username
-            )
+            results = self._retrieve_from_pipeline(name, pipeline, optimized_queries, username)
 
             # A rewritten query can miss where the literal one hits — notably
             # BM25, which drops every chunk scoring 0.
-            if not result.ranked_chunks and not result.error and optimized_query != query:
-                logger.info(f"[{name}] empty on optimized query — retrying original.")
-                result = self._retrieve_from_pipeline(name, pipeline, query, username)
-
-            per_pipeline[name] = result
-
-            if result.ranked_chunks:
-                ranked_lists.append(result.ranked_chunks)
-                names.append(name)
+            retry = [
+                i for i, result in enumerate(results)
+                if not result.ranked_chunks and not result.error and optimized_queries[i] != queries[i]
+            ]
+            if retry:
+                logger.info(f"[{name}] empty on {len(retry)} optimized queries — retrying the originals.")
+                retried = self._retrieve_from_pipeline(name, pipeline, [queries[i] for i in retry], username)
+                for i, result in zip(retry, retried):
+                    results[i] = result
+
+            for i, result in enumerate(results):
+                per_query[i][name] = result
+
+        return [
+            self._fuse(query, optimized_query, per_pipeline, top_n)
+            for query, optimized_query, per_pipeline in zip(queries, optimized_queries, per_query)
+        ]
+
+    def _fuse(
+        self,
+        query: str,
+        optimized_query: str,
+        per_pipeline: dict[str, PipelineResult],
+        top_n: int | None,
+    ) -> PooledResult:
+        """RRF over one query's per-pipeline results."""
+        ranked_lists = [r.ranked_chunks for r in per_pipeline.values() if r.ranked_chunks]
+        names = [name for name, r in per_pipeline.items() if r.ranked_chunks]
 
         if not ranked_lists:
             logger.warning("All pipelines returned empty results.")
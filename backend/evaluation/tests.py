@@ -378,6 +378,19 @@ class FakePipeline:
         return f"{query} (optimized)"
 
 
+class FakeBatchPipeline(FakePipeline):
+    """A FakePipeline whose engine retrieves a batch of queries in one call."""
+
+    def __init__(self, ranked_by_query):
+        super().__init__([])
+        self.ranked_by_query = ranked_by_query
+        self.rag = mock.Mock(spec=["retrieve", "retrieve_batch", "documents", "top_k"])
+        self.rag.documents = ["already indexed"]
+        self.rag.top_k = 5
+        self.rag.retrieve_batch.side_effect = lambda queries: [
+            list(self.ranked_by_query.get(q, [])) for q in queries
+        ]
+
 class CandidatePoolerTests(TestCase):
     def test_pool_fuses_every_registered_pipeline(self):
         pooler = CandidatePooler(k=60, top_n=None)
@@ -446,6 +459,35 @@ class CandidatePoolerTests(TestCase):
         pipeline.init.assert_called_with("alice")
 
 
+    def test_pool_batch_retrieves_every_query_in_one_call_per_pipeline(self):
+        sparse = FakeBatchPipeline({
+            "a (optimized)": [{"chunk_id": 1}],
+            "b (optimized)": [{"chunk_id": 2}],
+        })
+        dense = FakePipeline([{"chunk_id": 3}])
+        pooler = CandidatePooler(top_n=None).register("s", sparse).register("d", dense)
+
+        results = pooler.pool_batch(["a", "b"], username="alice")
+
+        sparse.rag.retrieve_batch.assert_called_once_with(["a (optimized)", "b (optimized)"])
+        self.assertEqual(dense.rag.retrieve.call_count, 2)
+        self.assertEqual([r.query for r in results], ["a", "b"])
+        self.assertEqual(set(results[0].rrf_chunk_ids), {1, 3})
+        self.assertEqual(set(results[1].rrf_chunk_ids), {2, 3})
+
+    def test_pool_batch_retries_only_the_queries_that_came_back_empty(self):
+        sparse = FakeBatchPipeline({
+            "a (optimized)": [{"chunk_id": 1}],
+            "b": [{"chunk_id": 2}],
+        })
+        pooler = CandidatePooler().register("s", sparse)
+
+        results = pooler.pool_batch(["a", "b"])
+
+        self.assertEqual(sparse.rag.retrieve_batch.call_args_list[-1], mock.call(["b"]))
+        self.assertEqual([r.rrf_chunk_ids for r in results], [[1], [2]])
+
+
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CACHES=LOCMEM_CACHE)
 class CandidatePoolEndpointTests(TestCase):
     def setUp(self):
@@ -528,6 +570,40 @@ class CandidatePoolEndpointTests(TestCase):
             GroundTruthChunk.objects.filter(conversation=self.conversation).count(), 1
         )
 
+    def test_batch_pooling_writes_each_conversation(self):
+        other = Conversation.objects.create(
+            user=self.user, document=self.document, query="q2", response="r", context="c"
+        )
+        pooler = self._pooler()
+        with mock.patch("evaluation.views.build_default_pooler", return_value=pooler), \
+                mock.patch.object(pooler, "pool_batch", wraps=pooler.pool_batch) as pool_batch:
+            resp = self.client.post(
+                "/api/v1/ground-truth-chunk/pool/",
+                {"conversation_ids": [self.conversation.id, other.id]},
+                content_type="application/json",
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        pool_batch.assert_called_once_with(["q", "q2"], username="alice")
+        results = resp.json()["results"]
+        self.assertEqual([r["conversation_id"] for r in results], [self.conversation.id, other.id])
+        self.assertTrue(all(r["status"] == 200 for r in results))
+        self.assertEqual(GroundTruthChunk.objects.filter(conversation=other).count(), 3)
+
+    def test_batch_pooling_rejects_unknown_conversations(self):
+        resp = self.client.post(
+            "/api/v1/ground-truth-chunk/pool/",
+            {"conversation_ids": [self.conversation.id, 424242]},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.json()["conversation_ids"], [424242])
+
+        resp = self.client.post(
+            "/api/v1/ground-truth-chunk/pool/", {"conversation_ids": []}, content_type="application/json"
+        )
+        self.assertEqual(resp.status_code, 400)
+
     def test_no_engines_available_returns_503(self):
         # RAG_DISABLE_ENGINE_INIT leaves the registry empty; the endpoint must
         # say so rather than raise.
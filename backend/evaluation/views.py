@@ -7,7 +7,7 @@ from rest_framework import status
 from evaluation.models import Chunk, GroundTruthChunk, GroundTruthResponse
 from router.models import Conversation, GuestUser, Document, AnalysisBatch, AnalysisResult
 from common.chunker import DocumentChunker
-from common.constant import DEFAULT_POOL_TOP_N, POOL_TOP_N_MAX
+from common.constant import DEFAULT_POOL_TOP_N, POOL_BATCH_MAX, POOL_TOP_N_MAX
 from common.schema import get_responses
 from .candidate_pooler import DEFAULT_RRF_K, build_default_pooler
 from .eval import evaluate_chunks, evaluate_response
@@ -170,6 +170,10 @@ class CandidatePoolView(APIView):
     hand-picking chunks — writes the same rows with `source="manual"`, so
     everything downstream (`run_analysis`, Precision@K/Recall@K/F1@K) is
     unchanged either way.
+
+    `conversation_ids` (a list) pools several conversations in one request.
+    Conversations over the same user's document are retrieved together, one
+    retrieve_batch call per method, and each gets its own entry in `results`.
     """
 
     def _resolve_username(self, conversation: Conversation) -> str | None:
@@ -215,7 +219,50 @@ class CandidatePoolView(APIView):
 
         return payload
 
+    def _outcome(self, conversation: Conversation, pooled, rrf_k: int, top_n: int) -> tuple[dict, int]:
+        """Persist one conversation's pool; the response body and status for it."""
+        if not pooled.rrf_ranked_chunks:
+            # Never wipe a ground-truth set the user already has just because
+            # every retriever came back empty — report why instead.
+            return (
+                {
+                    "error": "Candidate pooling returned no chunks. Existing ground truth was left untouched.",
+                    "pipelines": [
+                        {"name": name, "retrieved": len(r.ranked_chunks), "error": r.error}
+                        for name, r in pooled.per_pipeline.items()
+                    ],
+                },
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        chunks = self._persist(conversation, pooled)
+
+        return (
+            {
+                "conversation_id": conversation.id,
+                "source": GroundTruthChunk.Source.POOLED,
+                "query": pooled.query,
+                "optimized_query": pooled.optimized_query,
+                "rrf_k": rrf_k,
+                "top_n": top_n,
+                "pipelines": [
+                    {
+                        "name": name,
+                        "retrieved": len(result.ranked_chunks),
+                        "error": result.error,
+                    }
+                    for name, result in pooled.per_pipeline.items()
+                ],
+                "chunks": chunks,
+            },
+            status.HTTP_200_OK,
+        )
+
     def post(self, request):
+        conversation_ids = request.data.get("conversation_ids")
+        if conversation_ids is not None:
+            return self._post_batch(request, conversation_ids)
+
         conversation_id = request.data.get("conversation_id")
         if not conversation_id:
             return Response(
@@ -249,38 +296,73 @@ class CandidatePoolView(APIView):
             logger.error(f"Candidate pooling failed for conversation {conversation_id}: {e}", exc_info=True)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        if not pooled.rrf_ranked_chunks:
-            # Never wipe a ground-truth set the user already has just because
-            # every retriever came back empty — report why instead.
+        body, code = self._outcome(conversation, pooled, rrf_k, top_n)
+        return Response(body, status=code)
+
+    def _post_batch(self, request, conversation_ids):
+        if not isinstance(conversation_ids, list) or not conversation_ids:
             return Response(
-                {
-                    "error": "Candidate pooling returned no chunks. Existing ground truth was left untouched.",
-                    "pipelines": [
-                        {"name": name, "retrieved": len(r.ranked_chunks), "error": r.error}
-                        for name, r in pooled.per_pipeline.items()
-                    ],
-                },
-                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                {"error": "conversation_ids must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(conversation_ids) > POOL_BATCH_MAX:
+            return Response(
+                {"error": f"At most {POOL_BATCH_MAX} conversations can be pooled at once."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        chunks = self._persist(conversation, pooled)
+        try:
+            conversation_ids = list(dict.fromkeys(int(cid) for cid in conversation_ids))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "conversation_ids must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        found = Conversation.objects.select_related("user", "document__user").in_bulk(conversation_ids)
+        missing = [cid for cid in conversation_ids if cid not in found]
+        if missing:
+            return Response(
+                {"error": "Conversation not found", "conversation_ids": missing},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        top_n = _positive_int(request.data.get("top_n"), DEFAULT_POOL_TOP_N, POOL_TOP_N_MAX)
+        rrf_k = _positive_int(request.data.get("rrf_k"), DEFAULT_RRF_K)
+
+        pooler = build_default_pooler(k=rrf_k, top_n=top_n)
+        if not pooler.pipeline_names:
+            return Response(
+                {"error": "No retrieval engines are available for pooling."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        # One pool_batch per index owner: each retriever loads that user's
+        # index once and scores all of their queries together.
+        by_owner: dict = {}
+        for cid in conversation_ids:
+            conversation = found[cid]
+            by_owner.setdefault(self._resolve_username(conversation), []).append(conversation)
+
+        outcomes = {}
+        for username, conversations in by_owner.items():
+            try:
+                pooled = pooler.pool_batch([c.query for c in conversations], username=username)
+            except Exception as e:
+                logger.error(f"Candidate pooling failed for {[c.id for c in conversations]}: {e}", exc_info=True)
+                for conversation in conversations:
+                    outcomes[conversation.id] = ({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+                continue
+            for conversation, result in zip(conversations, pooled):
+                outcomes[conversation.id] = self._outcome(conversation, result, rrf_k, top_n)
 
         return Response({
-            "conversation_id": conversation.id,
-            "source": GroundTruthChunk.Source.POOLED,
-            "query": pooled.query,
-            "optimized_query": pooled.optimized_query,
             "rrf_k": rrf_k,
             "top_n": top_n,
-            "pipelines": [
-                {
-                    "name": name,
-                    "retrieved": len(result.ranked_chunks),
-                    "error": result.error,
-                }
-                for name, result in pooled.per_pipeline.items()
+            "results": [
+                {"conversation_id": cid, "status": outcomes[cid][1], **outcomes[cid][0]}
+                for cid in conversation_ids
             ],
-            "chunks": chunks,
         }, status=status.HTTP_200_OK)
         
 class CreateGroundTruthResponse(APIView):
@@ -0,0 +1,130 @@
+"""Adaptive reranking: spend the cross-encoder only where the halves disagree.
+
+A chunk that both BM25 and the dense search place in their top_k is one the
+cross-encoder almost always keeps too, and when the two halves' top_k are the
+same set there is nothing left for it to decide. plan_rerank() splits the
+merged candidates into
+
+    head  chunks in both halves' top_k, kept in RRF order without reranking
+    tail  the best of the rest by RRF, at most TAIL_FACTOR per open slot,
+          which the cross-encoder orders to fill the remaining top_k
+
+so a query whose halves agree costs no forward pass, and a partly agreeing
+one scores a few pairs instead of up to 2 * child_top_k. Every candidate
+carries its RRF score as `fused_score` and no `score` of its own: `score` is
+the cross-encoder's in every rerank mode, so HybridRAG sets it on the tail
+and leaves the head, which the cross-encoder never saw, without one. Halves
+that agree on nothing give no reason to trust either ranking, and every
+candidate is reranked as before. RerankTelemetry counts how often each
+happened and how many pairs were saved;
+benchmarks/adaptive_rerank.py measures the quality cost on the evaluation
+sets.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional
+
+# Tail candidates reranked per top_k slot the head leaves open.
+TAIL_FACTOR = 2
+
+DECISIONS = ("skipped", "partial", "full")
+
+
+def candidate_key(doc: Dict[str, Any]) -> Hashable:
+    chunk_id = doc.get("chunk_id")
+    return chunk_id if chunk_id is not None else doc["text"].strip()
+
+
+@dataclass
+class RerankPlan:
+    """What plan_rerank() decided for one query."""
+    head: List[Dict[str, Any]]
+    tail: List[Dict[str, Any]]
+    candidates: int
+    decision: str
+
+
+def _fused(doc: Dict[str, Any], rrf_score: float) -> Dict[str, Any]:
+    """`doc` with its RRF score, minus the BM25 or cosine `score` of its half."""
+    fused = {field: value for field, value in doc.items() if field != "score"}
+    fused["fused_score"] = rrf_score
+    return fused
+
+
+def plan_rerank(
+    sparse_results: List[Dict[str, Any]],
+    dense_results: List[Dict[str, Any]],
+    top_k: int,
+    rrf_k: int = 60,
+) -> RerankPlan:
+    """Split the halves' merged candidates into an agreed head and a tail to rerank."""
+    rrf_scores: Dict[Hashable, float] = {}
+    merged: Dict[Hashable, Dict[str, Any]] = {}
+    for results in (sparse_results, dense_results):
+        for rank, doc in enumerate(results):
+            key = candidate_key(doc)
+            rrf_scores[key] = rrf_scores.get(key, 0.0) + 1 / (rrf_k + rank + 1)
+            merged.setdefault(key, doc)
+
+    agreed = {candidate_key(doc) for doc in sparse_results[:top_k]} & {
+        candidate_key(doc) for doc in dense_results[:top_k]
+    }
+    # sorted() is stable: ties keep the sparse-then-dense order of _fuse().
+    ranked = sorted(merged, key=lambda key: -rrf_scores[key])
+    head = [_fused(merged[key], rrf_scores[key]) for key in ranked if key in agreed][:top_k]
+    rest = [_fused(merged[key], rrf_scores[key]) for key in ranked if key not in agreed]
+    tail = rest[: TAIL_FACTOR * (top_k - len(head))] if head else rest
+
+    if not tail:
+        decision = "skipped"
+    elif len(tail) == len(merged):
+        decision = "full"
+    else:
+        decision = "partial"
+    return RerankPlan(head, tail, len(merged), decision)
+
+
+class RerankTelemetry:
+    """Counts of adaptive rerank decisions and of the pairs they scored."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record(self, plan: RerankPlan) -> None:
+        with self._lock:
+            self.decisions[plan.decision] += 1
+            self.pairs_scored += len(plan.tail)
+            self.pairs_saved += plan.candidates - len(plan.tail)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = sum(self.decisions.values())
+            pairs = self.pairs_scored + self.pairs_saved
+            return {
+                "queries": queries,
+                **self.decisions,
+                "skip_rate": round(self.decisions["skipped"] / queries, 3) if queries else 0.0,
+                "pairs_scored": self.pairs_scored,
+                "pairs_saved": self.pairs_saved,
+                "pairs_saved_rate": round(self.pairs_saved / pairs, 3) if pairs else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self.decisions = {decision: 0 for decision in DECISIONS}
+            self.pairs_scored = 0
+            self.pairs_saved = 0
+
+
+_shared_telemetry: Optional[RerankTelemetry] = None
+_shared_lock = threading.Lock()
+
+
+def get_rerank_telemetry() -> RerankTelemetry:
+    """The process-wide adaptive rerank counters."""
+    global _shared_telemetry
+    with _shared_lock:
+        if _shared_telemetry is None:
+            _shared_telemetry = RerankTelemetry()
+        return _shared_telemetry
@@ -0,0 +1,74 @@
+"""Score-level fusion of the sparse and dense halves, without a cross-encoder.
+
+HybridRAG's default ("rerank") merges the two halves' top child_top_k lists
+and has the cross-encoder order them, which costs one forward pass per
+candidate. The other modes combine the halves' score arrays over the whole
+corpus instead: both halves index the same chunks in the same order (see
+HybridRAG.share_chunks), so position i of the BM25 array and of the cosine
+array is the same chunk and fusion is a few vectorized array operations.
+
+    rrf     reciprocal rank fusion of each half's top `depth` ranks
+    minmax  weighted sum of the scores, each rescaled to [0, 1]
+    zscore  weighted sum of the scores, each standardized
+
+`weight` is the sparse half's share; the dense half gets 1 - weight.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from common.ranking import top_k_indices
+
+FUSION_MODES = ("rerank", "rrf", "minmax", "zscore")
+
+
+def rrf(sparse: np.ndarray, dense: np.ndarray, k: int = 60, depth: int = 10) -> np.ndarray:
+    """1 / (k + rank) summed over the halves; chunks below `depth` in a half get nothing from it.
+
+    As in SparseRAG.retrieve(), chunks sharing no term with the query
+    (BM25 score 0) are not ranked by the sparse half at all.
+    """
+    fused = np.zeros(len(sparse), dtype=np.float64)
+    contributions = 1.0 / (k + np.arange(1, depth + 1, dtype=np.float64))
+    sparse_ranked = top_k_indices(sparse, depth)
+    sparse_ranked = sparse_ranked[sparse[sparse_ranked] > 0]
+    for ranked in (sparse_ranked, top_k_indices(dense, depth)):
+        fused[ranked] += contributions[: len(ranked)]
+    return fused
+
+
+def normalize(scores: np.ndarray, method: str) -> np.ndarray:
+    """Rescale `scores` ("minmax" to [0, 1], "zscore" to mean 0 and unit variance).
+
+    A constant array carries no ranking information and becomes all zeros.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if method == "minmax":
+        low, spread = scores.min(), np.ptp(scores)
+        return (scores - low) / spread if spread > 0 else np.zeros_like(scores)
+    if method == "zscore":
+        std = scores.std()
+        return (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+    raise ValueError(f"Unknown normalization '{method}'. Expected 'minmax' or 'zscore'.")
+
+
+def fuse(
+    mode: str, sparse: np.ndarray, dense: np.ndarray, weight: float = 0.5, k: int = 60, depth: int = 10
+) -> np.ndarray:
+    """One fused score per chunk for `mode` (any of FUSION_MODES but "rerank")."""
+    if len(sparse) != len(dense):
+        raise ValueError(f"Cannot fuse {len(sparse)} sparse scores with {len(dense)} dense scores.")
+    if len(sparse) == 0:
+        return np.zeros(0, dtype=np.float64)
+    if mode == "rrf":
+        return rrf(sparse, dense, k, depth)
+    return weight * normalize(sparse, mode) + (1.0 - weight) * normalize(dense, mode)
+
+
+def fused_top_k(
+    mode: str, sparse: np.ndarray, dense: np.ndarray, top_k: int, weight: float = 0.5, k: int = 60, depth: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(indices, fused scores) of the `top_k` best chunks, best first."""
+    fused = fuse(mode, sparse, dense, weight, k, depth)
+    top = top_k_indices(fused, top_k)
+    return top, fused[top]
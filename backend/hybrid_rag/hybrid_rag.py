@@ -1,17 +1,57 @@
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from collections import defaultdict
+from common.chunk_store import ChunkStore
+from common.ranking import top_k_indices
 from rag.base_rag import BaseRAG
 from sparse_rag.sparse_rag import SparseRAG
 from dense_rag.dense_rag import DenseRAG
 import numpy as np
-from sentence_transformers import CrossEncoder
+from hybrid_rag.adaptive import RerankTelemetry, plan_rerank
+from hybrid_rag.fusion import FUSION_MODES, fuse, fused_top_k
+from hybrid_rag.reranker import DEFAULT_BATCH_SIZE, RERANKER_BACKENDS, get_reranker_pool
+from hybrid_rag.score_cache import RerankScoreCache
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Threads that run the dense half of hybrid retrievals, shared by every
+# engine in the process: one per hybrid query in flight.
+RETRIEVAL_THREADS = 16
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_lock = threading.Lock()
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """The process-wide pool for the dense half of hybrid retrieval, started on first use."""
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=RETRIEVAL_THREADS, thread_name_prefix="hybrid-dense"
+                )
+    return _retrieval_executor
+
 
 class HybridRAG(BaseRAG):
+    # Class-level defaults for engines assembled without __init__.
+    parallel_retrieval: bool = True
+    rerank_batch_size: int = DEFAULT_BATCH_SIZE
+    rerank_cache: Optional[RerankScoreCache] = None
+    fusion: str = "rerank"
+    fusion_weight: float = 0.5
+    adaptive_rerank: bool = False
+    rerank_telemetry: Optional[RerankTelemetry] = None
+
+    @property
+    def updates_in_place(self) -> bool:
+        return self.sparse_engine.updates_in_place and self.dense_engine.updates_in_place
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initializes Hybrid RAG by creating both Sparse and Dense sub-engines.
@@ -21,6 +61,31 @@ class HybridRAG(BaseRAG):
         - rrf_k: (int) The constant 'k' for RRF algorithm (default 60).
         - child_top_k: (int) How many docs to fetch from sub-engines before fusion.
                        Usually higher than top_k (e.g., fetch 10 from each to find the best 3).
+        - parallel_retrieval: (bool) Run the dense half (an embeddings API
+                       call, then the vector search) on a pool thread while
+                       BM25 scores in the calling thread (default True).
+        - reranker_batch_size: (int) Pairs per cross-encoder forward pass.
+        - reranker_max_length: (int) Tokens per (query, chunk) pair; longer
+                       pairs are truncated. None keeps the model's limit.
+        - reranker_backend: (str) "torch" (default), "onnx" or "onnx-int8":
+                       the ONNX Runtime ones export the model on first use
+                       (see hybrid_rag.onnx_reranker).
+        - reranker_threads: (int) ONNX Runtime intra-op threads; None lets
+                       it use every core.
+        - rerank_cache: (RerankScoreCache) Optional shared cache of
+                       cross-encoder scores (see hybrid_rag.score_cache).
+        - fusion: (str) "rerank" (default) has the cross-encoder order the
+                       halves' merged candidates; "rrf", "minmax" and
+                       "zscore" fuse the halves' scores over the whole
+                       corpus and skip the cross-encoder (see
+                       hybrid_rag.fusion).
+        - fusion_weight: (float) The sparse half's share of a "minmax" or
+                       "zscore" fusion (default 0.5).
+        - adaptive_rerank: (bool) In "rerank" fusion, keep the chunks both
+                       halves rank in their top_k without reranking them
+                       and rerank only the rest (see hybrid_rag.adaptive).
+        - rerank_telemetry: (RerankTelemetry) Where adaptive reranking
+                       counts its decisions.
         """
         super().__init__(config)
 
@@ -28,32 +93,189 @@ class HybridRAG(BaseRAG):
         self.child_top_k = config.get("child_top_k", 10)
         self.rrf_k = config.get("rrf_k", 60)
         self.reranker_model = config.get("reranker_model", "cross-encoder/ms-marco-MiniLM-L6-v2")
+        self.parallel_retrieval = bool(config.get("parallel_retrieval", True))
+        self.rerank_batch_size = int(config.get("reranker_batch_size", DEFAULT_BATCH_SIZE))
+        self.reranker_max_length = config.get("reranker_max_length")
+        self.reranker_backend = config.get("reranker_backend", "torch")
+        if self.reranker_backend not in RERANKER_BACKENDS:
+            raise ValueError(
+                f"Unknown reranker_backend '{self.reranker_backend}'. Expected one of {RERANKER_BACKENDS}."
+            )
+        self.reranker_threads = config.get("reranker_threads")
+        self.rerank_cache = config.get("rerank_cache")
+        self.fusion = config.get("fusion", "rerank")
+        if self.fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion '{self.fusion}'. Expected one of {FUSION_MODES}.")
+        self.fusion_weight = float(config.get("fusion_weight", 0.5))
+        self.adaptive_rerank = bool(config.get("adaptive_rerank", False))
+        self.rerank_telemetry = config.get("rerank_telemetry")
 
         print(f"Initializing Hybrid Engine (fetching top {self.child_top_k} from children)...")
         self.sparse_engine = SparseRAG(config)
         self.dense_engine = DenseRAG(config)
 
-        self._cross_encoder = CrossEncoder(self.reranker_model)
+        # Shared with every other Hybrid engine using the same model, and
+        # loaded on the first rerank rather than here: see hybrid_rag.reranker.
+        pool = config.get("reranker_pool")
+        if pool is None:
+            pool = get_reranker_pool()
+        self._cross_encoder = pool.get(
+            self.reranker_model, self.reranker_max_length, self.reranker_backend, self.reranker_threads
+        )
 
         self.document_metadata = []
 
     def index_documents(self, documents: List[str]) -> None:
-        self.sparse_engine.index_documents(documents)
-        self.dense_engine.index_documents(documents)
-        self._documents = documents
-        self.document_metadata = [{"chunk_id": doc.get("chunk_id")} for doc in documents]
+        timings = {}
+        for name, engine in (("sparse", self.sparse_engine), ("dense", self.dense_engine)):
+            start = time.perf_counter()
+            engine.index_documents(documents)
+            timings[name] = time.perf_counter() - start
+            timings.update({f"{name}.{stage}": seconds for stage, seconds in engine.index_timings.items()})
+        self.index_timings = timings
+        self.share_chunks()
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        self.sparse_engine.add_documents(documents)
+        self.dense_engine.add_documents(documents)
+        self.share_chunks()
+
+    def remove_documents(self, chunk_ids) -> None:
+        self.sparse_engine.remove_documents(chunk_ids)
+        self.dense_engine.remove_documents(chunk_ids)
+        self.share_chunks()
+
+    def share_chunks(self, store: Optional[ChunkStore] = None) -> Optional[ChunkStore]:
+        """Point both halves at one ChunkStore of the indexed chunks.
+
+        Each half keeps its own list after indexing, so the chunk texts
+        would otherwise be held (and saved) twice. `store` is one already
+        loaded; by default it is built from the sparse half. Returns the
+        shared store, or None if the halves do not hold the same chunks.
+        """
+        sparse, dense = self.sparse_engine, self.dense_engine
+        if store is None:
+            store = ChunkStore.from_documents(sparse.documents, sparse.document_metadata)
+        if len(dense.documents) != len(store) or dense.indexed_chunk_ids() != store.metadata.chunk_ids():
+            logger.warning("Hybrid halves indexed different chunks; keeping a copy in each.")
+            self.document_metadata = list(sparse.document_metadata)
+            return None
+        for engine in (sparse, dense):
+            engine.documents = store
+            engine.document_metadata = store.metadata
+        self.document_metadata = store.metadata
+        return store
+
+    def indexed_chunk_ids(self) -> List[Any]:
+        return self.sparse_engine.indexed_chunk_ids()
+
+    def _clear_index(self) -> None:
+        super()._clear_index()
+        self.sparse_engine = self.sparse_engine.spawn()
+        self.dense_engine = self.dense_engine.spawn()
+
+    def copy_run_settings(self, template: "HybridRAG") -> None:
+        self.final_top_k = template.final_top_k
+        self.child_top_k = template.child_top_k
+        self.sparse_engine.copy_run_settings(template.sparse_engine)
+        self.dense_engine.copy_run_settings(template.dense_engine)
+
+    def warm_up(self) -> None:
+        self.sparse_engine.warm_up()
+        self.dense_engine.warm_up()
+        self._cross_encoder.load()
+
+    def index_nbytes(self) -> int:
+        total = self.sparse_engine.index_nbytes() + self.dense_engine.index_nbytes()
+        shared = self.sparse_engine.documents
+        if isinstance(shared, ChunkStore) and shared is self.dense_engine.documents:
+            total -= shared.nbytes
+        return total
 
     def retrieve(self, query: str) -> List[str]:
         """
         1. Get ranked results from Sparse (Keywords).
-        2. Get ranked results from Dense (Semantics).
+        2. Get ranked results from Dense (Semantics), concurrently.
         3. Deduplicate candidates.
         4. Rerank with CrossEncoder and return top_k.
+
+        With a score-level `fusion` mode, steps 1-4 become: score every
+        chunk in both halves, fuse the two arrays, return the top_k.
         """
         print(f"--- Hybrid Retrieval for: '{query}' ---")
 
-        sparse_results = self.sparse_engine.retrieve(query)
-        dense_results = self.dense_engine.retrieve(query)
+        if self._fuses_scores():
+            sparse_scores, dense_scores = self._retrieve_both(
+                self.sparse_engine.score_all, self.dense_engine.score_all, query
+            )
+            return self._fused_results(sparse_scores, dense_scores)
+
+        sparse_results, dense_results = self._retrieve_both(
+            self.sparse_engine.retrieve, self.dense_engine.retrieve, query
+        )
+        return self._fuse(query, sparse_results, dense_results)
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """retrieve() for several queries; the sparse half is scored as one batch."""
+        if self._fuses_scores():
+            sparse_scores, dense_scores = self._retrieve_both(
+                self.sparse_engine.score_all_batch,
+                lambda batch: [self.dense_engine.score_all(query) for query in batch],
+                queries,
+            )
+            return [self._fused_results(*pair) for pair in zip(sparse_scores, dense_scores)]
+
+        sparse_batch, dense_batch = self._retrieve_both(
+            self.sparse_engine.retrieve_batch, self.dense_engine.retrieve_batch, queries
+        )
+        return [
+            self._fuse(query, sparse_results, dense_results)
+            for query, sparse_results, dense_results in zip(queries, sparse_batch, dense_batch)
+        ]
+
+    def _fuses_scores(self) -> bool:
+        """Whether to use the score-level `fusion` mode for this query.
+
+        It pairs the halves' score arrays position by position, so both must
+        index the same chunks in the same order, as they do when
+        share_chunks() gave them one store. Halves that differ (share_chunks
+        found a mismatch) are fused by reranking instead.
+        """
+        if self.fusion == "rerank":
+            return False
+        sparse, dense = self.sparse_engine, self.dense_engine
+        if sparse.documents is dense.documents:
+            return True
+        if len(sparse.documents) == len(dense.documents) and sparse.indexed_chunk_ids() == dense.indexed_chunk_ids():
+            return True
+        logger.warning(f"Hybrid halves indexed different chunks; reranking instead of '{self.fusion}' fusion.")
+        return False
+
+    def _retrieve_both(self, sparse: Callable[[Any], Any], dense: Callable[[Any], Any], arg: Any) -> Tuple[Any, Any]:
+        """(sparse(arg), dense(arg)), the dense call on a pool thread.
+
+        The dense half waits on the network and the sparse half on numpy,
+        and both release the GIL, so the latency is the slower of the two
+        rather than their sum. The results are returned in a fixed order, so
+        fusion sees the same candidate list as when they ran one after the
+        other.
+        """
+        if not self.parallel_retrieval:
+            return sparse(arg), dense(arg)
+        dense_future = get_retrieval_executor().submit(dense, arg)
+        try:
+            sparse_results = sparse(arg)
+        except BaseException:
+            dense_future.cancel()
+            raise
+        return sparse_results, dense_future.result()
+
+    def _fuse(
+        self, query: str, sparse_results: List[Dict[str, Any]], dense_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Deduplicate both candidate lists and keep the reranked top_k."""
+        if self.adaptive_rerank:
+            return self._fuse_adaptively(query, sparse_results, dense_results)
 
         seen: set = set()
         candidates: List[Dict[str, Any]] = []
@@ -66,17 +288,59 @@ class HybridRAG(BaseRAG):
         reranked = self._rerank(query, candidates)
         return reranked[: self.final_top_k]
 
+    def _fuse_adaptively(
+        self, query: str, sparse_results: List[Dict[str, Any]], dense_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """The chunks both halves agree on, then the reranked tail.
+
+        Every result has its RRF score as `fused_score`. `score` stays the
+        cross-encoder relevance, as in the plain rerank mode, so only the
+        reranked tail has one; the head was kept without a forward pass.
+        """
+        plan = plan_rerank(sparse_results, dense_results, self.final_top_k, self.rrf_k)
+        if self.rerank_telemetry is not None:
+            self.rerank_telemetry.record(plan)
+        reranked = self._rerank(query, plan.tail) if plan.tail else []
+        return (plan.head + reranked)[: self.final_top_k]
+
+    def _fuse_arrays(self, sparse_scores: np.ndarray, dense_scores: np.ndarray, top_k: int):
+        """(indices, scores) of the `top_k` best chunks under `fusion`.
+
+        A half that returned nothing (the query could not be embedded, say)
+        leaves the other half's ranking as it is.
+        """
+        if len(dense_scores) == 0 or len(sparse_scores) == 0:
+            scores = np.asarray(sparse_scores if len(sparse_scores) else dense_scores, dtype=np.float64)
+            top = top_k_indices(scores, top_k)
+            return top, scores[top]
+        return fused_top_k(
+            self.fusion, sparse_scores, dense_scores, top_k,
+            weight=self.fusion_weight, k=self.rrf_k, depth=self.child_top_k,
+        )
+
+    def _fused_results(self, sparse_scores: np.ndarray, dense_scores: np.ndarray) -> List[Dict[str, Any]]:
+        """The top_k chunk dicts of a score-level fusion, keyed by chunk index."""
+        top, scores = self._fuse_arrays(sparse_scores, dense_scores, self.final_top_k)
+        if self.fusion == "rrf":
+            # A chunk neither half ranked has no RRF score at all.
+            keep = scores > 0
+            top, scores = top[keep], scores[keep]
+        documents, metadata = self.sparse_engine.documents, self.sparse_engine.document_metadata
+        return [
+            {"text": documents[i], "chunk_id": metadata[i].get("chunk_id"), "score": float(score)}
+            for i, score in zip(top.tolist(), scores.tolist())
+        ]
+
     def _rerank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Rerank candidate chunk dicts with the cross-encoder.
 
         Keeps the {text, chunk_id, score} contract shared by all engines —
-        `score` is replaced with the cross-encoder relevance score.
+        `score` is set to the cross-encoder relevance score.
         """
         if not candidates:
             return []
         try:
-            pairs = [(query, doc["text"]) for doc in candidates]
-            scores = self._cross_encoder.predict(pairs)
+            scores = self._score(query, candidates)
             ranked = np.argsort(scores)[::-1]
             return [
                 {**candidates[i], "score": float(scores[i])}
@@ -86,13 +350,49 @@ class HybridRAG(BaseRAG):
             logger.error(f"Reranking error: {exc}")
             return candidates
 
+    def _score(self, query: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        """Cross-encoder score of each candidate; cached scores are not predicted again."""
+        chunk_ids = [doc.get("chunk_id") for doc in candidates]
+        model = self._cross_encoder.name
+        cache = self.rerank_cache
+        cached = cache.get_many(model, query, chunk_ids) if cache is not None else [None] * len(candidates)
+        scores = np.array([np.nan if score is None else score for score in cached], dtype=np.float64)
+
+        missing = [i for i, score in enumerate(cached) if score is None]
+        if missing:
+            # Longest first, so each batch pads to pairs of about its own length.
+            missing.sort(key=lambda i: len(candidates[i]["text"]), reverse=True)
+            predicted = self._cross_encoder.predict(
+                [(query, candidates[i]["text"]) for i in missing], batch_size=self.rerank_batch_size
+            )
+            scores[missing] = np.asarray(predicted, dtype=np.float32)
+            if cache is not None:
+                cache.put_many(model, query, [chunk_ids[i] for i in missing], scores[missing])
+        return scores
+
     def get_retrieved_scores(self, query: str) -> Dict[str, Any]:
         """
         Returns the RRF scores for all documents given a query.
         Useful for evaluation purposes.
+
+        With a score-level `fusion` mode, the fused score of every chunk
+        instead, as a list in index order (like SparseRAG's).
         """
-        sparse_results = self.sparse_engine.retrieve(query)
-        dense_results = self.dense_engine.retrieve(query)
+        if self._fuses_scores():
+            sparse_scores, dense_scores = self._retrieve_both(
+                self.sparse_engine.score_all, self.dense_engine.score_all, query
+            )
+            if len(sparse_scores) == 0 or len(dense_scores) == 0:
+                return {"scores": np.asarray(sparse_scores if len(sparse_scores) else dense_scores).tolist()}
+            fused = fuse(
+                self.fusion, sparse_scores, dense_scores,
+                weight=self.fusion_weight, k=self.rrf_k, depth=self.child_top_k,
+            )
+            return {"scores": fused.tolist()}
+
+        sparse_results, dense_results = self._retrieve_both(
+            self.sparse_engine.retrieve, self.dense_engine.retrieve, query
+        )
 
         doc_scores = defaultdict(float)
 
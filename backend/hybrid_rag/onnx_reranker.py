@@ -0,0 +1,118 @@
+"""Cross-encoders on ONNX Runtime, optionally int8-quantized, for CPU serving.
+
+The PyTorch CrossEncoder dominates Hybrid latency on CPU-only hosts. The
+"onnx" backend runs the same weights on ONNX Runtime; "onnx-int8"
+additionally quantizes the linear layers to int8 (dynamic quantization, no
+calibration data) for the instruction set this CPU has. Both go through
+sentence-transformers' own backend support, which needs
+`pip install "sentence-transformers[onnx]"` (optimum + onnxruntime).
+
+Exporting and quantizing take a while and need the PyTorch weights, so the
+result is written once under RERANKER_ONNX_DIR, one directory per model and
+quantization target, and loaded from there by every later process.
+ONNX Runtime sizes its own thread pool; `threads` caps it, so several
+serving processes on one host do not oversubscribe the cores.
+
+benchmarks/reranker_backends.py compares latency and ranking agreement with
+the PyTorch path.
+"""
+import logging
+import os
+import platform
+from typing import Any, Optional
+
+from common.index_store import atomic_index_dir
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILE = "onnx/model.onnx"
+QUANTIZATION_TARGETS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def quantization_target() -> str:
+    """The int8 quantization config that suits this CPU (see QUANTIZATION_TARGETS)."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line.split(":", 1)[1].split() for line in f if line.startswith("flags")), [])
+    except OSError:
+        flags = []
+    if "avx512_vnni" in flags or "avx512vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def quantized_file(target: str) -> str:
+    return f"onnx/model_int8_{target}.onnx"
+
+
+def export_dir(model_name: str, quantize: bool, root: Optional[str] = None) -> str:
+    """Where the exported model for `model_name` lives under `root` (RERANKER_ONNX_DIR)."""
+    if root is None:
+        from django.conf import settings
+
+        root = settings.RERANKER_ONNX_DIR
+    variant = f"int8-{quantization_target()}" if quantize else "fp32"
+    return os.path.join(root, model_name.replace("/", "--"), variant)
+
+
+def model_file(model_name: str, quantize: bool, root: Optional[str] = None) -> str:
+    """The .onnx file load_onnx_cross_encoder() runs for `model_name`."""
+    file_name = quantized_file(quantization_target()) if quantize else ONNX_FILE
+    return os.path.join(export_dir(model_name, quantize, root), file_name)
+
+
+def session_options(threads: Optional[int]) -> Any:
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = int(threads)
+        options.inter_op_num_threads = 1
+    return options
+
+
+def load_onnx_cross_encoder(
+    model_name: str,
+    max_length: Optional[int] = None,
+    quantize: bool = True,
+    threads: Optional[int] = None,
+    root: Optional[str] = None,
+) -> Any:
+    """A CrossEncoder running `model_name` on ONNX Runtime, exported on first use."""
+    from sentence_transformers import CrossEncoder
+
+    path = export_dir(model_name, quantize, root)
+    file_path = model_file(model_name, quantize, root)
+    if not os.path.exists(file_path):
+        export(model_name, path, quantize)
+
+    return CrossEncoder(
+        path,
+        max_length=max_length,
+        backend="onnx",
+        local_files_only=True,
+        model_kwargs={
+            "file_name": os.path.relpath(file_path, path),
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options(threads),
+        },
+    )
+
+
+def export(model_name: str, path: str, quantize: bool) -> None:
+    """Export `model_name` to ONNX (and quantize it) into `path`, atomically."""
+    from sentence_transformers import CrossEncoder
+
+    logger.info(f"Exporting cross-encoder {model_name} to ONNX{' (int8)' if quantize else ''} in {path}...")
+    with atomic_index_dir(path) as scratch:
+        model = CrossEncoder(model_name, backend="onnx")
+        model.save_pretrained(scratch)
+        if quantize:
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+
+            target = quantization_target()
+            export_dynamic_quantized_onnx_model(model, target, scratch, file_suffix=f"int8_{target}")
@@ -0,0 +1,199 @@
+"""Cross-encoder rerankers: loaded on first use, one copy per model per process.
+
+Importing sentence_transformers pulls in torch and transformers (several
+seconds), and constructing a CrossEncoder loads the model weights. Neither
+belongs in process startup: most requests in a worker never reach Hybrid
+retrieval. LazyCrossEncoder defers both to the first predict() call; the
+warm_engines management command forces them ahead of traffic instead.
+
+Every HybridRAG used to build its own CrossEncoder, so each Hybrid engine in
+a process carried another copy of the same weights. RerankerPool hands out one
+LazyCrossEncoder per model name instead, and reports what the loaded models
+hold (see stats()). With `dedicated_thread`, each model's predictions run on
+one inference thread of its own, so concurrent requests queue for the model
+instead of competing for torch's intra-op threads.
+
+`backend` picks the runtime: "torch" (sentence-transformers' default), or
+"onnx" / "onnx-int8" for ONNX Runtime, the latter int8-quantized (see
+hybrid_rag.onnx_reranker). If an ONNX model cannot be loaded, the PyTorch
+one is used instead.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# sentence-transformers' own default.
+DEFAULT_BATCH_SIZE = 32
+RERANKER_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def load_cross_encoder(model_name: str, max_length: Optional[int] = None) -> Any:
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=max_length)
+
+
+def model_nbytes(model: Any) -> int:
+    """Bytes held by a loaded model's weights and buffers (0 if it cannot say)."""
+    module = getattr(model, "model", model)
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+    except Exception:
+        return 0
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class LazyCrossEncoder:
+    """A CrossEncoder that is only built when something first scores with it.
+
+    Engines spawned from one template (see BaseRAG.spawn) share the same
+    LazyCrossEncoder, so the model is loaded once whichever engine asks first.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dedicated_thread: bool = False,
+        max_length: Optional[int] = None,
+        backend: str = "torch",
+        threads: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.backend = backend
+        self.threads = threads
+        self.dedicated_thread = dedicated_thread
+        self.nbytes = 0
+        self.load_seconds = 0.0
+        self._model = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """The model name, qualified by what changes its scores: max_length and the backend."""
+        name = self.model_name if self.max_length is None else f"{self.model_name}@{self.max_length}"
+        return name if self.backend == "torch" else f"{name} ({self.backend})"
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = self._load_model()
+                    self.load_seconds = time.perf_counter() - start
+                    if self.dedicated_thread:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=1, thread_name_prefix=f"reranker-{self.name}"
+                        )
+                    self._model = model
+                    logger.info(
+                        f"Loaded cross-encoder {self.name} in {self.load_seconds:.1f}s "
+                        f"({self.nbytes / 2**20:.1f} MiB)."
+                    )
+        return self._model
+
+    def _load_model(self) -> Any:
+        if self.backend != "torch":
+            from hybrid_rag.onnx_reranker import load_onnx_cross_encoder, model_file
+
+            quantize = self.backend == "onnx-int8"
+            try:
+                model = load_onnx_cross_encoder(
+                    self.model_name, max_length=self.max_length, quantize=quantize, threads=self.threads
+                )
+                self.nbytes = os.path.getsize(model_file(self.model_name, quantize))
+                return model
+            except Exception as e:
+                logger.error(f"Cross-encoder {self.name} unavailable, using PyTorch: {e}")
+                self.backend = "torch"
+        model = load_cross_encoder(self.model_name, max_length=self.max_length)
+        self.nbytes = model_nbytes(model)
+        return model
+
+    @property
+    def model(self) -> Any:
+        return self.load()
+
+    def predict(self, pairs, **kwargs):
+        model = self.load()
+        if self._executor is not None:
+            return self._executor.submit(model.predict, pairs, **kwargs).result()
+        return model.predict(pairs, **kwargs)
+
+
+class RerankerPool:
+    """One LazyCrossEncoder per model name (and max_length, backend and
+    threads), shared by every HybridRAG."""
+
+    def __init__(self, dedicated_thread: bool = False):
+        self.dedicated_thread = dedicated_thread
+        self._models: Dict[Tuple[str, Optional[int], str, Optional[int]], LazyCrossEncoder] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model_name: str,
+        max_length: Optional[int] = None,
+        backend: str = "torch",
+        threads: Optional[int] = None,
+    ) -> LazyCrossEncoder:
+        key = (model_name, max_length, backend, threads)
+        with self._lock:
+            reranker = self._models.get(key)
+            if reranker is None:
+                reranker = self._models[key] = LazyCrossEncoder(
+                    model_name,
+                    dedicated_thread=self.dedicated_thread,
+                    max_length=max_length,
+                    backend=backend,
+                    threads=threads,
+                )
+            return reranker
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(reranker.nbytes for reranker in self._models.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": {
+                    reranker.name: {
+                        "loaded": reranker.loaded,
+                        "nbytes": reranker.nbytes,
+                        "load_seconds": round(reranker.load_seconds, 3),
+                    }
+                    for reranker in self._models.values()
+                },
+                "nbytes": sum(reranker.nbytes for reranker in self._models.values()),
+            }
+
+
+_shared_pool: Optional[RerankerPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_reranker_pool() -> RerankerPool:
+    """The process-wide reranker pool, configured by settings.RERANKER_INFERENCE_THREAD."""
+    global _shared_pool
+    from django.conf import settings
+
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = RerankerPool(getattr(settings, "RERANKER_INFERENCE_THREAD", False))
+        return _shared_pool
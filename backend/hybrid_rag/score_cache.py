@@ -0,0 +1,98 @@
+"""In-process LRU of cross-encoder scores.
+
+A deep analysis reranks the same optimized query over the same candidates
+once per LLM variant of the Hybrid method, and users repeat questions.
+A cross-encoder score depends only on the model, the query and the chunk
+text, and a chunk's text never changes under its id (re-chunking creates
+new Chunk rows), so RerankScoreCache keeps recent scores keyed by
+(model, query digest, chunk_id). Candidates without a chunk_id are always
+scored.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from dense_rag.query_cache import normalize_query
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+Key = Tuple[str, str, Hashable]
+
+
+class RerankScoreCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = int(max_entries)
+        self._entries: "OrderedDict[Key, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def query_digest(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, query: str, chunk_ids: Sequence[Hashable]) -> List[Optional[float]]:
+        """The cached score of each chunk, None where there is none."""
+        digest = self.query_digest(query)
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                key = (model, digest, chunk_id)
+                score = self._entries.get(key) if chunk_id is not None else None
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, model: str, query: str, chunk_ids: Sequence[Hashable], scores: Sequence[float]) -> None:
+        digest = self.query_digest(query)
+        with self._lock:
+            for chunk_id, score in zip(chunk_ids, scores):
+                if chunk_id is None:
+                    continue
+                key = (model, digest, chunk_id)
+                self._entries[key] = float(score)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_shared_cache: Optional[RerankScoreCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_rerank_score_cache() -> Optional[RerankScoreCache]:
+    """The process-wide score cache configured in settings, or None if disabled."""
+    global _shared_cache
+    from django.conf import settings
+
+    max_entries = getattr(settings, "RERANK_SCORE_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+    if max_entries <= 0:
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = RerankScoreCache(max_entries)
+        return _shared_cache
@@ -1,14 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from router.models import Document, GuestUser
+from contextlib import contextmanager
+from typing import Awaitable, Callable, List, Dict, Any, Iterator, Optional, Tuple
+from asgiref.sync import sync_to_async
+from router.models import Conversation, Document, GuestUser
 from router.models import Job
 import logging
+import threading
+import time
 from ai_handler.llm import OpenAILLM, GeminiLLM, ClaudeLLM
 import os
 import glob
 import hashlib
 import json
+import uuid
 from evaluation.models import Chunk
+from common.index_cache import get_index_cache
+from common.index_store import INDEX_DIR_SUFFIX
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +30,276 @@ class BasePipeline(ABC):
         self.config = config
         self.llm = None         
         self.reranker = None    
+        self._rag = None
+        # Per-thread engine while a request holds a cached index; see rag.
+        self._local = threading.local()
+        # Shared by every pipeline in RAGRegistry, so LLM variants of a
+        # method reuse each other's loaded indexes.
+        self.index_cache = config.get("index_cache")
+        if self.index_cache is None:
+            self.index_cache = get_index_cache()
+
+    @property
+    def rag(self):
+        """The retrieval engine this thread should use.
+
+        Inside _using_index() that is the cached engine holding the request's
+        document; everywhere else it is the template engine the pipeline was
+        built with, which only ever serves as the prototype for spawn().
+        """
+        engine = getattr(self._local, "engine", None)
+        return engine if engine is not None else self._rag
+
+    @rag.setter
+    def rag(self, engine):
+        self._rag = engine
+
+    @contextmanager
+    def _active_engine(self, engine) -> Iterator[None]:
+        previous = getattr(self._local, "engine", None)
+        self._local.engine = engine
+        try:
+            yield
+        finally:
+            self._local.engine = previous
+
+    def _index_key(self, document: Document) -> tuple:
+        return (document.pk, self.method, self._get_config_hash())
+
+    @contextmanager
+    def _using_index(self, document: Document, job=None) -> Iterator[Any]:
+        """Run the block with self.rag holding `document`'s index.
+
+        The engine comes from the index cache. On a miss, a fresh engine is
+        spawned from the template and _prepare_index() loads (or builds) the
+        index into it. Per-run settings such as top_k are copied from the
+        template on every use, so apply_retrieval_depth() keeps working.
+        """
+        def load():
+            engine = self._rag.spawn()
+            with self._active_engine(engine):
+                self._prepare_index(document, job)
+            return engine
+
+        def is_current(engine) -> bool:
+            return self._index_is_current(document, engine)
+
+        with self.index_cache.acquire(self._index_key(document), load, is_current) as engine:
+            engine.copy_run_settings(self._rag)
+            with self._active_engine(engine):
+                yield engine
+
+    def _index_is_current(self, document: Document, engine) -> bool:
+        """Whether `engine` still holds `document`'s ready index. Another
+        process catching the index up saves a new version and deletes the
+        one this process may have cached."""
+        from router.models import DocumentVector
+
+        if engine.index_location is None:
+            return True
+        location = (
+            DocumentVector.objects.filter(document=document, status="ready", method=self.method)
+            .values_list("vectorstore_location", flat=True)
+            .last()
+        )
+        return location == engine.index_location
+
+    @contextmanager
+    def loaded_index(self, username: str) -> Iterator[Any]:
+        """Run the block with self.rag holding `username`'s latest document's index."""
+        document = self.get_document(username)
+        if not document:
+            raise ValueError(f"No document found for user: {username}")
+        with self._using_index(document) as engine:
+            yield engine
+
+    @staticmethod
+    def _report_progress(job, progress: int) -> None:
+        if job:
+            job.progress = progress
+            job.save()
+
+    @staticmethod
+    def _report_timings(job, timings: Dict[str, float]) -> None:
+        """Add seconds per stage to the job's breakdown (Job.timings)."""
+        if job and timings:
+            job.timings = {**(job.timings or {}), **{stage: round(s, 3) for stage, s in timings.items()}}
+            job.save(update_fields=["timings", "updated_at"])
+
+    @contextmanager
+    def _stage(self, job, name: str) -> Iterator[None]:
+        """Time the block as indexing stage `name` and report it to `job`."""
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        logger.info(f"{self.method} {name}: {seconds:.2f}s")
+        self._report_timings(job, {name: seconds})
+
+    def _index_chunks(self, chunks: List[Dict[str, Any]], job=None) -> None:
+        """Index `chunks` into self.rag, reporting the engine's own stages
+        (e.g. index.tokenize) alongside the total."""
+        self.rag.index_location = None
+        with self._stage(job, "index"):
+            self.rag.index_documents(chunks)
+        self._report_timings(job, {f"index.{stage}": seconds for stage, seconds in self.rag.index_timings.items()})
+
+    def _prepare_index(self, document: Document, job=None) -> None:
+        """Load `document`'s saved index into self.rag, or build and save one."""
+        from router.models import DocumentVector
+
+        doc_vector = DocumentVector.objects.filter(
+            document=document,
+            status="ready",
+            method=self.method,
+        ).last()
+
+        if doc_vector:
+            logger.info("Existing index found. Loading into memory.")
+            self._report_progress(job, 80)
+
+            with self._stage(job, "load_index"):
+                loaded = self._load_index(doc_vector.vectorstore_location)
+            if loaded:
+                self._catch_up(document, job)
+                return
+
+            logger.warning("Corrupt or missing index. Deleting record and re-indexing...")
+            self._discard_bad_index(doc_vector)
+
+        self._report_progress(job, 20)
+        self._build_index(document.user.username, document, job)
+        self._report_progress(job, 90)
+
+    def _save_new_index(self, username: str, document: Document, job=None) -> str:
+        """Save self.rag under a fresh path and record it as the document's
+        ready index. Returns the path."""
+        from router.models import DocumentVector, VectorStore
+
+        file_name = f"{username}_{document.pk}_{self.method}_{uuid.uuid4().hex[:6]}{INDEX_DIR_SUFFIX}"
+        save_path = os.path.join(self.vector_store_root, file_name)
+
+        with self._stage(job, "save"):
+            self._save_state(save_path)
+        self.rag.index_location = save_path
+
+        vs, _ = VectorStore.objects.get_or_create(base_path=self.vector_store_root)
+
+        DocumentVector.objects.create(
+            document=document,
+            vectorstore=vs,
+            vectorstore_location=save_path,
+            document_location=document.extracted_text_path,
+            status="ready",
+            method=self.method
+        )
+        return save_path
+
+    def _catch_up(self, document: Document, job=None) -> bool:
+        """Apply the document's chunk changes to the loaded index in self.rag.
+
+        _sync_chunks replaces a document's Chunk rows whenever its text is
+        re-chunked (refresh_index(), or another method rebuilding), and a
+        saved index still lists the old ones. Only the difference is indexed:
+        stale chunks are removed and new ones embedded or tokenized, unless
+        most of the document changed or the engine cannot update in place,
+        in which case it is rebuilt; so is one whose in-place update fails.
+        The chunk ids are compared first; texts are read only for the chunks
+        that get indexed. The result is saved as a new index version and the
+        old one deleted. Returns whether anything changed.
+        """
+        from router.models import DocumentVector
+
+        indexed = self.rag.indexed_chunk_ids()
+        if None in indexed:
+            return False
+        chunks = Chunk.objects.filter(document=document, config_hash=self._get_config_hash()).order_by("id")
+        current_ids = list(chunks.values_list("id", flat=True))
+        if not current_ids:
+            return False
+
+        indexed_ids = set(indexed)
+        stale = indexed_ids.difference(current_ids)
+        added_ids = [chunk_id for chunk_id in current_ids if chunk_id not in indexed_ids]
+        if not stale and not added_ids:
+            return False
+
+        logger.info(f"{self.method} index is behind the chunks: -{len(stale)} +{len(added_ids)}.")
+        previous = DocumentVector.objects.filter(document=document, status="ready", method=self.method).last()
+        rebuild = not self.rag.updates_in_place or len(added_ids) * 2 > len(current_ids)
+        with self._stage(job, "update_index"):
+            if not rebuild:
+                try:
+                    self.rag.remove_documents(stale)
+                    self.rag.add_documents([
+                        {"text": text, "chunk_id": chunk_id}
+                        for chunk_id, text in chunks.filter(id__in=added_ids).values_list("id", "text")
+                    ])
+                except Exception as e:
+                    logger.warning(f"Updating the {self.method} index in place failed ({e}); rebuilding it.")
+                    rebuild = True
+            if rebuild:
+                logger.info(f"Rebuilding the {self.method} index: most of the document changed or it cannot update in place.")
+                self.rag.index_documents(
+                    [{"text": text, "chunk_id": chunk_id} for chunk_id, text in chunks.values_list("id", "text")]
+                )
+
+        self._save_new_index(document.user.username, document, job)
+        if previous:
+            # Engines cached for the old version (other LLM variants of this
+            # method) must not outlive its files.
+            self.index_cache.discard_location(previous.vectorstore_location)
+            self._discard_bad_index(previous)
+        return True
+
+    def refresh_index(self, username: str, job=None) -> bool:
+        """Re-read the user's latest document and bring its index up to date.
+
+        The text is re-chunked and synced to the Chunk table, then the index
+        is loaded (or taken from the index cache) and caught up: editing or
+        re-chunking a document only pays for the chunks that changed.
+        """
+        document = self.get_document(username)
+        if not document:
+            raise ValueError(f"No document found for user: {username}")
+        if not document.extracted_text_path:
+            raise ValueError("Document has no text source path.")
+
+        with self._stage(job, "load_text"):
+            raw_text = self.loader.load(document.extracted_text_path)
+        with self._stage(job, "chunk"):
+            chunks = self.chunker.chunk(raw_text)
+        with self._stage(job, "store_chunks"):
+            self._sync_chunks(document, chunks)
+
+        with self._using_index(document, job):
+            self._catch_up(document, job)
+        return True
+
+    def init(self, username: str) -> bool:
+        """
+        Prepares the user's index:
+        1. Checks DB for existing ready index.
+        2. If missing, loads text, chunks, indexes, and saves to disk.
+        3. Keeps it loaded in the index cache for the requests that follow.
+        """
+        return self.init_job(username)
+
+    def init_job(self, username: str, job=None) -> bool:
+        """
+        init() with optional job progress tracking (for websocket updates).
+        """
+        logger.info(f"Initializing {self.method} RAG for {username}...")
+        self._report_progress(job, 10)
+
+        document = self.get_document(username)
+        if not document:
+            raise ValueError(f"No document found for user: {username}")
+
+        with self._using_index(document, job):
+            pass
+
+        logger.info("Initialization Complete.")
+        return True
 
     def get_document(self, username: str) -> Document | None:
         try:
@@ -34,12 +311,112 @@ class BasePipeline(ABC):
             logger.error(f"Error getting document for {username}: {e}")
             return None
 
-    def optimize_query(self, query: str) -> str:
+    def _generate_answer(self, *args, on_delta: Optional[Callable[[str], None]] = None, **kwargs) -> str:
+        """The LLM's rag_generate(*args, **kwargs) answer.
+
+        With `on_delta`, the answer is streamed and each text delta is passed
+        to it as it arrives (QueryView's streaming response, the analysis
+        socket's answer_delta messages); the full answer is still returned.
         """
-        Optimizes the query for better retrieval.
-        Returns ONLY the optimized string.
+        if on_delta is None:
+            return self.llm.rag_generate(*args, **kwargs)
+
+        parts = []
+        for delta in self.llm.rag_generate(*args, stream=True, **kwargs):
+            parts.append(delta)
+            on_delta(delta)
+        return "".join(parts).strip()
+
+    async def _agenerate_answer(
+        self, *args, on_delta: Optional[Callable[[str], Awaitable[None]]] = None, **kwargs
+    ) -> str:
+        """_generate_answer() on the event loop; `on_delta` is awaited per delta."""
+        if on_delta is None:
+            return await self.llm.arag_generate(*args, **kwargs)
+
+        parts = []
+        async for delta in await self.llm.arag_generate(*args, stream=True, **kwargs):
+            parts.append(delta)
+            await on_delta(delta)
+        return "".join(parts).strip()
+
+    @staticmethod
+    def _core_result(answer: str, retrieved_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "answer": answer,
+            "context": [
+                {
+                    "text": doc["text"],
+                    "chunk_id": doc["chunk_id"],
+                    "score": doc.get("score"),
+                }
+                for doc in retrieved_docs
+            ],
+            "chunk_ids": [doc["chunk_id"] for doc in retrieved_docs],
+            "retrieved_docs": retrieved_docs,  # internal handoff for run_analysis
+        }
+
+    def _run_core(
+        self, document: Document, query: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Shared core logic for run() and run_analysis(): retrieval, then
+        LLM generation. The document's index is held for the retrieval only,
+        as in arun_analysis(): the LLM calls around it would otherwise keep
+        every other request on the document waiting on the index cache entry.
+        """
+        optimized_query = self.optimize_query(query)
+        with self._using_index(document):
+            args, kwargs, retrieved_docs = self._retrieve_core(document, query, optimized_query)
+        answer = self._generate_answer(*args, on_delta=on_delta, **kwargs)
+        return self._core_result(answer, retrieved_docs)
+
+    def _retrieve_for_analysis(self, document_id: str, query: str, optimized_query: str):
+        document = Document.objects.get(id=document_id)
+        with self._using_index(document):
+            return self._retrieve_core(document, query, optimized_query)
+
+    def _query_embedder(self):
+        """The DenseRAG that embeds this pipeline's queries, if any."""
+        return None
+
+    async def arun_analysis(
+        self,
+        document_id: str,
+        conversation_id: str,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """run_analysis() for the analysis consumer's event loop.
+
+        The network calls are awaited on the loop through the shared async
+        clients: the query optimization, the query embedding (put in the
+        query cache, where retrieval finds it) and the answer, streamed to
+        `on_delta`. Only the database, the index and the evaluation run on a
+        worker thread.
         """
-        prompt = (
+        logger.info(f"Running {self.method} analysis for conversation {conversation_id} on the event loop...")
+
+        conversation = await sync_to_async(Conversation.objects.get)(id=conversation_id)
+        optimized_query = await self.aoptimize_query(conversation.query)
+
+        embedder = self._query_embedder()
+        if embedder is not None and embedder.query_cache is not None:
+            try:
+                await embedder._aembed_query(optimized_query)
+            except Exception as e:
+                # Retrieval embeds the query itself on a miss.
+                logger.warning(f"Could not prefetch the query embedding: {e}")
+
+        args, kwargs, retrieved_docs = await sync_to_async(self._retrieve_for_analysis)(
+            document_id, conversation.query, optimized_query
+        )
+        answer = await self._agenerate_answer(*args, on_delta=on_delta, **kwargs)
+        result = self._core_result(answer, retrieved_docs)
+        return await sync_to_async(self._evaluate_analysis)(conversation, result)
+
+    @staticmethod
+    def _optimization_prompt(query: str) -> str:
+        return (
             "You are a query optimization tool for a Vector Database. "
             "Your task is to rewrite the user's input into a single, keyword-rich sentence "
             "that is optimized for cosine similarity search."
@@ -53,9 +430,27 @@ class BasePipeline(ABC):
             f"Input: {query}\n"
             "Output:"
         )
-        
+
+    def optimize_query(self, query: str) -> str:
+        """
+        Optimizes the query for better retrieval.
+        Returns ONLY the optimized string.
+        """
+        try:
+            raw_response = self.llm.prompt_generate(self._optimization_prompt(query))
+        except Exception as e:
+            logger.warning(f"Query optimization failed ({e}). Falling back to original query.")
+            return query
+
+        optimized_query = self._validate_and_clean_query(raw_response, query)
+
+        logger.info(f"Original Query: '{query}' -> Optimized: '{optimized_query}'")
+        return optimized_query
+
+    async def aoptimize_query(self, query: str) -> str:
+        """optimize_query() on the event loop."""
         try:
-            raw_response = self.llm.prompt_generate(prompt)
+            raw_response = await self.llm.aprompt_generate(self._optimization_prompt(query))
         except Exception as e:
             logger.warning(f"Query optimization failed ({e}). Falling back to original query.")
             return query
@@ -134,6 +529,17 @@ class BasePipeline(ABC):
 
         return bool(doc_vector) and os.path.exists(doc_vector.vectorstore_location)
     
+    def _load_index(self, path: str) -> bool:
+        """Load the saved index at `path` unless the engine already holds it."""
+        if self.rag.index_location == path:
+            logger.info(f"Index {path} already loaded; reusing it.")
+            return True
+        self.rag.index_location = None
+        if not self._load_state(path):
+            return False
+        self.rag.index_location = path
+        return True
+
     def get_retrieved_docs(self, query: str) -> List[str]:
         """
         Retrieves relevant documents using the RAG engine.
@@ -237,34 +643,43 @@ class BasePipeline(ABC):
         pass
 
     @abstractmethod
-    def run(self, username:str, query: str) -> Dict[str, Any]:
+    def run(self, username:str, query: str, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         The main execution flow:
         Query -> Retrieve -> Generate Answer.
         Replaces your 'parse_response'.
+        `on_delta` streams the answer (see _generate_answer).
         """
         pass
 
     @abstractmethod
-    def init(self, username: str) -> bool:
+    def _retrieve_core(
+        self, document: Document, query: str, optimized_query: Optional[str] = None
+    ) -> Tuple[tuple, Dict[str, Any], List[Dict[str, Any]]]:
         """
-        Initializes the pipeline by loading the state from the database
-        .
+        Retrieves for `query` (searching with `optimized_query`, optimized
+        here if not given). Returns the rag_generate() positional and
+        keyword arguments and the retrieved docs.
         """
         pass
-    
+
     @abstractmethod
-    def init_job(self, username: str, job=None) -> bool:
-        """
-        Initializes the pipeline with optional job progress tracking.
-        """
+    def _evaluate_analysis(self, conversation: Conversation, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds the evaluation against `conversation`'s ground truth to a
+        _run_core() result."""
         pass
-    
-    
+
+    @abstractmethod
+    def _discard_bad_index(self, doc_vector) -> None:
+        """Deletes an index, file and record: one that failed to load or
+        that a newer version replaced."""
+        pass
+
     @abstractmethod
-    def _build_index(self, username: str, document: Document) -> bool:
+    def _build_index(self, username: str, document: Document, job=None) -> bool:
         """
-        Builds the vector index for the given document and user.
+        Builds the vector index for the given document and user, reporting
+        the time per stage to `job` (see _stage).
         """
         pass
     
@@ -1,12 +1,12 @@
 import os
 import pickle
 import logging
-import uuid
-from typing import Dict, Any 
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from pipeline.base_pipeline import BasePipeline
 from common.chunker import DocumentChunker
 from dense_rag.dense_rag import DenseRAG
+from common.index_store import atomic_index_dir, remove_index
 from utils.insert_file import DataLoader
 
 from router.models import (
@@ -32,7 +32,8 @@ class DenseRAGPipeline(BasePipeline):
         super().__init__(config)
 
         self.method = "dense"
-        self.rag = DenseRAG(config)
+        # RAGRegistry passes in the engine it shares across LLM variants.
+        self.rag = config.get("rag_engine") or DenseRAG(config)
         self.llm = self._initialize_llm(config.get("llm_model", "openai"))
         self.chunker = DocumentChunker(
             strategy=config.get("chunk_strategy", "paragraph"),
@@ -46,28 +47,31 @@ class DenseRAGPipeline(BasePipeline):
         os.makedirs(self.vector_store_root, exist_ok=True)
 
     def _save_state(self, path: str):
-        data = {
-            "documents": self.rag.documents,
-            "vectors": self.rag.document_vectors,
-            "metadata": self.rag.document_metadata
-        }
-        with open(path, "wb") as f:
-            pickle.dump(data, f)
+        """Writes the index as a directory of memory-mappable arrays."""
+        with atomic_index_dir(path) as scratch:
+            self.rag.save_index(scratch)
+        self.rag.map_vectors(path)
 
     def _load_state(self, path: str) -> bool:
         try:
+            if os.path.isdir(path):
+                self.rag.load_index(path)
+                return True
+
+            # Legacy single-pickle index, from before the directory format.
             with open(path, "rb") as f:
                 data = pickle.load(f)
 
             self.rag.documents = data.get('documents', [])
-            self.rag.document_vectors = data.get('vectors', [])
+            self.rag.set_vectors(data.get('vectors'))
             self.rag.document_metadata = data.get("metadata", []) 
+            self.rag.restore_ann_index(data.get("ann_index"))
             return True
         except Exception as e:
             logger.error(f"Error loading state from {path}: {e}")
             return False
         
-    def _build_index(self, username: str, document: Document) -> str:
+    def _build_index(self, username: str, document: Document, job=None) -> str:
         """
         Internal function that performs the heavy indexing work.
         Returns the path of the saved vector store.
@@ -79,72 +83,24 @@ class DenseRAGPipeline(BasePipeline):
             raise ValueError("Document has no text source path.")
 
         logger.info(f"Loading text from {document.extracted_text_path}")
-        raw_text = self.loader.load(document.extracted_text_path)
-
-        chunks = self.chunker.chunk(raw_text)
-        
-        chunks_with_ids = self._sync_chunks(document, chunks)
-        
-        self.rag.index_documents(chunks_with_ids)
+        with self._stage(job, "load_text"):
+            raw_text = self.loader.load(document.extracted_text_path)
+        with self._stage(job, "chunk"):
+            chunks = self.chunker.chunk(raw_text)
+        with self._stage(job, "store_chunks"):
+            chunks_with_ids = self._sync_chunks(document, chunks)
 
-        file_name = f"{username}_{document.pk}_dense_{uuid.uuid4().hex[:6]}.pkl"
-        save_path = os.path.join(self.vector_store_root, file_name)
+        self._index_chunks(chunks_with_ids, job)
 
-        self._save_state(save_path)
-
-        vs, _ = VectorStore.objects.get_or_create(base_path=self.vector_store_root)
-
-        DocumentVector.objects.create(
-            document=document,
-            vectorstore=vs,
-            vectorstore_location=save_path,
-            document_location=document.extracted_text_path,
-            status="ready",
-            method="dense"
-        )
+        save_path = self._save_new_index(username, document, job)
 
         logger.info("Index creation complete.")
 
         return save_path
 
-    def init(self, username: str) -> bool:
-        """
-        Prepares the vector store for the user.
-        1. Checks DB for existing ready index.
-        2. If missing, loads text, chunks, embeds, and saves to disk.
-        3. Loads data into memory for this instance.
-        """
-
-        logger.info(f"Initializing Chat for {username}...")
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="dense"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                return True
-
-            logger.warning("Corrupt or missing index. Deleting record and re-indexing...")
-            self._discard_bad_index(doc_vector)
-
-        self._build_index(username, document)
-
-        logger.info("Initialization Complete.")
-        return True
-
     def _discard_bad_index(self, doc_vector) -> None:
         try:
-            if os.path.exists(doc_vector.vectorstore_location):
-                os.remove(doc_vector.vectorstore_location)
+            remove_index(doc_vector.vectorstore_location)
             doc_vector.delete()
         except Exception as e:
             logger.error(f"Failed to clean up bad index: {e}")
@@ -174,19 +130,19 @@ class DenseRAGPipeline(BasePipeline):
 
         return path
     
-    def _run_core(self, document: Document, query: str) -> Dict[str, Any]:
+    def _retrieve_core(
+        self, document: Document, query: str, optimized_query: Optional[str] = None
+    ) -> Tuple[tuple, Dict[str, Any], List[Dict[str, Any]]]:
         """
-        Handles init guard, retrieval, and LLM generation.
+        Handles the empty-index guard and retrieval; see BasePipeline._retrieve_core.
+        Callers hold the document's index via _using_index() (_run_core
+        and _retrieve_for_analysis do).
         """
         if not self.rag.documents or len(self.rag.documents) == 0:
-            logger.warning("No documents found in memory. Initializing...")
+            raise RuntimeError("State loaded from disk, but memory is still empty.")
 
-            self.init(document.user.username)
-
-            if not self.rag.documents or len(self.rag.documents) == 0:
-                raise RuntimeError("State loaded from disk, but memory is still empty.")
-
-        optimized_query = self.optimize_query(query)
+        if optimized_query is None:
+            optimized_query = self.optimize_query(query)
         retrieved_docs = self.rag.retrieve(optimized_query)
 
         if not retrieved_docs:
@@ -194,33 +150,17 @@ class DenseRAGPipeline(BasePipeline):
 
         if not retrieved_docs:
             logger.warning(f"No relevant documents found for query: {query}")
-            answer = self.llm.rag_generate(query, context="")
-            return {
-                "answer": answer,
-                "context": [],
-                "chunk_ids": [],
-                "retrieved_docs": [],
-            }
+            return (query,), {"context": ""}, []
 
         context_str = "\n\n".join(doc["text"] for doc in retrieved_docs)
-        answer = self.llm.rag_generate(optimized_query, context_str)
-
-        return {
-            "answer": answer,
-            "context": [
-                {
-                    "text": doc["text"],
-                    "chunk_id": doc["chunk_id"],
-                    "score": doc.get("score"),
-                }
-                for doc in retrieved_docs
-            ],
-            "chunk_ids": [doc["chunk_id"] for doc in retrieved_docs],
-            "retrieved_docs": retrieved_docs,  
-        }
+        return (optimized_query, context_str), {}, retrieved_docs
 
+    def _query_embedder(self):
+        return self._rag
 
-    def run(self, username: str, query: str) -> Dict[str, Any]:
+    def run(
+        self, username: str, query: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Retrieves relevant documents and generates an answer.
         """
@@ -230,13 +170,15 @@ class DenseRAGPipeline(BasePipeline):
         if not document:
             raise ValueError(f"No document found for user: {username}")
 
-        result = self._run_core(document, query)
+        result = self._run_core(document, query, on_delta)
 
         result.pop("retrieved_docs", None)
         return result
 
 
-    def run_analysis(self, document_id: str, conversation_id: str) -> Dict[str, Any]:
+    def run_analysis(
+        self, document_id: str, conversation_id: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         evaluates retrieved chunks and answer against ground truth.
         """
@@ -245,8 +187,11 @@ class DenseRAGPipeline(BasePipeline):
         document = Document.objects.get(id=document_id)
         conversation = Conversation.objects.get(id=conversation_id)
 
-        result = self._run_core(document, conversation.query)
+        result = self._run_core(document, conversation.query, on_delta)
 
+        return self._evaluate_analysis(conversation, result)
+
+    def _evaluate_analysis(self, conversation: Conversation, result: Dict[str, Any]) -> Dict[str, Any]:
         retrieved_docs = result.pop("retrieved_docs", [])
 
         if not retrieved_docs:
@@ -258,7 +203,7 @@ class DenseRAGPipeline(BasePipeline):
         ground_truth_qs = GroundTruthChunk.objects.filter(conversation=conversation)
 
         if not ground_truth_qs.exists():
-            logger.warning(f"No ground truth chunks for conversation {conversation_id}")
+            logger.warning(f"No ground truth chunks for conversation {conversation.id}")
 
         ground_truth_ids = set(
             ground_truth_qs.values_list("chunk_id", flat=True)
@@ -270,58 +215,10 @@ class DenseRAGPipeline(BasePipeline):
         if ground_truth_response:
             evaluation_response_result = evaluate_response(result["answer"], ground_truth_response.response, chunks=[doc["text"] for doc in result.get("context", [])])
         else:
-            logger.warning(f"No ground truth response for conversation {conversation_id}")
+            logger.warning(f"No ground truth response for conversation {conversation.id}")
 
         result["evaluation"] = {
             "chunk_evaluation": evaluation_chunks_results,
             "response_evaluation": evaluation_response_result if ground_truth_response else {}
         }
         return result
-
-    
-    def init_job(self, username: str, job=None) -> bool:
-        """
-        job: Instance of Job model with progess fro websocket updates
-        """
-        logger.info(f"Initializing Dense RAG for {username}...")
-
-        if job:
-            job.progress = 10
-            job.save()
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="dense"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-
-            if job:
-                job.progress = 80
-                job.save()
-
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                return True
-
-            logger.warning("Corrupt or missing index. Deleting record and re-indexing...")
-            self._discard_bad_index(doc_vector)
-
-        if job:
-            job.progress = 20
-            job.save()
-
-        self._build_index(username, document)
-
-        if job:
-            job.progress = 90
-            job.save()
-
-        logger.info("Initialization Complete.")
-        return True
\ No newline at end of file
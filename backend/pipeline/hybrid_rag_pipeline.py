@@ -1,21 +1,26 @@
 import os
 import pickle
 import logging
-import uuid
-from typing import Dict, Any, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from pipeline.base_pipeline import BasePipeline
 
+from common.chunk_store import ChunkStore
 from common.chunker import DocumentChunker
 from hybrid_rag.hybrid_rag import HybridRAG  
+from common.index_store import (
+    atomic_index_dir,
+    read_manifest,
+    remove_index,
+    write_manifest,
+)
+from sparse_rag.bm25 import BM25Index
 from utils.insert_file import DataLoader
 
 from router.models import (
     Conversation,
     Document, 
-    GuestUser, 
-    VectorStore, 
-    DocumentVector
+    GuestUser
 )
 
 from evaluation.models import Chunk, GroundTruthChunk, GroundTruthResponse
@@ -23,12 +28,19 @@ from evaluation.eval import evaluate_chunks, evaluate_response
 
 logger = logging.getLogger(__name__)
 
+INDEX_KIND = "hybrid"
+DENSE_SUBDIR = "dense"
+SPARSE_SUBDIR = "sparse"
+# The sparse half of index directories written before it had its own layout.
+SPARSE_FILE = "sparse.pkl"
+
 class HybridRAGPipeline(BasePipeline):
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
 
         self.method = "hybrid"
-        self.rag = HybridRAG(config)
+        # RAGRegistry passes in the engine it shares across LLM variants.
+        self.rag = config.get("rag_engine") or HybridRAG(config)
         
         self.llm = self._initialize_llm(config.get("llm_model", "openai"))
         embedding_client = getattr(self.rag.dense_engine, 'client', None)
@@ -47,81 +59,86 @@ class HybridRAGPipeline(BasePipeline):
     def _save_state(self, path: str):
         """
         Saves the state of both the Sparse and Dense engines.
+
+        `path` becomes an index directory holding each engine's own
+        memory-mappable layout: the dense half under dense/, the sparse half
+        under sparse/. Both halves index the same chunks, so the chunk store
+        is written once, at the top level, rather than in each subdirectory.
         """
-        sparse_docs = list(getattr(self.rag.sparse_engine, "documents", []))
-        dense_docs = list(getattr(self.rag.dense_engine, "documents", []))
+        sparse_docs = getattr(self.rag.sparse_engine, "documents", [])
+        dense_docs = getattr(self.rag.dense_engine, "documents", [])
         
-        if not sparse_docs or not dense_docs:
+        if not len(sparse_docs) or not len(dense_docs):
             raise RuntimeError(
                 f"Cannot save empty state — "
                 f"sparse: {len(sparse_docs)} docs, dense: {len(dense_docs)} docs"
             )
 
-        data = {
-            "sparse": {
-                "documents": sparse_docs,
-                "bm25": getattr(self.rag.sparse_engine, "bm25", None),
-                "tokenized_corpus": getattr(self.rag.sparse_engine, "tokenized_corpus", []),
-                "metadata": getattr(self.rag.sparse_engine, "document_metadata", [])
-            },
-            "dense": {
-                "documents": dense_docs,
-                "vectors": list(getattr(self.rag.dense_engine, "document_vectors", [])),
-                "metadata": getattr(self.rag.dense_engine, "document_metadata", [])
-            }
-        }
-
         # Verify BM25 was actually built
-        if data["sparse"]["bm25"] is None:
+        if getattr(self.rag.sparse_engine, "bm25", None) is None:
             raise RuntimeError("BM25 index is None — sparse engine did not index correctly.")
         
-        if not data["dense"]["vectors"]:
+        vectors = self.rag.dense_engine.document_vectors
+        if vectors is None or len(vectors) == 0:
             raise RuntimeError("Dense vectors are empty — dense engine did not index correctly.")
 
         try:
-            with open(path, "wb") as f:
-                pickle.dump(data, f)
+            sparse = self.rag.sparse_engine
+            with atomic_index_dir(path) as scratch:
+                ChunkStore.from_documents(sparse.documents, sparse.document_metadata).save(scratch)
+                for subdir, engine in ((DENSE_SUBDIR, self.rag.dense_engine), (SPARSE_SUBDIR, sparse)):
+                    os.makedirs(os.path.join(scratch, subdir))
+                    engine.save_index(os.path.join(scratch, subdir), with_chunks=False)
+                write_manifest(scratch, INDEX_KIND, dense=DENSE_SUBDIR, sparse=SPARSE_SUBDIR, chunks=True)
+            self.rag.dense_engine.map_vectors(os.path.join(path, DENSE_SUBDIR))
             logger.info(f"State saved: {len(sparse_docs)} sparse docs, {len(dense_docs)} dense docs")
         except Exception as e:
-            logger.error(f"Error saving pickle state: {e}")
+            logger.error(f"Error saving hybrid state: {e}")
             raise
 
 
     def _load_state(self, path: str) -> bool:
         """
         Restores the state of both engines from disk.
+
+        Reads the index directory written by _save_state, or a legacy
+        single-pickle hybrid index. Directories saved before the chunk store
+        moved to the top level keep a copy in each half; those load as
+        before and are deduplicated in memory.
         """
         try:
-            with open(path, "rb") as f:
-                data = pickle.load(f)
-
-            if "sparse" in data:
-                self.rag.sparse_engine.documents = data["sparse"].get("documents") or []
-                self.rag.sparse_engine.tokenized_corpus = data["sparse"].get("tokenized_corpus") or []
-                self.rag.sparse_engine.document_metadata = data["sparse"].get("metadata") or []
-                bm25 = data["sparse"].get("bm25")
-                if bm25 is not None:
-                    self.rag.sparse_engine.bm25 = bm25
+            store = None
+            if os.path.isdir(path):
+                manifest = read_manifest(path, INDEX_KIND)
+                if manifest.get("chunks"):
+                    store = ChunkStore.load(path)
+                sparse_path = os.path.join(path, manifest.get("sparse") or SPARSE_FILE)
+                if os.path.isdir(sparse_path):
+                    self.rag.sparse_engine.load_index(sparse_path, store=store)
                 else:
-                    logger.warning("BM25 not in pickle, rebuilding from tokenized_corpus...")
-                    corpus = getattr(self.rag.sparse_engine, "tokenized_corpus", [])
-                    if corpus:
-                        from rank_bm25 import BM25Okapi
-                        self.rag.sparse_engine.bm25 = BM25Okapi(corpus)
-                    else:
-                        logger.error("Cannot rebuild BM25 — tokenized_corpus is also empty.")
+                    with open(sparse_path, "rb") as f:
+                        sparse_data = pickle.load(f)
+                    if not self._restore_sparse(sparse_data):
                         return False
+                self.rag.dense_engine.load_index(os.path.join(path, DENSE_SUBDIR), store=store)
+            else:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
 
-            if "dense" in data:
-                # Use `or []` to safely handle None values from old corrupt pickles
-                self.rag.dense_engine.documents = data["dense"].get("documents") or []
-                self.rag.dense_engine.document_vectors = data["dense"].get("vectors") or []
-                self.rag.dense_engine.document_metadata = data["dense"].get("metadata") or []
+                if "sparse" in data and not self._restore_sparse(data["sparse"]):
+                    return False
+
+                if "dense" in data:
+                    # Use `or []` to safely handle None values from old corrupt pickles
+                    self.rag.dense_engine.documents = data["dense"].get("documents") or []
+                    self.rag.dense_engine.set_vectors(data["dense"].get("vectors"))
+                    self.rag.dense_engine.document_metadata = data["dense"].get("metadata") or []
+                    self.rag.dense_engine.restore_ann_index(data["dense"].get("ann_index"))
 
             sparse_ok = len(getattr(self.rag.sparse_engine, "documents", []) or []) > 0
             dense_ok = len(getattr(self.rag.dense_engine, "documents", []) or []) > 0
             bm25_ok = getattr(self.rag.sparse_engine, "bm25", None) is not None
-            vectors_ok = len(getattr(self.rag.dense_engine, "document_vectors", []) or []) > 0
+            vectors_ok = self.rag.dense_engine.document_vectors is not None
 
             if not all([sparse_ok, dense_ok, bm25_ok, vectors_ok]):
                 logger.error(
@@ -130,6 +147,7 @@ class HybridRAGPipeline(BasePipeline):
                     f"bm25: {bm25_ok}, vectors: {vectors_ok}"
                 )
                 return False
+            self.rag.share_chunks(store)
 
             logger.info(
                 f"State loaded — "
@@ -142,7 +160,25 @@ class HybridRAGPipeline(BasePipeline):
             logger.error(f"Error loading state from {path}: {e}")
             return False
 
-    def _build_index(self, username: str, document) -> str:
+    def _restore_sparse(self, sparse_data: dict) -> bool:
+        """Put a legacy pickled sparse-engine dict back into the sparse sub-engine."""
+        self.rag.sparse_engine.documents = sparse_data.get("documents") or []
+        self.rag.sparse_engine.document_metadata = sparse_data.get("metadata") or []
+        bm25 = sparse_data.get("bm25")
+        if bm25 is not None:
+            self.rag.sparse_engine.restore_bm25(bm25)
+            return True
+
+        logger.warning("BM25 not in saved state, rebuilding from tokenized_corpus...")
+        corpus = sparse_data.get("tokenized_corpus") or []
+        if corpus:
+            self.rag.sparse_engine.bm25 = BM25Index.build(corpus)
+            return True
+
+        logger.error("Cannot rebuild BM25 — tokenized_corpus is also empty.")
+        return False
+
+    def _build_index(self, username: str, document, job=None) -> str:
         """
         Internal function that builds the Hybrid index.
         Returns the saved vectorstore path.
@@ -155,97 +191,41 @@ class HybridRAGPipeline(BasePipeline):
 
         logger.info(f"Loading text from {document.extracted_text_path}")
 
-        raw_text = self.loader.load(document.extracted_text_path)
-
-        chunks = self.chunker.chunk(raw_text)
-
-        chunks_with_ids = self._sync_chunks(document, chunks)
-        
-        self.rag.index_documents(chunks_with_ids)
+        with self._stage(job, "load_text"):
+            raw_text = self.loader.load(document.extracted_text_path)
+        with self._stage(job, "chunk"):
+            chunks = self.chunker.chunk(raw_text)
+        with self._stage(job, "store_chunks"):
+            chunks_with_ids = self._sync_chunks(document, chunks)
 
-        file_name = f"{username}_{document.pk}_hybrid_{uuid.uuid4().hex[:6]}.pkl"
-        save_path = os.path.join(self.vector_store_root, file_name)
+        self._index_chunks(chunks_with_ids, job)
 
-        self._save_state(save_path)
-
-        vs, _ = VectorStore.objects.get_or_create(base_path=self.vector_store_root)
-
-        DocumentVector.objects.create(
-            document=document,
-            vectorstore=vs,
-            vectorstore_location=save_path,
-            document_location=document.extracted_text_path,
-            status="ready",
-            method="hybrid"
-        )
+        save_path = self._save_new_index(username, document, job)
 
         logger.info("Hybrid index creation complete.")
 
         return save_path
-    
-    def init(self, username: str) -> bool:
-        """
-        Initializes Hybrid RAG synchronously.
-        """
-
-        logger.info(f"Initializing Hybrid RAG for {username}...")
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="hybrid"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-            logger.info(f"Loading state from {doc_vector.vectorstore_location}")
-
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                return True
 
-            logger.warning("Corrupt or outdated index found. Deleting and re-indexing...")
-            try:
-                if os.path.exists(doc_vector.vectorstore_location):
-                    os.remove(doc_vector.vectorstore_location)
-                doc_vector.delete()
-            except Exception as e:
-                logger.error(f"Failed to clean up bad index: {e}")
-
-        self._build_index(username, document)
-
-        logger.info("Hybrid Initialization Complete.")
-        return True
+    def _discard_bad_index(self, doc_vector) -> None:
+        try:
+            remove_index(doc_vector.vectorstore_location)
+            doc_vector.delete()
+        except Exception as e:
+            logger.error(f"Failed to clean up bad index: {e}")
     
-    def _run_core(self, document: Document, query: str) -> Dict[str, Any]:
+    def _retrieve_core(
+        self, document: Document, query: str, optimized_query: Optional[str] = None
+    ) -> Tuple[tuple, Dict[str, Any], List[Dict[str, Any]]]:
         """
-        Handles init guard, retrieval, and LLM generation.
+        Handles the empty-index guard and retrieval; see BasePipeline._retrieve_core.
+        Callers hold the document's index via _using_index() (_run_core
+        and _retrieve_for_analysis do).
         """
         if not self.rag.dense_engine.documents or len(self.rag.dense_engine.documents) == 0:
-            logger.warning("No documents found in memory. Initializing...")
-
-            success = self.init(document.user.username)
-            if not success:
-                doc_vector = DocumentVector.objects.filter(
-                    document=document,
-                    status="ready",
-                    method="hybrid"
-                ).first()
-                if doc_vector:
-                    self._load_state(doc_vector.vectorstore_location)
-                else:
-                    raise ValueError("Initialization failed.")
-
-            if not self.rag.dense_engine.documents or len(self.rag.dense_engine.documents) == 0:
-                raise RuntimeError("State loaded from disk, but memory is still empty.")
-
-        optimized_query = self.optimize_query(query)
-        logger.info(f"Optimized Query: {optimized_query}")
+            raise RuntimeError("State loaded from disk, but memory is still empty.")
 
+        if optimized_query is None:
+            optimized_query = self.optimize_query(query)
         retrieved_docs = self.rag.retrieve(optimized_query)
 
         if not retrieved_docs:
@@ -253,33 +233,17 @@ class HybridRAGPipeline(BasePipeline):
 
         if not retrieved_docs:
             logger.warning(f"No relevant documents found for query: {query}")
-            answer = self.llm.rag_generate(query, context="")
-            return {
-                "answer": answer,
-                "context": [],
-                "chunk_ids": [],
-                "retrieved_docs": [],
-            }
+            return (query,), {"context": ""}, []
 
         context_str = "\n\n".join(doc["text"] for doc in retrieved_docs)
-        answer = self.llm.rag_generate(optimized_query, context_str)
-
-        return {
-            "answer": answer,
-            "context": [
-                {
-                    "text": doc["text"],
-                    "chunk_id": doc["chunk_id"],
-                    "score": doc.get("score"),
-                }
-                for doc in retrieved_docs
-            ],
-            "chunk_ids": [doc["chunk_id"] for doc in retrieved_docs],
-            "retrieved_docs": retrieved_docs, 
-        }
+        return (optimized_query, context_str), {}, retrieved_docs
 
+    def _query_embedder(self):
+        return self._rag.dense_engine
 
-    def run(self, username: str, query: str) -> Dict[str, Any]:
+    def run(
+        self, username: str, query: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Retrieves relevant documents and generates an answer using Hybrid RAG.
         """
@@ -289,12 +253,14 @@ class HybridRAGPipeline(BasePipeline):
         if not document:
             raise ValueError(f"No document found for user: {username}")
 
-        result = self._run_core(document, query)
+        result = self._run_core(document, query, on_delta)
         result.pop("retrieved_docs", None)
         return result
 
 
-    def run_analysis(self, document_id: str, conversation_id: str) -> Dict[str, Any]:
+    def run_analysis(
+        self, document_id: str, conversation_id: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Same as run() but also evaluates retrieved chunks and answer against ground truth.
         """
@@ -303,8 +269,11 @@ class HybridRAGPipeline(BasePipeline):
         document = Document.objects.get(id=document_id)
         conversation = Conversation.objects.get(id=conversation_id)
 
-        result = self._run_core(document, conversation.query)
+        result = self._run_core(document, conversation.query, on_delta)
+
+        return self._evaluate_analysis(conversation, result)
 
+    def _evaluate_analysis(self, conversation: Conversation, result: Dict[str, Any]) -> Dict[str, Any]:
         retrieved_docs = result.pop("retrieved_docs", [])
 
         if not retrieved_docs:
@@ -316,7 +285,7 @@ class HybridRAGPipeline(BasePipeline):
         ground_truth_qs = GroundTruthChunk.objects.filter(conversation=conversation)
 
         if not ground_truth_qs.exists():
-            logger.warning(f"No ground truth chunks for conversation {conversation_id}")
+            logger.warning(f"No ground truth chunks for conversation {conversation.id}")
 
         ground_truth_ids = set(
             ground_truth_qs.values_list("chunk_id", flat=True)
@@ -329,65 +298,10 @@ class HybridRAGPipeline(BasePipeline):
             evaluation_response_result = evaluate_response(result["answer"], ground_truth_response.response, chunks=[doc["text"] for doc in result.get("context", [])])
             
         else:
-            logger.warning(f"No ground truth response for conversation {conversation_id}")
+            logger.warning(f"No ground truth response for conversation {conversation.id}")
 
         result["evaluation"] = {
             "chunk_evaluation": evaluation_chunks_results,
             "response_evaluation": evaluation_response_result if ground_truth_response else {}
         }
         return result
-    
-    def init_job(self, username: str, job=None) -> bool:
-        """
-        Initializes Hybrid RAG with job progress tracking.
-        """
-
-        logger.info(f"Initializing Hybrid RAG for {username}...")
-
-        if job:
-            job.progress = 10
-            job.save()
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="hybrid"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-
-            if job:
-                job.progress = 80
-                job.save()
-
-            logger.info(f"Loading state from {doc_vector.vectorstore_location}")
-
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                return True
-
-            logger.warning("Corrupt or outdated index found. Deleting and re-indexing...")
-            try:
-                if os.path.exists(doc_vector.vectorstore_location):
-                    os.remove(doc_vector.vectorstore_location)
-                doc_vector.delete()
-            except Exception as e:
-                logger.error(f"Failed to clean up bad index: {e}")
-
-        if job:
-            job.progress = 20
-            job.save()
-
-        self._build_index(username, document)
-
-        if job:
-            job.progress = 90
-            job.save()
-
-        logger.info("Hybrid Initialization Complete.")
-        return True
\ No newline at end of file
@@ -1,20 +1,18 @@
 import os
 import pickle
 import logging
-import uuid
 
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pipeline.base_pipeline import BasePipeline
 from sparse_rag.sparse_rag import SparseRAG
 from ai_handler.llm import OpenAILLM
 from common.chunker import DocumentChunker
+from common.index_store import atomic_index_dir, remove_index
 from utils.insert_file import DataLoader 
 from router.models import (
     Conversation,
     Document, 
-    GuestUser, 
-    VectorStore, 
-    DocumentVector
+    GuestUser
 )
 
 from evaluation.models import (
@@ -30,7 +28,8 @@ class SparseRAGPipeline(BasePipeline):
         super().__init__(config)
 
         self.method = "sparse"
-        self.rag = SparseRAG(config)
+        # RAGRegistry passes in the engine it shares across LLM variants.
+        self.rag = config.get("rag_engine") or SparseRAG(config)
 
         self.llm = self._initialize_llm(config.get("llm_model", "openai"))
 
@@ -47,27 +46,28 @@ class SparseRAGPipeline(BasePipeline):
         os.makedirs(self.vector_store_root, exist_ok=True)
 
     def _save_state(self, path: str):
-        data = {
-            "documents": self.rag.documents,
-            "bm25": self.rag.bm25,
-            "metadata": self.rag.document_metadata
-        }
-        with open(path, "wb") as f:
-            pickle.dump(data, f)
+        """Writes the index as a directory of memory-mappable arrays."""
+        with atomic_index_dir(path) as scratch:
+            self.rag.save_index(scratch)
 
     def _load_state(self, path: str) -> bool:
         try:
+            if os.path.isdir(path):
+                self.rag.load_index(path)
+                return True
+
+            # Legacy single-pickle index, from before the directory format.
             with open(path, "rb") as f:
                 data = pickle.load(f)
             self.rag.documents = data.get("documents", [])
-            self.rag.bm25 = data.get("bm25", None)
+            self.rag.restore_bm25(data.get("bm25", None))
             self.rag.document_metadata = data.get("metadata", [])
             return True
         except Exception as e:
             logger.error(f"Error loading state from {path}: {e}")
             return False
         
-    def _build_index(self, username: str, document) -> str:
+    def _build_index(self, username: str, document, job=None) -> str:
         """
         Internal function that performs Sparse indexing.
         Returns the saved vectorstore path.
@@ -80,126 +80,57 @@ class SparseRAGPipeline(BasePipeline):
 
         logger.info(f"Loading text from {document.extracted_text_path}")
 
-        raw_text = self.loader.load(document.extracted_text_path)
-        chunks = self.chunker.chunk(raw_text)
-        
-        chunks_with_ids = self._sync_chunks(document, chunks)
-        
-        self.rag.index_documents(chunks_with_ids)
-
-        file_name = f"{username}_{document.pk}_sparse_{uuid.uuid4().hex[:6]}.pkl"
-        save_path = os.path.join(self.vector_store_root, file_name)
+        with self._stage(job, "load_text"):
+            raw_text = self.loader.load(document.extracted_text_path)
+        with self._stage(job, "chunk"):
+            chunks = self.chunker.chunk(raw_text)
+        with self._stage(job, "store_chunks"):
+            chunks_with_ids = self._sync_chunks(document, chunks)
 
-        self._save_state(save_path)
+        self._index_chunks(chunks_with_ids, job)
 
-        vs, _ = VectorStore.objects.get_or_create(base_path=self.vector_store_root)
-
-        DocumentVector.objects.create(
-            document=document,
-            vectorstore=vs,
-            vectorstore_location=save_path,
-            document_location=document.extracted_text_path,
-            status="ready",
-            method="sparse"
-        )
+        save_path = self._save_new_index(username, document, job)
 
         logger.info("Sparse index creation complete.")
 
         return save_path
 
-    def init(self, username: str) -> bool:
-        """
-        Initializes Sparse RAG synchronously.
-        """
-
-        logger.info(f"Initializing Sparse RAG for {username}...")
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="sparse"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                return True
-
-            logger.warning("Corrupt or missing index. Deleting record and re-indexing...")
-            self._discard_bad_index(doc_vector)
-
-        self._build_index(username, document)
-
-        logger.info("Initialization Complete.")
-        return True
-
     def _discard_bad_index(self, doc_vector) -> None:
         try:
-            if os.path.exists(doc_vector.vectorstore_location):
-                os.remove(doc_vector.vectorstore_location)
+            remove_index(doc_vector.vectorstore_location)
             doc_vector.delete()
         except Exception as e:
             logger.error(f"Failed to clean up bad index: {e}")
 
-    def _run_core(self, document: Document, query: str) -> Dict[str, Any]:
+    def _retrieve_core(
+        self, document: Document, query: str, optimized_query: Optional[str] = None
+    ) -> Tuple[tuple, Dict[str, Any], List[Dict[str, Any]]]:
         """
-        Shared core logic for run() and run_analysis().
-        Handles init guard, retrieval, and LLM generation.
+        Handles the empty-index guard and retrieval; see BasePipeline._retrieve_core.
+        Callers hold the document's index via _using_index() (_run_core
+        and _retrieve_for_analysis do).
         """
-        # Init guard — sparse checks rag.documents directly
+        # Guard — sparse checks rag.documents directly
         if not self.rag.documents or len(self.rag.documents) == 0:
-            logger.warning("No documents found in memory. Initializing...")
-
-            self.init(document.user.username)
-
-            if not self.rag.documents or len(self.rag.documents) == 0:
-                raise RuntimeError("State loaded from disk, but memory is still empty. The .pkl file might be corrupt or empty.")
-
-        # Retrieval
-        optimized_query = self.optimize_query(query)
+            raise RuntimeError("State loaded from disk, but memory is still empty. The saved index might be corrupt or empty.")
 
+        if optimized_query is None:
+            optimized_query = self.optimize_query(query)
         retrieved_docs = self.rag.retrieve(optimized_query)
 
         if not retrieved_docs:
             retrieved_docs = self.rag.retrieve(query)
 
-        # No results fallback
         if not retrieved_docs:
             logger.warning(f"No relevant documents found for query: {query}")
-            answer = self.llm.rag_generate(query, context="")
-            return {
-                "answer": answer,
-                "context": [],
-                "chunk_ids": [],
-                "retrieved_docs": [],
-            }
-
-        # LLM generation
-        context_str = "\n\n".join(doc["text"] for doc in retrieved_docs)
-        answer = self.llm.rag_generate(optimized_query, context_str)
-
-        return {
-            "answer": answer,
-            "context": [
-                {
-                    "text": doc["text"],
-                    "chunk_id": doc["chunk_id"],
-                    "score": doc.get("score"),
-                }
-                for doc in retrieved_docs
-            ],
-            "chunk_ids": [doc["chunk_id"] for doc in retrieved_docs],
-            "retrieved_docs": retrieved_docs,  # internal handoff for run_analysis
-        }
+            return (query,), {"context": ""}, []
 
+        context_str = "\n\n".join(doc["text"] for doc in retrieved_docs)
+        return (optimized_query, context_str), {}, retrieved_docs
 
-    def run(self, username: str, query: str) -> Dict[str, Any]:
+    def run(
+        self, username: str, query: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Retrieves relevant documents and generates an answer using Sparse RAG.
         """
@@ -209,12 +140,14 @@ class SparseRAGPipeline(BasePipeline):
         if not document:
             raise ValueError(f"No document found for user: {username}")
 
-        result = self._run_core(document, query)
+        result = self._run_core(document, query, on_delta)
         result.pop("retrieved_docs", None)
         return result
 
 
-    def run_analysis(self, document_id: str, conversation_id: str) -> Dict[str, Any]:
+    def run_analysis(
+        self, document_id: str, conversation_id: str, on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Same as run() but also evaluates retrieved chunks and answer against ground truth.
         """
@@ -223,8 +156,11 @@ class SparseRAGPipeline(BasePipeline):
         document = Document.objects.get(id=document_id)
         conversation = Conversation.objects.get(id=conversation_id)
 
-        result = self._run_core(document, conversation.query)
+        result = self._run_core(document, conversation.query, on_delta)
+
+        return self._evaluate_analysis(conversation, result)
 
+    def _evaluate_analysis(self, conversation: Conversation, result: Dict[str, Any]) -> Dict[str, Any]:
         retrieved_docs = result.pop("retrieved_docs", [])
 
         if not retrieved_docs:
@@ -236,7 +172,7 @@ class SparseRAGPipeline(BasePipeline):
         ground_truth_qs = GroundTruthChunk.objects.filter(conversation=conversation)
 
         if not ground_truth_qs.exists():
-            logger.warning(f"No ground truth chunks for conversation {conversation_id}")
+            logger.warning(f"No ground truth chunks for conversation {conversation.id}")
 
         ground_truth_ids = set(
             ground_truth_qs.values_list("chunk_id", flat=True)
@@ -248,57 +184,10 @@ class SparseRAGPipeline(BasePipeline):
         if ground_truth_response:
             evaluation_response_result = evaluate_response(result["answer"], ground_truth_response.response, chunks=[doc["text"] for doc in result.get("context", [])])
         else:
-            logger.warning(f"No ground truth response for conversation {conversation_id}")
+            logger.warning(f"No ground truth response for conversation {conversation.id}")
 
         result["evaluation"] = {
             "chunk_evaluation": evaluation_chunks_results,
             "response_evaluation": evaluation_response_result if ground_truth_response else {}
         }
         return result
-    
-    def init_job(self, username: str, job=None) -> bool:
-        """
-        Initializes Sparse RAG with job progress tracking.
-        """
-
-        logger.info(f"Initializing Sparse RAG for {username}...")
-
-        if job:
-            job.progress = 10
-            job.save()
-
-        document = self.get_document(username)
-        if not document:
-            raise ValueError(f"No document found for user: {username}")
-
-        doc_vector = DocumentVector.objects.filter(
-            document=document,
-            status="ready",
-            method="sparse"
-        ).last()
-
-        if doc_vector:
-            logger.info("Existing index found. Loading into memory.")
-
-            success = self._load_state(doc_vector.vectorstore_location)
-            if success:
-                if job:
-                    job.progress = 80
-                    job.save()
-                return True
-
-            logger.warning("Corrupt or missing index. Deleting record and re-indexing...")
-            self._discard_bad_index(doc_vector)
-
-        if job:
-            job.progress = 20
-            job.save()
-
-        self._build_index(username, document)
-
-        if job:
-            job.progress = 90
-            job.save()
-
-        logger.info("Initialization Complete.")
-        return True
\ No newline at end of file
@@ -1,5 +1,6 @@
+import copy
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 
 class BaseRAG(ABC):
     """
@@ -7,12 +8,51 @@ class BaseRAG(ABC):
     Enforces a standard structure: Index -> Retrieve -> Generate.
     """
 
+    # Saved index currently held in memory. One engine can serve several
+    # pipelines (one per LLM), so they check this before loading it again.
+    index_location: Optional[str] = None
+    # Seconds per stage of the last index_documents() (e.g. "tokenize"),
+    # reported with the indexing job. Replaced, never updated in place.
+    index_timings: Dict[str, float] = {}
+    # Whether add_documents()/remove_documents() update the loaded index in
+    # place. Pipelines rebuild engines that cannot with index_documents().
+    updates_in_place: bool = False
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize with configuration (API keys, DB paths, model names).
         """
         self.config = config
 
+    def spawn(self) -> "BaseRAG":
+        """A new, empty engine with this one's settings, clients and models.
+
+        IndexCache keeps one engine per loaded document. Copying the template
+        shares what __init__ builds (API clients, the cross-encoder) instead
+        of building it again for every document.
+        """
+        engine = copy.copy(self)
+        engine.index_location = None
+        engine._clear_index()
+        return engine
+
+    def _clear_index(self) -> None:
+        """Forget the indexed documents; everything index_documents() sets."""
+        self.document_metadata = []
+        self.index_timings = {}
+
+    def copy_run_settings(self, template: "BaseRAG") -> None:
+        """Take the per-run settings (apply_retrieval_depth) from `template`."""
+        if hasattr(template, "top_k"):
+            self.top_k = template.top_k
+
+    def warm_up(self) -> None:
+        """Load whatever the engine defers to first use (models, corpora)."""
+
+    def index_nbytes(self) -> int:
+        """Approximate memory held by the loaded index, for IndexCache's budget."""
+        return 0
+
     @abstractmethod
     def index_documents(self, documents: List[str]) -> None:
         """
@@ -23,6 +63,20 @@ class BaseRAG(ABC):
         """
         pass
 
+    def indexed_chunk_ids(self) -> List[Any]:
+        """chunk_id of every indexed chunk, in index order."""
+        return [meta.get("chunk_id") for meta in self.document_metadata]
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Add chunks ({"text", "chunk_id"}) to the loaded index, paying
+        only for them. Engines that cannot (updates_in_place is False)
+        raise NotImplementedError."""
+        raise NotImplementedError(f"{type(self).__name__} cannot add documents to its index.")
+
+    def remove_documents(self, chunk_ids) -> None:
+        """Drop the chunks with these chunk_ids from the loaded index."""
+        raise NotImplementedError(f"{type(self).__name__} cannot remove documents from its index.")
+
     @abstractmethod
     def retrieve(self, query: str) -> List[str]:
         """
@@ -31,6 +85,11 @@ class BaseRAG(ABC):
         """
         pass
     
+    def retrieve_batch(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """retrieve() for each query, in order. Engines that can score a
+        batch at once (SparseRAG) override this."""
+        return [self.retrieve(query) for query in queries]
+
     @abstractmethod
     def get_retrieved_scores(self, query: str) -> Dict[str, List[float]]:
         """
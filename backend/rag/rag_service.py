@@ -3,8 +3,21 @@ from pipeline.hybrid_rag_pipeline import HybridRAGPipeline
 from pipeline.sparse_rag_pipeline import SparseRAGPipeline
 from router.models import Document
 from common.constant import CONFIG_VARIANTS, DEFAULT_TOP_K
+from dense_rag.embedding_cache import get_embedding_cache
+from dense_rag.query_cache import get_query_embedding_cache
+from common.index_cache import get_index_cache
+from hybrid_rag.adaptive import get_rerank_telemetry
+from hybrid_rag.reranker import get_reranker_pool
+from hybrid_rag.score_cache import get_rerank_score_cache
+from django.conf import settings
+import logging
 import os
 import glob
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
 
 # How many candidates Hybrid's sub-engines feed the cross-encoder. Kept above
 # the final depth so the reranker has something to actually rerank.
@@ -41,7 +54,29 @@ def apply_retrieval_depth(engine, top_k: int = DEFAULT_TOP_K) -> None:
         rag.top_k = top_k
 
 
+def retrieval_engine_key(method: str, config: dict) -> tuple:
+    """What determines a retrieval engine's contents, besides the document.
+
+    Pipelines whose keys match can share one engine; the LLM is not part of it.
+    """
+    return (
+        method,
+        config.get("model"),
+        config.get("chunk_strategy"),
+        config.get("chunk_size"),
+        config.get("overlap"),
+    )
+
+
 class RAGRegistry:
+    """The method × model matrix of pipelines, built on first use.
+
+    Constructing a pipeline is not free (API clients, NLTK corpora, and for
+    Hybrid a cross-encoder), and most processes only ever serve a few of the
+    nine. get_engine() builds the one it is asked for; initialize_engines()
+    builds them all, and warm_up() also loads the models behind them — for
+    RAG_EAGER_ENGINE_INIT and the warm_engines management command.
+    """
     _instance = None
 
     def __new__(cls):
@@ -55,67 +90,161 @@ class RAGRegistry:
             return
         
         self.engines = {}
-        self.initialize_engines()
+        # Retrieval engines keyed by retrieval_engine_key(); each is shared by
+        # every LLM variant of its method.
+        self.retrieval_engines = {}
+        self._shared_config = None
+        self._lock = threading.RLock()
+        self.enabled = os.getenv("RAG_DISABLE_ENGINE_INIT", "").lower() not in ("1", "true")
+        if not self.enabled:
+            print("RAG_DISABLE_ENGINE_INIT set — skipping engine initialization.")
+        elif os.getenv("RAG_EAGER_ENGINE_INIT", "").lower() in ("1", "true"):
+            self.warm_up()
         self._initialized = True
 
-    def initialize_engines(self):
-        """
-        Instantiates pipelines based on the PIPELINE_VARIANTS list.
-        """
-        if os.getenv("RAG_DISABLE_ENGINE_INIT", "").lower() in ("1", "true"):
-            print("RAG_DISABLE_ENGINE_INIT set — skipping engine initialization.")
-            return
+    def _shared(self) -> dict:
+        """Caches handed to every pipeline, created with the first one."""
+        if self._shared_config is None:
+            self._shared_config = {
+                # One cache for every pipeline: Dense and Hybrid embed the same
+                # chunks, and each LLM variant would otherwise embed them again.
+                "embedding_cache": get_embedding_cache(),
+                "query_cache": get_query_embedding_cache(),
+                # Loaded indexes, per document; every variant of a method finds
+                # the ones the others loaded.
+                "index_cache": get_index_cache(),
+                # One cross-encoder per model, whichever Hybrid engine asks.
+                "reranker_pool": get_reranker_pool(),
+                # Cross-encoder scores: every variant reranks the same candidates.
+                "rerank_cache": get_rerank_score_cache(),
+                # How often adaptive reranking skipped the cross-encoder.
+                "rerank_telemetry": get_rerank_telemetry(),
+            }
+        return self._shared_config
 
+    def _build_engine(self, method_name: str, llm_model: str):
+        """Construct and register one pipeline. Raises if it cannot be built."""
         class_map = {
             "Dense Retrieval": DenseRAGPipeline,
             "Sparse Retrieval": SparseRAGPipeline,
             "Hybrid Retrieval": HybridRAGPipeline,
         }
+        pipeline_class = class_map.get(method_name)
+        if not pipeline_class:
+            raise ValueError(f"No class mapping found for '{method_name}'.")
+
+        instance_config = {
+            "llm_model": llm_model,
+            "model": "openai/text-embedding-3-small",
+            # Large documents get an HNSW index; small ones stay exact
+            # (see DenseRAG.build_ann_index).
+            "index_type": "hnsw",
+            # int8 codes in memory; the float32 vectors stay memory-mapped
+            # from the saved index and are read only to re-score the top
+            # candidates. About a quarter of the resident memory, same
+            # ranking (see benchmarks/dense_quantization.py).
+            "vector_dtype": "int8",
+            # word_tokenize's tokens at several times its speed, without
+            # Punkt (see benchmarks/sparse_tokenizer.py).
+            "tokenizer": "fast",
+            # torch, or the ONNX Runtime cross-encoder (see
+            # benchmarks/reranker_backends.py).
+            "reranker_backend": settings.RERANKER_BACKEND,
+            "reranker_threads": settings.RERANKER_THREADS,
+            # Cross-encoder reranking, or a score-level fusion that skips
+            # it (see benchmarks/hybrid_fusion.py).
+            "fusion": settings.HYBRID_FUSION,
+            "fusion_weight": settings.HYBRID_FUSION_WEIGHT,
+            # Rerank only where the halves disagree (see
+            # benchmarks/adaptive_rerank.py).
+            "adaptive_rerank": settings.HYBRID_ADAPTIVE_RERANK,
+            **self._shared(),
+            "child_top_k": 10,
+            "top_k": 5, 
+            "chunk_strategy": "fixed",
+            "chunk_size": 512,
+            "overlap": 50,
+        }
 
-        for variant in CONFIG_VARIANTS:
-            method_name = variant["method"]
-            llm_model = variant["model"]
-            
-            pipeline_class = class_map.get(method_name)
-            
-            if not pipeline_class:
-                print(f"⚠️ Warning: No class mapping found for '{method_name}'. Skipping.")
-                continue
-
-            instance_config = {
-                "llm_model": llm_model,
-                "model": "openai/text-embedding-3-small",
-                "child_top_k": 10,
-                "top_k": 5, 
-                "chunk_strategy": "fixed",
-                "chunk_size": 512,
-                "overlap": 50,
-            }
+        # Only the LLM differs between the variants of a method, so they
+        # share one retrieval engine — and with it the loaded index.
+        engine_key = retrieval_engine_key(method_name, instance_config)
+        instance_config["rag_engine"] = self.retrieval_engines.get(engine_key)
 
-            if llm_model not in self.engines:
-                self.engines[llm_model] = {}
+        print(f"Initializing {method_name} with {llm_model}...")
+        pipeline = pipeline_class(instance_config)
+        self.engines.setdefault(llm_model, {})[method_name] = pipeline
+        self.retrieval_engines.setdefault(engine_key, pipeline.rag)
+        return pipeline
 
-            print(f"Initializing {method_name} with {llm_model}...")
-            try:
-                self.engines[llm_model][method_name] = pipeline_class(instance_config)
-            except Exception as e:
-                print(f"❌ Error initializing {method_name} ({llm_model}): {e}")
+    def initialize_engines(self):
+        """
+        Instantiates every pipeline in CONFIG_VARIANTS that isn't built yet.
+        """
+        if not self.enabled:
+            print("RAG_DISABLE_ENGINE_INIT set — skipping engine initialization.")
+            return
+
+        with self._lock:
+            for variant in CONFIG_VARIANTS:
+                method_name = variant["method"]
+                llm_model = variant["model"]
+                if method_name in self.engines.get(llm_model, {}):
+                    continue
+                try:
+                    self._build_engine(method_name, llm_model)
+                except Exception as e:
+                    print(f"❌ Error initializing {method_name} ({llm_model}): {e}")
 
         print("--- RAG ENGINES READY ---")
 
+    def warm_up(self) -> Dict[str, float]:
+        """Build every pipeline and load what their engines defer to first use.
+
+        Returns seconds per step, for the warm_engines command to report.
+        """
+        timings = {}
+        start = time.perf_counter()
+        self.initialize_engines()
+        timings["pipelines"] = time.perf_counter() - start
+
+        for key, engine in list(self.retrieval_engines.items()):
+            start = time.perf_counter()
+            try:
+                engine.warm_up()
+            except Exception as e:
+                print(f"❌ Error warming up {key[0]}: {e}")
+            timings[key[0]] = time.perf_counter() - start
+        return timings
+
     def get_engine(self, method: str, llm_model: str):
         """
-        Retrieves a pipeline.
+        Retrieves a pipeline, building it on first use.
         Usage: registry.get_engine("Dense Retrieval", "gpt-4o-mini")
         """
         try:
             return self.engines[llm_model][method]
         except KeyError:
-            available_methods = list(self.engines.get(llm_model, {}).keys())
-            raise ValueError(
-                f"Engine not found for Model: '{llm_model}' and Method: '{method}'. "
-                f"Available methods for this model: {available_methods}"
-            )
+            pass
+
+        if self.enabled and {"method": method, "model": llm_model} in CONFIG_VARIANTS:
+            with self._lock:
+                built = self.engines.get(llm_model, {}).get(method)
+                if built is not None:
+                    return built
+                try:
+                    return self._build_engine(method, llm_model)
+                except Exception as e:
+                    logger.error(f"Error initializing {method} ({llm_model}): {e}")
+                    raise ValueError(
+                        f"Engine for Model: '{llm_model}' and Method: '{method}' failed to initialize: {e}"
+                    ) from e
+
+        available_methods = list(self.engines.get(llm_model, {}).keys())
+        raise ValueError(
+            f"Engine not found for Model: '{llm_model}' and Method: '{method}'. "
+            f"Available methods for this model: {available_methods}"
+        )
 
 # Create a global instance
 rag_registry = RAGRegistry()
\ No newline at end of file
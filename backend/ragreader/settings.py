@@ -27,6 +27,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # ── API Keys ──────────────────────────────────────────
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Every LLM and embedding client shares one HTTP connection pool per process
+# (ai_handler/clients.py): at most OPENROUTER_MAX_CONNECTIONS at once, of
+# which OPENROUTER_MAX_KEEPALIVE stay open for OPENROUTER_KEEPALIVE_EXPIRY s.
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", 100))
+OPENROUTER_MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", 20))
+OPENROUTER_KEEPALIVE_EXPIRY = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", 60))
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", 120))
 
 # Set these in os.environ for libraries that read from env vars
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
@@ -122,6 +129,55 @@ CACHES = {
     }
 }
 
+# Persistent embedding cache keyed by (model, text hash), shared by every
+# pipeline (dense_rag/embedding_cache.py). "sqlite" keeps it under the user's
+# cache directory, outside the source tree; docker-compose points
+# EMBEDDING_CACHE_PATH at the vector store volume the web and worker
+# containers share.
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "sqlite")
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "ragreader",
+        "embedding_cache.sqlite3",
+    ),
+)
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+
+# In-process LRU of query embeddings (dense_rag/query_cache.py); 0 disables
+# it. With QUERY_EMBEDDING_CACHE_REDIS a miss falls through to Redis, so
+# workers share each other's query vectors for QUERY_EMBEDDING_CACHE_TTL s.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+QUERY_EMBEDDING_CACHE_REDIS = os.getenv("QUERY_EMBEDDING_CACHE_REDIS", "False") == "True"
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 3600))
+# Loaded indexes kept per process (common/index_cache.py), one per document,
+# method and chunk config; least recently used ones go past this budget.
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# Run each cross-encoder's predictions on one inference thread of its own
+# (hybrid_rag/reranker.py) instead of on the request threads.
+RERANKER_INFERENCE_THREAD = os.getenv("RERANKER_INFERENCE_THREAD", "False") == "True"
+# Cross-encoder scores kept per process (hybrid_rag/score_cache.py), keyed
+# by model, query and chunk; 0 disables the cache.
+RERANK_SCORE_CACHE_SIZE = int(os.getenv("RERANK_SCORE_CACHE_SIZE", 100_000))
+# Cross-encoder runtime for Hybrid: torch | onnx | onnx-int8. The ONNX ones
+# need `pip install "sentence-transformers[onnx]"` and export the model into
+# RERANKER_ONNX_DIR on first use (hybrid_rag/onnx_reranker.py);
+# RERANKER_THREADS caps ONNX Runtime's threads per process.
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+RERANKER_THREADS = int(os.getenv("RERANKER_THREADS", 0)) or None
+RERANKER_ONNX_DIR = os.getenv("RERANKER_ONNX_DIR", os.path.join(BASE_DIR, "vector_stores", "rerankers"))
+# How Hybrid combines its sparse and dense halves: rerank (the cross-encoder
+# orders their merged candidates) | rrf | minmax | zscore, which fuse the two
+# score arrays and skip the cross-encoder (hybrid_rag/fusion.py).
+# HYBRID_FUSION_WEIGHT is BM25's share of a minmax / zscore fusion.
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rerank")
+HYBRID_FUSION_WEIGHT = float(os.getenv("HYBRID_FUSION_WEIGHT", 0.5))
+# In rerank fusion, keep the chunks both halves rank in their top k as they
+# are and rerank only the rest (hybrid_rag/adaptive.py).
+HYBRID_ADAPTIVE_RERANK = os.getenv("HYBRID_ADAPTIVE_RERANK", "False") == "True"
+
+
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -1,13 +1,19 @@
 import json
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.core.cache import cache
 from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
 
+from ai_handler.clients import async_client_session
+
 from router.models import AnalysisBatch, AnalysisResult, GuestUser
 from rag.rag_service import apply_retrieval_depth, rag_registry
 from common.constant import build_variants, normalize_analysis_config
+from dense_rag.query_cache import get_query_embedding_cache
+from hybrid_rag.adaptive import get_rerank_telemetry
+from hybrid_rag.score_cache import get_rerank_score_cache
 
 import logging
 
@@ -39,7 +45,28 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             print(f"Error during disconnect: {e}")
 
+    def _answer_delta_sender(self, method: str, model: str):
+        """on_delta for arun_analysis: each answer delta becomes an
+        answer_delta frame."""
+
+        async def on_delta(delta: str) -> None:
+            await self.send(text_data=json.dumps({
+                "type": "answer_delta",
+                "batch_id": str(self.job_id),
+                "method": method,
+                "aiModel": model,
+                "delta": delta,
+            }))
+
+        return on_delta
+
     async def run_rag_pipeline(self):
+        # The pooled OpenRouter clients stay open while any batch on this
+        # event loop is running, and are closed after the last one.
+        async with async_client_session():
+            await self._run_batch()
+
+    async def _run_batch(self):
         try:
             input_data = await sync_to_async(cache.get)(f"job_input_{self.job_id}")
             
@@ -138,7 +165,11 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
                         }))
                         await sync_to_async(engine.init)(username)
 
-                    response = await sync_to_async(engine.run_analysis)(document_id, conversation_id)
+                    # Awaited here: the LLM and embedding calls go through the
+                    # shared async clients instead of holding a worker thread.
+                    response = await engine.arun_analysis(
+                        document_id, conversation_id, on_delta=self._answer_delta_sender(method, model)
+                    )
 
                     llm_answer = response.get("answer", "")
                     context = response.get("context", [])
@@ -194,6 +225,15 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
                         "progress": int(((index + 1) / total_variants) * 100)
                     }))
 
+            query_cache = get_query_embedding_cache()
+            if query_cache is not None:
+                logger.info(f"Query embedding cache after batch {self.job_id}: {query_cache.stats()}")
+            rerank_cache = get_rerank_score_cache()
+            if rerank_cache is not None:
+                logger.info(f"Rerank score cache after batch {self.job_id}: {rerank_cache.stats()}")
+            if settings.HYBRID_ADAPTIVE_RERANK:
+                logger.info(f"Adaptive reranking after batch {self.job_id}: {get_rerank_telemetry().stats()}")
+
             await self.send(text_data=json.dumps({"status": "COMPLETE", "progress": 100}))
             await self.close()
         except Exception as e:
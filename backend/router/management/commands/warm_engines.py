@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from hybrid_rag.reranker import get_reranker_pool
+from rag.rag_service import rag_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Build every RAG pipeline and load the models they defer to first use "
+        "(cross-encoders, NLTK corpora), reporting how long each step took. "
+        "Run it at image build or deploy time to fill the model caches; set "
+        "RAG_EAGER_ENGINE_INIT=True to do the same inside each serving process."
+    )
+
+    def handle(self, *args, **options):
+        if not rag_registry.enabled:
+            self.stderr.write("RAG_DISABLE_ENGINE_INIT is set; nothing to warm up.")
+            return
+
+        timings = rag_registry.warm_up()
+        for step, seconds in timings.items():
+            self.stdout.write(f"{step:<20} {seconds:7.2f}s")
+        for name, model in get_reranker_pool().stats()["models"].items():
+            state = f"{model['nbytes'] / 2**20:.1f} MiB" if model["loaded"] else "not loaded"
+            self.stdout.write(f"reranker {name}: {state}")
+        built = sum(len(methods) for methods in rag_registry.engines.values())
+        self.stdout.write(self.style.SUCCESS(f"{built} pipelines ready in {sum(timings.values()):.2f}s."))
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router', '0012_analysisbatch_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='timings',
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text='Seconds per indexing stage, added as each one finishes.',
+            ),
+        ),
+    ]
@@ -96,6 +96,11 @@ class Job(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
     progress = models.PositiveSmallIntegerField(default=0)
+    timings = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Seconds per indexing stage, added as each one finishes.",
+    )
     user = models.ForeignKey(GuestUser, on_delete=models.CASCADE)
     document = models.ForeignKey(Document, on_delete=models.CASCADE, null=True, blank=True) 
     vectorstore = models.ForeignKey(VectorStore, on_delete=models.CASCADE, null=True, blank=True)
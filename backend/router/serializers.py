@@ -3,6 +3,8 @@ from rest_framework import serializers
 class QuerySerializer(serializers.Serializer):
     USER = serializers.CharField()
     QUERY = serializers.CharField()
+    # Stream the answer as newline-delimited JSON instead of one response.
+    STREAM = serializers.BooleanField(required=False, default=False)
 
 class InsertURLSerializer(serializers.Serializer):
     USER = serializers.CharField()
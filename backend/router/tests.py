@@ -6,14 +6,19 @@ These tests are hermetic: no Redis, no network, no LLM keys.
 RAG_DISABLE_ENGINE_INIT must be set before the URLconf (and therefore
 rag.rag_service) is imported, which is why it is set at module import time.
 """
+import json
 import os
+import shutil
 import tempfile
+import threading
+import time
 from unittest import mock
 
 os.environ.setdefault("RAG_DISABLE_ENGINE_INIT", "1")
 
 import numpy as np
-from django.test import TestCase, override_settings
+from asgiref.sync import async_to_sync
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from router.models import (
     GuestUser,
@@ -172,6 +177,111 @@ class QueryEndpointTests(TestCase):
         self.assertTrue(ConversationHistory.objects.filter(user=user).exists())
 
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CACHES=LOCMEM_CACHE)
+class QueryStreamingTests(TransactionTestCase):
+    """STREAM queries through Django's ASGI handler, as daphne serves them.
+
+    TransactionTestCase: the view reaches the database from sync_to_async
+    threads, so the fixtures have to be committed to be visible.
+    """
+
+    def setUp(self):
+        self.user = make_user("alice")
+        self.document = Document.objects.create(user=self.user, name="d", source_type="text")
+        Job.objects.create(user=self.user, status=Job.Status.READY, document=self.document)
+
+    def _stream(self, engine, on_line=None):
+        """The NDJSON lines of a streamed query; `on_line(line)` sees each
+        as its body message arrives."""
+        from asgiref.testing import ApplicationCommunicator
+        from django.core.handlers.asgi import ASGIHandler
+
+        import router.views as views
+
+        body = json.dumps({"USER": "alice", "QUERY": "meaning of life?", "STREAM": True}).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/api/v1/query/", "raw_path": b"/api/v1/query/",
+            "query_string": b"", "root_path": "", "client": ("127.0.0.1", 5000), "server": ("testserver", 80),
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+
+        async def request():
+            communicator = ApplicationCommunicator(ASGIHandler(), scope)
+            await communicator.send_input({"type": "http.request", "body": body, "more_body": False})
+            start = await communicator.receive_output(5)
+            self.assertEqual(start["status"], 200)
+            self.assertIn((b"Content-Type", b"application/x-ndjson"), start["headers"])
+            lines = []
+            while True:
+                message = await communicator.receive_output(5)
+                for line in message.get("body", b"").decode().splitlines():
+                    lines.append(json.loads(line))
+                    if on_line:
+                        on_line(lines[-1])
+                if not message.get("more_body"):
+                    break
+            await communicator.wait(5)
+            return lines
+
+        with mock.patch.object(views.rag_registry, "get_engine", return_value=engine):
+            return async_to_sync(request)()
+
+    def test_a_streamed_query_sends_deltas_then_the_saved_answer(self):
+        def run(username, query, on_delta=None):
+            for delta in ("4", "2"):
+                on_delta(delta)
+            return {"answer": "42", "context": [{"text": "chunk text", "chunk_id": 1, "score": 0.9}], "chunk_ids": [1]}
+
+        engine = mock.Mock()
+        engine.run.side_effect = run
+        lines = self._stream(engine)
+
+        self.assertEqual(lines[:2], [{"type": "answer_delta", "delta": "4"}, {"type": "answer_delta", "delta": "2"}])
+        self.assertEqual(lines[2]["type"], "done")
+        self.assertEqual(lines[2]["data"]["answer"], "42")
+        conversation = Conversation.objects.get(user=self.user)
+        self.assertEqual(lines[2]["data"]["conversation_id"], conversation.pk)
+        self.assertEqual(conversation.response, "42")
+
+    def test_each_delta_is_sent_before_the_answer_is_finished(self):
+        first_sent = threading.Event()
+
+        def run(username, query, on_delta=None):
+            on_delta("Hel")
+            # Blocks until the client has the first line: a buffered
+            # response would never send it.
+            if not first_sent.wait(5):
+                raise AssertionError("the first delta was not sent while the answer was pending")
+            on_delta("lo")
+            return {"answer": "Hello", "context": [], "chunk_ids": []}
+
+        engine = mock.Mock()
+        engine.run.side_effect = run
+
+        def on_line(line):
+            if line == {"type": "answer_delta", "delta": "Hel"}:
+                first_sent.set()
+
+        lines = self._stream(engine, on_line)
+
+        self.assertTrue(first_sent.is_set())
+        self.assertEqual([line["type"] for line in lines], ["answer_delta", "answer_delta", "done"])
+
+    def test_a_failing_streamed_query_ends_with_an_error_line(self):
+        engine = mock.Mock()
+        engine.run.side_effect = RuntimeError("OpenRouter down")
+
+        lines = self._stream(engine)
+
+        self.assertEqual(lines, [{"type": "error", "error": "OpenRouter down"}])
+        self.assertFalse(Conversation.objects.filter(user=self.user).exists())
+
+
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CACHES=LOCMEM_CACHE)
 class JobAndConversationEndpointTests(TestCase):
     def test_job_status_not_found(self):
@@ -374,6 +484,243 @@ class HybridRetrieveContractTests(TestCase):
         scores = engine.get_retrieved_scores("q")
         self.assertAlmostEqual(scores["scores"]["a"], 2 / 61)
 
+    def test_sparse_and_dense_halves_run_at_the_same_time(self):
+        engine = self._make_engine()
+        both_running = threading.Barrier(2, timeout=5)
+
+        def half(results):
+            def retrieve(query):
+                both_running.wait()
+                return results
+            return retrieve
+
+        engine.sparse_engine.retrieve.side_effect = half([{"text": "a", "chunk_id": 1, "score": 1.0}])
+        engine.dense_engine.retrieve.side_effect = half([{"text": "b", "chunk_id": 2, "score": 0.9}])
+        engine._cross_encoder.predict.return_value = [0.9, 0.1]
+
+        self.assertEqual([r["chunk_id"] for r in engine.retrieve("q")], [1, 2])
+
+    def test_candidates_keep_sparse_then_dense_order_whichever_finishes_first(self):
+        engine = self._make_engine()
+
+        def slow_sparse(query):
+            time.sleep(0.05)
+            return [{"text": "a", "chunk_id": 1, "score": 1.0}]
+
+        engine.sparse_engine.retrieve.side_effect = slow_sparse
+        engine.dense_engine.retrieve.return_value = [
+            {"text": "b", "chunk_id": 2, "score": 0.9},
+            {"text": "a", "chunk_id": 1, "score": 0.8},
+        ]
+        engine._cross_encoder.predict.return_value = [0.5, 0.5]
+
+        engine.retrieve("q")
+        pairs = engine._cross_encoder.predict.call_args.args[0]
+        self.assertEqual(pairs, [("q", "a"), ("q", "b")])
+
+    def test_rerank_predicts_longest_first_in_batches_and_keeps_the_order(self):
+        engine = self._make_engine()
+        engine.rerank_batch_size = 8
+        engine._cross_encoder.predict.side_effect = lambda pairs, batch_size: [len(text) for _q, text in pairs]
+        candidates = [{"text": text, "chunk_id": i, "score": 0.0} for i, text in enumerate(["bb", "dddd", "a", "ccc"])]
+
+        ranked = engine._rerank("q", candidates)
+
+        pairs = engine._cross_encoder.predict.call_args.args[0]
+        self.assertEqual([text for _q, text in pairs], ["dddd", "ccc", "bb", "a"])
+        self.assertEqual(engine._cross_encoder.predict.call_args.kwargs, {"batch_size": 8})
+        self.assertEqual([(r["text"], r["score"]) for r in ranked], [("dddd", 4.0), ("ccc", 3.0), ("bb", 2.0), ("a", 1.0)])
+
+    def test_cached_scores_are_not_predicted_again(self):
+        from hybrid_rag.score_cache import RerankScoreCache
+
+        engine = self._make_engine()
+        engine.rerank_cache = RerankScoreCache()
+        engine._cross_encoder.name = "cross-encoder/x"
+        engine._cross_encoder.predict.side_effect = lambda pairs, batch_size: [0.5] * len(pairs)
+        first = [{"text": "a", "chunk_id": 1, "score": 0.0}, {"text": "b", "chunk_id": 2, "score": 0.0}]
+        second = first[1:] + [{"text": "c", "chunk_id": 3, "score": 0.0}, {"text": "d", "chunk_id": None, "score": 0.0}]
+
+        engine._rerank("q", first)
+        ranked = engine._rerank(" q ", second)
+
+        pairs = engine._cross_encoder.predict.call_args.args[0]
+        self.assertEqual(sorted(text for _q, text in pairs), ["c", "d"])
+        self.assertEqual([r["score"] for r in ranked], [0.5, 0.5, 0.5])
+        self.assertEqual(engine.rerank_cache.stats()["hits"], 1)
+
+    def test_parallel_retrieval_can_be_turned_off(self):
+        engine = self._make_engine()
+        engine.parallel_retrieval = False
+        engine.sparse_engine.retrieve.return_value = []
+        threads = []
+        engine.dense_engine.retrieve.side_effect = lambda q: threads.append(threading.current_thread()) or []
+
+        self.assertEqual(engine.retrieve("q"), [])
+        self.assertEqual(threads, [threading.current_thread()])
+
+
+class HybridFusionTests(TestCase):
+    """Score-level fusion over the halves' full score arrays (hybrid_rag.fusion)."""
+
+    def _make_engine(self, fusion, sparse_scores, dense_scores):
+        from hybrid_rag.hybrid_rag import HybridRAG
+
+        engine = HybridRAG.__new__(HybridRAG)
+        engine.final_top_k = 2
+        engine.child_top_k = 3
+        engine.rrf_k = 60
+        engine.fusion = fusion
+        engine.sparse_engine = mock.Mock()
+        engine.dense_engine = mock.Mock()
+        engine.sparse_engine.documents = ["a", "b", "c", "d"]
+        engine.sparse_engine.document_metadata = [{"chunk_id": 10 + i} for i in range(4)]
+        # One shared store, as share_chunks() leaves aligned halves.
+        engine.dense_engine.documents = engine.sparse_engine.documents
+        engine.sparse_engine.score_all.return_value = np.array(sparse_scores, dtype=np.float64)
+        engine.dense_engine.score_all.return_value = np.array(dense_scores, dtype=np.float64)
+        engine._cross_encoder = mock.Mock()
+        return engine
+
+    def test_rrf_matches_the_rank_formula(self):
+        from hybrid_rag.fusion import rrf
+
+        fused = rrf(np.array([3.0, 0.0, 1.0, 2.0]), np.array([0.1, 0.9, 0.5, 0.2]), k=60, depth=3)
+
+        # sparse ranks a, d, c (b scores 0); dense ranks b, c, d.
+        expected = [1 / 61, 1 / 61, 1 / 63 + 1 / 62, 1 / 62 + 1 / 63]
+        np.testing.assert_allclose(fused, expected)
+
+    def test_minmax_and_zscore_weight_the_normalized_halves(self):
+        from hybrid_rag.fusion import fuse, normalize
+
+        sparse, dense = np.array([0.0, 5.0, 10.0]), np.array([0.2, 0.6, 0.4])
+        np.testing.assert_allclose(normalize(sparse, "minmax"), [0.0, 0.5, 1.0])
+        np.testing.assert_allclose(fuse("minmax", sparse, dense, weight=0.25), [0.0, 0.875, 0.625])
+        z = fuse("zscore", sparse, dense, weight=1.0)
+        self.assertAlmostEqual(z.mean(), 0.0)
+        self.assertAlmostEqual(z.std(), 1.0)
+        np.testing.assert_array_equal(normalize(np.ones(3), "zscore"), np.zeros(3))
+
+    def test_fusion_skips_the_cross_encoder(self):
+        engine = self._make_engine("minmax", [0.0, 1.0, 4.0, 2.0], [0.9, 0.1, 0.5, 0.3])
+
+        results = engine.retrieve("q")
+
+        self.assertEqual([r["chunk_id"] for r in results], [12, 10])
+        self.assertEqual(results[0]["text"], "c")
+        engine._cross_encoder.predict.assert_not_called()
+        engine.sparse_engine.retrieve.assert_not_called()
+
+    def test_rrf_drops_chunks_neither_half_ranked(self):
+        engine = self._make_engine("rrf", [0.0, 0.0, 2.0, 0.0], [0.0, 0.0, 0.0, 0.5])
+        engine.child_top_k = 1
+        engine.final_top_k = 3
+
+        self.assertEqual([r["chunk_id"] for r in engine.retrieve("q")], [12, 13])
+        engine.dense_engine.score_all.return_value = np.array([])
+        self.assertEqual([r["chunk_id"] for r in engine.retrieve("q")], [12])
+
+    def test_an_unembeddable_query_falls_back_to_the_sparse_ranking(self):
+        engine = self._make_engine("zscore", [0.0, 3.0, 1.0, 2.0], [])
+
+        self.assertEqual([r["chunk_id"] for r in engine.retrieve("q")], [11, 13])
+
+    def test_batch_matches_single_queries(self):
+        engine = self._make_engine("zscore", [0.0, 3.0, 1.0, 2.0], [0.2, 0.1, 0.9, 0.4])
+        engine.sparse_engine.score_all_batch.return_value = np.array([[0.0, 3.0, 1.0, 2.0]] * 2)
+
+        self.assertEqual(engine.retrieve_batch(["q", "r"]), [engine.retrieve("q")] * 2)
+
+    def test_halves_indexing_different_chunks_are_reranked_instead(self):
+        engine = self._make_engine("minmax", [0.0, 1.0, 4.0, 2.0], [0.9, 0.1, 0.5, 0.3])
+        engine.dense_engine.documents = ["a", "b", "d", "c"]
+        engine.sparse_engine.indexed_chunk_ids.return_value = [10, 11, 12, 13]
+        engine.dense_engine.indexed_chunk_ids.return_value = [10, 11, 13, 12]
+        engine.sparse_engine.retrieve.return_value = [{"text": "c", "chunk_id": 12, "score": 4.0}]
+        engine.dense_engine.retrieve.return_value = [{"text": "a", "chunk_id": 10, "score": 0.9}]
+        engine._cross_encoder.predict.side_effect = lambda pairs, batch_size: [
+            {"a": 2.0, "c": 1.0}[text] for _, text in pairs
+        ]
+
+        results = engine.retrieve("q")
+
+        self.assertEqual([(r["chunk_id"], r["score"]) for r in results], [(10, 2.0), (12, 1.0)])
+        engine.sparse_engine.score_all.assert_not_called()
+        self.assertIsInstance(engine.get_retrieved_scores("q")["scores"], dict)
+
+    def test_unknown_fusion_is_rejected(self):
+        from hybrid_rag.hybrid_rag import HybridRAG
+
+        with self.assertRaises(ValueError):
+            HybridRAG({"fusion": "borda"})
+
+
+class AdaptiveRerankTests(TestCase):
+    """hybrid_rag.adaptive: rerank only what the two halves disagree on."""
+
+    def _make_engine(self, sparse, dense, top_k=2):
+        from hybrid_rag.adaptive import RerankTelemetry
+        from hybrid_rag.hybrid_rag import HybridRAG
+
+        engine = HybridRAG.__new__(HybridRAG)
+        engine.final_top_k = top_k
+        engine.child_top_k = 10
+        engine.rrf_k = 60
+        engine.adaptive_rerank = True
+        engine.rerank_telemetry = RerankTelemetry()
+        engine.sparse_engine = mock.Mock()
+        engine.dense_engine = mock.Mock()
+        engine.sparse_engine.retrieve.return_value = [{"text": t, "chunk_id": ord(t), "score": 1.0} for t in sparse]
+        engine.dense_engine.retrieve.return_value = [{"text": t, "chunk_id": ord(t), "score": 0.5} for t in dense]
+        engine._cross_encoder = mock.Mock()
+        engine._cross_encoder.predict.side_effect = lambda pairs, batch_size: [ord(text) for _q, text in pairs]
+        return engine
+
+    def test_agreeing_halves_skip_the_cross_encoder(self):
+        engine = self._make_engine("abc", "bad")
+
+        results = engine.retrieve("q")
+
+        self.assertEqual([r["text"] for r in results], ["a", "b"])
+        self.assertAlmostEqual(results[0]["fused_score"], 1 / 61 + 1 / 62)
+        # Unscored by the cross-encoder, and not left with its half's score.
+        self.assertNotIn("score", results[0])
+        engine._cross_encoder.predict.assert_not_called()
+        stats = engine.rerank_telemetry.stats()
+        self.assertEqual((stats["skipped"], stats["pairs_scored"], stats["pairs_saved"]), (1, 0, 4))
+
+    def test_only_the_uncertain_tail_is_reranked(self):
+        engine = self._make_engine("abcd", "aefg", top_k=3)
+
+        results = engine.retrieve("q")
+
+        # "a" is agreed; two open slots leave room for four tail candidates.
+        pairs = engine._cross_encoder.predict.call_args.args[0]
+        self.assertEqual(sorted(text for _q, text in pairs), ["b", "c", "e", "f"])
+        self.assertEqual([r["text"] for r in results], ["a", "f", "e"])
+        self.assertEqual(engine.rerank_telemetry.stats()["partial"], 1)
+        # `score` is the cross-encoder's, as when every candidate is reranked;
+        # RRF is `fused_score`, head and tail alike.
+        self.assertEqual([r["fused_score"] for r in results], [2 / 61, 1 / 63, 1 / 62])
+        self.assertNotIn("score", results[0])
+        self.assertEqual([r["score"] for r in results[1:]], [ord("f"), ord("e")])
+
+    def test_disagreeing_halves_rerank_everything(self):
+        engine = self._make_engine("ab", "cd")
+
+        self.assertEqual([r["text"] for r in engine.retrieve("q")], ["d", "c"])
+        stats = engine.rerank_telemetry.stats()
+        self.assertEqual((stats["full"], stats["pairs_scored"], stats["skip_rate"]), (1, 4, 0.0))
+
+    def test_adaptive_reranking_is_off_by_default(self):
+        engine = self._make_engine("ab", "ab")
+        engine.adaptive_rerank = False
+
+        engine.retrieve("q")
+        engine._cross_encoder.predict.assert_called_once()
+        self.assertEqual(engine.rerank_telemetry.stats()["queries"], 0)
+
 
 class DenseRetrieveContractTests(TestCase):
     def _make_engine(self):
@@ -419,6 +766,875 @@ class DenseRetrieveContractTests(TestCase):
         with self.assertRaises(RuntimeError):
             engine.index_documents([{"text": "a", "chunk_id": 1}])
 
+    def test_vectors_are_stored_unit_normalized_float32(self):
+        engine = self._make_engine()
+        engine.set_vectors([[3.0, 4.0], [0.0, 0.0]])
+        self.assertEqual(engine.document_vectors.dtype, np.float32)
+        np.testing.assert_allclose(engine.document_vectors[0], [0.6, 0.8], rtol=1e-6)
+        # A zero vector stays zero instead of turning into NaN.
+        np.testing.assert_array_equal(engine.document_vectors[1], [0.0, 0.0])
+
+    def test_scores_are_cosine_similarities_whatever_the_magnitude(self):
+        engine = self._make_engine()
+        engine.documents = ["a", "b", "c"]
+        engine.document_metadata = [{"chunk_id": 1}, {"chunk_id": 2}, {"chunk_id": 3}]
+        engine.set_vectors([[10.0, 0.0], [1.0, 1.0], [0.0, 0.1]])
+        engine.client.embeddings.create.return_value = mock.Mock(
+            data=[mock.Mock(embedding=[5.0, 0.0])]
+        )
+        results = engine.retrieve("q")
+        self.assertEqual([r["chunk_id"] for r in results], [1, 2])
+        self.assertAlmostEqual(results[0]["score"], 1.0, places=5)
+        self.assertAlmostEqual(results[1]["score"], 2 ** -0.5, places=5)
+
+
+class TopKIndicesTests(TestCase):
+    def test_matches_a_full_sort(self):
+        from common.ranking import top_k_indices
+
+        scores = np.random.default_rng(3).standard_normal(1000)
+        np.testing.assert_array_equal(
+            top_k_indices(scores, 10), np.argsort(-scores, kind="stable")[:10]
+        )
+
+    def test_k_larger_than_the_corpus_and_ties(self):
+        from common.ranking import top_k_indices
+
+        np.testing.assert_array_equal(top_k_indices(np.array([0.5, 0.9, 0.5]), 10), [1, 0, 2])
+        self.assertEqual(len(top_k_indices(np.array([]), 3)), 0)
+
+
+
+class BM25IndexTests(TestCase):
+    def _corpus(self, n=300, seed=0):
+        rng = np.random.default_rng(seed)
+        vocab = [f"w{i}" for i in range(200)]
+        # Zipf-ish: a few terms in most documents, a long tail in a few.
+        return [
+            [vocab[min(int(t), 199)] for t in rng.zipf(1.3, size=rng.integers(0, 30))]
+            for _ in range(n)
+        ]
+
+    def test_scores_match_rank_bm25(self):
+        from rank_bm25 import BM25Okapi
+        from sparse_rag.bm25 import BM25Index
+
+        corpus = self._corpus()
+        reference, index = BM25Okapi(corpus), BM25Index.build(corpus)
+        for query in (["w1"], ["w3", "w40", "w3"], ["w150", "unknown"], []):
+            np.testing.assert_allclose(index.get_scores(query), reference.get_scores(query), rtol=1e-6, atol=1e-6)
+
+    def test_top_k_ranks_only_documents_with_a_query_term(self):
+        from sparse_rag.bm25 import BM25Index
+
+        index = BM25Index.build(self._corpus())
+        scores = index.get_scores(["w2", "w7"])
+        ids, top = index.top_k(["w2", "w7"], 5)
+        np.testing.assert_array_equal(ids, np.argsort(-scores, kind="stable")[:5])
+        np.testing.assert_allclose(top, scores[ids])
+        self.assertEqual(len(index.top_k(["unknown"], 5)[0]), 0)
+
+    def test_a_rank_bm25_index_converts_exactly(self):
+        from rank_bm25 import BM25Okapi
+        from sparse_rag.bm25 import BM25Index
+
+        reference = BM25Okapi(self._corpus(seed=1))
+        converted = BM25Index.from_okapi(reference)
+        np.testing.assert_allclose(converted.get_scores(["w1", "w9"]), reference.get_scores(["w1", "w9"]), rtol=1e-6)
+
+    def test_a_batch_scores_like_single_queries(self):
+        from sparse_rag.bm25 import BM25Index
+
+        index = BM25Index.build(self._corpus())
+        queries = [["w1"], ["w3", "w40", "w3"], ["unknown"], []]
+        np.testing.assert_allclose(
+            index.get_scores_batch(queries), [index.get_scores(q) for q in queries], rtol=1e-5, atol=1e-5
+        )
+        for query, (ids, scores) in zip(queries, index.top_k_batch(queries, 5)):
+            expected_ids, expected_scores = index.top_k(query, 5)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_the_matrix_shares_the_postings(self):
+        from sparse_rag.bm25 import BM25Index
+
+        index = BM25Index.build(self._corpus())
+        self.assertTrue(np.shares_memory(index.matrix.data, index.weights))
+        self.assertTrue(np.shares_memory(index.matrix.indices, index.doc_ids))
+
+    def test_added_documents_score_like_a_fresh_build(self):
+        from sparse_rag.bm25 import BM25Index
+
+        corpus, more = self._corpus(), self._corpus(n=40, seed=2) + [["brand", "new", "w1"]]
+        index = BM25Index.build(corpus)
+        index = index.add(more)
+        fresh = BM25Index.build(corpus + more)
+        self.assertEqual(index.vocabulary, fresh.vocabulary)
+        for query in (["w1"], ["w3", "w40", "w3"], ["brand"], ["unknown"]):
+            np.testing.assert_allclose(index.get_scores(query), fresh.get_scores(query), rtol=1e-6, atol=1e-6)
+
+    def test_removed_documents_score_like_a_fresh_build(self):
+        from sparse_rag.bm25 import BM25Index
+
+        corpus = self._corpus() + [["only", "here"]]
+        removed = {0, 5, 17, len(corpus) - 1}
+        index = BM25Index.build(corpus)
+        index = index.remove(removed)
+        fresh = BM25Index.build([doc for i, doc in enumerate(corpus) if i not in removed])
+        self.assertNotIn("only", index.vocabulary)
+        for query in (["w1"], ["w3", "w40", "w3"], ["only"]):
+            np.testing.assert_allclose(index.get_scores(query), fresh.get_scores(query), rtol=1e-6, atol=1e-6)
+
+    def test_an_empty_corpus_scores_nothing(self):
+        from sparse_rag.bm25 import BM25Index
+
+        index = BM25Index.build([[], []])
+        np.testing.assert_array_equal(index.get_scores(["a"]), [0.0, 0.0])
+
+
+class SparseTokenizerTests(TestCase):
+    # Punkt needs a downloaded model; preserve_line=True skips only the
+    # sentence split, which finds nothing once punctuation is stripped.
+    TEXTS = [
+        "The quick brown fox -- it cannot, won't (and can't) jump!",
+        "I'm gonna say: gimme 3.14 or lemme go; wanna? gotta... wannabe gonnabe",
+        "Naïve café résumé \u00a0spaces\tand\nnewlines, U.S.A. e-mail #42 x_y",
+        "  ",
+        "CANNOT Cannot cannot-do can not",
+    ]
+
+    def _engines(self, stop_words=(), **config):
+        from sparse_rag.sparse_rag import SparseRAG
+
+        nltk_engine = SparseRAG({"remove_stop_words": False})
+        nltk_engine.stop_words = set(stop_words)
+        fast_engine = SparseRAG({"remove_stop_words": False, "tokenizer": "fast", **config})
+        fast_engine._fast_tokenizer.stop_words = frozenset(stop_words)
+        return nltk_engine, fast_engine
+
+    def _word_tokenize(self, text):
+        from nltk.tokenize import word_tokenize
+
+        return word_tokenize(text, preserve_line=True)
+
+    def test_fast_tokens_match_word_tokenize(self):
+        rng = np.random.default_rng(0)
+        alphabet = list("abcxyzABC019 .,'-\n\x1c!?é") + [" cannot ", " wanna ", " gimme ", " the "]
+        texts = self.TEXTS + ["".join(rng.choice(alphabet, size=200)) for _ in range(50)]
+        for stop_words in ((), ("the", "not", "me", "s")):
+            nltk_engine, fast_engine = self._engines(stop_words)
+            with mock.patch("sparse_rag.sparse_rag.word_tokenize", side_effect=self._word_tokenize):
+                for text in texts:
+                    self.assertEqual(fast_engine._tokenize(text), nltk_engine._tokenize(text), text)
+
+    def test_tokens_are_interned_and_words_cached(self):
+        _, engine = self._engines()
+        first, second = engine._tokenize("Alpha beta alpha"), engine._tokenize("alpha, BETA")
+        self.assertIs(first[0], first[2])
+        self.assertIs(first[0], second[0])
+        self.assertEqual(set(engine._fast_tokenizer._cache), {"alpha", "beta"})
+
+    def test_stemming_runs_after_the_stop_word_filter(self):
+        _, engine = self._engines(stop_words=("having",), stem=True)
+        self.assertEqual(engine._tokenize("Having running runners cannot"), ["run", "runner", "can", "not"])
+
+    def test_stemming_needs_the_fast_tokenizer(self):
+        from sparse_rag.sparse_rag import SparseRAG
+
+        with self.assertRaises(ValueError):
+            SparseRAG({"remove_stop_words": False, "stem": True})
+        with self.assertRaises(ValueError):
+            SparseRAG({"remove_stop_words": False, "tokenizer": "spacy"})
+
+    def _pooled_engine(self, **config):
+        from sparse_rag.sparse_rag import SparseRAG
+
+        return SparseRAG({
+            "remove_stop_words": False,
+            "tokenizer": "fast",
+            "tokenize_workers": 2,
+            "tokenize_batch_size": 40,
+            "parallel_tokenize_min_chars": 0,
+            **config,
+        })
+
+    def _assert_same_index(self, left, right):
+        self.assertEqual(left.vocabulary, right.vocabulary)
+        for name in ("indptr", "doc_ids", "term_freqs", "doc_len", "weights"):
+            np.testing.assert_array_equal(getattr(left, name), getattr(right, name))
+
+    def test_slices_encoded_apart_merge_into_the_whole(self):
+        from sparse_rag.bm25 import encode_corpus, merge_encoded
+
+        rng = np.random.default_rng(1)
+        corpus = [[f"w{t}" for t in rng.zipf(1.3, size=rng.integers(0, 20))] for _ in range(100)]
+        parts = [encode_corpus(corpus[i:i + 30]) for i in range(0, 100, 30)]
+        merged = merge_encoded((list(vocabulary), ids, lengths) for vocabulary, ids, lengths in parts)
+        whole = encode_corpus(corpus)
+        self.assertEqual(merged[0], whole[0])
+        np.testing.assert_array_equal(merged[1], whole[1])
+        np.testing.assert_array_equal(merged[2], whole[2])
+
+    def test_a_large_document_is_tokenized_in_processes_to_the_same_index(self):
+        documents = [
+            {"text": " ".join(self.TEXTS[i % len(self.TEXTS)] for _ in range(i % 7)) + f" doc{i}", "chunk_id": i}
+            for i in range(200)
+        ]
+        pooled = self._pooled_engine()
+        serial = self._pooled_engine(tokenize_workers=1)
+        with mock.patch.object(pooled, "_encode_in_processes", wraps=pooled._encode_in_processes) as encode:
+            pooled.index_documents(documents)
+        serial.index_documents(documents)
+
+        encode.assert_called_once()
+        self._assert_same_index(pooled.bm25, serial.bm25)
+        self.assertEqual(set(pooled.index_timings), {"tokenize", "bm25"})
+
+    def test_tokenizing_falls_back_to_one_process_when_the_pool_fails(self):
+        documents = [{"text": f"chunk number {i}", "chunk_id": i} for i in range(100)]
+        pooled, serial = self._pooled_engine(), self._pooled_engine(tokenize_workers=1)
+        with mock.patch("sparse_rag.sparse_rag.ProcessPoolExecutor", side_effect=OSError("no processes")):
+            pooled.index_documents(documents)
+        serial.index_documents(documents)
+        self._assert_same_index(pooled.bm25, serial.bm25)
+
+    def test_small_documents_and_daemon_processes_tokenize_in_this_process(self):
+        documents = ["short text"] * 100
+        self.assertFalse(self._pooled_engine(parallel_tokenize_min_chars=10**9)._use_tokenizer_pool(documents))
+        with mock.patch("multiprocessing.current_process") as current:
+            current.return_value.daemon = True
+            self.assertFalse(self._pooled_engine()._use_tokenizer_pool(documents))
+        self.assertTrue(self._pooled_engine()._use_tokenizer_pool(documents))
+
+    def test_an_index_saved_unstemmed_does_not_load_into_a_stemming_engine(self):
+        from common.index_store import IndexFormatError
+        from sparse_rag.sparse_rag import SparseRAG
+
+        _, plain = self._engines()
+        plain.index_documents([{"text": t, "chunk_id": i} for i, t in enumerate(["running dogs", "cats", "birds"], 1)])
+        stemming = SparseRAG({"remove_stop_words": False, "tokenizer": "fast", "stem": True})
+        with tempfile.TemporaryDirectory() as directory:
+            plain.save_index(directory)
+            with self.assertRaises(IndexFormatError):
+                stemming.load_index(directory)
+            _, other = self._engines()
+            other.load_index(directory)
+            self.assertEqual([r["chunk_id"] for r in other.retrieve("dogs")], [1])
+
+
+class ChunkStoreTests(TestCase):
+    def test_round_trips_through_disk_memory_mapped(self):
+        from common.chunk_store import ChunkStore
+
+        texts = ["alpha", "", "naïve café ☕", "omega"]
+        store = ChunkStore.from_texts(texts, [7, None, 9, 10])
+        directory = tempfile.mkdtemp(prefix="ragreader-test-chunks-")
+        store.save(directory)
+
+        loaded = ChunkStore.load(directory)
+        self.assertEqual(loaded, texts)
+        self.assertEqual(loaded[np.int64(2)], "naïve café ☕")
+        self.assertEqual(loaded[-1], "omega")
+        self.assertEqual(list(loaded.metadata), [
+            {"chunk_id": 7}, {"chunk_id": None}, {"chunk_id": 9}, {"chunk_id": 10},
+        ])
+        with self.assertRaises(IndexError):
+            loaded[4]
+
+    def test_a_truncated_buffer_is_rejected(self):
+        from common.chunk_store import CHUNKS_FILE, ChunkStore
+
+        directory = tempfile.mkdtemp(prefix="ragreader-test-chunks-")
+        ChunkStore.from_texts(["alpha", "beta"]).save(directory)
+        with open(os.path.join(directory, CHUNKS_FILE), "r+b") as f:
+            f.truncate(3)
+        with self.assertRaises(ValueError):
+            ChunkStore.load(directory)
+
+
+class DenseAnnIndexTests(TestCase):
+    """The FAISS path must agree with exact search and stay out of the way
+    for corpora too small to need it."""
+
+    def _make_engine(self, index_type="hnsw", ann_min_corpus=10):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({
+                "top_k": 3,
+                "index_type": index_type,
+                "ann_min_corpus": ann_min_corpus,
+            })
+        vectors = np.random.default_rng(0).standard_normal((50, 8))
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=list(vectors[int(t)])) for t in input]
+        )
+        engine.index_documents([{"text": str(i), "chunk_id": i} for i in range(50)])
+        return engine
+
+    def test_ann_results_match_exact_search(self):
+        ann = self._make_engine("hnsw")
+        exact = self._make_engine("exact")
+        self.assertIsNotNone(ann.ann_index)
+        self.assertIsNone(exact.ann_index)
+
+        for query in ("3", "17", "42"):
+            got = ann.retrieve(query)
+            want = exact.retrieve(query)
+            self.assertEqual([r["chunk_id"] for r in got], [r["chunk_id"] for r in want])
+            for g, w in zip(got, want):
+                self.assertAlmostEqual(g["score"], w["score"], places=4)
+
+    def test_small_corpus_falls_back_to_exact(self):
+        engine = self._make_engine("ivf", ann_min_corpus=1000)
+        self.assertIsNone(engine.ann_index)
+        self.assertEqual(engine.retrieve("7")[0]["chunk_id"], 7)
+
+    def test_ann_index_round_trips_through_save_index(self):
+        engine = self._make_engine("hnsw")
+        directory = tempfile.mkdtemp(prefix="ragreader-test-ann-")
+        engine.save_index(directory)
+
+        reloaded = self._make_engine("hnsw")
+        reloaded.ann_index = None
+        reloaded.load_index(directory)
+        self.assertEqual(reloaded.ann_index.ntotal, 50)
+        self.assertEqual(reloaded.retrieve("5")[0]["chunk_id"], 5)
+
+    def test_added_and_removed_documents_stay_in_the_ann_index(self):
+        ann = self._make_engine("hnsw")
+        exact = self._make_engine("exact")
+        for engine in (ann, exact):
+            engine.remove_documents({3, 17})
+            engine.add_documents([{"text": "3", "chunk_id": 103}])
+        self.assertEqual(ann.ann_index.ntotal, 49)
+
+        for query in ("3", "17", "42"):
+            got, want = ann.retrieve(query), exact.retrieve(query)
+            self.assertEqual([r["chunk_id"] for r in got], [r["chunk_id"] for r in want])
+        self.assertEqual(ann.retrieve("3")[0]["chunk_id"], 103)
+
+    def test_unknown_index_type_is_rejected(self):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            with self.assertRaises(ValueError):
+                DenseRAG({"index_type": "annoy"})
+
+
+class DenseQuantizationTests(TestCase):
+    """Quantized storage must rank like float32, and re-scoring must give
+    back exact cosine scores."""
+
+    def _make_engine(self, vector_dtype="int8", index_type="exact", **config):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({
+                "top_k": 3,
+                "index_type": index_type,
+                "ann_min_corpus": 10,
+                "vector_dtype": vector_dtype,
+                **config,
+            })
+        vectors = np.random.default_rng(0).standard_normal((200, 16))
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=list(vectors[int(t)])) for t in input]
+        )
+        engine.index_documents([{"text": str(i), "chunk_id": i} for i in range(200)])
+        return engine
+
+    def test_codes_decode_close_to_the_originals(self):
+        from dense_rag.quantization import QuantizedVectors
+
+        vectors = np.random.default_rng(1).standard_normal((100, 32)).astype(np.float32)
+        int8 = QuantizedVectors.quantize(vectors, "int8")
+        self.assertEqual(int8.codes.dtype, np.int8)
+        self.assertEqual(int8.nbytes, vectors.nbytes // 4 + 2 * 32 * 4)
+        # Half a quantization step is the worst case per dimension.
+        self.assertTrue(np.all(np.abs(int8.decode() - vectors) <= int8.scale / 2 + 1e-6))
+
+        query = vectors[0]
+        np.testing.assert_allclose(int8.score(query), int8.decode() @ query, rtol=1e-4, atol=1e-4)
+        fp16 = QuantizedVectors.quantize(vectors, "float16")
+        np.testing.assert_allclose(fp16.score(query), vectors @ query, rtol=1e-2, atol=1e-2)
+
+    def test_rescored_results_match_float32_exactly(self):
+        exact = self._make_engine("float32")
+        for dtype in ("int8", "float16"):
+            quantized = self._make_engine(dtype)
+            self.assertIsNotNone(quantized.quantized)
+            for query in ("3", "77", "150"):
+                got = quantized.retrieve(query)
+                want = exact.retrieve(query)
+                self.assertEqual([r["chunk_id"] for r in got], [r["chunk_id"] for r in want])
+                for g, w in zip(got, want):
+                    self.assertAlmostEqual(g["score"], w["score"], places=5)
+
+    def test_without_rescoring_the_quantized_ranking_is_returned(self):
+        engine = self._make_engine("int8", rescore_factor=0)
+        with mock.patch.object(engine.quantized, "score", wraps=engine.quantized.score) as score:
+            results = engine.retrieve("42")
+        score.assert_called_once()
+        self.assertEqual(results[0]["chunk_id"], 42)
+
+    def test_ann_index_stores_quantized_vectors(self):
+        engine = self._make_engine("int8", index_type="hnsw")
+        self.assertEqual(engine.ann_index.vector_dtype, "int8")
+        self.assertEqual(engine.retrieve("9")[0]["chunk_id"], 9)
+
+    def test_rows_outside_the_trained_int8_range_retrain_the_ann_index(self):
+        from dense_rag.ann_index import AnnIndex
+
+        engine = self._make_engine("int8", index_type="hnsw")
+        with mock.patch.object(AnnIndex, "build", wraps=AnnIndex.build) as build:
+            engine.add_documents([{"text": "5", "chunk_id": 205}])
+            build.assert_not_called()
+            self.assertEqual(engine.ann_index.ntotal, 201)
+
+            # A unit vector along one axis is past every trained maximum.
+            create = engine.client.embeddings.create.side_effect
+            engine.client.embeddings.create.side_effect = lambda input, model: (
+                mock.Mock(data=[mock.Mock(embedding=[1.0] + [0.0] * 15)]) if input == ["axis"] else create(input, model)
+            )
+            engine.add_documents([{"text": "axis", "chunk_id": 206}])
+            build.assert_called_once()
+
+        self.assertEqual(engine.ann_index.ntotal, 202)
+        self.assertTrue(engine.ann_index.covers(np.asarray(engine.document_vectors)))
+        self.assertEqual(engine.retrieve("axis")[0]["chunk_id"], 206)
+
+    def test_quantized_index_round_trips_and_requantizes_on_dtype_change(self):
+        engine = self._make_engine("int8")
+        directory = tempfile.mkdtemp(prefix="ragreader-test-quant-")
+        engine.save_index(directory)
+
+        reloaded = self._make_engine("int8")
+        reloaded.load_index(directory)
+        self.assertIsInstance(reloaded.quantized.codes, np.memmap)
+        self.assertEqual(reloaded.retrieve("11")[0]["chunk_id"], 11)
+
+        as_fp16 = self._make_engine("float16")
+        as_fp16.load_index(directory)
+        self.assertEqual(as_fp16.quantized.dtype, "float16")
+        self.assertEqual(as_fp16.retrieve("11")[0]["chunk_id"], 11)
+
+        as_fp32 = self._make_engine("float32")
+        as_fp32.load_index(directory)
+        self.assertIsNone(as_fp32.quantized)
+
+    def test_a_built_index_keeps_only_its_codes_resident_once_saved(self):
+        engine = self._make_engine("int8")
+        in_memory = engine.index_nbytes()
+        before = engine.retrieve("77")
+        directory = tempfile.mkdtemp(prefix="ragreader-test-quant-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        engine.save_index(directory)
+
+        engine.map_vectors(directory)
+
+        self.assertIsInstance(engine.document_vectors, np.memmap)
+        self.assertEqual(in_memory - engine.index_nbytes(), 200 * 16 * 4)
+        self.assertEqual(engine.retrieve("77"), before)
+
+    def test_unknown_vector_dtype_is_rejected(self):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            with self.assertRaises(ValueError):
+                DenseRAG({"vector_dtype": "int4"})
+
+
+class EmbeddingCacheTests(TestCase):
+    """Re-embedding a known text must cost no API call, across engines."""
+
+    def _cache(self, **kwargs):
+        from dense_rag.embedding_cache import SQLiteEmbeddingCache
+
+        directory = tempfile.mkdtemp(prefix="ragreader-test-embcache-")
+        return SQLiteEmbeddingCache(os.path.join(directory, "cache.sqlite3"), **kwargs)
+
+    def _make_engine(self, cache, model="openai/text-embedding-3-small"):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({"top_k": 2, "model": model, "embedding_cache": cache})
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=[float(len(t)), 1.0, 0.5]) for t in input]
+        )
+        return engine
+
+    def test_round_trips_vectors_per_model(self):
+        cache = self._cache()
+        cache.put_many("m1", ["a", "bb"], [[1.0, 2.0], [3.0, 4.0]])
+        got = cache.get_many("m1", ["bb", "missing", "a"])
+        np.testing.assert_array_equal(got[0], [3.0, 4.0])
+        self.assertIsNone(got[1])
+        np.testing.assert_array_equal(got[2], [1.0, 2.0])
+        self.assertEqual(cache.get_many("m2", ["a"]), [None])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_evicts_least_recently_used_past_the_size_budget(self):
+        cache = self._cache(max_bytes=3 * 16)
+        with mock.patch("dense_rag.embedding_cache.time.time", side_effect=range(100, 200)):
+            cache.put_many("m", ["a", "b", "c"], np.ones((3, 4)))
+            cache.get_many("m", ["a"])
+            cache.put_many("m", ["d"], np.ones((1, 4)))
+        self.assertLessEqual(cache.nbytes, 3 * 16)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get_many("m", ["b"])[0])
+        self.assertIsNotNone(cache.get_many("m", ["a"])[0])
+
+    def test_keeps_a_running_byte_total_across_connections(self):
+        cache = self._cache()
+        cache.put_many("m", ["a", "b"], np.ones((2, 4)))
+        cache.put_many("m", ["a", "c"], np.ones((2, 4)))
+        self.assertEqual(cache.nbytes, 3 * 16)
+        cache._conn.execute("DELETE FROM embeddings WHERE key = (SELECT key FROM embeddings LIMIT 1)")
+        self.assertEqual(cache.nbytes, 2 * 16)
+
+        from dense_rag.embedding_cache import SQLiteEmbeddingCache
+
+        reopened = SQLiteEmbeddingCache(cache.path)
+        self.assertEqual(reopened.nbytes, 2 * 16)
+        cache.clear()
+        self.assertEqual(reopened.nbytes, 0)
+
+    def test_reads_buffer_their_recency_updates(self):
+        from dense_rag import embedding_cache
+
+        cache = self._cache()
+        cache.put_many("m", ["a", "b"], np.ones((2, 4)))
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+        for _ in range(3):
+            cache.get_many("m", ["a", "b"])
+        self.assertFalse([s for s in statements if s.lstrip().upper().startswith("UPDATE")])
+
+        with mock.patch.object(embedding_cache, "_TOUCH_BATCH", 2):
+            cache.get_many("m", ["a", "b"])
+        self.assertEqual(len([s for s in statements if s.lstrip().upper().startswith("UPDATE")]), 2)
+        self.assertEqual(cache._touched, {})
+
+    def test_a_second_engine_reindexes_without_api_calls(self):
+        cache = self._cache()
+        documents = [{"text": f"chunk {i}", "chunk_id": i} for i in range(5)]
+        first = self._make_engine(cache)
+        first.index_documents(documents)
+        self.assertEqual(first.client.embeddings.create.call_count, 1)
+
+        second = self._make_engine(cache)
+        second.index_documents(documents)
+        second.client.embeddings.create.assert_not_called()
+        np.testing.assert_array_equal(first.document_vectors, second.document_vectors)
+
+        other_model = self._make_engine(cache, model="qwen/qwen3-embedding-8b")
+        other_model.index_documents(documents)
+        other_model.client.embeddings.create.assert_called_once()
+
+    def test_only_missing_and_distinct_texts_are_sent(self):
+        cache = self._cache()
+        engine = self._make_engine(cache)
+        engine._get_embeddings(["known"])
+        vectors = engine._get_embeddings(["known", "new", "new"])
+        self.assertEqual(len(vectors), 3)
+        engine.client.embeddings.create.assert_called_with(input=["new"], model=engine.model)
+
+    def test_a_broken_cache_falls_back_to_the_api(self):
+        cache = mock.Mock()
+        cache.get_many.side_effect = RuntimeError("disk full")
+        cache.put_many.side_effect = RuntimeError("disk full")
+        engine = self._make_engine(cache)
+        self.assertEqual(len(engine._get_embeddings(["a", "b"])), 2)
+
+
+class EmbeddingBatchTests(TestCase):
+    """Big inputs go out in bounded, concurrent batches and come back in order."""
+
+    def test_batches_respect_item_and_token_limits(self):
+        from dense_rag.embedding_batches import plan_batches
+
+        self.assertEqual(plan_batches([1] * 7, max_items=3, max_tokens=100), [(0, 3), (3, 6), (6, 7)])
+        self.assertEqual(plan_batches([40, 40, 40, 150, 10], max_items=10, max_tokens=100),
+                         [(0, 2), (2, 3), (3, 4), (4, 5)])
+        self.assertEqual(plan_batches([], max_items=3, max_tokens=100), [])
+
+    def test_tokenizer_is_only_consulted_when_the_byte_bound_exceeds_the_budget(self):
+        from dense_rag import embedding_batches
+
+        encoding = mock.Mock()
+        encoding.encode_batch.side_effect = lambda texts, **kw: [[0] * (len(t) // 4) for t in texts]
+        with mock.patch.object(embedding_batches, "_encoding", return_value=encoding):
+            self.assertEqual(embedding_batches.token_counts(["abcd", "ef"], "m", budget=10), [4, 2])
+            encoding.encode_batch.assert_not_called()
+            self.assertEqual(embedding_batches.token_counts(["a" * 40, "b" * 8], "m", budget=10), [10, 2])
+
+    def test_concurrent_batches_keep_input_order(self):
+        import time
+        from dense_rag.embedding_batches import embed_in_batches
+
+        def embed(batch):
+            time.sleep(0.01 * (len(batch) % 3))
+            return [[float(t)] for t in batch]
+
+        texts = [str(i) for i in range(50)]
+        vectors = embed_in_batches(embed, texts, "m", batch_size=4, concurrency=4)
+        self.assertEqual(vectors, [[float(i)] for i in range(50)])
+
+    def test_a_failed_batch_is_retried_alone_with_backoff(self):
+        import httpx
+        import openai
+        from dense_rag.embedding_batches import embed_in_batches
+
+        calls = []
+        connection_error = openai.APIConnectionError(request=httpx.Request("POST", "http://test"))
+
+        def embed(batch):
+            calls.append(tuple(batch))
+            if batch == ["c", "d"] and calls.count(("c", "d")) < 3:
+                raise connection_error
+            return [[1.0] for _ in batch]
+
+        sleep = mock.Mock()
+        with mock.patch("dense_rag.embedding_batches.random.uniform", return_value=1.0):
+            vectors = embed_in_batches(
+                embed, ["a", "b", "c", "d"], "m", batch_size=2, concurrency=1, backoff=0.5, sleep=sleep
+            )
+        self.assertEqual(len(vectors), 4)
+        self.assertEqual(calls.count(("a", "b")), 1)
+        self.assertEqual(calls.count(("c", "d")), 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+    def test_non_retryable_errors_fail_fast(self):
+        from dense_rag.embedding_batches import embed_in_batches
+
+        embed = mock.Mock(side_effect=ValueError("bad input"))
+        sleep = mock.Mock()
+        with self.assertRaises(ValueError):
+            embed_in_batches(embed, ["a"], "m", sleep=sleep)
+        embed.assert_called_once()
+        sleep.assert_not_called()
+
+    def test_async_batches_keep_input_order_and_retry_alone(self):
+        import asyncio
+        import httpx
+        import openai
+        from dense_rag.embedding_batches import aembed_in_batches
+
+        calls = []
+        connection_error = openai.APIConnectionError(request=httpx.Request("POST", "http://test"))
+
+        async def embed(batch):
+            calls.append(tuple(batch))
+            await asyncio.sleep(0.001 * (len(calls) % 3))
+            if batch == ["4", "5"] and calls.count(("4", "5")) < 2:
+                raise connection_error
+            return [[float(t)] for t in batch]
+
+        sleep = mock.AsyncMock()
+        texts = [str(i) for i in range(9)]
+        vectors = asyncio.run(aembed_in_batches(embed, texts, "m", batch_size=2, concurrency=3, sleep=sleep))
+
+        self.assertEqual(vectors, [[float(i)] for i in range(9)])
+        self.assertEqual(calls.count(("4", "5")), 2)
+        self.assertEqual(calls.count(("0", "1")), 1)
+        sleep.assert_awaited_once()
+
+    def test_dense_rag_async_embeddings_match_the_sync_ones(self):
+        import asyncio
+
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({"top_k": 2, "embed_batch_size": 3})
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=[float(t), 1.0]) for t in input]
+        )
+        engine._aembed_batch = mock.AsyncMock(side_effect=lambda texts: [[float(t), 1.0] for t in texts])
+        texts = [str(i) for i in range(7)]
+
+        self.assertEqual(asyncio.run(engine._aget_embeddings(texts)), engine._get_embeddings(texts))
+        self.assertEqual(engine._aembed_batch.await_count, 3)
+
+    def test_dense_rag_indexes_a_large_document_in_batches(self):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({"top_k": 2, "embed_batch_size": 3})
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=[float(t), 1.0]) for t in input]
+        )
+        engine.index_documents([{"text": str(i), "chunk_id": i} for i in range(10)])
+        self.assertEqual(engine.client.embeddings.create.call_count, 4)
+        self.assertEqual(engine.retrieve("9")[0]["chunk_id"], 9)
+
+
+class OpenRouterClientTests(TestCase):
+    """One pooled client per process, and per event loop for the async one."""
+
+    def test_llms_and_dense_engines_share_one_client(self):
+        from ai_handler.llm import GeminiLLM, OpenAILLM
+
+        with override_settings(OPENROUTER_API_KEY="shared-key"):
+            clients = {id(OpenAILLM().client), id(GeminiLLM().client), id(DenseRAG({}).client)}
+        self.assertEqual(len(clients), 1)
+        self.assertIsNot(OpenAILLM(api_key="other-key").client, OpenAILLM(api_key="shared-key").client)
+
+    def test_async_clients_are_kept_per_event_loop(self):
+        import asyncio
+        from ai_handler.clients import get_async_client
+
+        async def twice():
+            return get_async_client("k"), get_async_client("k")
+
+        first, again = asyncio.run(twice())
+        self.assertIs(first, again)
+        self.assertIsNot(asyncio.run(twice())[0], first)
+
+    def test_async_clients_are_closed_when_the_last_session_ends(self):
+        import asyncio
+        from ai_handler import clients
+
+        async def sessions():
+            async with clients.async_client_session():
+                first = clients.get_async_client("k")
+                async with clients.async_client_session():
+                    self.assertIs(clients.get_async_client("k"), first)
+                # Another session on the loop is still using it.
+                self.assertFalse(first.is_closed())
+            self.assertTrue(first.is_closed())
+            async with clients.async_client_session():
+                self.assertIsNot(clients.get_async_client("k"), first)
+            return first
+
+        asyncio.run(sessions())
+
+    def test_clients_of_a_closed_loop_are_dropped(self):
+        import asyncio
+        from ai_handler import clients
+
+        async def open_client():
+            return asyncio.get_running_loop(), clients.get_async_client("k")
+
+        closed_loop, _ = asyncio.run(open_client())
+        self.assertIn(closed_loop, clients._async_clients)
+        asyncio.run(open_client())
+        self.assertNotIn(closed_loop, clients._async_clients)
+
+    def test_an_llm_awaits_and_streams_through_the_async_client(self):
+        import asyncio
+        from ai_handler.llm import OpenAILLM
+
+        async def chunks():
+            for content in ("Hel", None, "lo"):
+                yield mock.Mock(choices=[mock.Mock(delta=mock.Mock(content=content))])
+
+        async def create(stream=False, **kwargs):
+            if stream:
+                return chunks()
+            return mock.Mock(choices=[mock.Mock(message=mock.Mock(content=" Hello "))])
+
+        client = mock.Mock()
+        client.chat.completions.create = mock.AsyncMock(side_effect=create)
+        llm = OpenAILLM(api_key="k")
+
+        async def run():
+            answer = await llm.arag_generate("q", "ctx")
+            deltas = [delta async for delta in await llm.arag_generate("q", "ctx", stream=True)]
+            return answer, deltas
+
+        with mock.patch("ai_handler.llm.get_async_client", return_value=client):
+            self.assertEqual(asyncio.run(run()), ("Hello", ["Hel", "lo"]))
+
+
+class RerankScoreCacheTests(TestCase):
+    def test_scores_are_kept_per_model_query_and_chunk(self):
+        from hybrid_rag.score_cache import RerankScoreCache
+
+        cache = RerankScoreCache()
+        cache.put_many("m", "what is alpha?", [1, 2, None], [0.25, 0.5, 0.75])
+
+        self.assertEqual(cache.get_many("m", " what is  alpha?", [1, 2, 3, None]), [0.25, 0.5, None, None])
+        self.assertEqual(cache.get_many("other", "what is alpha?", [1]), [None])
+        self.assertEqual(cache.get_many("m", "what is beta?", [1]), [None])
+        self.assertEqual(len(cache), 2)
+
+    def test_least_recently_used_scores_are_evicted(self):
+        from hybrid_rag.score_cache import RerankScoreCache
+
+        cache = RerankScoreCache(max_entries=2)
+        cache.put_many("m", "q", [1, 2], [1.0, 2.0])
+        cache.get_many("m", "q", [1])
+        cache.put_many("m", "q", [3], [3.0])
+
+        self.assertEqual(cache.get_many("m", "q", [1, 2, 3]), [1.0, None, 3.0])
+
+    @override_settings(RERANK_SCORE_CACHE_SIZE=0)
+    def test_a_zero_size_disables_the_shared_cache(self):
+        from hybrid_rag.score_cache import get_rerank_score_cache
+
+        self.assertIsNone(get_rerank_score_cache())
+
+
+class QueryEmbeddingCacheTests(TestCase):
+    """A query embedded once is not embedded again by any engine sharing the cache."""
+
+    def _make_engine(self, query_cache, model="openai/text-embedding-3-small"):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            engine = DenseRAG({"top_k": 1, "model": model, "query_cache": query_cache})
+        engine.client = mock.Mock()
+        engine.client.embeddings.create.side_effect = lambda input, model: mock.Mock(
+            data=[mock.Mock(embedding=[float(len(t)), 1.0]) for t in input]
+        )
+        engine.documents = ["a", "b"]
+        engine.document_metadata = [{"chunk_id": 1}, {"chunk_id": 2}]
+        engine.set_vectors([[1.0, 0.0], [0.0, 1.0]])
+        return engine
+
+    def test_repeated_queries_skip_the_embedding_call_across_engines(self):
+        from dense_rag.query_cache import QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache()
+        dense, hybrid_dense = self._make_engine(cache), self._make_engine(cache)
+        dense.retrieve("what is  alpha?")
+        dense.get_retrieved_scores("what is alpha?")
+        hybrid_dense.retrieve(" what is alpha?\n")
+
+        self.assertEqual(dense.client.embeddings.create.call_count, 1)
+        hybrid_dense.client.embeddings.create.assert_not_called()
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        other_model = self._make_engine(cache, model="qwen/qwen3-embedding-8b")
+        other_model.retrieve("what is alpha?")
+        other_model.client.embeddings.create.assert_called_once()
+
+    def test_least_recently_used_queries_are_evicted(self):
+        from dense_rag.query_cache import QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertIsNotNone(cache.get("m", "a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_misses_fall_through_to_redis(self):
+        from dense_rag.query_cache import QueryEmbeddingCache
+
+        store = {}
+        redis_client = mock.Mock()
+        redis_client.get.side_effect = store.get
+        redis_client.set.side_effect = lambda key, value, ex: store.__setitem__(key, value)
+
+        QueryEmbeddingCache(redis_client=redis_client).put("m", "q", [0.6, 0.8])
+        other_process = QueryEmbeddingCache(redis_client=redis_client)
+        np.testing.assert_allclose(other_process.get("m", "q"), [0.6, 0.8])
+        self.assertEqual(other_process.stats()["redis_hits"], 1)
+        self.assertEqual(len(other_process), 1)
+
+    def test_queries_stay_out_of_the_persistent_chunk_cache(self):
+        from dense_rag.query_cache import QueryEmbeddingCache
+
+        engine = self._make_engine(QueryEmbeddingCache())
+        engine.embedding_cache = mock.Mock()
+        engine.retrieve("q")
+        engine.embedding_cache.get_many.assert_not_called()
+        engine.embedding_cache.put_many.assert_not_called()
+
 
 # ── Pipeline helpers ─────────────────────────────────────────────────────────
 
@@ -444,6 +1660,21 @@ class BasePipelineHelperTests(TestCase):
         self.assertIsInstance(llm, OpenAILLM)
         self.assertEqual(llm.model, "openai/gpt-4o-mini")
 
+    def test_a_streamed_completion_yields_only_the_text_deltas(self):
+        with override_settings(OPENROUTER_API_KEY="test-key"):
+            llm = OpenAILLM("openai/gpt-4o-mini")
+
+        def chunk(content):
+            return mock.Mock(choices=[mock.Mock(delta=mock.Mock(content=content))])
+
+        llm.client = mock.Mock()
+        llm.client.chat.completions.create.return_value = iter(
+            [chunk("Hel"), mock.Mock(choices=[]), chunk(None), chunk("lo")]
+        )
+
+        self.assertEqual(list(llm.rag_generate("q", "ctx", stream=True)), ["Hel", "lo"])
+        self.assertTrue(llm.client.chat.completions.create.call_args.kwargs["stream"])
+
     def test_initialize_llm_rejects_unknown_models(self):
         stub = mock.Mock(config={})
         with self.assertRaises(ValueError):
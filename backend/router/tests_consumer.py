@@ -3,7 +3,7 @@ Tests for `router/consumers.py` — the WebSocket that drives a deep analysis.
 
 This is the module that turns a stored AnalysisBatch into a stream of results:
 it expands the batch's config into variants, pins the retrieval depth per
-variant, initializes engines that aren't ready, calls `run_analysis`, persists
+variant, initializes engines that aren't ready, awaits `arun_analysis`, persists
 each result, and reports progress. None of that was covered before, and it is
 the only place the pipeline layer is exercised end to end.
 
@@ -61,7 +61,7 @@ ANALYSIS_RESPONSE = {
 def make_engine(is_initialized=True, response=None):
     engine = mock.Mock()
     engine.is_initialized.return_value = is_initialized
-    engine.run_analysis.return_value = dict(response or ANALYSIS_RESPONSE)
+    engine.arun_analysis = mock.AsyncMock(return_value=dict(response or ANALYSIS_RESPONSE))
     return engine
 
 
@@ -205,10 +205,31 @@ class AnalysisConsumerTests(TransactionTestCase):
 
         self.assertEqual(frames[-1], {"status": "COMPLETE", "progress": 100})
 
-        engine.run_analysis.assert_called_once_with(
-            str(self.document.pk), str(self.conversation.pk)
+        engine.arun_analysis.assert_called_once_with(
+            str(self.document.pk), str(self.conversation.pk), on_delta=mock.ANY
         )
 
+    def test_answer_deltas_are_sent_before_the_result(self):
+        batch = self.make_batch()
+        engine = make_engine()
+
+        async def arun_analysis(document_id, conversation_id, on_delta=None):
+            for delta in ("generated ", "answer"):
+                await on_delta(delta)
+            return dict(ANALYSIS_RESPONSE)
+
+        engine.arun_analysis.side_effect = arun_analysis
+
+        with mock.patch.object(
+            consumers.rag_registry, "get_engine", return_value=engine
+        ), mock.patch.object(consumers, "apply_retrieval_depth"):
+            frames = self.collect(batch.job_id)
+
+        deltas = [f for f in frames if f.get("type") == "answer_delta"]
+        self.assertEqual([f["delta"] for f in deltas], ["generated ", "answer"])
+        self.assertEqual((deltas[0]["method"], deltas[0]["aiModel"]), (DENSE, GPT))
+        self.assertEqual(frames.index(deltas[-1]) + 1, frames.index(self.results_in(frames)[0]))
+
     def test_each_result_is_persisted_with_its_metrics(self):
         batch = self.make_batch()
         engine = make_engine()
@@ -293,7 +314,7 @@ class AnalysisConsumerTests(TransactionTestCase):
     def test_a_variant_whose_analysis_raises_is_reported_and_skipped(self):
         batch = self.make_batch()
         engine = make_engine()
-        engine.run_analysis.side_effect = RuntimeError("OpenRouter down")
+        engine.arun_analysis.side_effect = RuntimeError("OpenRouter down")
 
         with mock.patch.object(
             consumers.rag_registry, "get_engine", return_value=engine
@@ -353,7 +374,7 @@ class AnalysisConsumerTests(TransactionTestCase):
         self.assertEqual(results[0]["answer"], "already done")
         self.assertIsNone(results[1].get("replayed"))
         # Only the missing variant was computed.
-        engine.run_analysis.assert_called_once()
+        engine.arun_analysis.assert_called_once()
         self.assertEqual(AnalysisResult.objects.filter(batch=batch).count(), 2)
 
     def test_a_batch_without_a_stored_config_runs_the_full_matrix(self):
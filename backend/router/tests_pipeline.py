@@ -8,9 +8,11 @@ that turns a Document into an index, a query into an answer, and an answer into
 evaluated results:
 
     BasePipeline        chunk sync, document lookup, init detection
-    DenseRAGPipeline    state round-trip, init/reuse/rebuild, run, run_analysis
+    DenseRAGPipeline    state round-trip, init/reuse/rebuild, run, (a)run_analysis
     SparseRAGPipeline   the same flow over BM25
     HybridRAGPipeline   two-engine state, the reranked run
+    refresh_index       incremental updates when a document's chunks change
+    IndexCache          loaded indexes per document, under a byte budget
     RAGRegistry         the method × model matrix and its lookups
     DataLoader.load     the text read every _build_index() starts from
 
@@ -26,24 +28,31 @@ rather than an arbitrary choice:
   `word_tokenize`, both of which need corpora that are downloaded at import
   time. Tests pass `remove_stop_words: False` and patch `word_tokenize`, so a
   missing corpus can never be the reason a pipeline test fails.
-* `HybridRAG.__init__` constructs a `CrossEncoder`, which downloads a model on
-  first use. Tests patch the class and score with a stub.
+* HybridRAG's reranker builds a `CrossEncoder` on its first prediction, which
+  downloads a model. Tests patch the loader and score with a stub.
 """
+import json
 import os
 import pickle
 import shutil
 import tempfile
+import threading
 from unittest import mock
 
 os.environ.setdefault("RAG_DISABLE_ENGINE_INIT", "1")
 
 import numpy as np
+from asgiref.sync import async_to_sync
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.test import TestCase, override_settings
 
 import rag.rag_service as rag_service
+from common.index_cache import IndexCache
+from dense_rag.query_cache import QueryEmbeddingCache
 from evaluation.models import Chunk, GroundTruthChunk, GroundTruthResponse
+from hybrid_rag.hybrid_rag import HybridRAG
+from hybrid_rag.reranker import RerankerPool
 from pipeline.base_pipeline import BasePipeline
 from pipeline.dense_rag_pipeline import DenseRAGPipeline
 from pipeline.hybrid_rag_pipeline import HybridRAGPipeline
@@ -143,7 +152,7 @@ class FakeCrossEncoder:
     def __init__(self, model_name, *args, **kwargs):
         self.model_name = model_name
 
-    def predict(self, pairs):
+    def predict(self, pairs, **kwargs):
         scores = []
         for _query, text in pairs:
             lowered = text.lower()
@@ -170,7 +179,7 @@ class PipelineTestCase(TestCase):
         self.addCleanup(tokenize_patch.stop)
 
         cross_encoder_patch = mock.patch(
-            "hybrid_rag.hybrid_rag.CrossEncoder", FakeCrossEncoder
+            "hybrid_rag.reranker.load_cross_encoder", FakeCrossEncoder
         )
         cross_encoder_patch.start()
         self.addCleanup(cross_encoder_patch.stop)
@@ -179,6 +188,10 @@ class PipelineTestCase(TestCase):
         return {
             **BASE_CONFIG,
             "vector_store_path": self.vector_store_path,
+            # Each pipeline gets its own, like a fresh process; the shared
+            # one would carry indexes across tests.
+            "index_cache": IndexCache(),
+            "reranker_pool": RerankerPool(),
             **overrides,
         }
 
@@ -197,6 +210,11 @@ class PipelineTestCase(TestCase):
 
         return pipeline
 
+    @staticmethod
+    def cached_engine(pipeline, document):
+        """The engine the pipeline's index cache holds for `document`, if any."""
+        return pipeline.index_cache.get(pipeline._index_key(document))
+
     @staticmethod
     def _embedding_engines(pipeline):
         rag = pipeline.rag
@@ -414,6 +432,66 @@ class DensePipelineIndexTests(PipelineTestCase):
             np.asarray(self.pipeline.rag.document_vectors),
         )
 
+    def test_a_quantized_build_maps_its_float32_vectors_from_the_saved_index(self):
+        pipeline = self.make_pipeline(DenseRAGPipeline, vector_dtype="int8")
+        path = pipeline._build_index("alice", self.document)
+
+        vectors = pipeline.rag.document_vectors
+        self.assertIsInstance(vectors, np.memmap)
+        self.assertTrue(vectors.filename.startswith(os.path.realpath(path)))
+        self.assertEqual(pipeline.rag.retrieve("alpha")[0]["text"].split()[0], "Alpha")
+
+    def test_ann_index_is_persisted_and_restored(self):
+        pipeline = self.make_pipeline(
+            DenseRAGPipeline, index_type="hnsw", ann_min_corpus=1
+        )
+        path = pipeline._build_index("alice", self.document)
+        self.assertIsNotNone(pipeline.rag.ann_index)
+
+        reloaded = self.make_pipeline(
+            DenseRAGPipeline, index_type="hnsw", ann_min_corpus=1
+        )
+        with mock.patch(
+            "dense_rag.dense_rag.AnnIndex.build", side_effect=AssertionError("rebuilt")
+        ):
+            self.assertTrue(reloaded._load_state(path))
+        self.assertEqual(reloaded.rag.ann_index.ntotal, 3)
+
+    def test_index_is_saved_as_memory_mapped_arrays(self):
+        path = self.pipeline._build_index("alice", self.document)
+        self.assertTrue(os.path.isdir(path))
+
+        reloaded = self.make_pipeline(DenseRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertIsInstance(reloaded.rag.document_vectors, np.memmap)
+        self.assertEqual(reloaded.rag.document_vectors.dtype, np.float32)
+        self.assertEqual(reloaded.rag.documents[0], self.pipeline.rag.documents[0])
+
+    def test_legacy_pickle_indexes_still_load(self):
+        self.pipeline._build_index("alice", self.document)
+        path = os.path.join(self.vector_store_path, "legacy.pkl")
+        with open(path, "wb") as handle:
+            pickle.dump({
+                "documents": list(self.pipeline.rag.documents),
+                "vectors": np.asarray(self.pipeline.rag.document_vectors, dtype=np.float64) * 3,
+                "metadata": list(self.pipeline.rag.document_metadata),
+            }, handle)
+
+        reloaded = self.make_pipeline(DenseRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertIn("Alpha", reloaded.rag.retrieve("alpha")[0]["text"])
+
+    def test_an_index_from_another_format_version_is_refused(self):
+        path = self.pipeline._build_index("alice", self.document)
+        manifest_path = os.path.join(path, "manifest.json")
+        with open(manifest_path) as handle:
+            manifest = json.load(handle)
+        manifest["format_version"] = 999
+        with open(manifest_path, "w") as handle:
+            json.dump(manifest, handle)
+
+        self.assertFalse(self.make_pipeline(DenseRAGPipeline)._load_state(path))
+
     def test_load_state_returns_false_for_a_missing_or_corrupt_file(self):
         self.assertFalse(
             self.pipeline._load_state(os.path.join(self.vector_store_path, "nope.pkl"))
@@ -432,16 +510,80 @@ class DensePipelineIndexTests(PipelineTestCase):
         self.assertTrue(fresh.init("alice"))
 
         self.assertEqual(fresh.rag.client.embeddings.create.call_count, 0)
-        self.assertEqual(len(fresh.rag.documents), 3)
+        self.assertEqual(len(self.cached_engine(fresh, self.document).documents), 3)
         self.assertGreater(calls_after_build, 0)
         self.assertEqual(
             DocumentVector.objects.filter(document=self.document, method="dense").count(),
             1,
         )
 
+    def test_pipelines_sharing_an_index_cache_load_the_index_once(self):
+        self.pipeline._build_index("alice", self.document)
+        first = self.make_pipeline(DenseRAGPipeline)
+        second = self.make_pipeline(
+            DenseRAGPipeline, rag_engine=first.rag, index_cache=first.index_cache
+        )
+        self.assertIs(second.rag, first.rag)
+
+        with mock.patch.object(DenseRAGPipeline, "_load_state", autospec=True,
+                               side_effect=DenseRAGPipeline._load_state) as load_state:
+            self.assertTrue(first.init("alice"))
+            self.assertTrue(second.init("alice"))
+            self.assertTrue(second.init_job("alice"))
+        self.assertEqual(load_state.call_count, 1)
+
+    def test_a_freshly_built_index_counts_as_loaded(self):
+        path = self.pipeline._build_index("alice", self.document)
+        self.assertEqual(self.pipeline.rag.index_location, path)
+
+    def test_an_index_built_by_init_stays_loaded(self):
+        self.assertTrue(self.pipeline.init("alice"))
+        with mock.patch.object(self.pipeline, "_load_state") as load_state, \
+                mock.patch.object(self.pipeline, "_build_index") as build_index:
+            self.assertTrue(self.pipeline.init("alice"))
+            self.pipeline.run("alice", "alpha")
+        load_state.assert_not_called()
+        build_index.assert_not_called()
+
+    def test_each_user_is_answered_from_their_own_document(self):
+        # Regression: the pipeline held one index, and a user whose document
+        # differed from the one in memory was answered from it.
+        bob = make_user("bob")
+        bob_document = make_document(bob, text="Delta paragraph about graphs.")
+        self.pipeline.llm.prompt_generate.side_effect = lambda prompt: "paragraph"
+
+        alice_answer = self.pipeline.run("alice", "paragraph")
+        bob_answer = self.pipeline.run("bob", "paragraph")
+        alice_again = self.pipeline.run("alice", "paragraph")
+
+        self.assertTrue(all("Delta" not in c["text"] for c in alice_answer["context"]))
+        self.assertEqual([c["text"] for c in bob_answer["context"]], ["Delta paragraph about graphs."])
+        self.assertEqual(alice_again["chunk_ids"], alice_answer["chunk_ids"])
+        self.assertEqual(len(self.pipeline.index_cache), 2)
+        self.assertEqual(len(self.cached_engine(self.pipeline, bob_document).documents), 1)
+        # Outside a request the pipeline's own engine stays an empty template.
+        self.assertEqual(self.pipeline.rag.documents, [])
+
+    def test_the_cached_engine_follows_the_template_depth(self):
+        self.pipeline.init("alice")
+        rag_service.apply_retrieval_depth(self.pipeline, 1)
+
+        result = self.pipeline.run("alice", "alpha")
+
+        self.assertEqual(len(result["chunk_ids"]), 1)
+
+    def test_a_failed_load_does_not_count_as_loaded(self):
+        path = self.pipeline._build_index("alice", self.document)
+        fresh = self.make_pipeline(DenseRAGPipeline)
+        with mock.patch.object(fresh, "_load_state", return_value=False):
+            self.assertFalse(fresh._load_index(path))
+        self.assertIsNone(fresh.rag.index_location)
+        self.assertTrue(fresh._load_index(path))
+        self.assertEqual(fresh.rag.index_location, path)
+
     def test_init_discards_a_record_whose_file_vanished_and_rebuilds(self):
         path = self.pipeline._build_index("alice", self.document)
-        os.remove(path)
+        shutil.rmtree(path)
         stale_id = DocumentVector.objects.get(
             document=self.document, method="dense"
         ).pk
@@ -463,7 +605,8 @@ class DensePipelineIndexTests(PipelineTestCase):
         original_save = Job.save
 
         def record_progress(self_job, *args, **kwargs):
-            seen.append(self_job.progress)
+            if "progress" in (kwargs.get("update_fields") or ["progress"]):
+                seen.append(self_job.progress)
             return original_save(self_job, *args, **kwargs)
 
         with mock.patch.object(Job, "save", record_progress):
@@ -471,6 +614,23 @@ class DensePipelineIndexTests(PipelineTestCase):
 
         self.assertEqual(seen, [10, 20, 90])
 
+    def test_init_job_reports_the_time_per_indexing_stage(self):
+        job = Job.objects.create(user=self.user, document=self.document)
+        self.assertTrue(self.pipeline.init_job("alice", job=job))
+
+        job.refresh_from_db()
+        self.assertEqual(
+            list(job.timings),
+            ["load_text", "chunk", "store_chunks", "index", "index.embed", "index.vectors", "index.ann", "save"],
+        )
+        self.assertTrue(all(seconds >= 0 for seconds in job.timings.values()))
+
+        fresh = self.make_pipeline(DenseRAGPipeline)
+        later = Job.objects.create(user=self.user, document=self.document)
+        fresh.init_job("alice", job=later)
+        later.refresh_from_db()
+        self.assertEqual(list(later.timings), ["load_index"])
+
     def test_init_job_shortcuts_to_80_when_an_index_already_exists(self):
         self.pipeline._build_index("alice", self.document)
         job = Job.objects.create(user=self.user, document=self.document)
@@ -509,6 +669,37 @@ class DensePipelineRunTests(PipelineTestCase):
         for entry in result["context"]:
             self.assertIn("score", entry)
 
+    def test_overlapping_runs_on_one_document_generate_concurrently(self):
+        # Both answers must be in generation at once: the document's index
+        # cache entry is released once retrieval is done.
+        self.pipeline.run("alice", "alpha")
+        both_generating = threading.Barrier(2, timeout=5)
+
+        def generate(*args, **kwargs):
+            both_generating.wait()
+            return "generated answer"
+
+        self.pipeline.llm.rag_generate.side_effect = generate
+        results, errors = [], []
+
+        def run():
+            try:
+                results.append(self.pipeline.run("alice", "alpha"))
+            except Exception as e:
+                errors.append(e)
+
+        # The worker threads cannot see this test's uncommitted rows.
+        with mock.patch.object(self.pipeline, "get_document", return_value=self.document), \
+                mock.patch.object(self.pipeline, "_index_is_current", return_value=True):
+            threads = [threading.Thread(target=run) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual([result["answer"] for result in results], ["generated answer"] * 2)
+
     def test_run_never_leaks_the_internal_retrieved_docs_key(self):
         # `retrieved_docs` is an internal handoff to run_analysis; it must not
         # reach the API serializer.
@@ -540,6 +731,16 @@ class DensePipelineRunTests(PipelineTestCase):
         self.assertEqual(retrieve.call_args_list[1][0][0], "original question")
         self.assertEqual(result["chunk_ids"], [1])
 
+    def test_a_streamed_answer_reaches_on_delta_and_the_result(self):
+        self.pipeline.llm.rag_generate.side_effect = lambda query, context, stream=False: iter([" The ", "answer."])
+        deltas = []
+
+        result = self.pipeline.run("alice", "alpha", on_delta=deltas.append)
+
+        self.assertEqual(deltas, [" The ", "answer."])
+        self.assertEqual(result["answer"], "The answer.")
+        self.assertTrue(self.pipeline.llm.rag_generate.call_args.kwargs["stream"])
+
     def test_no_retrieval_at_all_still_answers_with_empty_context(self):
         with mock.patch.object(self.pipeline.rag, "retrieve", return_value=[]):
             result = self.pipeline.run("alice", "unanswerable")
@@ -556,7 +757,7 @@ class DensePipelineRunTests(PipelineTestCase):
 
         result = cold.run("alice", "alpha")
 
-        self.assertEqual(len(cold.rag.documents), 3)
+        self.assertEqual(len(self.cached_engine(cold, self.document).documents), 3)
         self.assertEqual(result["answer"], "generated answer")
 
     def test_run_for_a_user_without_documents_raises(self):
@@ -663,6 +864,51 @@ class DensePipelineAnalysisTests(PipelineTestCase):
         self.assertEqual(result["evaluation"], {})
         self.assertNotIn("retrieved_docs", result)
 
+    def _async_llm(self):
+        async def arag_generate(query, context, stream=False):
+            async def deltas():
+                for delta in (" generated ", "answer"):
+                    yield delta
+            return deltas() if stream else "generated answer"
+
+        self.pipeline.llm.aprompt_generate = mock.AsyncMock(return_value="alpha embeddings")
+        self.pipeline.llm.arag_generate = mock.AsyncMock(side_effect=arag_generate)
+
+    def test_the_async_analysis_matches_the_threaded_one(self):
+        GroundTruthChunk.objects.create(
+            conversation=self.conversation, chunk=self._alpha_chunk()
+        )
+        self._async_llm()
+        deltas = []
+
+        async def on_delta(delta):
+            deltas.append(delta)
+
+        threaded = self.pipeline.run_analysis(self.document.pk, self.conversation.pk)
+        awaited = async_to_sync(self.pipeline.arun_analysis)(
+            self.document.pk, self.conversation.pk, on_delta=on_delta
+        )
+
+        self.assertEqual(awaited, threaded)
+        self.assertEqual(deltas, [" generated ", "answer"])
+        self.pipeline.llm.aprompt_generate.assert_awaited_once()
+        generated_query, context = self.pipeline.llm.arag_generate.call_args[0]
+        self.assertEqual(generated_query, "alpha embeddings")
+        self.assertIn("Alpha paragraph", context)
+
+    def test_the_async_analysis_embeds_the_query_on_the_event_loop(self):
+        self._async_llm()
+        self.pipeline.rag.query_cache = QueryEmbeddingCache(16)
+        self.pipeline.rag._aembed_batch = mock.AsyncMock(
+            side_effect=lambda texts: [_vector_for(t) for t in texts]
+        )
+        async_to_sync(self.pipeline.arun_analysis)(self.document.pk, self.conversation.pk)
+
+        self.pipeline.rag._aembed_batch.assert_awaited_once_with(["alpha embeddings"])
+        engine = self.cached_engine(self.pipeline, self.document)
+        queried = [c.kwargs["input"] for c in engine.client.embeddings.create.call_args_list]
+        self.assertNotIn(["alpha embeddings"], queried)
+
 
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, OPENROUTER_API_KEY="test-key")
 class SparsePipelineTests(PipelineTestCase):
@@ -692,6 +938,15 @@ class SparsePipelineTests(PipelineTestCase):
         self.assertGreater(results[0]["score"], 0.0)
         self.assertIsNotNone(results[0]["chunk_id"])
 
+    def test_retrieve_batch_matches_retrieve_per_query(self):
+        self.pipeline._build_index("alice", self.document)
+        queries = ["reranking", "keyword", "zzzz nonexistent"]
+
+        self.assertEqual(
+            self.pipeline.rag.retrieve_batch(queries),
+            [self.pipeline.rag.retrieve(query) for query in queries],
+        )
+
     def test_a_query_matching_nothing_returns_no_chunks(self):
         # BM25 drops zero-scoring documents, which is what makes the
         # retry-with-the-original-query path in _run_core reachable.
@@ -706,6 +961,41 @@ class SparsePipelineTests(PipelineTestCase):
         self.assertEqual(reloaded.rag.documents, self.pipeline.rag.documents)
         self.assertIn("Beta", reloaded.rag.retrieve("keyword")[0]["text"])
 
+    def test_the_index_is_saved_as_memory_mapped_arrays(self):
+        path = self.pipeline._build_index("alice", self.document)
+
+        self.assertTrue(os.path.isdir(path))
+        self.assertFalse([name for name in os.listdir(path) if name.endswith(".pkl")])
+        reloaded = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertIsInstance(reloaded.rag.bm25.doc_ids.base, np.memmap)
+        self.assertEqual(reloaded.rag.retrieve_batch(["keyword", "reranking"]), self.pipeline.rag.retrieve_batch(["keyword", "reranking"]))
+
+    def test_an_index_tokenized_differently_is_rebuilt(self):
+        path = self.pipeline._build_index("alice", self.document)
+
+        with override_settings(OPENROUTER_API_KEY="test-key"), \
+                mock.patch("sparse_rag.sparse_rag._nltk") as nltk:
+            nltk.return_value.corpus.stopwords.words.return_value = ["the"]
+            other = self.make_pipeline(SparseRAGPipeline, remove_stop_words=True)
+        self.assertFalse(other._load_state(path))
+
+    def test_an_index_saved_with_rank_bm25_still_loads(self):
+        from rank_bm25 import BM25Okapi
+
+        self.pipeline._build_index("alice", self.document)
+        legacy = os.path.join(self.vector_store_path, "legacy.pkl")
+        with open(legacy, "wb") as handle:
+            pickle.dump({
+                "documents": self.pipeline.rag.documents,
+                "bm25": BM25Okapi([self.pipeline.rag._tokenize(text) for text in self.pipeline.rag.documents]),
+                "metadata": self.pipeline.rag.document_metadata,
+            }, handle)
+
+        reloaded = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(reloaded._load_state(legacy))
+        self.assertEqual(reloaded.rag.retrieve("keyword"), self.pipeline.rag.retrieve("keyword"))
+
     def test_load_state_returns_false_for_a_corrupt_file(self):
         corrupt = os.path.join(self.vector_store_path, "corrupt.pkl")
         with open(corrupt, "wb") as handle:
@@ -752,6 +1042,194 @@ class SparsePipelineTests(PipelineTestCase):
         self.assertEqual(job.progress, 90)
 
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, OPENROUTER_API_KEY="test-key")
+class IncrementalIndexTests(PipelineTestCase):
+    """refresh_index() and the catch-up after a load: only changed chunks are indexed."""
+
+    EDITED_TEXT = DOCUMENT_TEXT.replace("Gamma paragraph about reranking.", "Delta paragraph about fusion.")
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.document = make_document(self.user)
+
+    def _edit_document(self, text):
+        with default_storage.open(self.document.extracted_text_path, "w") as handle:
+            handle.write(text)
+
+    def _record(self, method):
+        return DocumentVector.objects.get(document=self.document, method=method, status="ready")
+
+    @staticmethod
+    def _embedded_texts(engine):
+        texts = []
+        for call in engine.client.embeddings.create.call_args_list:
+            texts.extend(call.kwargs["input"])
+        return texts
+
+    def _current_chunk_ids(self, pipeline):
+        return sorted(
+            Chunk.objects.filter(document=self.document, config_hash=pipeline._get_config_hash())
+            .values_list("id", flat=True)
+        )
+
+    def test_refresh_embeds_only_the_changed_chunk(self):
+        pipeline = self.make_pipeline(DenseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        old_path = self._record("dense").vectorstore_location
+        pipeline.rag.client.embeddings.create.reset_mock()
+
+        self._edit_document(self.EDITED_TEXT)
+        self.assertTrue(pipeline.refresh_index("alice"))
+
+        self.assertEqual(self._embedded_texts(pipeline.rag), ["Delta paragraph about fusion."])
+        engine = self.cached_engine(pipeline, self.document)
+        self.assertEqual(sorted(m["chunk_id"] for m in engine.document_metadata), self._current_chunk_ids(pipeline))
+        self.assertNotIn("Gamma paragraph about reranking.", engine.documents)
+
+        record = self._record("dense")
+        self.assertNotEqual(record.vectorstore_location, old_path)
+        self.assertEqual(engine.index_location, record.vectorstore_location)
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_the_refreshed_index_is_what_a_fresh_load_sees(self):
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        self._edit_document(self.EDITED_TEXT)
+        pipeline.refresh_index("alice")
+
+        fresh = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(fresh._load_state(self._record("sparse").vectorstore_location))
+        results = fresh.rag.retrieve("fusion")
+        self.assertIn("Delta", results[0]["text"])
+        self.assertEqual(fresh.rag.retrieve("reranking"), [])
+
+    def test_an_unchanged_document_keeps_its_index(self):
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        record = self._record("sparse")
+
+        with mock.patch.object(pipeline, "_save_state") as save_state:
+            pipeline.refresh_index("alice")
+
+        save_state.assert_not_called()
+        self.assertEqual(self._record("sparse").pk, record.pk)
+
+    def test_a_mostly_rewritten_document_is_rebuilt(self):
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        engine = self.cached_engine(pipeline, self.document)
+
+        rewritten = [
+            "Epsilon paragraph about query expansion.",
+            "Zeta paragraph about chunk boundaries.",
+            "Eta paragraph about answer grounding.",
+        ]
+        self._edit_document("\n\n".join(rewritten))
+        with mock.patch.object(engine, "add_documents") as add_documents:
+            pipeline.refresh_index("alice")
+
+        add_documents.assert_not_called()
+        self.assertEqual(list(engine.documents), rewritten)
+
+    def test_a_loaded_index_catches_up_with_chunks_another_method_replaced(self):
+        # Chunk rows are shared between methods: a dense rebuild of the edited
+        # text replaces the rows a saved sparse index still lists.
+        self.make_pipeline(SparseRAGPipeline).init("alice")
+        self._edit_document(self.EDITED_TEXT)
+        self.make_pipeline(DenseRAGPipeline).init_job("alice")
+        dense = self.make_pipeline(DenseRAGPipeline)
+        dense.refresh_index("alice")
+
+        sparse = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(sparse.init("alice"))
+
+        engine = self.cached_engine(sparse, self.document)
+        self.assertEqual(sorted(engine.indexed_chunk_ids()), self._current_chunk_ids(sparse))
+        self.assertEqual(DocumentVector.objects.filter(document=self.document, method="sparse").count(), 1)
+
+    def test_hybrid_refresh_updates_both_halves(self):
+        pipeline = self.make_pipeline(HybridRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        pipeline.rag.dense_engine.client.embeddings.create.reset_mock()
+
+        self._edit_document(self.EDITED_TEXT)
+        pipeline.refresh_index("alice", job=Job.objects.create(user=self.user, document=self.document))
+
+        engine = self.cached_engine(pipeline, self.document)
+        self.assertEqual(self._embedded_texts(pipeline.rag.dense_engine), ["Delta paragraph about fusion."])
+        expected = self._current_chunk_ids(pipeline)
+        self.assertEqual(sorted(engine.sparse_engine.indexed_chunk_ids()), expected)
+        self.assertEqual(sorted(engine.dense_engine.indexed_chunk_ids()), expected)
+        self.assertIn("update_index", Job.objects.get().timings)
+
+    def _catch_up_a_saved_ivf_index(self, vector_dtype):
+        # A fresh pipeline opens the saved IVF index memory-mapped, with
+        # read-only lists, and catches it up on load.
+        options = {"index_type": "ivf", "ann_min_corpus": 1, "vector_dtype": vector_dtype}
+        self.assertTrue(self.make_pipeline(DenseRAGPipeline, **options).init("alice"))
+        # Only an addition: removing rows would rebuild the ANN index anyway.
+        self._edit_document(DOCUMENT_TEXT + "\n\nDelta paragraph about fusion.")
+
+        pipeline = self.make_pipeline(DenseRAGPipeline, **options)
+        self.assertTrue(pipeline.refresh_index("alice"))
+
+        engine = self.cached_engine(pipeline, self.document)
+        self.assertEqual(self._embedded_texts(pipeline.rag), ["Delta paragraph about fusion."])
+        self.assertEqual(sorted(engine.indexed_chunk_ids()), self._current_chunk_ids(pipeline))
+        self.assertEqual(engine.ann_index.ntotal, 4)
+        self.assertIn("Beta", engine.retrieve("beta?")[0]["text"])
+
+    def test_a_memory_mapped_ivf_index_catches_up(self):
+        self._catch_up_a_saved_ivf_index("float32")
+
+    def test_a_memory_mapped_int8_ivf_index_catches_up(self):
+        self._catch_up_a_saved_ivf_index("int8")
+
+    def test_a_memory_mapped_float16_ivf_index_catches_up(self):
+        self._catch_up_a_saved_ivf_index("float16")
+
+    def test_a_failed_update_in_place_rebuilds_the_index(self):
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        engine = self.cached_engine(pipeline, self.document)
+
+        self._edit_document(self.EDITED_TEXT)
+        with mock.patch.object(engine, "add_documents", side_effect=RuntimeError("read-only")):
+            self.assertTrue(pipeline.refresh_index("alice"))
+
+        self.assertEqual(sorted(engine.indexed_chunk_ids()), self._current_chunk_ids(pipeline))
+        self.assertIn("Delta", engine.retrieve("fusion")[0]["text"])
+
+    def test_an_index_another_process_replaced_is_reloaded(self):
+        # Each pipeline has its own IndexCache, as separate processes do.
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        stale = self.cached_engine(pipeline, self.document)
+
+        self._edit_document(self.EDITED_TEXT)
+        self.make_pipeline(SparseRAGPipeline).refresh_index("alice")
+        self.assertFalse(os.path.exists(stale.index_location))
+
+        with pipeline.loaded_index("alice") as engine:
+            self.assertIsNot(engine, stale)
+            self.assertEqual(engine.index_location, self._record("sparse").vectorstore_location)
+            self.assertIn("Delta", engine.retrieve("fusion")[0]["text"])
+
+    def test_an_engine_that_cannot_update_in_place_is_rebuilt(self):
+        pipeline = self.make_pipeline(SparseRAGPipeline)
+        self.assertTrue(pipeline.init("alice"))
+        engine = self.cached_engine(pipeline, self.document)
+        engine.updates_in_place = False
+
+        self._edit_document(self.EDITED_TEXT)
+        with mock.patch.object(engine, "index_documents", wraps=engine.index_documents) as index_documents:
+            pipeline.refresh_index("alice")
+
+        index_documents.assert_called_once()
+        self.assertEqual(sorted(engine.indexed_chunk_ids()), self._current_chunk_ids(pipeline))
+
+
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, OPENROUTER_API_KEY="test-key")
 class HybridPipelineTests(PipelineTestCase):
     """Hybrid: two engines, one reranked answer, and a stricter state guard."""
@@ -787,25 +1265,108 @@ class HybridPipelineTests(PipelineTestCase):
         self.assertEqual(len(reloaded.rag.dense_engine.documents), 3)
         self.assertIsNotNone(reloaded.rag.sparse_engine.bm25)
 
+    def _pickle_the_sparse_half(self, path, **data):
+        """Rewrite `path` in the earlier layout, with the sparse half in sparse.pkl."""
+        sparse = self.pipeline.rag.sparse_engine
+        shutil.rmtree(os.path.join(path, "sparse"))
+        with open(os.path.join(path, "sparse.pkl"), "wb") as handle:
+            pickle.dump({
+                "documents": list(sparse.documents),
+                "metadata": list(sparse.document_metadata),
+                **data,
+            }, handle)
+        with open(os.path.join(path, "manifest.json")) as handle:
+            manifest = json.load(handle)
+        manifest["sparse"] = "sparse.pkl"
+        with open(os.path.join(path, "manifest.json"), "w") as handle:
+            json.dump(manifest, handle)
+
+    def test_the_sparse_half_is_saved_without_pickles(self):
+        path = self.pipeline._build_index("alice", self.document)
+
+        self.assertTrue(os.path.isdir(os.path.join(path, "sparse")))
+        for root, _dirs, files in os.walk(path):
+            self.assertFalse([name for name in files if name.endswith(".pkl")], root)
+
+    def test_the_chunk_texts_are_saved_once_for_both_halves(self):
+        path = self.pipeline._build_index("alice", self.document)
+
+        self.assertTrue(os.path.exists(os.path.join(path, "chunks.bin")))
+        for subdir in ("sparse", "dense"):
+            self.assertFalse(os.path.exists(os.path.join(path, subdir, "chunks.bin")), subdir)
+
+    def test_both_halves_share_one_chunk_store(self):
+        path = self.pipeline._build_index("alice", self.document)
+        rag = self.pipeline.rag
+        self.assertIs(rag.sparse_engine.documents, rag.dense_engine.documents)
+
+        reloaded = self.make_pipeline(HybridRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertIs(reloaded.rag.sparse_engine.documents, reloaded.rag.dense_engine.documents)
+        self.assertEqual(list(reloaded.rag.dense_engine.documents), list(rag.sparse_engine.documents))
+        self.assertEqual(reloaded.rag.indexed_chunk_ids(), rag.indexed_chunk_ids())
+
+    def test_an_index_with_a_chunk_store_per_half_still_loads(self):
+        path = self.pipeline._build_index("alice", self.document)
+        rag = self.pipeline.rag
+        # The earlier layout: each half saved with its own chunks, none at the top.
+        for subdir, engine in (("sparse", rag.sparse_engine), ("dense", rag.dense_engine)):
+            shutil.rmtree(os.path.join(path, subdir))
+            os.makedirs(os.path.join(path, subdir))
+            engine.save_index(os.path.join(path, subdir))
+        with open(os.path.join(path, "manifest.json")) as handle:
+            manifest = json.load(handle)
+        del manifest["chunks"]
+        with open(os.path.join(path, "manifest.json"), "w") as handle:
+            json.dump(manifest, handle)
+        os.remove(os.path.join(path, "chunks.bin"))
+
+        reloaded = self.make_pipeline(HybridRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertEqual(len(reloaded.rag.sparse_engine.documents), 3)
+        self.assertIs(reloaded.rag.sparse_engine.documents, reloaded.rag.dense_engine.documents)
+
     def test_a_pickle_without_bm25_is_rebuilt_from_the_tokenized_corpus(self):
         path = self.pipeline._build_index("alice", self.document)
-        with open(path, "rb") as handle:
-            data = pickle.load(handle)
-        data["sparse"]["bm25"] = None
-        with open(path, "wb") as handle:
-            pickle.dump(data, handle)
+        sparse = self.pipeline.rag.sparse_engine
+        self._pickle_the_sparse_half(
+            path, bm25=None, tokenized_corpus=[sparse._tokenize(text) for text in sparse.documents]
+        )
 
         reloaded = self.make_pipeline(HybridRAGPipeline)
         self.assertTrue(reloaded._load_state(path))
         self.assertIsNotNone(reloaded.rag.sparse_engine.bm25)
 
-    def test_an_incomplete_pickle_is_rejected(self):
+    def test_an_index_with_a_pickled_sparse_half_still_loads(self):
+        from rank_bm25 import BM25Okapi
+
+        path = self.pipeline._build_index("alice", self.document)
+        sparse = self.pipeline.rag.sparse_engine
+        self._pickle_the_sparse_half(path, bm25=BM25Okapi([sparse._tokenize(text) for text in sparse.documents]))
+
+        reloaded = self.make_pipeline(HybridRAGPipeline)
+        self.assertTrue(reloaded._load_state(path))
+        self.assertEqual(reloaded.rag.sparse_engine.retrieve("alpha"), sparse.retrieve("alpha"))
+
+    def test_an_incomplete_index_is_rejected(self):
         path = self.pipeline._build_index("alice", self.document)
-        with open(path, "rb") as handle:
-            data = pickle.load(handle)
-        data["dense"]["vectors"] = []
+        os.remove(os.path.join(path, "dense", "vectors.npy"))
+
+        reloaded = self.make_pipeline(HybridRAGPipeline)
+        self.assertFalse(reloaded._load_state(path))
+
+    def test_a_legacy_pickle_with_empty_vectors_is_rejected(self):
+        self.pipeline._build_index("alice", self.document)
+        path = os.path.join(self.vector_store_path, "legacy.pkl")
         with open(path, "wb") as handle:
-            pickle.dump(data, handle)
+            pickle.dump({
+                "sparse": {
+                    "documents": list(self.pipeline.rag.sparse_engine.documents),
+                    "bm25": self.pipeline.rag.sparse_engine.bm25,
+                    "metadata": self.pipeline.rag.sparse_engine.document_metadata,
+                },
+                "dense": {"documents": ["a"], "vectors": [], "metadata": []},
+            }, handle)
 
         reloaded = self.make_pipeline(HybridRAGPipeline)
         self.assertFalse(reloaded._load_state(path))
@@ -825,13 +1386,46 @@ class HybridPipelineTests(PipelineTestCase):
         self.assertEqual(len(result["context"]), self.pipeline.rag.final_top_k)
         self.assertNotIn("retrieved_docs", result)
 
+    def test_retrieve_batch_matches_retrieve_per_query(self):
+        self.pipeline._build_index("alice", self.document)
+        queries = ["alpha", "beta keyword"]
+
+        self.assertEqual(
+            self.pipeline.rag.retrieve_batch(queries),
+            [self.pipeline.rag.retrieve(query) for query in queries],
+        )
+
+    def test_the_cross_encoder_loads_on_the_first_rerank(self):
+        self.pipeline._build_index("alice", self.document)
+        reranker = self.pipeline.rag._cross_encoder
+        self.assertFalse(reranker.loaded)
+
+        self.pipeline.run("alice", "alpha")
+
+        self.assertTrue(reranker.loaded)
+        self.assertIsInstance(reranker.model, FakeCrossEncoder)
+
+    def test_hybrid_engines_share_one_cross_encoder_per_model(self):
+        pool = RerankerPool()
+        first = self.make_pipeline(HybridRAGPipeline, reranker_pool=pool)
+        second = self.make_pipeline(HybridRAGPipeline, reranker_pool=pool, chunk_size=90)
+        other = self.make_pipeline(HybridRAGPipeline, reranker_pool=pool, reranker_model="other/model")
+
+        self.assertIs(first.rag._cross_encoder, second.rag._cross_encoder)
+        self.assertIsNot(first.rag._cross_encoder, other.rag._cross_encoder)
+        self.assertEqual(len(pool), 2)
+
     def test_run_initializes_from_disk_when_memory_is_empty(self):
         self.pipeline._build_index("alice", self.document)
 
         cold = self.make_pipeline(HybridRAGPipeline)
         result = cold.run("alice", "alpha")
 
-        self.assertEqual(len(cold.rag.dense_engine.documents), 3)
+        cached = self.cached_engine(cold, self.document)
+        self.assertEqual(len(cached.dense_engine.documents), 3)
+        self.assertEqual(len(cached.sparse_engine.documents), 3)
+        self.assertIsNot(cached.dense_engine, cold.rag.dense_engine)
+        self.assertIs(cached._cross_encoder, cold.rag._cross_encoder)
         self.assertEqual(result["answer"], "generated answer")
 
     def test_run_analysis_scores_the_reranked_chunks(self):
@@ -868,6 +1462,246 @@ class HybridPipelineTests(PipelineTestCase):
         self.assertEqual(job.progress, 90)
 
 
+class FakeEngine:
+    """Just enough of an engine for IndexCache to size it."""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def index_nbytes(self):
+        return self.nbytes
+
+
+class IndexCacheTests(TestCase):
+    def _load(self, cache, key, nbytes=100):
+        with cache.acquire(key, lambda: FakeEngine(nbytes)) as engine:
+            return engine
+
+    def test_a_loaded_index_is_reused(self):
+        cache = IndexCache(max_bytes=1000)
+        first = self._load(cache, "a")
+        with cache.acquire("a", mock.Mock(side_effect=AssertionError("reloaded"))) as again:
+            self.assertIs(again, first)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_least_recently_used_indexes_go_past_the_budget(self):
+        cache = IndexCache(max_bytes=250)
+        self._load(cache, "a")
+        self._load(cache, "b")
+        self._load(cache, "a")
+        self._load(cache, "c")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.nbytes, 200)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_an_index_in_use_is_never_evicted(self):
+        cache = IndexCache(max_bytes=150)
+        with cache.acquire("a", lambda: FakeEngine(100)) as held:
+            self._load(cache, "b")
+            self.assertIs(cache.get("a"), held)
+        self.assertIsNone(cache.get("b"))
+
+    def test_a_failed_load_caches_nothing(self):
+        cache = IndexCache()
+        with self.assertRaises(ValueError):
+            with cache.acquire("a", mock.Mock(side_effect=ValueError("corrupt"))):
+                pass
+        self.assertEqual(len(cache), 0)
+        self.assertIsNotNone(self._load(cache, "a"))
+
+    def test_concurrent_requests_for_one_index_load_it_once(self):
+        cache = IndexCache()
+        started = threading.Event()
+        release = threading.Event()
+        loads = []
+
+        def slow_load():
+            loads.append(1)
+            started.set()
+            release.wait(5)
+            return FakeEngine(10)
+
+        engines = []
+
+        def request():
+            with cache.acquire("a", slow_load) as engine:
+                engines.append(engine)
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        # Another document is not held up by the load in progress.
+        self.assertIsNotNone(self._load(cache, "b"))
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(len(engines), 3)
+        self.assertTrue(all(engine is engines[0] for engine in engines))
+
+    def test_an_engine_that_is_no_longer_current_is_reloaded(self):
+        cache = IndexCache()
+        first = self._load(cache, "a")
+        with cache.acquire("a", lambda: FakeEngine(100), is_current=lambda engine: engine is not first) as again:
+            self.assertIsNot(again, first)
+        self.assertIs(cache.get("a"), again)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_discard_location_drops_the_engines_holding_it(self):
+        cache = IndexCache()
+        for key, location in (("a", "/old"), ("b", "/old"), ("c", "/new")):
+            engine = self._load(cache, key)
+            engine.index_location = location
+
+        self.assertEqual(cache.discard_location("/old"), 2)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+
+
+class FakeTensor:
+    def __init__(self, numel, element_size=4):
+        self._numel, self._element_size = numel, element_size
+
+    def numel(self):
+        return self._numel
+
+    def element_size(self):
+        return self._element_size
+
+
+class SizedCrossEncoder(FakeCrossEncoder):
+    """A FakeCrossEncoder whose `model` reports 1000 float32 weights."""
+
+    def __init__(self, model_name, *args, **kwargs):
+        super().__init__(model_name)
+        self.model = mock.Mock()
+        self.model.parameters.return_value = [FakeTensor(600), FakeTensor(400)]
+        self.model.buffers.return_value = []
+
+
+class RerankerPoolTests(TestCase):
+    def setUp(self):
+        patch = mock.patch("hybrid_rag.reranker.load_cross_encoder", side_effect=SizedCrossEncoder)
+        self.load = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_a_model_is_loaded_once_whoever_asks(self):
+        pool = RerankerPool()
+        results = []
+
+        def request():
+            results.append(pool.get("m").predict([("q", "alpha")]))
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.load.call_count, 1)
+        self.assertEqual(len(results), 4)
+
+    def test_stats_report_the_memory_of_loaded_models(self):
+        pool = RerankerPool()
+        pool.get("m").load()
+        pool.get("unused")
+
+        stats = pool.stats()
+        self.assertEqual(stats["models"]["m"]["nbytes"], 4000)
+        self.assertFalse(stats["models"]["unused"]["loaded"])
+        self.assertEqual(stats["nbytes"], 4000)
+        self.assertEqual(pool.nbytes, 4000)
+
+    def test_each_max_length_gets_its_own_model(self):
+        pool = RerankerPool()
+        pool.get("m").load()
+        pool.get("m", max_length=256).load()
+
+        self.assertIs(pool.get("m", 256), pool.get("m", max_length=256))
+        self.assertEqual(
+            [call.kwargs for call in self.load.call_args_list], [{"max_length": None}, {"max_length": 256}]
+        )
+        self.assertEqual(sorted(pool.stats()["models"]), ["m", "m@256"])
+
+    def test_a_dedicated_thread_runs_every_prediction(self):
+        reranker = RerankerPool(dedicated_thread=True).get("m")
+        threads = []
+        reranker.load().predict = lambda pairs: threads.append(threading.current_thread().name) or [0.0]
+
+        reranker.predict([("q", "a")])
+        reranker.predict([("q", "b")])
+
+        self.assertEqual(len(set(threads)), 1)
+        self.assertNotEqual(threads[0], threading.current_thread().name)
+
+
+class OnnxRerankerTests(TestCase):
+    """The ONNX Runtime backends, with sentence-transformers' loaders patched."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="ragreader-test-onnx-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_the_quantization_target_follows_the_cpu_flags(self):
+        from hybrid_rag import onnx_reranker
+
+        for flags, target in (("avx2 avx512f avx512_vnni", "avx512_vnni"), ("avx2 avx512f", "avx512"), ("sse4_2 avx2", "avx2")):
+            cpuinfo = mock.mock_open(read_data=f"processor\t: 0\nflags\t\t: fpu {flags}\n")
+            with mock.patch.object(onnx_reranker.platform, "machine", return_value="x86_64"), \
+                    mock.patch("builtins.open", cpuinfo):
+                self.assertEqual(onnx_reranker.quantization_target(), target)
+        with mock.patch.object(onnx_reranker.platform, "machine", return_value="aarch64"):
+            self.assertEqual(onnx_reranker.quantization_target(), "arm64")
+
+    def test_the_model_is_exported_once_then_loaded_from_disk(self):
+        from hybrid_rag import onnx_reranker
+
+        def export(model_name, path, quantize):
+            with onnx_reranker.atomic_index_dir(path) as scratch:
+                os.makedirs(os.path.join(scratch, "onnx"))
+                file_name = onnx_reranker.quantized_file(onnx_reranker.quantization_target())
+                open(os.path.join(scratch, file_name), "wb").close()
+
+        with mock.patch.object(onnx_reranker, "export", side_effect=export) as exporter, \
+                mock.patch.object(onnx_reranker, "session_options", return_value="options"), \
+                mock.patch("sentence_transformers.CrossEncoder") as cross_encoder:
+            for _ in range(2):
+                onnx_reranker.load_onnx_cross_encoder("org/model", max_length=256, threads=2, root=self.root)
+
+        exporter.assert_called_once()
+        path = onnx_reranker.export_dir("org/model", True, self.root)
+        self.assertTrue(path.startswith(os.path.join(self.root, "org--model", "int8-")))
+        args, kwargs = cross_encoder.call_args
+        self.assertEqual(args, (path,))
+        self.assertEqual(kwargs["backend"], "onnx")
+        self.assertEqual(kwargs["max_length"], 256)
+        self.assertEqual(kwargs["model_kwargs"]["session_options"], "options")
+        self.assertTrue(os.path.exists(os.path.join(path, kwargs["model_kwargs"]["file_name"])))
+
+    def test_an_unloadable_onnx_model_falls_back_to_pytorch(self):
+        reranker = RerankerPool().get("m", backend="onnx-int8", threads=2)
+        self.assertEqual(reranker.name, "m (onnx-int8)")
+        with mock.patch("hybrid_rag.onnx_reranker.load_onnx_cross_encoder", side_effect=ImportError("no onnxruntime")), \
+                mock.patch("hybrid_rag.reranker.load_cross_encoder", side_effect=FakeCrossEncoder) as load:
+            self.assertEqual(list(reranker.predict([("q", "alpha"), ("q", "x")])), [0.9, 0.1])
+
+        load.assert_called_once()
+        self.assertEqual(reranker.backend, "torch")
+        self.assertEqual(reranker.name, "m")
+
+    def test_hybrid_rejects_an_unknown_reranker_backend(self):
+        with override_settings(OPENROUTER_API_KEY="test-key"), self.assertRaises(ValueError):
+            HybridRAG({**BASE_CONFIG, "reranker_backend": "tensorrt", "reranker_pool": RerankerPool()})
+
+
 class RagRegistryTests(TestCase):
     """The method × model matrix, and the lookups the tasks make against it."""
 
@@ -877,8 +1711,17 @@ class RagRegistryTests(TestCase):
         self.addCleanup(
             setattr, rag_service.RAGRegistry, "_instance", original
         )
-        with mock.patch.dict(os.environ, env):
-            return rag_service.RAGRegistry()
+        # The shared caches would otherwise open real files / connections.
+        # Pipelines are built lazily, so the patches stay up for the test.
+        for patch in (
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(rag_service, "get_embedding_cache", return_value=None),
+            mock.patch.object(rag_service, "get_query_embedding_cache", return_value=None),
+            mock.patch.object(rag_service, "get_reranker_pool", return_value=RerankerPool()),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        return rag_service.RAGRegistry()
 
     def test_the_registry_is_a_singleton(self):
         first = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="1")
@@ -898,6 +1741,7 @@ class RagRegistryTests(TestCase):
             HybridRAGPipeline=mock.DEFAULT,
         ):
             registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="")
+            registry.initialize_engines()
 
         self.assertEqual(len(registry.engines), 3)
         for methods in registry.engines.values():
@@ -914,11 +1758,107 @@ class RagRegistryTests(TestCase):
             HybridRAGPipeline=mock.DEFAULT,
         ):
             registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="")
+            registry.initialize_engines()
 
         for methods in registry.engines.values():
             self.assertNotIn("Dense Retrieval", methods)
             self.assertIn("Sparse Retrieval", methods)
 
+    def test_llm_variants_of_a_method_share_one_retrieval_engine(self):
+        built = []
+
+        def pipeline(config):
+            built.append(config)
+            return mock.Mock(rag=config["rag_engine"] or mock.Mock(name="engine"))
+
+        with mock.patch.multiple(
+            rag_service,
+            DenseRAGPipeline=mock.Mock(side_effect=pipeline),
+            SparseRAGPipeline=mock.Mock(side_effect=pipeline),
+            HybridRAGPipeline=mock.Mock(side_effect=pipeline),
+        ):
+            registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="")
+            registry.initialize_engines()
+
+        self.assertEqual(len(registry.retrieval_engines), 3)
+        for method in ("Dense Retrieval", "Sparse Retrieval", "Hybrid Retrieval"):
+            engines = {id(methods[method].rag) for methods in registry.engines.values()}
+            self.assertEqual(len(engines), 1, method)
+        # Only the first variant of each method builds its own engine.
+        self.assertEqual(sum(config["rag_engine"] is None for config in built), 3)
+
+    def test_pipelines_are_built_on_first_use(self):
+        with mock.patch.multiple(
+            rag_service,
+            DenseRAGPipeline=mock.DEFAULT,
+            SparseRAGPipeline=mock.DEFAULT,
+            HybridRAGPipeline=mock.DEFAULT,
+        ) as classes:
+            registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="")
+            self.assertEqual(registry.engines, {})
+
+            first = registry.get_engine("Sparse Retrieval", "openai/gpt-4o-mini")
+            again = registry.get_engine("Sparse Retrieval", "openai/gpt-4o-mini")
+
+        self.assertIs(first, again)
+        self.assertEqual(classes["SparseRAGPipeline"].call_count, 1)
+        classes["DenseRAGPipeline"].assert_not_called()
+        classes["HybridRAGPipeline"].assert_not_called()
+
+    def test_a_pipeline_that_fails_to_build_is_retried_on_the_next_request(self):
+        dense = mock.Mock(side_effect=[RuntimeError("no api key"), mock.Mock()])
+        with mock.patch.object(rag_service, "DenseRAGPipeline", dense):
+            registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="")
+            with self.assertRaises(ValueError) as ctx:
+                registry.get_engine("Dense Retrieval", "openai/gpt-4o-mini")
+            self.assertIn("no api key", str(ctx.exception))
+            self.assertIsNotNone(registry.get_engine("Dense Retrieval", "openai/gpt-4o-mini"))
+
+    def test_eager_flag_builds_and_warms_everything_at_startup(self):
+        with mock.patch.multiple(
+            rag_service,
+            DenseRAGPipeline=mock.DEFAULT,
+            SparseRAGPipeline=mock.DEFAULT,
+            HybridRAGPipeline=mock.DEFAULT,
+        ):
+            registry = self._fresh_registry(
+                RAG_DISABLE_ENGINE_INIT="", RAG_EAGER_ENGINE_INIT="1"
+            )
+
+        self.assertEqual(sum(len(methods) for methods in registry.engines.values()), 9)
+        for engine in registry.retrieval_engines.values():
+            engine.warm_up.assert_called_once_with()
+
+    def test_warm_engines_command_reports_each_step(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        registry = mock.Mock(enabled=True, engines={"m": {"Dense Retrieval": object()}})
+        registry.warm_up.return_value = {"pipelines": 0.5, "dense": 0.25}
+        out = StringIO()
+        with mock.patch("router.management.commands.warm_engines.rag_registry", registry):
+            call_command("warm_engines", stdout=out)
+
+        registry.warm_up.assert_called_once_with()
+        self.assertIn("dense", out.getvalue())
+        self.assertIn("1 pipelines ready in 0.75s", out.getvalue())
+
+    def test_warm_engines_command_reports_reranker_memory(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        pool = RerankerPool()
+        with mock.patch("hybrid_rag.reranker.load_cross_encoder", side_effect=SizedCrossEncoder):
+            pool.get("cross-encoder/x").load()
+        registry = mock.Mock(enabled=True, engines={})
+        registry.warm_up.return_value = {}
+        out = StringIO()
+        with mock.patch("router.management.commands.warm_engines.rag_registry", registry), \
+                mock.patch("router.management.commands.warm_engines.get_reranker_pool", return_value=pool):
+            call_command("warm_engines", stdout=out)
+
+        self.assertIn("reranker cross-encoder/x: 0.0 MiB", out.getvalue())
+
     def test_get_engine_returns_the_registered_pipeline(self):
         registry = self._fresh_registry(RAG_DISABLE_ENGINE_INIT="1")
         sentinel = object()
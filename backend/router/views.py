@@ -1,6 +1,10 @@
+import asyncio
+import json
 import uuid
 
-from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
 from django.core.cache import cache
 from rest_framework.views import APIView
 from rest_framework.generics import GenericAPIView
@@ -203,6 +207,7 @@ class JobStatusView(APIView):
             "job_id": job.id,
             "status": job.status,      
             "progress": job.progress,
+            "timings": job.timings,
             "username": job.user.username,
             "error": job.error_message,
             "updated_at": job.updated_at
@@ -288,8 +293,15 @@ class QueryView(GenericAPIView):
             
             document = last_job.document
             document_id = document.pk if document else None
-            
-            answer = rag_registry.get_engine(CONFIG_VARIANTS[0]["method"], CONFIG_VARIANTS[0]["model"]).run(username, query)
+            engine = rag_registry.get_engine(CONFIG_VARIANTS[0]["method"], CONFIG_VARIANTS[0]["model"])
+
+            if serializer.validated_data["STREAM"]:
+                return StreamingHttpResponse(
+                    self.stream_answer(engine, username, query, document),
+                    content_type="application/x-ndjson",
+                )
+
+            answer = engine.run(username, query)
             
             retrieved_chunks = answer.get("context", [])
             llm_answer = answer.get("answer", "")
@@ -304,6 +316,61 @@ class QueryView(GenericAPIView):
         except Exception as e:
             return get_responses().response_500(error=str(e))
 
+    async def stream_answer(self, engine, username: str, query: str, document: Document):
+        """NDJSON lines: {"type": "answer_delta", "delta"} as the LLM writes,
+        then {"type": "done", "data"} with what the non-streaming response
+        returns, or {"type": "error", "error"}.
+
+        An async generator, so daphne sends each line as it is yielded (a
+        sync one is buffered whole under ASGI). The pipeline runs on a pool
+        thread and hands its deltas to the event loop through a queue.
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_delta(delta: str) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, ("delta", delta))
+
+        def run():
+            try:
+                return engine.run(username, query, on_delta=on_delta)
+            finally:
+                connection.close()
+
+        async def work():
+            try:
+                result = await sync_to_async(run, thread_sensitive=False)()
+            except Exception as e:
+                events.put_nowait(("error", str(e)))
+            else:
+                # After the deltas: call_soon_threadsafe queued them first.
+                events.put_nowait(("done", result))
+
+        task = asyncio.create_task(work())
+        try:
+            while True:
+                kind, payload = await events.get()
+                if kind == "delta":
+                    yield json.dumps({"type": "answer_delta", "delta": payload}) + "\n"
+                elif kind == "error":
+                    yield json.dumps({"type": "error", "error": payload}) + "\n"
+                    return
+                else:
+                    try:
+                        context_str = "\n\n".join(doc["text"] for doc in payload.get("context", []))
+                        record = await sync_to_async(self.save_conversation)(
+                            username, query, payload.get("answer", ""), context_str, document
+                        )
+                        payload["conversation_id"] = record.pk
+                        payload["document_id"] = document.pk if document else None
+                        yield json.dumps({"type": "done", "data": payload}) + "\n"
+                    except Exception as e:
+                        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+                    return
+        finally:
+            # The client went away mid-answer: stop waiting for the run.
+            task.cancel()
+
 class AnalysisConfigView(APIView):
     """The option set the Deep Analysis sidebar renders.
 
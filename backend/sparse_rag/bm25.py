@@ -0,0 +1,398 @@
+"""Okapi BM25 over an inverted index.
+
+rank_bm25's BM25Okapi keeps one term-frequency dict per document, and
+get_scores() walks every one of those dicts for every query term: O(corpus)
+in pure Python, however rare the terms are. BM25Index stores, per term, the
+documents that contain it (its postings) and each posting's precomputed
+weight
+
+    idf(t) · tf · (k1 + 1) / (tf + k1 · (1 − b + b · |d| / avgdl))
+
+so a query only touches the postings of its own terms, summed per document
+with one np.bincount.
+
+The same three arrays (indptr, doc_ids, weights) are a CSR term-document
+matrix, which `matrix` wraps without copying. A batch of queries becomes one
+sparse query-term count matrix, and all of them are scored with a single
+sparse product (top_k_batch) — how deep analysis and candidate pooling score
+many queries against one document.
+
+Scores match BM25Okapi's, including its IDF floor (terms in more than half
+the documents get epsilon × the average IDF instead of a negative one), to
+float32 precision.
+
+save() writes the index as flat arrays (see common.index_store) that load()
+memory-maps: no per-document token lists are rebuilt, only the vocabulary
+dict. Files, all inside the index directory:
+
+    bm25_terms.bin          UTF-8 vocabulary, back to back, in term-id order
+    bm25_term_offsets.npy   int64, len = V + 1
+    bm25_indptr.npy         postings offsets per term, len = V + 1
+    bm25_doc_ids.npy        posting document ids
+    bm25_term_freqs.npy     posting term frequencies
+    bm25_weights.npy        float32 posting weights (idf × normalized tf)
+    bm25_doc_len.npy        int32 tokens per document
+    bm25_idf.npy            float64 per term
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from common.ranking import top_k_indices
+
+TERMS_FILE = "bm25_terms.bin"
+TERM_OFFSETS_FILE = "bm25_term_offsets.npy"
+ARRAY_FILES = {
+    "indptr": "bm25_indptr.npy",
+    "doc_ids": "bm25_doc_ids.npy",
+    "term_freqs": "bm25_term_freqs.npy",
+    "weights": "bm25_weights.npy",
+    "doc_len": "bm25_doc_len.npy",
+    "idf": "bm25_idf.npy",
+}
+
+
+def okapi_idf(doc_freqs: np.ndarray, n_docs: int, epsilon: float = 0.25) -> np.ndarray:
+    """BM25Okapi's IDF: log((N − df + 0.5) / (df + 0.5)), floored for common terms.
+
+    Terms in more than half the documents would get a negative IDF; they get
+    epsilon × the average IDF over the vocabulary instead.
+    """
+    doc_freqs = np.asarray(doc_freqs, dtype=np.float64)
+    idf = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+    if len(idf):
+        idf[idf < 0] = epsilon * idf.mean()
+    return idf
+
+
+def encode_corpus(corpus: Sequence[Sequence[str]]) -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """Map a tokenized corpus to term ids.
+
+    Returns the vocabulary (ids in order of first occurrence), every token's
+    term id, corpus order, and the number of tokens per document.
+    """
+    vocabulary: Dict[str, int] = {}
+    term_ids = np.fromiter(
+        (vocabulary.setdefault(token, len(vocabulary)) for doc in corpus for token in doc),
+        dtype=np.int64,
+    )
+    doc_len = np.fromiter((len(doc) for doc in corpus), dtype=np.int64, count=len(corpus))
+    return vocabulary, term_ids, doc_len
+
+
+def merge_encoded(
+    parts: Iterable[Tuple[Sequence[str], np.ndarray, np.ndarray]]
+) -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """Join consecutive slices of a corpus, each encoded on its own.
+
+    `parts` are (terms in local id order, term ids, tokens per document).
+    Merged in corpus order, ids still follow first occurrence, so the result
+    equals encode_corpus() over the whole corpus.
+    """
+    vocabulary: Dict[str, int] = {}
+    term_ids, doc_len = [], []
+    for terms, local_ids, local_len in parts:
+        remap = np.fromiter(
+            (vocabulary.setdefault(term, len(vocabulary)) for term in terms), dtype=np.int64, count=len(terms)
+        )
+        term_ids.append(remap[local_ids])
+        doc_len.append(np.asarray(local_len, dtype=np.int64))
+    if not doc_len:
+        return vocabulary, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return vocabulary, np.concatenate(term_ids), np.concatenate(doc_len)
+
+
+class BM25Index:
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_len: np.ndarray,
+        idf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        weights: Optional[np.ndarray] = None,
+        epsilon: float = 0.25,
+    ):
+        # Term -> id, inserted in id order (add() and remove() rely on it).
+        self.vocabulary = vocabulary
+        # Postings of term t: doc_ids[indptr[t]:indptr[t + 1]], ascending.
+        # Both in scipy's index dtype, so `matrix` can share them.
+        index_dtype = np.int32 if indptr[-1] < 2 ** 31 else np.int64
+        self.indptr = np.asarray(indptr, dtype=index_dtype)
+        self.doc_ids = np.asarray(doc_ids, dtype=index_dtype)
+        self.term_freqs = np.asarray(term_freqs, dtype=np.int32)
+        self.doc_len = np.asarray(doc_len, dtype=np.int32)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(self.doc_len)
+        self.avgdl = float(self.doc_len.mean()) if self.corpus_size else 0.0
+        self.weights = self._posting_weights() if weights is None else np.asarray(weights, dtype=np.float32)
+        self.matrix = sparse.csr_matrix(
+            (self.weights, self.doc_ids, self.indptr), shape=(len(vocabulary), self.corpus_size), copy=False
+        )
+
+    @classmethod
+    def build(
+        cls, corpus: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25
+    ) -> "BM25Index":
+        """Index a tokenized corpus, one token list per document."""
+        return cls.from_encoded(*encode_corpus(corpus), k1=k1, b=b, epsilon=epsilon)
+
+    @classmethod
+    def from_encoded(
+        cls,
+        vocabulary: Dict[str, int],
+        term_ids: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        """Index a corpus already mapped to term ids (see encode_corpus)."""
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_len = np.asarray(doc_len, dtype=np.int64)
+        n_docs, n_terms = len(doc_len), len(vocabulary)
+
+        # One key per (term, document) occurrence; sorting them groups the
+        # postings by term, documents ascending within each.
+        docs = np.repeat(np.arange(n_docs, dtype=np.int64), doc_len)
+        keys, term_freqs = np.unique(term_ids * max(n_docs, 1) + docs, return_counts=True)
+        posting_terms = keys // max(n_docs, 1)
+        doc_freqs = np.bincount(posting_terms, minlength=n_terms)
+        indptr = np.concatenate(([0], np.cumsum(doc_freqs)))
+
+        return cls(
+            vocabulary,
+            indptr,
+            keys % max(n_docs, 1),
+            term_freqs,
+            doc_len,
+            okapi_idf(doc_freqs, n_docs, epsilon),
+            k1=k1,
+            b=b,
+            epsilon=epsilon,
+        )
+
+    @classmethod
+    def from_okapi(cls, bm25) -> "BM25Index":
+        """Convert a rank_bm25 BM25Okapi, e.g. one unpickled from an older index."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, freqs in enumerate(bm25.doc_freqs):
+            for term, tf in freqs.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocabulary = {term: i for i, term in enumerate(postings)}
+        flat = [posting for term_postings in postings.values() for posting in term_postings]
+        indptr = np.concatenate(([0], np.cumsum([len(p) for p in postings.values()], dtype=np.int64)))
+        return cls(
+            vocabulary,
+            indptr,
+            np.array([doc_id for doc_id, _ in flat], dtype=np.int32),
+            np.array([tf for _, tf in flat], dtype=np.int32),
+            np.asarray(bm25.doc_len),
+            np.array([bm25.idf[term] for term in postings], dtype=np.float64),
+            k1=bm25.k1,
+            b=bm25.b,
+            epsilon=getattr(bm25, "epsilon", 0.25),
+        )
+
+    def add(self, corpus: Sequence[Sequence[str]]) -> "BM25Index":
+        """A new index with `corpus` appended as documents corpus_size, ...
+
+        Only the new documents are encoded; the existing postings are merged
+        with theirs as arrays. IDF and every posting weight are recomputed,
+        since N and the average length change, which is one pass over the
+        arrays. Scores equal those of build() over the combined corpus.
+        """
+        vocabulary = dict(self.vocabulary)
+        term_ids = np.fromiter(
+            (vocabulary.setdefault(token, len(vocabulary)) for doc in corpus for token in doc),
+            dtype=np.int64,
+        )
+        added_len = np.fromiter((len(doc) for doc in corpus), dtype=np.int64, count=len(corpus))
+        n_docs = self.corpus_size + len(corpus)
+
+        docs = np.repeat(np.arange(self.corpus_size, n_docs, dtype=np.int64), added_len)
+        keys, term_freqs = np.unique(term_ids * max(n_docs, 1) + docs, return_counts=True)
+        terms = np.concatenate((self._posting_terms(), keys // max(n_docs, 1)))
+        # Stable: within a term the existing postings (lower document ids)
+        # stay ahead of the new ones, so documents remain ascending.
+        order = np.argsort(terms, kind="stable")
+        return self._from_postings(
+            vocabulary,
+            terms[order],
+            np.concatenate((self.doc_ids, keys % max(n_docs, 1)))[order],
+            np.concatenate((self.term_freqs, term_freqs))[order],
+            np.concatenate((self.doc_len, added_len)),
+        )
+
+    def remove(self, doc_indices: Iterable[int]) -> "BM25Index":
+        """A new index without the documents at `doc_indices`.
+
+        Later documents move up to close the gaps, in order, and terms left
+        without postings leave the vocabulary, as if the remaining corpus
+        had been built from scratch.
+        """
+        keep = np.ones(self.corpus_size, dtype=bool)
+        keep[np.fromiter(doc_indices, dtype=np.int64)] = False
+        new_ids = np.cumsum(keep) - 1
+        kept = keep[self.doc_ids]
+        terms = self._posting_terms()[kept]
+
+        alive = np.bincount(terms, minlength=len(self.vocabulary)) > 0
+        new_terms = np.cumsum(alive) - 1
+        vocabulary = {term: int(new_terms[i]) for term, i in self.vocabulary.items() if alive[i]}
+        return self._from_postings(
+            vocabulary,
+            new_terms[terms],
+            new_ids[self.doc_ids[kept]],
+            self.term_freqs[kept],
+            self.doc_len[keep],
+        )
+
+    def _posting_terms(self) -> np.ndarray:
+        """The term id of every posting."""
+        return np.repeat(np.arange(len(self.vocabulary), dtype=np.int64), np.diff(self.indptr))
+
+    def _from_postings(self, vocabulary, terms, doc_ids, term_freqs, doc_len) -> "BM25Index":
+        """An index from postings already sorted by term, then document."""
+        doc_freqs = np.bincount(terms, minlength=len(vocabulary))
+        return type(self)(
+            vocabulary,
+            np.concatenate(([0], np.cumsum(doc_freqs))),
+            doc_ids,
+            term_freqs,
+            doc_len,
+            okapi_idf(doc_freqs, len(doc_len), self.epsilon),
+            k1=self.k1,
+            b=self.b,
+            epsilon=self.epsilon,
+        )
+
+    def _posting_weights(self) -> np.ndarray:
+        if not len(self.doc_ids):
+            return np.empty(0, dtype=np.float32)
+        tf = self.term_freqs.astype(np.float64)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len[self.doc_ids] / self.avgdl)
+        idf = np.repeat(self.idf, np.diff(self.indptr))
+        return (idf * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def _postings(self, query: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Document ids and weights of every posting of the query's terms.
+
+        A term repeated in the query counts once per occurrence, as in BM25Okapi.
+        """
+        spans = [
+            (self.indptr[t], self.indptr[t + 1])
+            for t in (self.vocabulary.get(token) for token in query)
+            if t is not None
+        ]
+        if not spans:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if len(spans) == 1:
+            start, end = spans[0]
+            return self.doc_ids[start:end], self.weights[start:end]
+        return (
+            np.concatenate([self.doc_ids[start:end] for start, end in spans]),
+            np.concatenate([self.weights[start:end] for start, end in spans]),
+        )
+
+    def get_scores(self, query: Iterable[str]) -> np.ndarray:
+        """BM25 score of every document for a tokenized query."""
+        doc_ids, weights = self._postings(query)
+        return np.bincount(doc_ids, weights=weights, minlength=self.corpus_size)
+
+    def top_k(self, query: Iterable[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The `k` best-scoring documents that contain a query term, best first.
+
+        Only documents in the postings are ranked, so the cost depends on how
+        common the query terms are, not on the size of the corpus.
+        """
+        doc_ids, weights = self._postings(query)
+        if not len(doc_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        candidates, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights, minlength=len(candidates))
+        best = top_k_indices(scores, k)
+        return candidates[best].astype(np.int64), scores[best]
+
+    def save(self, directory: str) -> Dict[str, Any]:
+        """Write the index into `directory`; returns the fields for its manifest."""
+        terms = [term.encode("utf-8") for term in sorted(self.vocabulary, key=self.vocabulary.get)]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        if terms:
+            np.cumsum([len(term) for term in terms], out=offsets[1:])
+        with open(os.path.join(directory, TERMS_FILE), "wb") as f:
+            f.write(b"".join(terms))
+        np.save(os.path.join(directory, TERM_OFFSETS_FILE), offsets)
+        for name, file_name in ARRAY_FILES.items():
+            np.save(os.path.join(directory, file_name), np.ascontiguousarray(getattr(self, name)))
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "terms": len(terms),
+            "postings": int(len(self.doc_ids)),
+        }
+
+    @classmethod
+    def load(cls, directory: str, k1: float, b: float, mmap: bool = True, epsilon: float = 0.25) -> "BM25Index":
+        """Open an index written by save(); postings stay on disk with `mmap`."""
+        with open(os.path.join(directory, TERMS_FILE), "rb") as f:
+            blob = f.read()
+        offsets = np.load(os.path.join(directory, TERM_OFFSETS_FILE)).tolist()
+        if offsets and offsets[-1] != len(blob):
+            raise ValueError(f"{directory}: vocabulary is truncated ({len(blob)} of {offsets[-1]} bytes).")
+        vocabulary = {blob[offsets[i]:offsets[i + 1]].decode("utf-8"): i for i in range(len(offsets) - 1)}
+
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, file_name), mmap_mode=mode) for name, file_name in ARRAY_FILES.items()}
+        if len(arrays["indptr"]) != len(vocabulary) + 1 or len(arrays["idf"]) != len(vocabulary):
+            raise ValueError(f"{directory}: postings do not match the {len(vocabulary)}-term vocabulary.")
+        if not len(arrays["doc_ids"]) == len(arrays["term_freqs"]) == len(arrays["weights"]) == int(arrays["indptr"][-1]):
+            raise ValueError(f"{directory}: postings arrays disagree in length.")
+        return cls(vocabulary, k1=k1, b=b, epsilon=epsilon, **arrays)
+
+    def query_matrix(self, queries: Sequence[Iterable[str]]) -> sparse.csr_matrix:
+        """Query × term counts; a term repeated in a query counts twice."""
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for token in query:
+                term = self.vocabulary.get(token)
+                if term is not None:
+                    rows.append(row)
+                    cols.append(term)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(queries), len(self.vocabulary))
+        )
+
+    def get_scores_batch(self, queries: Sequence[Iterable[str]]) -> np.ndarray:
+        """BM25 scores of every document for each query, one row per query."""
+        return (self.query_matrix(queries) @ self.matrix).toarray().astype(np.float64)
+
+    def top_k_batch(self, queries: Sequence[Iterable[str]], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """top_k() for every query, from one sparse matrix product."""
+        scores = self.query_matrix(queries) @ self.matrix
+        scores.sort_indices()
+        results = []
+        for row in range(len(queries)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            candidates, row_scores = scores.indices[start:end], scores.data[start:end].astype(np.float64)
+            best = top_k_indices(row_scores, k)
+            results.append((candidates[best].astype(np.int64), row_scores[best]))
+        return results
+
+    @property
+    def nbytes(self) -> int:
+        # `matrix` shares indptr, doc_ids and weights; it adds nothing.
+        arrays = (self.indptr, self.doc_ids, self.term_freqs, self.doc_len, self.idf, self.weights)
+        # Vocabulary: the key strings plus roughly 100 bytes of dict entry and int each.
+        return sum(a.nbytes for a in arrays) + sum(len(term) + 100 for term in self.vocabulary)
+
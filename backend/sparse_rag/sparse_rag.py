@@ -1,23 +1,80 @@
+import functools
+import itertools
+import multiprocessing
 import pickle
 import os
 import re
-from typing import List, Dict, Any
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from rank_bm25 import BM25Okapi
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
 from rag.base_rag import BaseRAG
+from common.chunk_store import ChunkStore
+from common.index_store import IndexFormatError, read_manifest, write_manifest
+from sparse_rag.bm25 import BM25Index, encode_corpus, merge_encoded
+from sparse_rag.tokenizer import FastTokenizer
+
+INDEX_KIND = "sparse"
+# "nltk": word_tokenize. "fast": sparse_rag.tokenizer, the same tokens
+# without NLTK's tokenizer, and the only one that can stem.
+TOKENIZERS = ("nltk", "fast")
+
+# Documents with at least this many characters of chunk text are tokenized
+# in a process pool; below it, starting the workers costs more than it saves.
+DEFAULT_PARALLEL_TOKENIZE_MIN_CHARS = 20_000_000
+DEFAULT_TOKENIZE_WORKERS = min(4, os.cpu_count() or 1)
+# Chunks per work unit sent to a tokenizer process.
+DEFAULT_TOKENIZE_BATCH_SIZE = 2_000
+
+
+@functools.lru_cache(maxsize=None)
+def _nltk():
+    """Import NLTK and fetch its corpora on first use, not at import time.
+
+    Both take seconds and every process imports this module through
+    rag.rag_service, including the ones that never tokenize anything.
+    """
+    import nltk
+
+    try:
+        nltk.data.find('corpora/stopwords')
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        nltk.download('stopwords', quiet=True)
+        nltk.download('punkt', quiet=True)
+        nltk.download('punkt_tab', quiet=True)
+    return nltk
+
+
+def word_tokenize(text: str) -> List[str]:
+    return _nltk().word_tokenize(text)
+
+
+@functools.lru_cache(maxsize=4)
+def _tokenizing_engine(tokenizer: str, stop_words: frozenset, stem: bool) -> "SparseRAG":
+    engine = SparseRAG.__new__(SparseRAG)
+    engine.stop_words = set(stop_words)
+    engine._set_tokenizer(tokenizer, stem)
+    return engine
+
+
+def _encode_batch(settings: Tuple[str, frozenset, bool], texts: List[str]):
+    """Tokenize and encode one work unit in a tokenizer process."""
+    vocabulary, term_ids, doc_len = encode_corpus([_tokenizing_engine(*settings)._tokenize(t) for t in texts])
+    return list(vocabulary), term_ids.astype(np.int32), doc_len
 
-try:
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
-    nltk.download('punkt', quiet=True)
-    nltk.download('punkt_tab', quiet=True)
 
 class SparseRAG(BaseRAG):
+    tokenizer = "nltk"
+    stem = False
+    _fast_tokenizer = None
+    parallel_tokenize_min_chars = DEFAULT_PARALLEL_TOKENIZE_MIN_CHARS
+    tokenize_workers = DEFAULT_TOKENIZE_WORKERS
+    tokenize_batch_size = DEFAULT_TOKENIZE_BATCH_SIZE
+    updates_in_place = True
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initializes the SparseRAG engine with BM25.
@@ -29,15 +86,35 @@ class SparseRAG(BaseRAG):
         self.top_k = config.get("top_k", 3)
         
         if config.get("remove_stop_words", True):
-            self.stop_words = set(stopwords.words('english'))
+            self.stop_words = set(_nltk().corpus.stopwords.words('english'))
         else:
             self.stop_words = set()
         self.document_metadata = []
 
+        self._set_tokenizer(config.get("tokenizer", "nltk"), bool(config.get("stem", False)))
+        self.parallel_tokenize_min_chars = int(
+            config.get("parallel_tokenize_min_chars", DEFAULT_PARALLEL_TOKENIZE_MIN_CHARS)
+        )
+        self.tokenize_workers = int(config.get("tokenize_workers", DEFAULT_TOKENIZE_WORKERS))
+        self.tokenize_batch_size = int(config.get("tokenize_batch_size", DEFAULT_TOKENIZE_BATCH_SIZE))
+
+    def _set_tokenizer(self, tokenizer: str, stem: bool) -> None:
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer '{tokenizer}'. Expected one of {TOKENIZERS}.")
+        if stem and tokenizer != "fast":
+            raise ValueError("Stemming needs the 'fast' tokenizer.")
+        self.tokenizer = tokenizer
+        self.stem = stem
+        self._fast_tokenizer = None
+        if tokenizer == "fast":
+            self._fast_tokenizer = FastTokenizer(self.stop_words, stemmer="english" if stem else None)
+
     def _tokenize(self, text: str) -> List[str]:
         """
         Helper to lowercase, remove punctuation, and tokenize text.
         """
+        if self._fast_tokenizer is not None:
+            return self._fast_tokenizer(text)
         text = re.sub(r'[^a-zA-Z0-9\s]', '', text.lower())
         tokens = word_tokenize(text)
         return [w for w in tokens if w not in self.stop_words]
@@ -56,13 +133,154 @@ class SparseRAG(BaseRAG):
         print(f"Indexing {len(documents)} documents using BM25...")
         
         self.documents = texts
-        self.tokenized_corpus = [self._tokenize(doc) for doc in texts]
+        # The token lists are only needed to build the postings; the index
+        # holds everything retrieval and save_index() use.
+        start = time.perf_counter()
+        if self._use_tokenizer_pool(texts):
+            encoded = self._encode_in_processes(texts)
+            tokenized_corpus = None
+        else:
+            tokenized_corpus = [self._tokenize(doc) for doc in texts]
+        tokenized = time.perf_counter()
         
         try:
-            self.bm25 = BM25Okapi(self.tokenized_corpus)
+            if tokenized_corpus is None:
+                self.bm25 = BM25Index.from_encoded(*encoded)
+            else:
+                self.bm25 = BM25Index.build(tokenized_corpus)
             print("Indexing complete.")
         except Exception as e:
             print(f"Error during indexing: {e}")
+        self.index_timings = {"tokenize": tokenized - start, "bm25": time.perf_counter() - tokenized}
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Append `documents` to the index, tokenizing only them."""
+        if not documents:
+            return
+        if self.bm25 is None:
+            self.index_documents(documents)
+            return
+        texts = [doc["text"] for doc in documents]
+        self.bm25 = self.bm25.add([self._tokenize(text) for text in texts])
+        self.documents = list(self.documents) + texts
+        self.document_metadata = list(self.document_metadata) + [{"chunk_id": doc.get("chunk_id")} for doc in documents]
+
+    def remove_documents(self, chunk_ids) -> None:
+        """Drop every indexed chunk whose chunk_id is in `chunk_ids`."""
+        chunk_ids = set(chunk_ids)
+        drop = [i for i, meta in enumerate(self.document_metadata) if meta.get("chunk_id") in chunk_ids]
+        if not drop or self.bm25 is None:
+            return
+        self.bm25 = self.bm25.remove(drop)
+        dropped = set(drop)
+        self.documents = [text for i, text in enumerate(self.documents) if i not in dropped]
+        self.document_metadata = [meta for i, meta in enumerate(self.document_metadata) if i not in dropped]
+
+    def _use_tokenizer_pool(self, texts: List[str]) -> bool:
+        # Daemonic processes (Celery's prefork workers) cannot start children.
+        return (
+            self.tokenize_workers > 1
+            and len(texts) > self.tokenize_batch_size
+            and sum(len(text) for text in texts) >= self.parallel_tokenize_min_chars
+            and not multiprocessing.current_process().daemon
+        )
+
+    def _encode_in_processes(self, texts: List[str]):
+        """Tokenize and encode `texts` in a process pool, one work unit per
+        tokenize_batch_size chunks.
+
+        Workers return each unit's vocabulary and term ids rather than token
+        lists, which are slow to pickle. Units are merged in order, so the
+        index is the one a serial build would produce. The pool is spawned,
+        not forked: this process has threads (and their locks) a fork would
+        copy mid-use.
+        """
+        settings = (self.tokenizer, frozenset(self.stop_words), self.stem)
+        size = self.tokenize_batch_size
+        units = [texts[i:i + size] for i in range(0, len(texts), size)]
+        workers = min(self.tokenize_workers, len(units))
+        print(f"Tokenizing {len(texts)} chunks in {workers} processes...")
+        try:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                return merge_encoded(pool.map(_encode_batch, itertools.repeat(settings), units))
+        except Exception as e:
+            print(f"Warning: parallel tokenization failed ({e}); tokenizing serially.")
+            return encode_corpus([self._tokenize(doc) for doc in texts])
+
+    def _clear_index(self) -> None:
+        super()._clear_index()
+        self.documents = []
+        self.bm25 = None
+
+    def save_index(self, directory: str, with_chunks: bool = True) -> None:
+        """Write the index into `directory` (see common.index_store).
+
+        Layout: the chunk store files, the BM25 postings arrays (see
+        sparse_rag.bm25) and manifest.json. No pickles and no token lists.
+        Without `with_chunks` the chunk store is left to the caller (Hybrid
+        saves one for both of its halves) and load_index() must be given it.
+        """
+        if self.bm25 is None or len(self.documents) == 0:
+            raise RuntimeError("Cannot save an empty sparse index.")
+
+        store = ChunkStore.from_documents(self.documents, self.document_metadata)
+        if with_chunks:
+            store.save(directory)
+        bm25 = self.bm25.save(directory)
+        write_manifest(
+            directory, INDEX_KIND, count=len(store), stop_words=bool(self.stop_words), stem=self.stem, bm25=bm25
+        )
+
+    def load_index(self, directory: str, mmap: bool = True, store: Optional[ChunkStore] = None) -> None:
+        """Open an index written by save_index().
+
+        With `mmap` the chunk texts and postings stay on disk and are paged
+        in on demand; only the vocabulary is read into a dict. `store` is
+        the chunk store of an index saved without one.
+        """
+        manifest = read_manifest(directory, INDEX_KIND)
+        if manifest.get("stop_words") != bool(self.stop_words):
+            raise IndexFormatError(
+                f"{directory} was tokenized with stop words {'removed' if manifest.get('stop_words') else 'kept'}; "
+                f"this engine {'removes' if self.stop_words else 'keeps'} them."
+            )
+        # Both tokenizers produce the same tokens, so only stemming matters.
+        if bool(manifest.get("stem")) != self.stem:
+            raise IndexFormatError(
+                f"{directory} was tokenized {'with' if manifest.get('stem') else 'without'} stemming; "
+                f"this engine {'stems' if self.stem else 'does not'}."
+            )
+
+        if store is None:
+            store = ChunkStore.load(directory, mmap=mmap)
+        params = manifest.get("bm25") or {}
+        bm25 = BM25Index.load(
+            directory, k1=params.get("k1", 1.5), b=params.get("b", 0.75), mmap=mmap, epsilon=params.get("epsilon", 0.25)
+        )
+        if bm25.corpus_size != len(store):
+            raise IndexFormatError(f"{directory}: BM25 covers {bm25.corpus_size} documents, store has {len(store)}.")
+
+        self.documents = store
+        self.document_metadata = store.metadata
+        self.bm25 = bm25
+
+    def restore_bm25(self, bm25) -> None:
+        """Install a saved BM25 index, converting a legacy rank_bm25 one."""
+        if bm25 is not None and not isinstance(bm25, BM25Index):
+            bm25 = BM25Index.from_okapi(bm25)
+        self.bm25 = bm25
+
+    def warm_up(self) -> None:
+        if self._fast_tokenizer is not None:
+            self._fast_tokenizer.warm_up()
+        else:
+            _nltk()
+
+    def index_nbytes(self) -> int:
+        postings = self.bm25.nbytes if self.bm25 is not None else 0
+        if isinstance(self.documents, ChunkStore):
+            return self.documents.nbytes + postings
+        return sum(len(text) for text in self.documents) + postings
 
     def retrieve(self, query: str) -> List[str]:
         """
@@ -73,19 +291,45 @@ class SparseRAG(BaseRAG):
             return []
             
         tokenized_query = self._tokenize(query)
-        
-        scores = self.bm25.get_scores(tokenized_query)
-        
-        top_indices = scores.argsort()[-self.top_k:][::-1]
 
+        top_indices, scores = self.bm25.top_k(tokenized_query, self.top_k)
+        return self._results(top_indices, scores)
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        retrieve() for several queries, scored with one sparse matrix product.
+        """
+        if self.bm25 is None:
+            print("Warning: No documents indexed.")
+            return [[] for _ in queries]
+
+        tokenized_queries = [self._tokenize(query) for query in queries]
+        return [
+            self._results(top_indices, scores)
+            for top_indices, scores in self.bm25.top_k_batch(tokenized_queries, self.top_k)
+        ]
+
+    def score_all(self, query: str) -> np.ndarray:
+        """BM25 score of every indexed chunk, in index order (empty if none)."""
+        if self.bm25 is None:
+            return np.zeros(0, dtype=np.float64)
+        return self.bm25.get_scores(self._tokenize(query))
+
+    def score_all_batch(self, queries: List[str]) -> np.ndarray:
+        """score_all() for several queries, one row per query."""
+        if self.bm25 is None:
+            return np.zeros((len(queries), 0), dtype=np.float64)
+        return self.bm25.get_scores_batch([self._tokenize(query) for query in queries])
+
+    def _results(self, top_indices, scores) -> List[Dict[str, Any]]:
         relevant_docs = []
-        for idx in top_indices:
-            if scores[idx] > 0:
+        for idx, score in zip(top_indices, scores):
+            if score > 0:
                 relevant_docs.append(
                     {
                         "text": self.documents[idx],
                         "chunk_id": self.document_metadata[idx].get("chunk_id"),
-                        "score": float(scores[idx])
+                        "score": float(score)
                     }
                 )
                 
@@ -0,0 +1,98 @@
+"""The "fast" SparseRAG tokenizer: NLTK's tokens without NLTK's tokenizer.
+
+SparseRAG strips everything but ASCII letters, digits and whitespace before
+calling word_tokenize, so Punkt never finds a sentence boundary and the
+Treebank rules have no punctuation left to act on. On such text
+word_tokenize reduces to a whitespace split plus a handful of contraction
+splits ("cannot" -> "can", "not"). FastTokenizer does exactly that with one
+compiled regex (str.translate for ASCII text, twice as fast) and
+str.split(), and caches what each distinct word becomes
+(contraction split, stop word filter, optional Snowball stem) so every later
+occurrence is one dict lookup. Cached tokens are interned: the token lists
+built for a large document share one string per distinct term.
+
+router.tests checks the parity with word_tokenize; see
+benchmarks/sparse_tokenizer.py for the throughput.
+"""
+import functools
+import re
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# What SparseRAG._tokenize has always removed, applied after lowercasing.
+STRIP = re.compile(r"[^a-z0-9\s]+")
+ASCII_STRIP = str.maketrans(
+    "", "", "".join(c for c in map(chr, range(128)) if not (c.isspace() or c.isdigit() or c.islower()))
+)
+
+# NLTK's MacIntyre contractions that survive punctuation stripping: whole
+# words that word_tokenize splits in two.
+CONTRACTIONS = {
+    "cannot": ("can", "not"),
+    "gimme": ("gim", "me"),
+    "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"),
+    "lemme": ("lem", "me"),
+    "wanna": ("wan", "na"),
+}
+
+# Distinct words remembered before the cache starts over.
+DEFAULT_CACHE_SIZE = 500_000
+
+
+@functools.lru_cache(maxsize=None)
+def snowball_stemmer(language: str) -> Callable[[str], str]:
+    """NLTK's Snowball stemmer, imported on first use; it needs no corpora."""
+    from nltk.stem.snowball import SnowballStemmer
+
+    return SnowballStemmer(language).stem
+
+
+class FastTokenizer:
+    """Lowercase, strip, split; then each distinct word once through the cache.
+
+    `stop_words` are dropped before stemming, as in the NLTK path. With
+    `stemmer` (a Snowball language, e.g. "english") the surviving tokens are
+    stemmed.
+    """
+
+    def __init__(
+        self,
+        stop_words: Iterable[str] = (),
+        stemmer: Optional[str] = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.stop_words = frozenset(stop_words)
+        self.stemmer = stemmer
+        self.cache_size = cache_size
+        self._cache: Dict[str, Tuple[str, ...]] = {}
+
+    def __call__(self, text: str) -> List[str]:
+        cache = self._cache
+        tokens = []
+        text = text.lower()
+        text = text.translate(ASCII_STRIP) if text.isascii() else STRIP.sub("", text)
+        for word in text.split():
+            normalized = cache.get(word)
+            if normalized is None:
+                normalized = self._normalize(word)
+                if len(cache) >= self.cache_size:
+                    cache.clear()
+                cache[word] = normalized
+            tokens.extend(normalized)
+        return tokens
+
+    def warm_up(self) -> None:
+        if self.stemmer is not None:
+            snowball_stemmer(self.stemmer)
+
+    def _normalize(self, word: str) -> Tuple[str, ...]:
+        stem = snowball_stemmer(self.stemmer) if self.stemmer is not None else None
+        normalized = []
+        for token in CONTRACTIONS.get(word, (word,)):
+            if token in self.stop_words:
+                continue
+            if stem is not None:
+                token = stem(token)
+            normalized.append(sys.intern(token))
+        return tuple(normalized)
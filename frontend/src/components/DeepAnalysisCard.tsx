@@ -95,7 +95,7 @@ const DeepAnalysisCard: React.FC<DeepAnalysisCardProps> = ({
                     <span className="text-cyan-400 font-mono text-xs">
                       chunk {chunk.number} - ID: {chunk.id}
                     </span>
-                    {chunk.score !== undefined && (
+                    {chunk.score != null && (
                       <span
                         className={`text-xs font-medium px-1.5 py-0.5 rounded-full ${
                           chunk.score >= 0.75
@@ -15,7 +15,7 @@ export interface ChatResponse {
 export interface RetrievedChunk {
   id: string | number;
   text: string;
-  score?: number;
+  score?: number | null;
 }
 
 export interface EvaluationMetric {
@@ -48,7 +48,7 @@ export interface WebSocketMessage {
   context?: {
     text: string;
     chunk_id: number | string;
-    score?: number;
+    score?: number | null;
   }[];
   evaluation?: EvaluationMetric;
 }
@@ -57,7 +57,7 @@ export interface NormalizedChunk {
   number: number;
   id: string | number;
   text: string;
-  score?: number;
+  score?: number | null;
 }
 
 export interface DeepAnalysisServiceOptions {